@@ -7,12 +7,30 @@ Handles rate limiting for all configured threat intelligence APIs
 import os
 import json
 import time
+import queue
+import logging
+import threading
 from datetime import datetime, timedelta
 from collections import defaultdict
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 import pymongo
+from bson import ObjectId
 from dataclasses import dataclass
 
+logger = logging.getLogger(__name__)
+
+# Sliding windows kept in memory: stats key -> (bucket width in seconds, bucket count)
+USAGE_WINDOWS = {
+    "last_minute": (1, 60),
+    "last_hour": (60, 60),
+    "last_day": (900, 96),
+}
+
+EPOCH = datetime(1970, 1, 1)
+
+# MongoDB error code for an insert whose _id is already stored
+DUPLICATE_KEY_ERROR = 11000
+
 @dataclass
 class APIConfig:
     """API Configuration with rate limits"""
@@ -24,87 +42,159 @@ class APIConfig:
     rate_limit_per_month: Optional[int] = None
     notes: Optional[str] = None
 
+def load_api_configs() -> Dict[str, APIConfig]:
+    """Load API configurations from environment variables"""
+    apis = {}
+    
+    # VirusTotal
+    if os.getenv('VT_API_KEY'):
+        apis['virustotal'] = APIConfig(
+            name="VirusTotal",
+            api_key=os.getenv('VT_API_KEY'),
+            rate_limit_per_min=int(os.getenv('VT_RATE_LIMIT_PER_MIN', 4)),
+            rate_limit_per_day=int(os.getenv('VT_RATE_LIMIT_PER_DAY', 500)),
+            notes="Free tier: 4 requests/minute, 500/day"
+        )
+    
+    # AbuseIPDB
+    if os.getenv('ABUSEIPDB_API_KEY'):
+        apis['abuseipdb'] = APIConfig(
+            name="AbuseIPDB",
+            api_key=os.getenv('ABUSEIPDB_API_KEY'),
+            rate_limit_per_day=int(os.getenv('ABUSEIPDB_RATE_LIMIT_CHECKS_PER_DAY', 1000)),
+            notes="Free tier: 1000 checks/day, 100 reports/day"
+        )
+    
+    # AlienVault OTX
+    if os.getenv('OTX_API_KEY'):
+        apis['otx'] = APIConfig(
+            name="AlienVault OTX",
+            api_key=os.getenv('OTX_API_KEY'),
+            notes="No strict limits - reasonable use policy"
+        )
+    
+    # IntelligenceX
+    if os.getenv('INTELX_API_KEY'):
+        apis['intelx'] = APIConfig(
+            name="IntelligenceX",
+            api_key=os.getenv('INTELX_API_KEY'),
+            rate_limit_per_month=int(os.getenv('INTELX_RATE_LIMIT_SEARCH_PER_MONTH', 50)),
+            notes="Free tier: 50 searches/month, 100 views"
+        )
+    
+    # LeakIX
+    if os.getenv('LEAKIX_API_KEY'):
+        apis['leakix'] = APIConfig(
+            name="LeakIX",
+            api_key=os.getenv('LEAKIX_API_KEY'),
+            rate_limit_per_month=int(os.getenv('LEAKIX_RATE_LIMIT_PER_MONTH', 3000)),
+            notes="Free tier: 3000 calls/month"
+        )
+    
+    # FOFA
+    if os.getenv('FOFA_KEY'):
+        apis['fofa'] = APIConfig(
+            name="FOFA",
+            api_key=os.getenv('FOFA_KEY'),
+            rate_limit_per_month=int(os.getenv('FOFA_RATE_LIMIT_PER_MONTH', 300)),
+            notes="Free tier: 300 queries/month"
+        )
+    
+    # Custom APIs (for future expansion)
+    for i in range(1, 4):  # Support for 3 custom APIs
+        if os.getenv(f'CUSTOM_API_{i}_KEY'):
+            apis[f'custom_{i}'] = APIConfig(
+                name=os.getenv(f'CUSTOM_API_{i}_NAME', f'Custom API {i}'),
+                api_key=os.getenv(f'CUSTOM_API_{i}_KEY'),
+                notes=os.getenv(f'CUSTOM_API_{i}_RATE_LIMIT', 'Custom limits')
+            )
+    
+    return apis
+
+class WindowCounter:
+    """Ring of fixed-width buckets approximating a sliding-window count"""
+
+    def __init__(self, bucket_seconds: int, bucket_count: int):
+        self.bucket_seconds = bucket_seconds
+        self.counts = [0] * bucket_count
+        self.slots = [-1] * bucket_count  # absolute bucket index held by each slot
+
+    def add(self, seconds: float, count: int = 1) -> None:
+        index = int(seconds // self.bucket_seconds)
+        slot = index % len(self.counts)
+        if self.slots[slot] != index:
+            if index < self.slots[slot]:
+                return  # older than the window
+            self.slots[slot] = index
+            self.counts[slot] = 0
+        self.counts[slot] += count
+
+    def total(self, seconds: float) -> int:
+        current = int(seconds // self.bucket_seconds)
+        oldest = current - len(self.counts) + 1
+        return sum(count for count, index in zip(self.counts, self.slots) if oldest <= index <= current)
+
+class UsageCounters:
+    """Minute/hour/day sliding windows plus a calendar-month counter for one API and user"""
+
+    def __init__(self):
+        self.windows = {name: WindowCounter(*spec) for name, spec in USAGE_WINDOWS.items()}
+        self.month = None
+        self.month_count = 0
+
+    def add(self, timestamp: datetime) -> None:
+        seconds = (timestamp - EPOCH).total_seconds()
+        for window in self.windows.values():
+            window.add(seconds)
+        self.add_month((timestamp.year, timestamp.month))
+
+    def add_month(self, month: Tuple[int, int], count: int = 1) -> None:
+        if self.month is None or month > self.month:
+            self.month = month
+            self.month_count = 0
+        if month == self.month:
+            self.month_count += count
+
+    def stats(self, now: datetime) -> Dict[str, int]:
+        seconds = (now - EPOCH).total_seconds()
+        stats = {name: window.total(seconds) for name, window in self.windows.items()}
+        stats["last_month"] = self.month_count if self.month == (now.year, now.month) else 0
+        return stats
+
 class APIRateLimiter:
     """
     Centralized API rate limiter for all threat intelligence services
     Tracks usage and enforces limits defined in environment variables
     """
     
-    def __init__(self, mongo_url: str):
+    def __init__(self, mongo_url: str, flush_interval: float = 2.0, flush_batch_size: int = 500,
+                 max_pending: int = 50000):
         self.client = pymongo.MongoClient(mongo_url)
         self.db = self.client.jupiter_siem
         self.usage_collection = self.db.api_usage_logs
         self.apis = self._load_api_configs()
-        self.usage_cache = defaultdict(list)
+        
+        # Rate checks are answered from in-memory counters; usage history is
+        # written to MongoDB in batches by a background thread
+        self.usage_counters: Dict[Tuple[str, Optional[str]], UsageCounters] = defaultdict(UsageCounters)
+        self._counter_lock = threading.Lock()
+        self._pending_records: "queue.Queue[Dict]" = queue.Queue()
+        self._failed_records: List[Dict] = []
+        self._flush_lock = threading.Lock()
+        self.flush_interval = flush_interval
+        self.flush_batch_size = flush_batch_size
+        self.max_pending = max_pending
+        self.records_written = 0
+        self.records_dropped = 0
+        
+        self._warm_counters()
+        self._stop = threading.Event()
+        self._writer = threading.Thread(target=self._flush_loop, name="api-usage-writer", daemon=True)
+        self._writer.start()
     
     def _load_api_configs(self) -> Dict[str, APIConfig]:
         """Load API configurations from environment variables"""
-        apis = {}
-        
-        # VirusTotal
-        if os.getenv('VT_API_KEY'):
-            apis['virustotal'] = APIConfig(
-                name="VirusTotal",
-                api_key=os.getenv('VT_API_KEY'),
-                rate_limit_per_min=int(os.getenv('VT_RATE_LIMIT_PER_MIN', 4)),
-                rate_limit_per_day=int(os.getenv('VT_RATE_LIMIT_PER_DAY', 500)),
-                notes="Free tier: 4 requests/minute, 500/day"
-            )
-        
-        # AbuseIPDB
-        if os.getenv('ABUSEIPDB_API_KEY'):
-            apis['abuseipdb'] = APIConfig(
-                name="AbuseIPDB",
-                api_key=os.getenv('ABUSEIPDB_API_KEY'),
-                rate_limit_per_day=int(os.getenv('ABUSEIPDB_RATE_LIMIT_CHECKS_PER_DAY', 1000)),
-                notes="Free tier: 1000 checks/day, 100 reports/day"
-            )
-        
-        # AlienVault OTX
-        if os.getenv('OTX_API_KEY'):
-            apis['otx'] = APIConfig(
-                name="AlienVault OTX",
-                api_key=os.getenv('OTX_API_KEY'),
-                notes="No strict limits - reasonable use policy"
-            )
-        
-        # IntelligenceX
-        if os.getenv('INTELX_API_KEY'):
-            apis['intelx'] = APIConfig(
-                name="IntelligenceX",
-                api_key=os.getenv('INTELX_API_KEY'),
-                rate_limit_per_month=int(os.getenv('INTELX_RATE_LIMIT_SEARCH_PER_MONTH', 50)),
-                notes="Free tier: 50 searches/month, 100 views"
-            )
-        
-        # LeakIX
-        if os.getenv('LEAKIX_API_KEY'):
-            apis['leakix'] = APIConfig(
-                name="LeakIX",
-                api_key=os.getenv('LEAKIX_API_KEY'),
-                rate_limit_per_month=int(os.getenv('LEAKIX_RATE_LIMIT_PER_MONTH', 3000)),
-                notes="Free tier: 3000 calls/month"
-            )
-        
-        # FOFA
-        if os.getenv('FOFA_KEY'):
-            apis['fofa'] = APIConfig(
-                name="FOFA",
-                api_key=os.getenv('FOFA_KEY'),
-                rate_limit_per_month=int(os.getenv('FOFA_RATE_LIMIT_PER_MONTH', 300)),
-                notes="Free tier: 300 queries/month"
-            )
-        
-        # Custom APIs (for future expansion)
-        for i in range(1, 4):  # Support for 3 custom APIs
-            if os.getenv(f'CUSTOM_API_{i}_KEY'):
-                apis[f'custom_{i}'] = APIConfig(
-                    name=os.getenv(f'CUSTOM_API_{i}_NAME', f'Custom API {i}'),
-                    api_key=os.getenv(f'CUSTOM_API_{i}_KEY'),
-                    notes=os.getenv(f'CUSTOM_API_{i}_RATE_LIMIT', 'Custom limits')
-                )
-        
-        return apis
+        return load_api_configs()
     
     def check_rate_limit(self, api_name: str, user_id: str = None) -> Tuple[bool, Dict]:
         """
@@ -175,6 +265,8 @@ class APIRateLimiter:
             return
         
         usage_record = {
+            # Assigned up front so a retried insert is rejected as a duplicate, not counted twice
+            "_id": ObjectId(),
             "api_name": api_name,
             "user_id": user_id,
             "request_type": request_type,
@@ -183,55 +275,115 @@ class APIRateLimiter:
             "metadata": metadata or {}
         }
         
-        # Store in MongoDB
-        self.usage_collection.insert_one(usage_record)
-        
-        # Update cache
-        self.usage_cache[f"{api_name}:{user_id}"].append({
-            "timestamp": usage_record["timestamp"],
-            "response_code": response_code
-        })
+        self._count_usage(api_name, user_id, usage_record["timestamp"])
         
-        # Clean old cache entries (keep last 24 hours)
-        cutoff = datetime.utcnow() - timedelta(days=1)
-        self.usage_cache[f"{api_name}:{user_id}"] = [
-            entry for entry in self.usage_cache[f"{api_name}:{user_id}"]
-            if entry["timestamp"] > cutoff
-        ]
+        # Persisted asynchronously by the writer thread
+        self._pending_records.put(usage_record)
+    
+    def _count_usage(self, api_name: str, user_id: Optional[str], timestamp: datetime) -> None:
+        """Add one call to the API-wide counters and, if given, the user's counters"""
+        with self._counter_lock:
+            for counters in self._counters_for(api_name, user_id):
+                counters.add(timestamp)
     
     def _get_usage_stats(self, api_name: str, user_id: str, now: datetime) -> Dict:
         """Get usage statistics for rate limit checking"""
-        base_query = {"api_name": api_name}
+        with self._counter_lock:
+            counters = self.usage_counters.get((api_name, user_id or None))
+            if counters is None:
+                return {"last_minute": 0, "last_hour": 0, "last_day": 0, "last_month": 0}
+            return counters.stats(now)
+    
+    def _warm_counters(self) -> None:
+        """
+        Seed the in-memory counters from usage history so a restart keeps the quota
+        MongoDB groups each window's records into its buckets, so startup reads a
+        few hundred counts instead of a month of usage records
+        """
+        now = datetime.utcnow()
+        seconds = (now - EPOCH).total_seconds()
+        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        try:
+            for name, (bucket_seconds, bucket_count) in USAGE_WINDOWS.items():
+                oldest = (int(seconds // bucket_seconds) - bucket_count + 1) * bucket_seconds
+                for group in self._aggregate_usage(EPOCH + timedelta(seconds=oldest), bucket_seconds):
+                    key = group["_id"]
+                    for counters in self._counters_for(key["api_name"], key.get("user_id")):
+                        counters.windows[name].add(key["bucket"] * bucket_seconds, group["count"])
+            for group in self._aggregate_usage(month_start):
+                key = group["_id"]
+                for counters in self._counters_for(key["api_name"], key.get("user_id")):
+                    counters.add_month((now.year, now.month), group["count"])
+        except pymongo.errors.PyMongoError as e:
+            self.usage_counters.clear()
+            logger.warning(f"Could not load API usage history, counters start empty: {e}")
+    
+    def _aggregate_usage(self, since: datetime, bucket_seconds: Optional[int] = None) -> List[Dict]:
+        """Usage counts since a time per API and user, and per time bucket when given"""
+        group_key = {"api_name": "$api_name", "user_id": "$user_id"}
+        if bucket_seconds:
+            group_key["bucket"] = {"$floor": {"$divide": [{"$toLong": "$timestamp"}, bucket_seconds * 1000]}}
+        return list(self.usage_collection.aggregate([
+            {"$match": {"timestamp": {"$gte": since}}},
+            {"$group": {"_id": group_key, "count": {"$sum": 1}}}
+        ]))
+    
+    def _counters_for(self, api_name: str, user_id: Optional[str]) -> List[UsageCounters]:
+        """The API-wide counters and, if given, the user's counters"""
+        counters = [self.usage_counters[(api_name, None)]]
         if user_id:
-            base_query["user_id"] = user_id
-        
-        # Time ranges
-        minute_ago = now - timedelta(minutes=1)
-        hour_ago = now - timedelta(hours=1) 
-        day_ago = now - timedelta(days=1)
-        month_ago = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        # Count queries in each time range
-        stats = {
-            "last_minute": self.usage_collection.count_documents({
-                **base_query,
-                "timestamp": {"$gte": minute_ago}
-            }),
-            "last_hour": self.usage_collection.count_documents({
-                **base_query,
-                "timestamp": {"$gte": hour_ago}
-            }),
-            "last_day": self.usage_collection.count_documents({
-                **base_query,
-                "timestamp": {"$gte": day_ago}
-            }),
-            "last_month": self.usage_collection.count_documents({
-                **base_query,
-                "timestamp": {"$gte": month_ago}
-            })
-        }
-        
-        return stats
+            counters.append(self.usage_counters[(api_name, user_id)])
+        return counters
+    
+    def flush(self) -> int:
+        """Write pending usage records to MongoDB in batches; returns the number written"""
+        with self._flush_lock:
+            batch, self._failed_records = self._failed_records, []
+            while True:
+                try:
+                    batch.append(self._pending_records.get_nowait())
+                except queue.Empty:
+                    break
+            
+            written = 0
+            for start in range(0, len(batch), self.flush_batch_size):
+                chunk = batch[start:start + self.flush_batch_size]
+                try:
+                    self.usage_collection.insert_many(chunk, ordered=False)
+                    written += len(chunk)
+                except pymongo.errors.BulkWriteError as e:
+                    # Unordered inserts write everything they can; retry only the rejected records.
+                    # Duplicate keys are records an earlier attempt already wrote
+                    errors = e.details.get("writeErrors", [])
+                    retry = [chunk[err["index"]] for err in errors if err.get("code") != DUPLICATE_KEY_ERROR]
+                    written += e.details.get("nInserted", len(chunk) - len(errors))
+                    if retry:
+                        logger.error(f"Failed to write {len(retry)} API usage records: {e}")
+                        self._failed_records.extend(retry)
+                except pymongo.errors.PyMongoError as e:
+                    logger.error(f"Failed to write {len(chunk)} API usage records: {e}")
+                    self._failed_records.extend(batch[start:])
+                    break
+            
+            # Keep retrying failed writes, but never let the backlog grow without bound
+            overflow = len(self._failed_records) - self.max_pending
+            if overflow > 0:
+                self._failed_records = self._failed_records[overflow:]
+                self.records_dropped += overflow
+                logger.warning(f"Dropped {overflow} API usage records after repeated write failures")
+            
+            self.records_written += written
+            return written
+    
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+    
+    def close(self) -> None:
+        """Stop the writer thread and flush what is left"""
+        self._stop.set()
+        self._writer.join(timeout=self.flush_interval + 1)
+        self.flush()
     
     def get_all_api_status(self, user_id: str = None) -> Dict:
         """Get current status and usage for all configured APIs"""
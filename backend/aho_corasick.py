@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Jupiter SIEM Multi-Pattern Matching
+Aho-Corasick automaton shared by the retro-hunt IOC matcher and the MITRE
+technique index: every pattern is found in a single pass over the text
+"""
+
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+class AhoCorasick:
+    """Multi-pattern substring automaton: one pass over the text finds every pattern"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+        for pattern in patterns:
+            self._add(pattern)
+        self._build()
+
+    def _add(self, pattern: str):
+        node = 0
+        for char in pattern:
+            if char not in self._goto[node]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[node][char] = len(self._goto) - 1
+            node = self._goto[node][char]
+        self._output[node].append(len(self.patterns))
+        self.patterns.append(pattern)
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                if node == 0:
+                    continue  # depth-1 states fail to the root
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def search(self, text: str) -> Iterator[Tuple[int, int]]:
+        """Yield (start, pattern index) for every occurrence"""
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for index in self._output[node]:
+                yield position - len(self.patterns[index]) + 1, index
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Jupiter SIEM Alert Store
+Bounded in-memory hot set of SOAR alerts with secondary indexes by tenant,
+severity, status and creation time, written through to the DuckDB `alerts`
+table in batches. Listings use keyset pagination ordered by (created_at, id),
+answered from memory while it holds every alert and from DuckDB afterwards
+"""
+
+import asyncio
+import base64
+import bisect
+import heapq
+import json
+import logging
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    from soar_engine import Alert
+
+logger = logging.getLogger(__name__)
+
+INDEXED_FIELDS = ("tenant_id", "severity", "status")
+DEFAULT_TENANT = "default"
+
+# Columns of the alerts table; everything else in Alert.to_dict() goes to metadata
+ALERT_COLUMNS = (
+    "id", "tenant_id", "title", "description", "severity", "status", "source", "category",
+    "tags", "metadata", "created_at", "updated_at", "resolved_at", "assigned_to", "created_by"
+)
+METADATA_FIELDS = (
+    "source_event", "indicators", "mitre_tactics", "mitre_techniques",
+    "affected_assets", "playbooks_executed", "playbook_jobs",
+    "fingerprint", "occurrence_count", "last_seen"
+)
+
+SortKey = Tuple[datetime, str]
+
+def encode_cursor(key: SortKey) -> str:
+    """Opaque keyset cursor for the last alert on a page"""
+    raw = f"{key[0].isoformat()}|{key[1]}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> SortKey:
+    try:
+        created_at, alert_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(created_at), alert_id
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def alert_to_row(alert: "Alert") -> Tuple[Any, ...]:
+    data = alert.to_dict()
+    return (
+        alert.id,
+        alert.tenant_id or DEFAULT_TENANT,
+        alert.title,
+        alert.description,
+        alert.severity.value,
+        alert.status.value,
+        "soar",
+        alert.tags[0] if alert.tags else None,
+        json.dumps(alert.tags),
+        json.dumps({name: data[name] for name in METADATA_FIELDS}, default=str),
+        alert.created_at,
+        alert.updated_at,
+        alert.resolved_at,
+        alert.assigned_to,
+        None
+    )
+
+def alert_from_row(row: Dict[str, Any]) -> "Alert":
+    from soar_engine import Alert  # soar_engine imports this module
+    
+    metadata = row.get("metadata") or {}
+    if isinstance(metadata, str):
+        metadata = json.loads(metadata)
+    tags = row.get("tags") or []
+    if isinstance(tags, str):
+        tags = json.loads(tags)
+
+    def iso(value):
+        return value.isoformat() if isinstance(value, datetime) else value
+
+    return Alert.from_dict({
+        **metadata,
+        "id": row["id"],
+        "tenant_id": row.get("tenant_id"),
+        "title": row.get("title") or "",
+        "description": row.get("description") or "",
+        "severity": row["severity"],
+        "status": row.get("status") or "open",
+        "tags": tags,
+        "assigned_to": row.get("assigned_to"),
+        "created_at": iso(row.get("created_at")),
+        "updated_at": iso(row.get("updated_at")),
+        "resolved_at": iso(row.get("resolved_at"))
+    })
+
+class AlertStore:
+    """Alert repository: indexed LRU hot set with batched DuckDB write-through"""
+
+    def __init__(self, hot_size: int = 10000, flush_batch_size: int = 500):
+        self.hot_size = hot_size
+        self.flush_batch_size = flush_batch_size
+        self.conn = None
+        self._hot: "OrderedDict[str, Alert]" = OrderedDict()
+        self._keys: Dict[str, Tuple[Tuple[Any, ...], SortKey]] = {}
+        self._index: Dict[str, Dict[Any, Set[str]]] = {name: defaultdict(set) for name in INDEXED_FIELDS}
+        self._order: List[SortKey] = []
+        self._pending: Dict[str, "Alert"] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        # True while memory holds every alert, so listings need not touch DuckDB
+        self._complete = True
+        self.stats = {"saved": 0, "evicted": 0, "flushed": 0, "flush_errors": 0, "db_queries": 0}
+
+    async def attach(self, conn):
+        """Persist to a DuckDB connection that has the `alerts` table"""
+        def count():
+            cursor = conn.cursor()
+            try:
+                return cursor.execute("SELECT COUNT(*) FROM alerts").fetchone()[0]
+            finally:
+                cursor.close()
+
+        existing = await asyncio.to_thread(count)
+        self.conn = conn
+        if existing:
+            self._complete = False
+        logger.info(f"Alert store persisting to DuckDB ({existing} stored alerts)")
+
+    # Hot set and indexes
+
+    def _unindex(self, alert_id: str):
+        keys = self._keys.pop(alert_id, None)
+        if keys is None:
+            return
+        values, sort_key = keys
+        for name, value in zip(INDEXED_FIELDS, values):
+            ids = self._index[name].get(value)
+            if ids is not None:
+                ids.discard(alert_id)
+                if not ids:
+                    del self._index[name][value]
+        position = bisect.bisect_left(self._order, sort_key)
+        if position < len(self._order) and self._order[position] == sort_key:
+            del self._order[position]
+
+    def _reindex(self, alert: "Alert"):
+        self._unindex(alert.id)
+        values = (alert.tenant_id or DEFAULT_TENANT, alert.severity.value, alert.status.value)
+        sort_key = (alert.created_at, alert.id)
+        for name, value in zip(INDEXED_FIELDS, values):
+            self._index[name][value].add(alert.id)
+        bisect.insort(self._order, sort_key)
+        self._keys[alert.id] = (values, sort_key)
+
+    def save(self, alert: "Alert"):
+        """Insert or update an alert; call again after mutating one so indexes stay current"""
+        self._hot[alert.id] = alert
+        self._hot.move_to_end(alert.id)
+        self._reindex(alert)
+        self.stats["saved"] += 1
+
+        while len(self._hot) > self.hot_size:
+            evicted_id, _ = self._hot.popitem(last=False)
+            self._unindex(evicted_id)
+            self._complete = False
+            self.stats["evicted"] += 1
+
+        if self.conn is not None:
+            self._pending[alert.id] = alert
+            if len(self._pending) >= self.flush_batch_size and (self._flush_task is None or self._flush_task.done()):
+                try:
+                    self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+                except RuntimeError:
+                    pass  # no loop; the periodic flush picks it up
+
+    def get(self, alert_id: str) -> Optional["Alert"]:
+        """Alert from the hot set or the write buffer"""
+        alert = self._hot.get(alert_id)
+        if alert is not None:
+            self._hot.move_to_end(alert_id)
+            return alert
+        return self._pending.get(alert_id)
+
+    async def fetch(self, alert_id: str) -> Optional["Alert"]:
+        """Alert by id, falling back to DuckDB for evicted alerts"""
+        alert = self.get(alert_id)
+        if alert is not None or self.conn is None or self._complete:
+            return alert
+        rows = await asyncio.to_thread(self._query, "SELECT * FROM alerts WHERE id = ?", [alert_id])
+        return alert_from_row(rows[0]) if rows else None
+
+    def __contains__(self, alert_id: str) -> bool:
+        return alert_id in self._hot or alert_id in self._pending
+
+    def __len__(self) -> int:
+        return len(self._hot)
+
+    # Keyset listing
+
+    async def list_alerts(self, tenant_id: Optional[str] = None, severity: Optional[str] = None,
+                          status: Optional[str] = None, limit: int = 50,
+                          cursor: Optional[str] = None) -> Tuple[List["Alert"], Optional[str]]:
+        """Newest-first page of alerts and the cursor for the next page (None on the last page)"""
+        before = decode_cursor(cursor) if cursor else None
+        filters = {"tenant_id": tenant_id, "severity": severity, "status": status}
+        if self._complete or self.conn is None:
+            keys = self._list_memory(filters, limit + 1, before)
+            alerts = [self._hot[key[1]] for key in keys]
+        else:
+            await self.flush()
+            alerts = await asyncio.to_thread(self._list_db, filters, limit + 1, before)
+            self.stats["db_queries"] += 1
+
+        next_cursor = None
+        if len(alerts) > limit:
+            alerts = alerts[:limit]
+            next_cursor = encode_cursor((alerts[-1].created_at, alerts[-1].id))
+        return alerts, next_cursor
+
+    def _list_memory(self, filters: Dict[str, Optional[str]], limit: int,
+                     before: Optional[SortKey]) -> List[SortKey]:
+        end = bisect.bisect_left(self._order, before) if before else len(self._order)
+        active = [self._index[name].get(value, set()) for name, value in filters.items() if value is not None]
+        if not active:
+            return self._order[max(0, end - limit):end][::-1]
+
+        # Intersect starting from the most selective index
+        active.sort(key=len)
+        candidates = active[0]
+        for ids in active[1:]:
+            candidates = candidates & ids
+        keys = (self._keys[alert_id][1] for alert_id in candidates)
+        if before:
+            keys = (key for key in keys if key < before)
+        return heapq.nlargest(limit, keys)
+
+    def _list_db(self, filters: Dict[str, Optional[str]], limit: int, before: Optional[SortKey]) -> List["Alert"]:
+        clauses, params = [], []
+        for name, value in filters.items():
+            if value is not None:
+                clauses.append(f"{name} = ?")
+                params.append(value)
+        if before:
+            clauses.append("(created_at, id) < (?, ?)")
+            params.extend(before)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._query(f"SELECT * FROM alerts {where} ORDER BY created_at DESC, id DESC LIMIT ?", [*params, limit])
+        return [alert_from_row(row) for row in rows]
+
+    def _query(self, sql: str, params: List[Any]) -> List[Dict[str, Any]]:
+        cursor = self.conn.cursor()
+        try:
+            result = cursor.execute(sql, params)
+            columns = [desc[0] for desc in result.description]
+            return [dict(zip(columns, row)) for row in result.fetchall()]
+        finally:
+            cursor.close()
+
+    # Batched persistence
+
+    def _write(self, rows: List[Tuple[Any, ...]]):
+        placeholders = ", ".join("?" for _ in ALERT_COLUMNS)
+        cursor = self.conn.cursor()
+        try:
+            cursor.executemany(
+                f"INSERT OR REPLACE INTO alerts ({', '.join(ALERT_COLUMNS)}) VALUES ({placeholders})", rows
+            )
+        finally:
+            cursor.close()
+
+    async def flush(self) -> int:
+        """Write buffered alerts to DuckDB; failed batches stay buffered"""
+        if self.conn is None or not self._pending:
+            return 0
+        batch, self._pending = self._pending, {}
+        try:
+            await asyncio.to_thread(self._write, [alert_to_row(alert) for alert in batch.values()])
+        except Exception as e:
+            logger.error(f"Alert flush failed ({len(batch)} alerts): {e}")
+            self.stats["flush_errors"] += 1
+            for alert_id, alert in batch.items():
+                self._pending.setdefault(alert_id, alert)
+            return 0
+        self.stats["flushed"] += len(batch)
+        return len(batch)
+
+    async def run_flush_loop(self, interval: float = 1.0):
+        """Periodically flush buffered alerts until cancelled"""
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "hot": len(self._hot),
+            "hot_size": self.hot_size,
+            "pending": len(self._pending),
+            "persistent": self.conn is not None,
+            "complete_in_memory": self._complete
+        }
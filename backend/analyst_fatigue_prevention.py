@@ -194,6 +194,9 @@ class ContextualAlertCorrelator:
                 if any(pattern in alert.description.lower() for pattern in rule["pattern"]):
                     matching_alerts.append(alert)
             
+            # Only alerts inside a time window that reaches the threshold are grouped
+            matching_alerts = self._alerts_in_dense_windows(matching_alerts, rule["threshold"], rule["time_window"])
+            
             # Check if threshold is met
             if len(matching_alerts) >= rule["threshold"]:
                 # Group alerts
@@ -214,6 +217,21 @@ class ContextualAlertCorrelator:
         
         return correlated_groups
     
+    def _alerts_in_dense_windows(self, alerts: List[AlertContext], threshold: int, time_window: float) -> List[AlertContext]:
+        """Alerts that fall in some window of `time_window` seconds holding at least `threshold` alerts"""
+        alerts = sorted(alerts, key=lambda alert: alert.timestamp)
+        window = timedelta(seconds=time_window)
+        selected = []
+        end = 0
+        covered = 0  # alerts before this index are already selected
+        for start in range(len(alerts)):
+            while end < len(alerts) and alerts[end].timestamp - alerts[start].timestamp <= window:
+                end += 1
+            if end - start >= threshold:
+                selected.extend(alerts[max(start, covered):end])
+                covered = end
+        return selected
+    
     def _calculate_group_priority(self, alerts: List[AlertContext]) -> str:
         """Calculate priority for correlated alert group"""
         
@@ -6,7 +6,7 @@ Converts Jupiter Query AST to ClickHouse SQL and executes queries
 
 import asyncio
 import logging
-from typing import Dict, List, Any, Optional, Union
+from typing import AsyncIterator, Dict, List, Any, Optional, Union
 from datetime import datetime, timedelta
 import json
 
@@ -22,6 +22,8 @@ from query_ast_schema import (
     ASTCondition, ASTLogicalExpression, ASTSelectField, ASTGroupBy, ASTOrderBy,
     ComparisonOperator, LogicalOperator, AggregateFunction, FieldType, SortOrder
 )
+from ip_ranges import split_values, is_cidr
+from ocsf_field_catalog import field_catalog
 
 logger = logging.getLogger(__name__)
 
@@ -32,97 +34,7 @@ class ClickHouseSQLBuilder:
     
     def __init__(self):
         # OCSF field mapping to ClickHouse columns
-        self.field_mapping = {
-            # Core OCSF fields
-            "time": "time",
-            "event_uid": "event_uid", 
-            "tenant_id": "tenant_id",
-            "class_uid": "class_uid",
-            "class_name": "class_name",
-            "category_uid": "category_uid", 
-            "category_name": "category_name",
-            "activity_name": "activity_name",
-            "severity": "severity",
-            "message": "message",
-            
-            # Actor/User fields
-            "user.name": "actor_user_name",
-            "user.uid": "actor_user_uid",
-            "user.type": "actor_user_type",
-            "user.domain": "actor_user_domain",
-            "user.email": "actor_user_email",
-            "actor_user_name": "actor_user_name",
-            
-            # Device fields
-            "device.name": "device_name",
-            "device.type": "device_type", 
-            "device.ip": "device_ip",
-            "device.hostname": "device_hostname",
-            "device.mac": "device_mac",
-            "device.os.name": "device_os_name",
-            "device.os.version": "device_os_version",
-            
-            # Network fields
-            "src_endpoint.ip": "src_endpoint_ip",
-            "src_endpoint.port": "src_endpoint_port",
-            "dst_endpoint.ip": "dst_endpoint_ip", 
-            "dst_endpoint.port": "dst_endpoint_port",
-            "network.protocol": "network_protocol",
-            "network.direction": "network_direction",
-            
-            # Process fields
-            "process.name": "process_name",
-            "process.pid": "process_pid",
-            "process.cmd_line": "process_cmd_line",
-            "process.parent.name": "process_parent_name",
-            "process.parent.pid": "process_parent_pid",
-            
-            # File fields
-            "file.name": "file_name",
-            "file.path": "file_path",
-            "file.size": "file_size",
-            "file.hash.md5": "file_hash_md5",
-            "file.hash.sha1": "file_hash_sha1", 
-            "file.hash.sha256": "file_hash_sha256",
-            
-            # Registry fields
-            "registry.key": "registry_key",
-            "registry.value": "registry_value",
-            "registry.type": "registry_type",
-            
-            # Authentication fields
-            "auth.method": "auth_method",
-            "auth.result": "auth_result",
-            "logon_type": "logon_type",
-            
-            # HTTP fields
-            "http.method": "http_method",
-            "http.status_code": "http_status_code",
-            "http.url": "http_url",
-            "http.user_agent": "http_user_agent",
-            "http.referrer": "http_referrer",
-            
-            # DNS fields
-            "dns.query": "dns_query",
-            "dns.response": "dns_response", 
-            "dns.type": "dns_type",
-            
-            # Enrichment fields
-            "enrichment.geo.country": "enrichment_geo_country",
-            "enrichment.geo.city": "enrichment_geo_city",
-            "enrichment.threat_score": "enrichment_threat_score",
-            "enrichment.reputation": "enrichment_reputation",
-            
-            # MITRE ATT&CK fields
-            "mitre.technique.id": "mitre_technique_id",
-            "mitre.technique.name": "mitre_technique_name", 
-            "mitre.tactic.id": "mitre_tactic_id",
-            "mitre.tactic.name": "mitre_tactic_name",
-            
-            # Risk/Confidence
-            "risk_score": "risk_score",
-            "confidence": "confidence",
-        }
+        self.field_mapping = field_catalog.column_mapping()
     
     def build_sql(self, ast: JupiterQueryAST) -> str:
         """Build complete SQL query from AST"""
@@ -224,6 +136,11 @@ class ClickHouseSQLBuilder:
         """Build simple condition SQL"""
         left_value = self._build_field_reference(condition.left)
         
+        if condition.operator in [ComparisonOperator.IN_SUBNET, ComparisonOperator.IN, ComparisonOperator.NOT_IN]:
+            subnet_sql = self._build_subnet_condition(left_value, condition)
+            if subnet_sql:
+                return subnet_sql
+        
         if isinstance(condition.right, ASTLiteral):
             right_value = self._build_literal_value(condition.right)
         elif isinstance(condition.right, list):
@@ -265,12 +182,34 @@ class ClickHouseSQLBuilder:
             right_value = f"'%{condition.right.value}'"
         elif condition.operator in [ComparisonOperator.IS_NULL, ComparisonOperator.IS_NOT_NULL]:
             return f"{left_value} {operator}"
-        elif condition.operator == ComparisonOperator.IN_SUBNET:
-            # Special ClickHouse function for IP subnet matching
-            return f"isIPAddressInRange({left_value}, '{condition.right.value}')"
         
         return f"{left_value} {operator} {right_value}"
     
+    def _build_subnet_condition(self, left_value: str, condition: ASTCondition) -> Optional[str]:
+        """Build CIDR matching SQL for IN_SUBNET and IN/NOT IN lists containing CIDR blocks"""
+        if isinstance(condition.right, list):
+            values = split_values(lit.value for lit in condition.right)
+        elif isinstance(condition.right, ASTLiteral):
+            values = split_values(condition.right.value)
+        else:
+            return None
+        
+        cidrs = [v for v in values if condition.operator == ComparisonOperator.IN_SUBNET or is_cidr(v)]
+        if not cidrs:
+            return None
+        
+        # Special ClickHouse function for IP subnet matching
+        parts = [f"isIPAddressInRange(toString({left_value}), '{self._escape_string(c)}')" for c in dict.fromkeys(cidrs)]
+        plain = [v for v in values if v not in cidrs]
+        if plain:
+            quoted = ', '.join(f"'{self._escape_string(v)}'" for v in plain)
+            parts.append(f"toString({left_value}) IN ({quoted})")
+        
+        sql = " OR ".join(parts)
+        if condition.operator == ComparisonOperator.NOT_IN:
+            return f"({left_value} IS NOT NULL AND NOT ({sql}))"
+        return f"({sql})"
+    
     def _build_logical_expression(self, expr: ASTLogicalExpression) -> str:
         """Build logical expression SQL"""
         if not expr.conditions:
@@ -435,6 +374,28 @@ class ClickHouseQueryProvider(QueryProvider):
             )
         return self.connection_pool
     
+    async def execute_sql(self, sql: str) -> List[Dict[str, Any]]:
+        """Execute raw SQL (internal aggregations only) and return rows as dictionaries"""
+        connection = await self._get_connection()
+        cursor = await connection.cursor()
+        await cursor.execute(sql)
+        rows = await cursor.fetchall()
+        columns = [desc[0] for desc in cursor.description]
+        return [dict(zip(columns, row)) for row in rows]
+    
+    async def stream_sql(self, sql: str, batch_size: int = 10000) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Execute raw SQL and yield rows as dictionaries in batches instead of buffering the whole result"""
+        connection = await self._get_connection()
+        cursor = await connection.cursor()
+        cursor.set_stream_results(True, batch_size)
+        await cursor.execute(sql)
+        columns = [desc[0] for desc in cursor.description]
+        while True:
+            rows = await cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [dict(zip(columns, row)) for row in rows]
+    
     def execute_ast(self, ast: JupiterQueryAST) -> Dict[str, Any]:
         """Execute AST against ClickHouse"""
         try:
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Jupiter SIEM Streaming Correlation Engine
+Threshold rules over sliding or tumbling windows, counted per group-by key
+(source IP, user, tenant, ...) in small ring buffers. Idle keys are evicted, the
+number of tracked keys is bounded, and state can be snapshotted to disk so
+windows survive a restart
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ocsf_field_catalog import field_catalog
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GROUP_BY = ("tenant_id", "src_endpoint_ip", "actor_user_name")
+
+TIMEFRAME_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+def parse_timeframe(value: Any) -> float:
+    """Seconds in a timeframe such as 300, "90s", "5m" or "1h\""""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*", str(value))
+    if not match:
+        raise ValueError(f"Invalid timeframe: {value}")
+    return float(match.group(1)) * TIMEFRAME_UNITS[match.group(2) or "s"]
+
+class WindowType:
+    SLIDING = "sliding"
+    TUMBLING = "tumbling"
+
+@dataclass
+class CorrelationRule:
+    """Fire when a group sees `threshold` events within `window` seconds"""
+    name: str
+    threshold: int
+    window: float
+    group_by: Tuple[str, ...] = DEFAULT_GROUP_BY
+    window_type: str = WindowType.SLIDING
+    buckets: int = 10  # sliding-window resolution; tumbling windows use one bucket
+
+    @classmethod
+    def from_condition(cls, name: str, condition: Dict[str, Any]) -> "CorrelationRule":
+        """Build from a playbook trigger such as {"threshold": 10, "timeframe": "5m"}"""
+        return cls(
+            name=name,
+            threshold=int(condition.get("threshold", 1)),
+            window=parse_timeframe(condition.get("timeframe", 300)),
+            group_by=tuple(condition.get("group_by", DEFAULT_GROUP_BY)),
+            window_type=condition.get("window", WindowType.SLIDING),
+            buckets=int(condition.get("buckets", 10))
+        )
+
+@dataclass
+class CorrelationTrigger:
+    """A rule crossing its threshold for one group"""
+    rule: str
+    group: Dict[str, Any]
+    count: int
+    window: float
+    fired_at: float
+
+class RingCounter:
+    """Event count over the last `len(counts)` buckets with an O(1) running total"""
+
+    __slots__ = ("width", "counts", "head", "total", "fired", "last_seen")
+
+    def __init__(self, width: float, buckets: int):
+        self.width = width
+        self.counts = array("l", [0]) * buckets
+        self.head = -1  # absolute index of the newest bucket
+        self.total = 0
+        self.fired = False
+        self.last_seen = 0.0
+
+    def _advance(self, index: int):
+        size = len(self.counts)
+        if self.head >= 0:
+            for expired in range(self.head + 1, min(index, self.head + size) + 1):
+                slot = expired % size
+                self.total -= self.counts[slot]
+                self.counts[slot] = 0
+        self.head = index
+
+    def add(self, now: float, count: int = 1) -> int:
+        index = int(now // self.width)
+        if index > self.head:
+            self._advance(index)
+        elif self.head - index >= len(self.counts):
+            return self.total  # older than the window
+        self.counts[index % len(self.counts)] += count
+        self.total += count
+        return self.total
+
+    def current(self, now: float) -> int:
+        index = int(now // self.width)
+        if index > self.head:
+            self._advance(index)
+        return self.total
+
+    def to_state(self) -> List[Any]:
+        return [self.head, self.total, int(self.fired), self.last_seen, list(self.counts)]
+
+    def restore(self, state: List[Any]):
+        self.head, self.total, fired, self.last_seen, counts = state
+        self.fired = bool(fired)
+        if len(counts) == len(self.counts):
+            self.counts = array("l", counts)
+        else:
+            self.head, self.total = -1, 0
+
+class CorrelationEngine:
+    """Streaming threshold correlation over many rules and group keys"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self.rules: Dict[str, CorrelationRule] = {}
+        self._accessors: Dict[str, List[Callable[[Dict[str, Any]], Any]]] = {}
+        self._state: Dict[str, "OrderedDict[tuple, RingCounter]"] = {}
+        self.stats = {"events": 0, "triggers": 0, "evicted": 0}
+
+    def add_rule(self, rule: CorrelationRule):
+        """Register or replace a rule; replacing resets its windows"""
+        self.rules[rule.name] = rule
+        self._accessors[rule.name] = [field_catalog.accessor(name) for name in rule.group_by]
+        self._state[rule.name] = OrderedDict()
+
+    def remove_rule(self, name: str):
+        self.rules.pop(name, None)
+        self._accessors.pop(name, None)
+        self._state.pop(name, None)
+
+    def _new_counter(self, rule: CorrelationRule) -> RingCounter:
+        if rule.window_type == WindowType.TUMBLING:
+            return RingCounter(rule.window, 1)
+        buckets = max(1, rule.buckets)
+        return RingCounter(rule.window / buckets, buckets)
+
+    def _evict(self, rule: CorrelationRule, keys: "OrderedDict[tuple, RingCounter]", now: float):
+        # Keys are kept in last-seen order, so idle ones are at the front
+        while keys:
+            key, counter = next(iter(keys.items()))
+            if len(keys) <= self.max_keys and now - counter.last_seen <= rule.window:
+                break
+            del keys[key]
+            self.stats["evicted"] += 1
+
+    def observe_rule(self, name: str, event: Dict[str, Any],
+                     now: Optional[float] = None) -> Optional[CorrelationTrigger]:
+        """Count an event for one rule; returns a trigger when its group crosses the threshold"""
+        rule = self.rules[name]
+        now = time.time() if now is None else now
+        key = tuple(accessor(event) for accessor in self._accessors[name])
+        keys = self._state[name]
+
+        counter = keys.get(key)
+        if counter is None:
+            counter = self._new_counter(rule)
+            keys[key] = counter
+        else:
+            keys.move_to_end(key)
+        counter.last_seen = now
+        count = counter.add(now)
+        self.stats["events"] += 1
+        self._evict(rule, keys, now)
+
+        if count < rule.threshold:
+            counter.fired = False  # re-arm once the window drops below the threshold
+            return None
+        if counter.fired:
+            return None
+        counter.fired = True
+        self.stats["triggers"] += 1
+        return CorrelationTrigger(
+            rule=name,
+            group=dict(zip(rule.group_by, key)),
+            count=count,
+            window=rule.window,
+            fired_at=now
+        )
+
+    def observe(self, event: Dict[str, Any], now: Optional[float] = None) -> List[CorrelationTrigger]:
+        """Count an event for every rule"""
+        triggers = []
+        for name in self.rules:
+            trigger = self.observe_rule(name, event, now)
+            if trigger:
+                triggers.append(trigger)
+        return triggers
+
+    def current_count(self, name: str, group: Dict[str, Any], now: Optional[float] = None) -> int:
+        rule = self.rules[name]
+        counter = self._state[name].get(tuple(group.get(field_name) for field_name in rule.group_by))
+        return counter.current(time.time() if now is None else now) if counter else 0
+
+    def snapshot_state(self) -> Dict[str, Any]:
+        """Copy of the window state that is safe to serialize off the event loop"""
+        return {
+            name: {
+                "window": self.rules[name].window,
+                "keys": [[list(key), counter.to_state()] for key, counter in keys.items()]
+            }
+            for name, keys in self._state.items()
+        }
+
+    @staticmethod
+    def _write_snapshot(path: str, state: Dict[str, Any]):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def snapshot(self, path: str):
+        """Write window state to disk atomically"""
+        self._write_snapshot(path, self.snapshot_state())
+
+    def restore(self, path: str) -> int:
+        """Load window state for the currently registered rules; returns keys restored"""
+        if not os.path.exists(path):
+            return 0
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read correlation state {path}: {e}")
+            return 0
+
+        restored = 0
+        for name, rule_state in state.items():
+            rule = self.rules.get(name)
+            if rule is None or rule_state.get("window") != rule.window:
+                continue  # rule removed or redefined since the snapshot
+            keys = self._state[name]
+            for key, counter_state in rule_state["keys"]:
+                counter = self._new_counter(rule)
+                counter.restore(counter_state)
+                keys[tuple(key)] = counter
+                restored += 1
+        return restored
+
+    async def run_snapshots(self, path: str, interval: float = 60.0):
+        """Periodically snapshot state until cancelled"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self._write_snapshot, path, self.snapshot_state())
+            except OSError as e:
+                logger.error(f"Correlation snapshot failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "rules": len(self.rules),
+            "tracked_keys": {name: len(keys) for name, keys in self._state.items()}
+        }
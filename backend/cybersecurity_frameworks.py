@@ -13,6 +13,16 @@ from enum import Enum
 import requests
 from pathlib import Path
 
+from aho_corasick import AhoCorasick
+from indicator_cache import MISSING, LRUTTLCache
+from ip_ranges import is_private_ip
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
 class FrameworkType(Enum):
     """Supported cybersecurity frameworks"""
     MITRE_ATTACK = "mitre_attack"
@@ -59,6 +69,84 @@ class KillChainPhase:
     detection_methods: List[str]
     mitigations: List[str]
 
+@dataclass
+class EventFeatures:
+    """Log fields read by the framework mappers, extracted and lower-cased once per event"""
+    log_id: str
+    activity: str
+    activity_name: str
+    process_name: str
+    network_protocol: str
+    file_path: str
+    user_name: str
+    url: str
+    user_agent: str
+    severity: str
+    src_ip: Optional[str]
+    dst_ip: Optional[str]
+    resources: List[str]
+
+def extract_features(log_data: Dict[str, Any]) -> EventFeatures:
+    """Extract the mapper inputs from a log"""
+    resource_sections = (("network", "Network"), ("process", "Process"), ("file", "File System"), ("registry", "Registry"))
+    return EventFeatures(
+        log_id=log_data.get("_id", "unknown"),
+        activity=log_data.get('activity_name', 'Unknown'),
+        activity_name=log_data.get('activity_name', '').lower(),
+        process_name=log_data.get('process', {}).get('name', '').lower(),
+        network_protocol=log_data.get('network', {}).get('protocol', '').lower(),
+        file_path=log_data.get('file', {}).get('path', '').lower(),
+        user_name=log_data.get('user', {}).get('name', '').lower(),
+        url=log_data.get('url', '').lower(),
+        user_agent=log_data.get('user_agent', '').lower(),
+        severity=log_data.get('severity', 'Unknown'),
+        src_ip=log_data.get('src_endpoint', {}).get('ip'),
+        dst_ip=log_data.get('dst_endpoint', {}).get('ip'),
+        resources=[label for section, label in resource_sections if log_data.get(section)]
+    )
+
+def features_signature(features: EventFeatures) -> Tuple:
+    """Everything the mappers read except the log id: events with equal signatures analyze identically"""
+    return (
+        features.activity, features.activity_name, features.process_name, features.network_protocol,
+        features.file_path, features.user_name, features.url, features.user_agent, features.severity,
+        features.src_ip, features.dst_ip, tuple(features.resources)
+    )
+
+@dataclass
+class TechniqueRule:
+    """Detection rule contributing a fixed score to one technique
+
+    A rule fires once per log when any of its keywords occurs in the given
+    fields; a rule with no keywords fires whenever one of its fields is set.
+    """
+    technique_id: str
+    fields: Dict[str, List[str]]
+    weight: float
+    indicator: str
+
+# Log fields the technique rules look at
+MITRE_RULE_FIELDS = ("activity_name", "process_name", "network_protocol", "file_path", "user_name")
+
+MITRE_TECHNIQUE_RULES = [
+    TechniqueRule("T1055", {"activity_name": ["injection", "inject"]}, 0.8,
+                  "Process injection activity detected"),
+    TechniqueRule("T1083", {"activity_name": ["discovery", "enumeration", "list"]}, 0.7,
+                  "File and directory discovery activity"),
+    TechniqueRule("T1021", {"activity_name": ["remote", "rpc", "smb", "ssh"]}, 0.6,
+                  "Remote service usage detected"),
+    TechniqueRule("T1047", {"activity_name": ["wmi"], "process_name": ["wmiprvse"]}, 0.9,
+                  "WMI usage detected"),
+    TechniqueRule("T1071", {"network_protocol": []}, 0.5,
+                  "Network protocol: {network_protocol}"),
+]
+
+# Score a technique must exceed to be reported
+MITRE_SCORE_THRESHOLD = 0.5
+
+# Score of keyword rules declared inline in techniques.json ("keywords": [...])
+CATALOG_KEYWORD_WEIGHT = 0.6
+
 class MITREAttackMapper:
     """MITRE ATT&CK Framework mapping and analysis"""
     
@@ -69,6 +157,8 @@ class MITREAttackMapper:
         self.software = {}
         self.groups = {}
         self.campaigns = {}
+        self.rules: List[TechniqueRule] = []
+        self.rules_version = 0
         self.load_mitre_data()
     
     def load_mitre_data(self):
@@ -79,15 +169,23 @@ class MITREAttackMapper:
         except FileNotFoundError:
             # Fallback to API or create minimal dataset
             self._create_minimal_mitre_data()
+        self.compile_rules()
     
     def _load_local_mitre_data(self):
         """Load MITRE data from local JSON files"""
         base_path = Path(__file__).parent / "data" / "mitre_attack"
         
         # Load techniques
+        self.rules = list(MITRE_TECHNIQUE_RULES)
         with open(base_path / "techniques.json", 'r') as f:
             techniques_data = json.load(f)
             for tech in techniques_data:
+                if tech.get('keywords'):
+                    self.rules.append(TechniqueRule(
+                        tech['id'], {"activity_name": tech['keywords']},
+                        tech.get('keyword_weight', CATALOG_KEYWORD_WEIGHT),
+                        f"{tech['name']} activity detected"
+                    ))
                 self.techniques[tech['id']] = AttackTechnique(
                     id=tech['id'],
                     name=tech['name'],
@@ -154,6 +252,7 @@ class MITREAttackMapper:
             }
         }
         
+        self.rules = list(MITRE_TECHNIQUE_RULES)
         for tech_id, tech_data in common_techniques.items():
             self.techniques[tech_id] = AttackTechnique(
                 id=tech_id,
@@ -182,69 +281,118 @@ class MITREAttackMapper:
             "Impact": "The adversary is trying to manipulate, interrupt, or destroy your systems"
         }
     
-    def map_log_to_techniques(self, log_data: Dict[str, Any]) -> List[AttackTechnique]:
-        """Map log data to MITRE ATT&CK techniques"""
+    def compile_rules(self):
+        """Index the rules for loaded techniques: one automaton per field, keyword -> rule postings"""
+        self.rules_version += 1
+        self._technique_order = {tech_id: position for position, tech_id in enumerate(self.techniques)}
+        self._active_rules = [rule for rule in self.rules if rule.technique_id in self.techniques]
+        self._rule_techniques = sorted(
+            {rule.technique_id for rule in self._active_rules}, key=self._technique_order.get
+        )
+        technique_columns = {tech_id: column for column, tech_id in enumerate(self._rule_techniques)}
+        self._rule_columns = [technique_columns[rule.technique_id] for rule in self._active_rules]
+        
+        self._automata: Dict[str, Tuple[AhoCorasick, List[List[int]]]] = {}
+        self._presence_rules: Dict[str, List[int]] = {}
+        for field_name in MITRE_RULE_FIELDS:
+            keywords: Dict[str, List[int]] = {}
+            for rule_id, rule in enumerate(self._active_rules):
+                if field_name not in rule.fields:
+                    continue
+                if rule.fields[field_name]:
+                    for keyword in rule.fields[field_name]:
+                        keywords.setdefault(keyword.lower(), []).append(rule_id)
+                else:
+                    self._presence_rules.setdefault(field_name, []).append(rule_id)
+            if keywords:
+                automaton = AhoCorasick(keywords)
+                self._automata[field_name] = (automaton, [keywords[k] for k in automaton.patterns])
+        
+        # Rules x techniques score matrix for batch scoring
+        if NUMPY_AVAILABLE:
+            self._weight_matrix = np.zeros((len(self._active_rules), len(self._rule_techniques)))
+            for rule_id, rule in enumerate(self._active_rules):
+                self._weight_matrix[rule_id, self._rule_columns[rule_id]] = rule.weight
+    
+    @staticmethod
+    def _rule_fields(features: EventFeatures) -> Dict[str, str]:
+        """Lower-cased text of the fields the rules look at"""
+        return {field_name: getattr(features, field_name) for field_name in MITRE_RULE_FIELDS}
+    
+    def _fired_rules(self, fields: Dict[str, str]) -> List[int]:
+        """Rule ids that fire for a log, each at most once"""
+        fired = set()
+        for field_name, value in fields.items():
+            if not value:
+                continue
+            fired.update(self._presence_rules.get(field_name, ()))
+            compiled = self._automata.get(field_name)
+            if compiled:
+                automaton, postings = compiled
+                for _, pattern_index in automaton.search(value):
+                    fired.update(postings[pattern_index])
+        return sorted(fired)
+    
+    def _build_matches(self, fields: Dict[str, str], fired: List[int],
+                       scores: Dict[int, float]) -> List[AttackTechnique]:
         matched_techniques = []
-        
-        # Extract key information from log
-        activity_name = log_data.get('activity_name', '').lower()
-        process_name = log_data.get('process', {}).get('name', '').lower()
-        network_protocol = log_data.get('network', {}).get('protocol', '').lower()
-        file_path = log_data.get('file', {}).get('path', '').lower()
-        user_name = log_data.get('user', {}).get('name', '').lower()
-        
-        # Pattern matching for techniques
-        for tech_id, technique in self.techniques.items():
-            score = 0
-            matched_indicators = []
-            
-            # Check activity name patterns
-            if any(keyword in activity_name for keyword in ['injection', 'inject']):
-                if tech_id == "T1055":
-                    score += 0.8
-                    matched_indicators.append("Process injection activity detected")
-            
-            # Check for file discovery patterns
-            if any(keyword in activity_name for keyword in ['discovery', 'enumeration', 'list']):
-                if tech_id == "T1083":
-                    score += 0.7
-                    matched_indicators.append("File and directory discovery activity")
-            
-            # Check for remote service usage
-            if any(keyword in activity_name for keyword in ['remote', 'rpc', 'smb', 'ssh']):
-                if tech_id == "T1021":
-                    score += 0.6
-                    matched_indicators.append("Remote service usage detected")
-            
-            # Check for WMI usage
-            if 'wmi' in activity_name or 'wmiprvse' in process_name:
-                if tech_id == "T1047":
-                    score += 0.9
-                    matched_indicators.append("WMI usage detected")
-            
-            # Check for network protocol usage
-            if network_protocol and tech_id == "T1071":
-                score += 0.5
-                matched_indicators.append(f"Network protocol: {network_protocol}")
-            
-            # Add technique if score is above threshold
-            if score > 0.5:
-                technique_copy = AttackTechnique(
-                    id=technique.id,
-                    name=technique.name,
-                    description=technique.description,
-                    tactics=technique.tactics,
-                    platforms=technique.platforms,
-                    data_sources=technique.data_sources,
-                    detection_rules=technique.detection_rules,
-                    mitigations=technique.mitigations
-                )
-                technique_copy.matched_indicators = matched_indicators
-                technique_copy.confidence_score = score
-                matched_techniques.append(technique_copy)
-        
+        for column in sorted(scores):
+            score = scores[column]
+            if score <= MITRE_SCORE_THRESHOLD:
+                continue
+            technique = self.techniques[self._rule_techniques[column]]
+            technique_copy = AttackTechnique(
+                id=technique.id,
+                name=technique.name,
+                description=technique.description,
+                tactics=technique.tactics,
+                platforms=technique.platforms,
+                data_sources=technique.data_sources,
+                detection_rules=technique.detection_rules,
+                mitigations=technique.mitigations
+            )
+            technique_copy.matched_indicators = [
+                self._active_rules[rule_id].indicator.format(**fields)
+                for rule_id in fired if self._rule_columns[rule_id] == column
+            ]
+            technique_copy.confidence_score = score
+            matched_techniques.append(technique_copy)
         return matched_techniques
     
+    def map_log_to_techniques(self, log_data: Dict[str, Any],
+                              features: Optional[EventFeatures] = None) -> List[AttackTechnique]:
+        """Map log data to MITRE ATT&CK techniques"""
+        fields = self._rule_fields(features or extract_features(log_data))
+        fired = self._fired_rules(fields)
+        
+        # Only techniques with a fired rule are scored, however large the catalog
+        scores: Dict[int, float] = {}
+        for rule_id in fired:
+            column = self._rule_columns[rule_id]
+            scores[column] = scores.get(column, 0.0) + self._active_rules[rule_id].weight
+        return self._build_matches(fields, fired, scores)
+    
+    def map_logs_to_techniques(self, logs: List[Dict[str, Any]],
+                               features: Optional[List[EventFeatures]] = None) -> List[List[AttackTechnique]]:
+        """Map a batch of logs, scoring all of them with one matrix product when NumPy is available"""
+        features = features or [extract_features(log_data) for log_data in logs]
+        if not NUMPY_AVAILABLE or not logs or not self._active_rules:
+            return [self.map_log_to_techniques(log_data, f) for log_data, f in zip(logs, features)]
+        
+        extracted = [self._rule_fields(f) for f in features]
+        fired_rules = [self._fired_rules(fields) for fields in extracted]
+        hits = np.zeros((len(logs), len(self._active_rules)))
+        for row, fired in enumerate(fired_rules):
+            hits[row, fired] = 1.0
+        score_matrix = hits @ self._weight_matrix
+        
+        results = []
+        for row, (fields, fired) in enumerate(zip(extracted, fired_rules)):
+            columns = np.flatnonzero(score_matrix[row] > MITRE_SCORE_THRESHOLD)
+            scores = {int(column): float(score_matrix[row, column]) for column in columns}
+            results.append(self._build_matches(fields, fired, scores))
+        return results
+    
     def get_technique_by_id(self, technique_id: str) -> Optional[AttackTechnique]:
         """Get technique by ID"""
         return self.techniques.get(technique_id)
@@ -267,34 +415,34 @@ class DiamondModelMapper:
             "Actions on Objectives"
         ]
     
-    def map_log_to_diamond_model(self, log_data: Dict[str, Any]) -> DiamondModel:
+    def map_log_to_diamond_model(self, log_data: Dict[str, Any],
+                                 features: Optional[EventFeatures] = None) -> DiamondModel:
         """Map log data to Diamond Model"""
         
         # Extract information from log
-        src_ip = log_data.get('src_endpoint', {}).get('ip', 'Unknown')
-        dst_ip = log_data.get('dst_endpoint', {}).get('ip', 'Unknown')
-        activity = log_data.get('activity_name', 'Unknown')
-        severity = log_data.get('severity', 'Unknown')
+        features = features or extract_features(log_data)
+        src_ip = 'Unknown' if features.src_ip is None else features.src_ip
+        dst_ip = 'Unknown' if features.dst_ip is None else features.dst_ip
         
         # Determine phase based on activity
-        phase = self._determine_phase(activity, log_data)
+        phase = self._determine_phase(features.activity_name, log_data)
         
         # Determine direction
-        direction = self._determine_direction(log_data)
+        direction = self._determine_direction(log_data, features)
         
         # Determine result
-        result = self._determine_result(severity, log_data)
+        result = self._determine_result(features.severity, log_data)
         
         return DiamondModel(
             adversary=src_ip,
-            capability=activity,
+            capability=features.activity,
             infrastructure=src_ip,
             victim=dst_ip,
             phase=phase,
             result=result,
             direction=direction,
-            methodology=self._determine_methodology(activity),
-            resources=self._determine_resources(log_data),
+            methodology=self._determine_methodology(features.activity_name),
+            resources=", ".join(features.resources) if features.resources else "Unknown",
             timestamp=datetime.utcnow()
         )
     
@@ -319,10 +467,12 @@ class DiamondModelMapper:
         else:
             return "Unknown"
     
-    def _determine_direction(self, log_data: Dict[str, Any]) -> str:
+    def _determine_direction(self, log_data: Dict[str, Any],
+                             features: Optional[EventFeatures] = None) -> str:
         """Determine attack direction"""
-        src_ip = log_data.get('src_endpoint', {}).get('ip', '')
-        dst_ip = log_data.get('dst_endpoint', {}).get('ip', '')
+        features = features or extract_features(log_data)
+        src_ip = features.src_ip or ''
+        dst_ip = features.dst_ip or ''
         
         # Simple heuristic: external to internal is inbound
         if self._is_external_ip(src_ip) and self._is_internal_ip(dst_ip):
@@ -358,38 +508,16 @@ class DiamondModelMapper:
         else:
             return "Unknown"
     
-    def _determine_resources(self, log_data: Dict[str, Any]) -> str:
-        """Determine resources used in attack"""
-        resources = []
-        
-        if log_data.get('network'):
-            resources.append("Network")
-        if log_data.get('process'):
-            resources.append("Process")
-        if log_data.get('file'):
-            resources.append("File System")
-        if log_data.get('registry'):
-            resources.append("Registry")
-        
-        return ", ".join(resources) if resources else "Unknown"
-    
     def _is_external_ip(self, ip: str) -> bool:
-        """Check if IP is external (simplified)"""
+        """Check if IP is external"""
         if not ip:
             return False
         
-        # Simple check for private IP ranges
-        private_ranges = [
-            "10.", "192.168.", "172.16.", "172.17.", "172.18.", "172.19.",
-            "172.20.", "172.21.", "172.22.", "172.23.", "172.24.", "172.25.",
-            "172.26.", "172.27.", "172.28.", "172.29.", "172.30.", "172.31."
-        ]
-        
-        return not any(ip.startswith(prefix) for prefix in private_ranges)
+        return not is_private_ip(ip)
     
     def _is_internal_ip(self, ip: str) -> bool:
         """Check if IP is internal"""
-        return not self._is_external_ip(ip)
+        return is_private_ip(ip)
 
 class KillChainMapper:
     """Lockheed Martin Kill Chain mapping"""
@@ -447,10 +575,10 @@ class KillChainMapper:
             )
         }
     
-    def map_log_to_kill_chain(self, log_data: Dict[str, Any]) -> KillChainPhase:
+    def map_log_to_kill_chain(self, log_data: Dict[str, Any],
+                              features: Optional[EventFeatures] = None) -> KillChainPhase:
         """Map log data to Kill Chain phase"""
-        activity = log_data.get('activity_name', '').lower()
-        severity = log_data.get('severity', '')
+        activity = (features or extract_features(log_data)).activity_name
         
         # Determine phase based on activity patterns
         for phase_name, phase in self.phases.items():
@@ -478,22 +606,70 @@ class KillChainMapper:
 class FrameworkAnalyzer:
     """Main framework analyzer that combines all frameworks"""
     
-    def __init__(self):
+    def __init__(self, cache_size: int = 10000, cache_ttl: float = 3600.0):
         self.mitre_mapper = MITREAttackMapper()
         self.diamond_mapper = DiamondModelMapper()
         self.kill_chain_mapper = KillChainMapper()
+        # Event signature -> analysis; cached results are shared and must not be mutated
+        self.cache = LRUTTLCache(max_size=cache_size, ttl=cache_ttl)
+    
+    def _cache_key(self, features: EventFeatures) -> Tuple:
+        return (self.mitre_mapper.rules_version, features_signature(features))
     
-    def analyze_log(self, log_data: Dict[str, Any]) -> Dict[str, Any]:
+    @staticmethod
+    def _with_identity(features: EventFeatures, cached: Dict[str, Any]) -> Dict[str, Any]:
+        return {"log_id": features.log_id, "timestamp": datetime.utcnow().isoformat(), **cached}
+    
+    def analyze_log(self, log_data: Dict[str, Any],
+                    features: Optional[EventFeatures] = None) -> Dict[str, Any]:
         """Comprehensive analysis of log data across all frameworks"""
+        features = features or extract_features(log_data)
+        key = self._cache_key(features)
+        cached = self.cache.get(key)
+        if cached is MISSING:
+            cached = self._build_analysis(
+                log_data, features, self.mitre_mapper.map_log_to_techniques(log_data, features)
+            )
+            self.cache.set(key, cached)
+        return self._with_identity(features, cached)
+    
+    def analyze_logs(self, logs: List[Dict[str, Any]],
+                     features: Optional[List[EventFeatures]] = None) -> List[Dict[str, Any]]:
+        """Analyze a batch of logs; only distinct uncached signatures are mapped, in one MITRE pass"""
+        features = features or [extract_features(log_data) for log_data in logs]
+        keys = [self._cache_key(event_features) for event_features in features]
+        
+        resolved: Dict[Tuple, Dict[str, Any]] = {}
+        misses: Dict[Tuple, int] = {}
+        for position, key in enumerate(keys):
+            if key in resolved or key in misses:
+                continue
+            cached = self.cache.get(key)
+            if cached is MISSING:
+                misses[key] = position
+            else:
+                resolved[key] = cached
+        
+        if misses:
+            positions = list(misses.values())
+            techniques = self.mitre_mapper.map_logs_to_techniques(
+                [logs[i] for i in positions], [features[i] for i in positions]
+            )
+            for key, position, mitre_techniques in zip(misses, positions, techniques):
+                resolved[key] = self._build_analysis(logs[position], features[position], mitre_techniques)
+                self.cache.set(key, resolved[key])
         
-        analysis = {
-            "log_id": log_data.get("_id", "unknown"),
-            "timestamp": datetime.utcnow().isoformat(),
-            "frameworks": {}
-        }
+        return [self._with_identity(event_features, resolved[key]) for event_features, key in zip(features, keys)]
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        return self.cache.get_stats()
+    
+    def _build_analysis(self, log_data: Dict[str, Any], features: EventFeatures,
+                        mitre_techniques: List[AttackTechnique]) -> Dict[str, Any]:
+        """Framework results for one signature (without log id and timestamp)"""
+        analysis = {"frameworks": {}}
         
         # MITRE ATT&CK analysis
-        mitre_techniques = self.mitre_mapper.map_log_to_techniques(log_data)
         analysis["frameworks"]["mitre_attack"] = {
             "techniques": [
                 {
@@ -511,7 +687,7 @@ class FrameworkAnalyzer:
         }
         
         # Diamond Model analysis
-        diamond_model = self.diamond_mapper.map_log_to_diamond_model(log_data)
+        diamond_model = self.diamond_mapper.map_log_to_diamond_model(log_data, features)
         analysis["frameworks"]["diamond_model"] = {
             "adversary": diamond_model.adversary,
             "capability": diamond_model.capability,
@@ -525,7 +701,7 @@ class FrameworkAnalyzer:
         }
         
         # Kill Chain analysis
-        kill_chain_phase = self.kill_chain_mapper.map_log_to_kill_chain(log_data)
+        kill_chain_phase = self.kill_chain_mapper.map_log_to_kill_chain(log_data, features)
         analysis["frameworks"]["kill_chain"] = {
             "phase": kill_chain_phase.phase,
             "description": kill_chain_phase.description,
@@ -649,6 +825,9 @@ __all__ = [
     'AttackTechnique', 
     'DiamondModel',
     'KillChainPhase',
+    'EventFeatures',
+    'extract_features',
+    'features_signature',
     'MITREAttackMapper',
     'DiamondModelMapper', 
     'KillChainMapper',
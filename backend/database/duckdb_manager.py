@@ -391,6 +391,8 @@ class DuckDBManager:
             "CREATE INDEX IF NOT EXISTS idx_users_tenant ON users(tenant_id)",
             "CREATE INDEX IF NOT EXISTS idx_alerts_tenant ON alerts(tenant_id)",
             "CREATE INDEX IF NOT EXISTS idx_alerts_created ON alerts(created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_alerts_severity ON alerts(severity)",
+            "CREATE INDEX IF NOT EXISTS idx_alerts_status ON alerts(status)",
             "CREATE INDEX IF NOT EXISTS idx_logs_tenant ON logs(tenant_id)",
             "CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs(timestamp)",
             "CREATE INDEX IF NOT EXISTS idx_logs_source ON logs(source)",
@@ -152,6 +152,18 @@ async def analyze_log_extended(
             detail=f"Extended framework analysis failed: {str(e)}"
         )
 
+@router.get("/cache-stats")
+async def get_extended_cache_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get extended analysis cache hit rate
+    """
+    return {
+        "success": True,
+        "analysis_cache": extended_analyzer.get_cache_stats()
+    }
+
 @router.get("/owasp/vulnerabilities")
 async def get_owasp_vulnerabilities(
     current_user: User = Depends(get_current_user),
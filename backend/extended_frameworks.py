@@ -13,6 +13,9 @@ from enum import Enum
 import requests
 from pathlib import Path
 
+from cybersecurity_frameworks import EventFeatures, extract_features, features_signature
+from indicator_cache import MISSING, LRUTTLCache
+
 class ExtendedFrameworkType(Enum):
     """Extended cybersecurity frameworks"""
     OWASP_TOP_10 = "owasp_top_10"
@@ -291,13 +294,12 @@ class OWASPTop10Mapper:
             )
         }
     
-    def map_log_to_owasp(self, log_data: Dict[str, Any]) -> List[OWASPVulnerability]:
+    def map_log_to_owasp(self, log_data: Dict[str, Any],
+                         features: Optional[EventFeatures] = None) -> List[OWASPVulnerability]:
         """Map log data to OWASP Top 10 vulnerabilities"""
         matched_vulnerabilities = []
         
-        activity_name = log_data.get('activity_name', '').lower()
-        url = log_data.get('url', '').lower()
-        user_agent = log_data.get('user_agent', '').lower()
+        activity_name = (features or extract_features(log_data)).activity_name
         
         # A01 - Broken Access Control
         if any(keyword in activity_name for keyword in ['unauthorized', 'access denied', 'permission denied']):
@@ -434,12 +436,12 @@ class STRIDEMapper:
             )
         }
     
-    def map_log_to_stride(self, log_data: Dict[str, Any]) -> List[STRIDEThreat]:
+    def map_log_to_stride(self, log_data: Dict[str, Any],
+                          features: Optional[EventFeatures] = None) -> List[STRIDEThreat]:
         """Map log data to STRIDE threats"""
         matched_threats = []
         
-        activity_name = log_data.get('activity_name', '').lower()
-        severity = log_data.get('severity', '').lower()
+        activity_name = (features or extract_features(log_data)).activity_name
         
         # Spoofing
         if any(keyword in activity_name for keyword in ['spoof', 'impersonat', 'fake', 'forged']):
@@ -528,11 +530,12 @@ class NISTCSFMapper:
             )
         }
     
-    def map_log_to_nist_csf(self, log_data: Dict[str, Any]) -> List[NISTCSFControl]:
+    def map_log_to_nist_csf(self, log_data: Dict[str, Any],
+                            features: Optional[EventFeatures] = None) -> List[NISTCSFControl]:
         """Map log data to NIST CSF controls"""
         matched_controls = []
         
-        activity_name = log_data.get('activity_name', '').lower()
+        activity_name = (features or extract_features(log_data)).activity_name
         
         # Asset Management
         if any(keyword in activity_name for keyword in ['inventory', 'asset', 'device', 'system']):
@@ -605,11 +608,12 @@ class AtomicRedTeamMapper:
             }
         }
     
-    def map_log_to_atomic(self, log_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def map_log_to_atomic(self, log_data: Dict[str, Any],
+                          features: Optional[EventFeatures] = None) -> List[Dict[str, Any]]:
         """Map log data to Atomic Red Team techniques"""
         matched_techniques = []
         
-        activity_name = log_data.get('activity_name', '').lower()
+        activity_name = (features or extract_features(log_data)).activity_name
         
         for technique_id, technique in self.techniques.items():
             if any(keyword in activity_name for keyword in technique['name'].lower().split()):
@@ -734,24 +738,49 @@ class AnalystFatigueManager:
 class ExtendedFrameworkAnalyzer:
     """Extended framework analyzer with fatigue management"""
     
-    def __init__(self):
+    def __init__(self, cache_size: int = 10000, cache_ttl: float = 3600.0):
         self.owasp_mapper = OWASPTop10Mapper()
         self.stride_mapper = STRIDEMapper()
         self.nist_csf_mapper = NISTCSFMapper()
         self.atomic_mapper = AtomicRedTeamMapper()
         self.fatigue_manager = AnalystFatigueManager()
+        # Event signature -> analysis; cached results are shared and must not be mutated
+        self.cache = LRUTTLCache(max_size=cache_size, ttl=cache_ttl)
     
-    def analyze_log_extended(self, log_data: Dict[str, Any], analyst_id: str = None) -> Dict[str, Any]:
+    def analyze_log_extended(self, log_data: Dict[str, Any], analyst_id: str = None,
+                             features: Optional[EventFeatures] = None) -> Dict[str, Any]:
         """Comprehensive log analysis with extended frameworks"""
+        features = features or extract_features(log_data)
+        key = features_signature(features)
+        cached = self.cache.get(key)
+        if cached is MISSING:
+            cached = self._build_analysis(log_data, features)
+            self.cache.set(key, cached)
         
         analysis = {
-            "log_id": log_data.get("_id", "unknown"),
+            "log_id": features.log_id,
             "timestamp": datetime.utcnow().isoformat(),
-            "frameworks": {}
+            **cached
         }
         
+        # Analyst fatigue management
+        if analyst_id:
+            analysis["fatigue_management"] = {
+                "analyst_id": analyst_id,
+                "recommendations": self.fatigue_manager._get_fatigue_recommendations("Low", [])
+            }
+        
+        return analysis
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        return self.cache.get_stats()
+    
+    def _build_analysis(self, log_data: Dict[str, Any], features: EventFeatures) -> Dict[str, Any]:
+        """Extended framework results for one signature (without log id and timestamp)"""
+        analysis = {"frameworks": {}}
+        
         # OWASP Top 10 Analysis
-        owasp_vulnerabilities = self.owasp_mapper.map_log_to_owasp(log_data)
+        owasp_vulnerabilities = self.owasp_mapper.map_log_to_owasp(log_data, features)
         analysis["frameworks"]["owasp_top_10"] = {
             "vulnerabilities": [
                 {
@@ -768,7 +797,7 @@ class ExtendedFrameworkAnalyzer:
         }
         
         # STRIDE Analysis
-        stride_threats = self.stride_mapper.map_log_to_stride(log_data)
+        stride_threats = self.stride_mapper.map_log_to_stride(log_data, features)
         analysis["frameworks"]["stride"] = {
             "threats": [
                 {
@@ -784,7 +813,7 @@ class ExtendedFrameworkAnalyzer:
         }
         
         # NIST CSF Analysis
-        nist_controls = self.nist_csf_mapper.map_log_to_nist_csf(log_data)
+        nist_controls = self.nist_csf_mapper.map_log_to_nist_csf(log_data, features)
         analysis["frameworks"]["nist_csf"] = {
             "controls": [
                 {
@@ -800,7 +829,7 @@ class ExtendedFrameworkAnalyzer:
         }
         
         # Atomic Red Team Analysis
-        atomic_techniques = self.atomic_mapper.map_log_to_atomic(log_data)
+        atomic_techniques = self.atomic_mapper.map_log_to_atomic(log_data, features)
         analysis["frameworks"]["atomic_red_team"] = {
             "techniques": atomic_techniques,
             "total_techniques": len(atomic_techniques)
@@ -809,13 +838,6 @@ class ExtendedFrameworkAnalyzer:
         # Overall threat assessment
         analysis["threat_assessment"] = self._assess_extended_threat(analysis)
         
-        # Analyst fatigue management
-        if analyst_id:
-            analysis["fatigue_management"] = {
-                "analyst_id": analyst_id,
-                "recommendations": self.fatigue_manager._get_fatigue_recommendations("Low", [])
-            }
-        
         return analysis
     
     def _assess_extended_threat(self, analysis: Dict[str, Any]) -> Dict[str, Any]:
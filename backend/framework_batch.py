@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Jupiter SIEM Batch Framework Analysis
+Runs every framework mapper over large batches of events. Features are extracted
+once per event and shared by all mappers, MITRE techniques are scored per chunk
+in one pass, and chunks are spread across a process pool
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from cybersecurity_frameworks import FrameworkAnalyzer, extract_features
+from extended_frameworks import ExtendedFrameworkAnalyzer
+
+logger = logging.getLogger(__name__)
+
+CORE_FRAMEWORKS = ("mitre_attack", "diamond_model", "kill_chain")
+EXTENDED_FRAMEWORKS = ("owasp_top_10", "stride", "nist_csf", "atomic_red_team")
+ALL_FRAMEWORKS = CORE_FRAMEWORKS + EXTENDED_FRAMEWORKS
+
+# Analyzers are built once per process, not once per chunk
+_analyzers = None
+
+def _get_analyzers():
+    global _analyzers
+    if _analyzers is None:
+        _analyzers = (FrameworkAnalyzer(), ExtendedFrameworkAnalyzer())
+    return _analyzers
+
+def _cache_counters(core: FrameworkAnalyzer, extended: ExtendedFrameworkAnalyzer) -> Dict[str, Tuple[int, int]]:
+    return {"core": (core.cache.hits, core.cache.misses), "extended": (extended.cache.hits, extended.cache.misses)}
+
+def analyze_chunk(logs: List[Dict[str, Any]], frameworks: Optional[Sequence[str]] = None
+                  ) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, int]]]:
+    """Analyze a chunk of logs with all requested frameworks in the current process.
+    Returns the analyses and the chunk's analysis cache hits and misses, since the caches
+    live in whichever process ran the chunk"""
+    requested = set(frameworks or ALL_FRAMEWORKS)
+    core, extended = _get_analyzers()
+    before = _cache_counters(core, extended)
+    features = [extract_features(log_data) for log_data in logs]
+    
+    if requested.intersection(CORE_FRAMEWORKS):
+        core_results = core.analyze_logs(logs, features)
+    else:
+        core_results = [None] * len(logs)
+    
+    results = []
+    for log_data, event_features, core_analysis in zip(logs, features, core_results):
+        analysis = {
+            "log_id": event_features.log_id,
+            "timestamp": datetime.utcnow().isoformat(),
+            "frameworks": {}
+        }
+        if core_analysis is not None:
+            analysis["frameworks"].update(core_analysis["frameworks"])
+            analysis["threat_assessment"] = core_analysis["threat_assessment"]
+        if requested.intersection(EXTENDED_FRAMEWORKS):
+            extended_analysis = extended.analyze_log_extended(log_data, features=event_features)
+            analysis["frameworks"].update(extended_analysis["frameworks"])
+            analysis["extended_threat_assessment"] = extended_analysis["threat_assessment"]
+        analysis["frameworks"] = {
+            name: result for name, result in analysis["frameworks"].items() if name in requested
+        }
+        results.append(analysis)
+    
+    after = _cache_counters(core, extended)
+    cache = {
+        name: {"hits": after[name][0] - before[name][0], "misses": after[name][1] - before[name][1]}
+        for name in after
+    }
+    return results, cache
+
+class BatchFrameworkAnalyzer:
+    """Splits a batch into chunks and analyzes them in worker processes"""
+    
+    def __init__(self, max_workers: Optional[int] = None, chunk_size: int = 500):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.chunk_size = max(1, chunk_size)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.stats = {"batches": 0, "events": 0, "chunks": 0, "total_seconds": 0.0}
+        self.cache_stats = {name: {"hits": 0, "misses": 0} for name in ("core", "extended")}
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawn rather than fork the server with its client threads and open connections
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+    
+    async def analyze(self, logs: List[Dict[str, Any]],
+                      frameworks: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """Analyze logs, preserving their order in the results"""
+        frameworks = tuple(frameworks) if frameworks else None
+        chunks = [logs[i:i + self.chunk_size] for i in range(0, len(logs), self.chunk_size)]
+        started = time.perf_counter()
+        
+        if len(chunks) <= 1 or self.max_workers <= 1:
+            chunk_results = [await asyncio.to_thread(analyze_chunk, logs, frameworks)]
+        else:
+            loop = asyncio.get_running_loop()
+            try:
+                executor = self._get_executor()
+                chunk_results = await asyncio.gather(*(
+                    loop.run_in_executor(executor, analyze_chunk, chunk, frameworks) for chunk in chunks
+                ))
+            except BrokenProcessPool as e:
+                logger.error(f"Framework analysis worker pool failed, analyzing in-process: {e}")
+                self._executor = None
+                chunk_results = [await asyncio.to_thread(analyze_chunk, chunk, frameworks) for chunk in chunks]
+        results = [analysis for chunk, _ in chunk_results for analysis in chunk]
+        for _, cache in chunk_results:
+            for name, counters in cache.items():
+                self.cache_stats[name]["hits"] += counters["hits"]
+                self.cache_stats[name]["misses"] += counters["misses"]
+        
+        self.stats["batches"] += 1
+        self.stats["events"] += len(logs)
+        self.stats["chunks"] += len(chunks)
+        self.stats["total_seconds"] += time.perf_counter() - started
+        return results
+    
+    def get_stats(self) -> Dict[str, Any]:
+        seconds = self.stats["total_seconds"]
+        cache = {}
+        for name, counters in self.cache_stats.items():
+            lookups = counters["hits"] + counters["misses"]
+            cache[name] = {**counters, "hit_rate": counters["hits"] / lookups if lookups else 0.0}
+        return {
+            **self.stats,
+            "max_workers": self.max_workers,
+            "chunk_size": self.chunk_size,
+            "events_per_second": self.stats["events"] / seconds if seconds else 0.0,
+            "analysis_cache": cache
+        }
+    
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
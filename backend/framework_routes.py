@@ -9,6 +9,7 @@ from typing import List, Dict, Any, Optional
 from pydantic import BaseModel, Field, validator
 from datetime import datetime, timedelta
 import logging
+import os
 
 from auth_middleware import get_current_user
 from models.user_management import User
@@ -19,6 +20,7 @@ from cybersecurity_frameworks import (
     KillChainMapper,
     FrameworkType
 )
+from framework_batch import ALL_FRAMEWORKS, BatchFrameworkAnalyzer
 from security_utils import sanitize_string
 
 # Configure logging
@@ -30,6 +32,14 @@ router = APIRouter(prefix="/api/frameworks", tags=["frameworks"])
 # Initialize framework analyzer
 framework_analyzer = FrameworkAnalyzer()
 
+# Batch analysis runs in worker processes (0 = pick from CPU count)
+batch_analyzer = BatchFrameworkAnalyzer(
+    max_workers=int(os.getenv("FRAMEWORK_BATCH_WORKERS", "0")) or None,
+    chunk_size=int(os.getenv("FRAMEWORK_BATCH_CHUNK_SIZE", "500"))
+)
+
+MAX_BATCH_EVENTS = int(os.getenv("FRAMEWORK_BATCH_MAX_EVENTS", "100000"))
+
 # Request/Response Models
 class LogAnalysisRequest(BaseModel):
     """Request model for log analysis"""
@@ -54,6 +64,26 @@ class LogAnalysisRequest(BaseModel):
                 raise ValueError(f"Invalid framework: {framework}")
         return v
 
+class BatchAnalysisRequest(BaseModel):
+    """Request model for batch log analysis"""
+    logs: List[Dict[str, Any]] = Field(..., min_length=1, description="Logs to analyze")
+    frameworks: Optional[List[str]] = Field(default=None, description="Frameworks to use (default: all)")
+    
+    @validator('logs')
+    def validate_logs(cls, v):
+        """Limit batch size and sanitize each log"""
+        if len(v) > MAX_BATCH_EVENTS:
+            raise ValueError(f"At most {MAX_BATCH_EVENTS} logs per batch")
+        return [sanitize_log_data(log) for log in v]
+    
+    @validator('frameworks')
+    def validate_frameworks(cls, v):
+        """Validate framework names"""
+        for framework in v or []:
+            if framework not in ALL_FRAMEWORKS:
+                raise ValueError(f"Invalid framework: {framework}")
+        return v
+
 class FrameworkAnalysisResponse(BaseModel):
     """Response model for framework analysis"""
     success: bool
@@ -182,6 +212,48 @@ async def analyze_log(
             detail=f"Failed to analyze log data: {str(e)}"
         )
 
+@router.post("/analyze-batch")
+async def analyze_log_batch(
+    request: BatchAnalysisRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Analyze a batch of logs with all frameworks, in chunks across worker processes
+    """
+    try:
+        logger.info(f"Batch analyzing {len(request.logs)} logs for user {current_user.email}")
+        
+        started = datetime.utcnow()
+        results = await batch_analyzer.analyze(request.logs, request.frameworks)
+        
+        return {
+            "success": True,
+            "results": results,
+            "total": len(results),
+            "processing_time_ms": (datetime.utcnow() - started).total_seconds() * 1000,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error batch analyzing log data: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to analyze log batch: {str(e)}"
+        )
+
+@router.get("/cache-stats")
+async def get_framework_cache_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get analysis cache hit rates (single-log and batch worker caches) and batch throughput
+    """
+    return {
+        "success": True,
+        "analysis_cache": framework_analyzer.get_cache_stats(),
+        "batch": batch_analyzer.get_stats()
+    }
+
 @router.get("/mitre/techniques")
 async def get_mitre_techniques(
     current_user: User = Depends(get_current_user),
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Jupiter SIEM Shared HTTP Client
+Pooled outbound HTTP for threat-intel providers, SOAR webhooks and health checks
+"""
+
+import asyncio
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, Optional, Union
+from urllib.parse import urlsplit
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Responses worth retrying: throttling and transient upstream failures
+RETRYABLE_STATUSES = frozenset({429, 502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+class CircuitState(str, Enum):
+    """Circuit breaker states"""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """Raised when a request is short-circuited by an open breaker"""
+    pass
+
+@dataclass
+class HTTPClientConfig:
+    """Connection pool, timeout and resilience settings"""
+    max_connections: int = 100
+    max_connections_per_host: int = 10
+    keepalive_timeout: float = 30.0
+    dns_cache_ttl: int = 300
+    total_timeout: float = 10.0
+    connect_timeout: float = 5.0
+    max_retries: int = 2
+    backoff_base: float = 0.2
+    backoff_max: float = 5.0
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
+
+    @classmethod
+    def from_dict(cls, config: Dict[str, Any]) -> "HTTPClientConfig":
+        return cls(**{k: v for k, v in config.items() if k in cls.__dataclass_fields__})
+
+class CircuitBreaker:
+    """Per-host breaker: opens after consecutive failures, probes once after a cool-down"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started = 0.0
+
+    def allow(self) -> bool:
+        if self.state == CircuitState.CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == CircuitState.OPEN:
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            self.state = CircuitState.HALF_OPEN
+        elif now - self.probe_started < self.reset_timeout:
+            # One trial request at a time; a probe that never reports back is replaced after the cool-down
+            return False
+        self.probe_started = now
+        return True
+
+    def record_success(self):
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == CircuitState.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != CircuitState.OPEN:
+                logger.warning(f"Circuit opened after {self.failures} consecutive failures")
+            self.state = CircuitState.OPEN
+            self.opened_at = time.monotonic()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"state": self.state.value, "failures": self.failures}
+
+class SharedHTTPClient:
+    """
+    One pooled aiohttp session for all outbound integrations
+    Keep-alive connections and cached DNS are reused across calls; requests
+    retry with full-jitter exponential backoff and fail fast while a host's
+    circuit is open
+    """
+
+    def __init__(self, config: Optional[HTTPClientConfig] = None):
+        self.config = config or HTTPClientConfig()
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self):
+        """Open the pooled session (called from the application lifespan)"""
+        await self._get_session()
+
+    async def close(self):
+        """Close the pooled session and its connections"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is not None and not self._session.closed and self._loop is not loop:
+            if not self._loop.is_closed():
+                raise RuntimeError("Shared HTTP client is bound to another event loop; close it there first")
+            # The owning loop is gone, so its connections are unusable: release them before replacing
+            await self._session.close()
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.config.max_connections,
+                limit_per_host=self.config.max_connections_per_host,
+                keepalive_timeout=self.config.keepalive_timeout,
+                ttl_dns_cache=self.config.dns_cache_ttl,
+                use_dns_cache=True
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(
+                    total=self.config.total_timeout, connect=self.config.connect_timeout
+                )
+            )
+            self._loop = loop
+        return self._session
+
+    def _breaker(self, url: str) -> CircuitBreaker:
+        host = urlsplit(url).netloc
+        if host not in self.breakers:
+            self.breakers[host] = CircuitBreaker(self.config.failure_threshold, self.config.reset_timeout)
+        return self.breakers[host]
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.config.backoff_max, self.config.backoff_base * (2 ** attempt)))
+
+    @asynccontextmanager
+    async def request(self, method: str, url: str, retries: Optional[int] = None,
+                      timeout: Union[float, aiohttp.ClientTimeout, None] = None,
+                      **kwargs) -> AsyncIterator[aiohttp.ClientResponse]:
+        """
+        Issue a request through the shared pool
+        Non-idempotent methods are not retried unless ``retries`` is given
+        """
+        method = method.upper()
+        if retries is None:
+            retries = self.config.max_retries if method in IDEMPOTENT_METHODS else 0
+        if timeout is not None and not isinstance(timeout, aiohttp.ClientTimeout):
+            timeout = aiohttp.ClientTimeout(total=timeout, connect=min(timeout, self.config.connect_timeout))
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+
+        breaker = self._breaker(url)
+        session = await self._get_session()
+        response = None
+
+        for attempt in range(retries + 1):
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuit open for {urlsplit(url).netloc}")
+            try:
+                response = await session.request(method, url, **kwargs)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                breaker.record_failure()
+                if attempt >= retries:
+                    raise
+                logger.debug(f"{method} {url} failed ({e}), retrying")
+            else:
+                if response.status >= 500 or response.status == 429:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                if response.status not in RETRYABLE_STATUSES or attempt >= retries:
+                    break
+                response.release()
+            await asyncio.sleep(self._backoff(attempt))
+
+        try:
+            yield response
+        finally:
+            response.release()
+
+    def get(self, url: str, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Pool and breaker state for operations dashboards"""
+        connector = self._session.connector if self._session and not self._session.closed else None
+        return {
+            "session_open": connector is not None,
+            "max_connections": self.config.max_connections,
+            "max_connections_per_host": self.config.max_connections_per_host,
+            "breakers": {host: breaker.to_dict() for host, breaker in self.breakers.items()}
+        }
+
+# Global instance
+http_client = SharedHTTPClient()
+
+async def initialize_http_client(config: Optional[Dict[str, Any]] = None) -> SharedHTTPClient:
+    """Configure and open the shared HTTP client"""
+    await http_client.close()
+    http_client.config = HTTPClientConfig.from_dict(config or {})
+    http_client.breakers.clear()
+    await http_client.start()
+    logger.info(
+        f"Shared HTTP client initialized ({http_client.config.max_connections} connections, "
+        f"{http_client.config.max_connections_per_host} per host)"
+    )
+    return http_client
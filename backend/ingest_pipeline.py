@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+Jupiter SIEM Streaming Ingest Pipeline
+Batches of raw events flow through bounded asyncio queues:
+
+    parse -> validate -> enrich -> correlate -> alert -> store
+
+Each stage pulls whatever is queued (up to batch_size events) and processes it
+as one batch, so enrichment lookups, correlation and storage writes are
+amortized under load. Full queues push back on producers: HTTP callers get
+503s, TCP connections stop being read and UDP datagrams are dropped and counted.
+The validate stage runs the compiled OCSF validator over each batch
+"""
+
+import asyncio
+import json
+import logging
+import time
+import zlib
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from uuid import uuid4
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("parse", "validate", "enrich", "correlate", "alert", "store")
+
+Batch = List[Any]
+StageFunc = Callable[[Batch], Awaitable[Batch]]
+
+def load_event(line: bytes) -> Any:
+    return orjson.loads(line) if ORJSON_AVAILABLE else json.loads(line)
+
+class BatchTooLarge(Exception):
+    """Raised when a batch exceeds its decompressed size or event count limit"""
+    pass
+
+def _gunzip(body: bytes, max_bytes: Optional[int]) -> bytes:
+    """Decompress (possibly multi-member) gzip, never inflating more than max_bytes"""
+    chunks, size = [], 0
+    while body:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        limit = max_bytes - size + 1 if max_bytes is not None else 0
+        try:
+            chunk = decompressor.decompress(body, limit)
+        except zlib.error as e:
+            raise ValueError(f"Invalid gzip batch: {e}")
+        size += len(chunk)
+        if max_bytes is not None and (size > max_bytes or decompressor.unconsumed_tail):
+            raise BatchTooLarge(f"Batch inflates to more than {max_bytes} bytes")
+        if not decompressor.eof:
+            raise EOFError("Compressed batch ended before the end-of-stream marker")
+        chunks.append(chunk)
+        body = decompressor.unused_data.lstrip(b"\x00")
+    return b"".join(chunks)
+
+def split_body(body: bytes, content_encoding: Optional[str] = None,
+               max_bytes: Optional[int] = None, max_events: Optional[int] = None) -> List[Any]:
+    """
+    Raw lines (NDJSON) or decoded events (JSON array) from a possibly gzipped body
+    Raises BatchTooLarge past max_bytes (after decompression) or max_events
+    """
+    if content_encoding == "gzip" or body[:2] == b"\x1f\x8b":
+        body = _gunzip(body, max_bytes)
+    elif max_bytes is not None and len(body) > max_bytes:
+        raise BatchTooLarge(f"Batch is larger than {max_bytes} bytes")
+    stripped = body.lstrip()
+    if stripped[:1] == b"[":
+        events = load_event(stripped)
+        if not isinstance(events, list):
+            raise ValueError("Expected a JSON array of events")
+    else:
+        events = [line for line in body.splitlines() if line.strip()]
+    if max_events is not None and len(events) > max_events:
+        raise BatchTooLarge(f"At most {max_events} events per batch")
+    return events
+
+def event_time(event: Dict[str, Any]) -> datetime:
+    """Event timestamp from OCSF epoch milliseconds or an ISO string; now if absent"""
+    value = event.get("time")
+    try:
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value / 1000 if value > 1e11 else value, tz=timezone.utc).replace(tzinfo=None)
+        if isinstance(value, str):
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+    except (ValueError, OverflowError, OSError):
+        pass
+    return datetime.utcnow()
+
+class StageMetrics:
+    """Counters for one pipeline stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.batches = 0
+        self.events_in = 0
+        self.events_out = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.max_batch = 0
+        self.last_batch_ms = 0.0
+
+    def record(self, events_in: int, events_out: int, seconds: float):
+        self.batches += 1
+        self.events_in += events_in
+        self.events_out += events_out
+        self.busy_seconds += seconds
+        self.max_batch = max(self.max_batch, events_in)
+        self.last_batch_ms = seconds * 1000
+
+    def to_dict(self, queue_depth: int) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "events_in": self.events_in,
+            "events_out": self.events_out,
+            "errors": self.errors,
+            "queue_depth": queue_depth,
+            "avg_batch": round(self.events_in / self.batches, 1) if self.batches else 0,
+            "max_batch": self.max_batch,
+            "last_batch_ms": round(self.last_batch_ms, 3),
+            "busy_seconds": round(self.busy_seconds, 3),
+            # Capacity of this stage if it were never idle
+            "events_per_busy_second": round(self.events_in / self.busy_seconds) if self.busy_seconds else None
+        }
+
+class DuckDBEventSink:
+    """Batched writes of processed events to the DuckDB logs table"""
+
+    def __init__(self, conn=None):
+        self._conn = conn
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            from database import get_db_manager
+            self._conn = get_db_manager().conn
+        return self._conn
+
+    @staticmethod
+    def to_row(event: Dict[str, Any]) -> Tuple[Any, ...]:
+        metadata = event.get("metadata") if isinstance(event.get("metadata"), dict) else {}
+        product = metadata.get("product") if isinstance(metadata.get("product"), dict) else {}
+        document = json.dumps(event, default=str)
+        return (
+            str(event.get("event_uid")),
+            event.get("tenant_id") or "default",
+            event_time(event),
+            product.get("name") or event.get("source") or "ingest",
+            event.get("class_name") or event.get("activity_name") or "unknown",
+            event.get("severity"),
+            event.get("message"),
+            document,
+            document,
+            datetime.utcnow()
+        )
+
+    def _insert(self, rows: List[Tuple[Any, ...]]):
+        cursor = self.conn.cursor()
+        try:
+            cursor.executemany(
+                "INSERT OR IGNORE INTO logs (id, tenant_id, timestamp, source, event_type, severity, message, "
+                "raw_data, parsed_data, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+        finally:
+            cursor.close()
+
+    async def write_rows(self, rows: List[Tuple[Any, ...]]):
+        """Insert rows already built with to_row (e.g. by ingest worker processes)"""
+        await asyncio.to_thread(self._insert, rows)
+
+    async def write(self, events: List[Dict[str, Any]]):
+        await self.write_rows([self.to_row(event) for event in events])
+
+class StreamListeners:
+    """
+    TCP/UDP listeners for anything with submit(), submit_nowait(), batch_size
+    and a _servers list
+    """
+
+    async def start_tcp(self, host: str = "0.0.0.0", port: int = 5170, flush_interval: float = 0.2):
+        """Newline-delimited JSON over TCP; a full pipeline stops reading the socket"""
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            lines: List[bytes] = []
+            try:
+                while True:
+                    try:
+                        line = await asyncio.wait_for(reader.readline(), flush_interval if lines else None)
+                    except asyncio.TimeoutError:
+                        await self.submit(lines)
+                        lines = []
+                        continue
+                    if not line:
+                        break
+                    line = line.strip()
+                    if line:
+                        lines.append(line)
+                    if len(lines) >= self.batch_size:
+                        await self.submit(lines)
+                        lines = []
+                if lines:
+                    await self.submit(lines)
+            finally:
+                writer.close()
+
+        server = await asyncio.start_server(handle, host, port, limit=1 << 20)
+        self._servers.append(server)
+        logger.info(f"Ingest TCP listener on {host}:{port}")
+        return server
+
+    async def start_udp(self, host: str = "0.0.0.0", port: int = 5170):
+        """One or more newline-delimited events per datagram; dropped when the pipeline is full"""
+        pipeline = self
+
+        class Protocol(asyncio.DatagramProtocol):
+            def datagram_received(self, data, addr):
+                pipeline.submit_nowait([line for line in data.splitlines() if line.strip()])
+
+        transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(Protocol, local_addr=(host, port))
+        self._servers.append(transport)
+        logger.info(f"Ingest UDP listener on {host}:{port}")
+        return transport
+
+class IngestPipeline(StreamListeners):
+    """Bounded, batched, multi-stage event pipeline"""
+
+    def __init__(self, enricher: Optional[Callable[[List[Dict[str, Any]]], Awaitable[List[Dict[str, Any]]]]] = None,
+                 soar=None, sink=None, observers: Sequence[Callable[[Dict[str, Any]], Any]] = (),
+                 batch_size: int = 500, queue_batches: int = 64, enrich_workers: int = 4,
+                 validator=None, validation_mode: str = "monitor"):
+        self.enricher = enricher
+        self.soar = soar
+        self.sink = sink
+        self.observers = list(observers)
+        # OCSFSchemaValidator; "monitor" counts failures, "enforce" also drops events with errors
+        self.validator = validator
+        self.validation_mode = validation_mode
+        self.validation = {"invalid": 0, "warnings": 0, "dropped": 0, "checks": Counter()}
+        self.batch_size = batch_size
+        self.queue_batches = queue_batches
+        self.workers = {"enrich": enrich_workers}
+        self.metrics = {name: StageMetrics(name) for name in STAGES}
+        self.stats = {"accepted": 0, "rejected": 0, "dropped": 0, "alerts": 0}
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._servers: List[Any] = []
+        self._started_at: Optional[float] = None
+
+    # Lifecycle
+
+    async def start(self):
+        self._queues = {name: asyncio.Queue(maxsize=self.queue_batches) for name in STAGES}
+        functions = {
+            "parse": self._parse, "validate": self._validate, "enrich": self._enrich,
+            "correlate": self._correlate, "alert": self._alert, "store": self._store
+        }
+        for position, name in enumerate(STAGES):
+            outbox = self._queues[STAGES[position + 1]] if position + 1 < len(STAGES) else None
+            for _ in range(self.workers.get(name, 1)):
+                self._tasks.append(asyncio.create_task(self._run_stage(name, functions[name], outbox)))
+        self._started_at = time.monotonic()
+        logger.info(f"Ingest pipeline started (batch size {self.batch_size}, {self.queue_batches} batches per queue)")
+
+    async def drain(self):
+        """Wait until everything submitted so far has left the last stage"""
+        for name in STAGES:
+            await self._queues[name].join()
+
+    async def stop(self, drain: bool = True):
+        for server in self._servers:
+            server.close()
+        self._servers = []
+        if drain and self._queues:
+            await self.drain()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # Producers
+
+    def _chunks(self, items: List[Any]) -> List[List[Any]]:
+        return [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+
+    async def submit(self, items: List[Any], timeout: Optional[float] = None,
+                     rejected: Optional[List[int]] = None) -> int:
+        """
+        Queue raw lines or event dicts in order, returning how many were accepted
+        Fewer than len(items) means the pipeline stayed full for `timeout` seconds;
+        the indices of rejected items are appended to ``rejected`` when given
+        """
+        queue = self._queues["parse"]
+        accepted = 0
+        for chunk in self._chunks(items):
+            try:
+                await asyncio.wait_for(queue.put(chunk), timeout)
+            except asyncio.TimeoutError:
+                self.stats["rejected"] += len(items) - accepted
+                if rejected is not None:
+                    rejected.extend(range(accepted, len(items)))
+                break
+            accepted += len(chunk)
+        self.stats["accepted"] += accepted
+        return accepted
+
+    def submit_nowait(self, items: List[Any]) -> int:
+        """Queue without waiting; items that do not fit are dropped"""
+        queue = self._queues["parse"]
+        accepted = 0
+        for chunk in self._chunks(items):
+            try:
+                queue.put_nowait(chunk)
+            except asyncio.QueueFull:
+                self.stats["dropped"] += len(items) - accepted
+                break
+            accepted += len(chunk)
+        self.stats["accepted"] += accepted
+        return accepted
+
+    # Stage runner
+
+    async def _run_stage(self, name: str, func: StageFunc, outbox: Optional[asyncio.Queue]):
+        inbox = self._queues[name]
+        metrics = self.metrics[name]
+        while True:
+            batch = await inbox.get()
+            taken = 1
+            # Coalesce whatever else is already waiting, up to batch_size
+            while len(batch) < self.batch_size and not inbox.empty():
+                batch = batch + inbox.get_nowait()
+                taken += 1
+            started = time.perf_counter()
+            try:
+                output = await func(batch)
+            except Exception as e:
+                logger.error(f"Ingest stage {name} failed on {len(batch)} events: {e}")
+                metrics.errors += len(batch)
+                output = []
+            metrics.record(len(batch), len(output), time.perf_counter() - started)
+            try:
+                if outbox is not None and output:
+                    await outbox.put(output)
+            finally:
+                for _ in range(taken):
+                    inbox.task_done()
+
+    # Stages
+
+    async def _parse(self, batch: Batch) -> Batch:
+        events = []
+        for item in batch:
+            if isinstance(item, (bytes, str)):
+                try:
+                    item = load_event(item)
+                except ValueError:
+                    self.metrics["parse"].errors += 1
+                    continue
+            events.append(item)
+        return events
+
+    async def _validate(self, batch: Batch) -> Batch:
+        events = []
+        now_ms = int(time.time() * 1000)
+        for event in batch:
+            if not isinstance(event, dict):
+                self.metrics["validate"].errors += 1
+                continue
+            event.setdefault("event_uid", uuid4().hex)
+            event.setdefault("time", now_ms)
+            for observer in self.observers:
+                observer(event)
+            events.append(event)
+        if self.validator is not None:
+            events = self._apply_validation(events, self.validator.validate_batch(events))
+        return events
+
+    def _apply_validation(self, events: List[Dict[str, Any]], bitmaps: List[int]) -> List[Dict[str, Any]]:
+        failures = Counter(bitmap for bitmap in bitmaps if bitmap)
+        if not failures:
+            return events
+        error_mask = self.validator.error_mask
+        checks = self.validation["checks"]
+        for bitmap, count in failures.items():
+            if bitmap & error_mask:
+                self.validation["invalid"] += count
+            else:
+                self.validation["warnings"] += count
+            errors, warnings = self.validator.describe(bitmap)
+            for message in errors + warnings:
+                checks[message] += count
+        if self.validation_mode != "enforce":
+            return events
+        kept = [event for event, bitmap in zip(events, bitmaps) if not bitmap & error_mask]
+        self.validation["dropped"] += len(events) - len(kept)
+        return kept
+
+    async def _enrich(self, batch: Batch) -> Batch:
+        if self.enricher is None:
+            return batch
+        try:
+            return await self.enricher(batch)
+        except Exception as e:
+            # Unenriched events are still worth correlating and storing
+            logger.error(f"Batch enrichment failed: {e}")
+            self.metrics["enrich"].errors += len(batch)
+            return batch
+
+    async def _correlate(self, batch: Batch) -> Batch:
+        if self.soar is None:
+            return [(event, [], []) for event in batch]
+        return [(event, *self.soar._match_playbooks(event)) for event in batch]
+
+    async def _alert(self, batch: Batch) -> Batch:
+        events = []
+        for event, playbooks, triggers in batch:
+            if self.soar is not None:
+                try:
+                    alert = await self.soar.raise_alert(event, playbooks, triggers)
+                except Exception as e:
+                    logger.error(f"Alerting failed for event {event.get('event_uid')}: {e}")
+                    self.metrics["alert"].errors += 1
+                    alert = None
+                if alert:
+                    event["alert_id"] = alert.id
+                    self.stats["alerts"] += 1
+            events.append(event)
+        return events
+
+    async def _store(self, batch: Batch) -> Batch:
+        if self.sink is not None:
+            await self.sink.write(batch)
+        return batch
+
+    def get_stats(self) -> Dict[str, Any]:
+        uptime = time.monotonic() - self._started_at if self._started_at else 0.0
+        stored = self.metrics["store"].events_out
+        return {
+            **self.stats,
+            "uptime_seconds": round(uptime, 3),
+            "events_per_second": round(stored / uptime) if uptime else 0,
+            "orjson": ORJSON_AVAILABLE,
+            "validation": {
+                "mode": self.validation_mode if self.validator is not None else "off",
+                "invalid": self.validation["invalid"],
+                "warnings": self.validation["warnings"],
+                "dropped": self.validation["dropped"],
+                "top_failures": dict(self.validation["checks"].most_common(10))
+            },
+            "stages": {
+                name: self.metrics[name].to_dict(self._queues[name].qsize() if self._queues else 0)
+                for name in STAGES
+            }
+        }
+
+# Global instance
+ingest_pipeline = None
+
+async def initialize_ingest_pipeline(**kwargs) -> IngestPipeline:
+    """Create and start the global ingest pipeline"""
+    global ingest_pipeline
+    ingest_pipeline = IngestPipeline(**kwargs)
+    await ingest_pipeline.start()
+    return ingest_pipeline
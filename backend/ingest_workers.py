@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+Jupiter SIEM Multi-Process Ingest Workers
+Runs N ingest pipelines in separate processes so enrichment, correlation and
+alerting use more than one core. Events are partitioned by a stable hash of
+their tenant (and optionally entity) fields, so every correlation window,
+dedup fingerprint and alert for a partition lives in exactly one worker.
+
+Batches travel over bounded multiprocessing queues, encoded as Arrow IPC when
+pyarrow is installed and as NDJSON otherwise. Workers send back storage rows,
+new or updated alerts and heartbeats; the supervisor restarts workers that die
+or stop reporting.
+
+The parent does not decode raw lines: partition keys are read straight from
+the bytes, falling back to a full parse only for lines where that is
+ambiguous, and observers are fed a sample of one line in observe_sample
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import queue
+import re
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from ingest_pipeline import DuckDBEventSink, IngestPipeline, StreamListeners, load_event
+
+try:
+    import pyarrow as pa
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARTITION_FIELDS = ("tenant_id",)
+
+def encode_batch(lines: List[bytes]) -> Tuple[str, bytes]:
+    """Serialize raw event lines for a worker queue"""
+    if PYARROW_AVAILABLE:
+        table = pa.table({"event": pa.array(lines, type=pa.binary())})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return "arrow", sink.getvalue().to_pybytes()
+    return "ndjson", b"\n".join(lines)
+
+def decode_batch(message: Tuple[str, bytes]) -> List[bytes]:
+    encoding, payload = message
+    if encoding == "arrow":
+        return pa.ipc.open_stream(payload).read_all().column("event").to_pylist()
+    return payload.split(b"\n")
+
+def partition_of(event: Dict[str, Any], partitions: int, fields: Sequence[str] = DEFAULT_PARTITION_FIELDS) -> int:
+    """Stable (process-independent) partition for an event"""
+    key = "\x1f".join(str(event.get(name) or "") for name in fields)
+    return zlib.crc32(key.encode()) % partitions
+
+def _field_pattern(name: str) -> Tuple[bytes, re.Pattern]:
+    key = json.dumps(name).encode()
+    return key, re.compile(re.escape(key) + rb'\s*:\s*(?:"([^"\\]*)"|null\b)')
+
+def _raw_field(line: bytes, key: bytes, pattern: re.Pattern) -> Optional[str]:
+    """
+    String value of a field read from raw JSON without decoding it
+    Returns "" when the key is absent and None when the bytes are ambiguous
+    (repeated key, non-string or escaped value), so the caller parses instead.
+    A key that appears once is taken to be the top-level one
+    """
+    occurrences = line.count(key)
+    if occurrences == 0:
+        return ""
+    if occurrences > 1:
+        return None
+    match = pattern.search(line)
+    if match is None:
+        return None
+    try:
+        return (match.group(1) or b"").decode()
+    except UnicodeDecodeError:
+        return None
+
+class _ResultSink:
+    """Worker-side store stage: ships storage rows and touched alerts to the parent"""
+
+    def __init__(self, worker_id: int, engine, results, store_events: bool):
+        self.worker_id = worker_id
+        self.engine = engine
+        self.results = results
+        self.store_events = store_events
+
+    async def write(self, events: List[Dict[str, Any]]):
+        rows = [DuckDBEventSink.to_row(event) for event in events] if self.store_events else []
+        alerts = []
+        for alert_id in {event["alert_id"] for event in events if "alert_id" in event}:
+            alert = self.engine.alerts.get(alert_id)
+            if alert is not None:
+                alerts.append(alert.to_dict())
+        await asyncio.to_thread(self.results.put, ("events", self.worker_id, len(events), rows, alerts))
+
+async def _run_worker(worker_id: int, config: Dict[str, Any], inbox, results, beat):
+    from soar_engine import initialize_soar_engine
+
+    enricher = None
+    http = None
+    if config.get("threat_intel"):
+        from http_client import initialize_http_client
+        from threat_intelligence import enrich_events_with_threat_intel, initialize_threat_intelligence
+        http = await initialize_http_client(config.get("http", {}))
+        # Provider quotas are split between the parent (share 0) and every worker
+        threat_config = dict(config["threat_intel"], quota_share=(worker_id + 1, config.get("quota_shares", 1)))
+        await initialize_threat_intelligence(config.get("redis_url"), threat_config)
+        enricher = enrich_events_with_threat_intel
+
+    engine = initialize_soar_engine(config.get("soar", {}))
+    job_queue = None
+    if config.get("queue_path"):
+        # Playbooks are enqueued here and run by the parent's SOAR workers
+        from playbook_queue import PlaybookJobQueue
+        job_queue = engine.job_queue = PlaybookJobQueue(config["queue_path"])
+
+    validator = None
+    if config.get("validation", "monitor") != "off":
+        from ocsf_validator import ocsf_validator as validator
+
+    pipeline = IngestPipeline(
+        enricher=enricher, soar=engine,
+        sink=_ResultSink(worker_id, engine, results, config.get("store_events", True)),
+        batch_size=config.get("batch_size", 500), queue_batches=config.get("queue_batches", 64),
+        validator=validator, validation_mode=config.get("validation", "monitor")
+    )
+    await pipeline.start()
+
+    async def heartbeat():
+        # Liveness goes through shared memory so it never waits behind storage rows;
+        # stats share the results queue and are skipped while it is full
+        while True:
+            beat.value = time.time()
+            try:
+                results.put_nowait(("stats", worker_id, pipeline.get_stats()))
+            except queue.Full:
+                pass
+            await asyncio.sleep(config.get("heartbeat_interval", 1.0))
+
+    heartbeat_task = asyncio.create_task(heartbeat())
+    try:
+        while True:
+            message = await asyncio.to_thread(inbox.get)
+            if message is None:
+                break
+            # Blocks while this worker's pipeline is full, which backs up its inbox
+            await pipeline.submit(decode_batch(message))
+    finally:
+        await pipeline.stop()
+        heartbeat_task.cancel()
+        results.put(("stats", worker_id, pipeline.get_stats()))
+        if job_queue:
+            job_queue.close()
+        if http:
+            await http.close()
+
+def _worker_main(worker_id: int, config: Dict[str, Any], inbox, results, beat):
+    """Process entry point"""
+    logging.basicConfig(level=config.get("log_level", "INFO"))
+    try:
+        asyncio.run(_run_worker(worker_id, config, inbox, results, beat))
+    except KeyboardInterrupt:
+        pass
+
+class _Worker:
+    def __init__(self, worker_id: int, inbox, beat):
+        self.id = worker_id
+        self.inbox = inbox
+        self.beat = beat  # wall-clock time of the last heartbeat, written by the worker
+        self.process: Optional[multiprocessing.Process] = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.stats: Dict[str, Any] = {}
+
+    @property
+    def heartbeat_age(self) -> float:
+        return time.time() - self.beat.value
+
+class IngestWorkerPool(StreamListeners):
+    """Partitioned ingest across worker processes, supervised from the parent"""
+
+    def __init__(self, workers: int = 4, config: Optional[Dict[str, Any]] = None, soar=None, sink=None,
+                 observers: Sequence[Callable[[Dict[str, Any]], Any]] = (),
+                 partition_fields: Sequence[str] = DEFAULT_PARTITION_FIELDS,
+                 batch_size: int = 500, queue_batches: int = 16, observe_sample: int = 10,
+                 heartbeat_timeout: float = 15.0, supervise_interval: float = 1.0):
+        self.config = dict(config or {})
+        self.config.setdefault("batch_size", batch_size)
+        self.config.setdefault("quota_shares", workers + 1)
+        self.config["store_events"] = sink is not None
+        self.soar = soar
+        self.sink = sink
+        self.observers = list(observers)
+        self.partition_fields = tuple(partition_fields)
+        self._partition_keys = [_field_pattern(name) for name in self.partition_fields]
+        # Raw lines are decoded in the parent only for observers, one in observe_sample
+        self.observe_sample = max(1, observe_sample)
+        self._observed = 0
+        self.batch_size = batch_size
+        self.heartbeat_timeout = heartbeat_timeout
+        self.supervise_interval = supervise_interval
+        self._context = multiprocessing.get_context("spawn")
+        self._workers = [
+            _Worker(i, self._context.Queue(maxsize=queue_batches), self._context.Value("d", 0.0, lock=False))
+            for i in range(workers)
+        ]
+        self._results = self._context.Queue(maxsize=queue_batches * workers)
+        self._servers: List[Any] = []
+        self._tasks: List[asyncio.Task] = []
+        self.stats = {"accepted": 0, "rejected": 0, "dropped": 0, "parse_errors": 0,
+                      "events_processed": 0, "events_stored": 0, "alerts": 0, "restarts": 0}
+
+    # Lifecycle
+
+    def _spawn(self, worker: _Worker):
+        worker.process = self._context.Process(
+            target=_worker_main, args=(worker.id, self.config, worker.inbox, self._results, worker.beat),
+            name=f"jupiter-ingest-{worker.id}", daemon=True
+        )
+        worker.beat.value = time.time()
+        worker.process.start()
+        worker.started_at = time.monotonic()
+
+    async def start(self):
+        for worker in self._workers:
+            self._spawn(worker)
+        self._tasks = [asyncio.create_task(self._collect_results()), asyncio.create_task(self._supervise())]
+        logger.info(f"Ingest worker pool started ({len(self._workers)} processes, "
+                    f"partitioned by {', '.join(self.partition_fields)})")
+
+    async def stop(self, timeout: float = 30.0):
+        """Let every worker drain its inbox, then stop the result collector"""
+        for server in self._servers:
+            server.close()
+        self._servers = []
+        supervisor = self._tasks[1] if len(self._tasks) > 1 else None
+        if supervisor:
+            supervisor.cancel()
+        for worker in self._workers:
+            await asyncio.to_thread(worker.inbox.put, None)
+        for worker in self._workers:
+            await asyncio.to_thread(worker.process.join, timeout)
+            if worker.process.is_alive():
+                logger.warning(f"Ingest worker {worker.id} did not stop in {timeout}s, terminating")
+                worker.process.terminate()
+        await asyncio.to_thread(self._results.put, None)
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _supervise(self):
+        while True:
+            await asyncio.sleep(self.supervise_interval)
+            for worker in self._workers:
+                if not worker.process.is_alive():
+                    logger.error(f"Ingest worker {worker.id} exited with code {worker.process.exitcode}, restarting")
+                elif worker.heartbeat_age > self.heartbeat_timeout:
+                    logger.error(f"Ingest worker {worker.id} missed heartbeats for "
+                                 f"{worker.heartbeat_age:.0f}s, restarting")
+                    worker.process.terminate()
+                    await asyncio.to_thread(worker.process.join, 5)
+                else:
+                    continue
+                # Batches the old process had taken are lost; its inbox is kept
+                worker.restarts += 1
+                self.stats["restarts"] += 1
+                self._spawn(worker)
+
+    async def _collect_results(self):
+        while True:
+            message = await asyncio.to_thread(self._results.get)
+            if message is None:
+                return
+            try:
+                if message[0] == "stats":
+                    _, worker_id, stats = message
+                    worker = self._workers[worker_id]
+                    worker.stats = stats
+                else:
+                    _, worker_id, processed, rows, alerts = message
+                    self.stats["events_processed"] += processed
+                    if rows and self.sink is not None:
+                        await self.sink.write_rows(rows)
+                        self.stats["events_stored"] += len(rows)
+                    self._merge_alerts(alerts)
+            except Exception as e:
+                logger.error(f"Failed to handle ingest worker result: {e}")
+
+    def _merge_alerts(self, alerts: List[Dict[str, Any]]):
+        """Mirror worker alerts into the parent's alert store for the API and playbook workers"""
+        if self.soar is None:
+            return
+        from soar_engine import Alert
+        for data in alerts:
+            existing = self.soar.alerts.get(data["id"])
+            if existing is None:
+                self.soar.alerts.save(Alert.from_dict(data))
+                self.stats["alerts"] += 1
+                continue
+            # Keep parent-side playbook progress; take the worker's occurrence tracking
+            existing.occurrence_count = max(existing.occurrence_count, data.get("occurrence_count", 1))
+            existing.playbook_jobs = list(dict.fromkeys(existing.playbook_jobs + data.get("playbook_jobs", [])))
+            if data.get("last_seen"):
+                existing.last_seen = Alert.from_dict(data).last_seen
+            self.soar.alerts.save(existing)
+
+    # Producers
+
+    def _route(self, line: bytes) -> Optional[int]:
+        """Partition of a raw line from its key fields, or None when it has to be parsed"""
+        values = []
+        for key, pattern in self._partition_keys:
+            value = _raw_field(line, key, pattern)
+            if value is None:
+                return None
+            values.append(value)
+        return zlib.crc32("\x1f".join(values).encode()) % len(self._workers)
+
+    def _partition(self, items: List[Any]) -> Tuple[List[List[bytes]], List[List[int]]]:
+        """Lines per worker, with the index of each line in items"""
+        partitions: List[List[bytes]] = [[] for _ in self._workers]
+        positions: List[List[int]] = [[] for _ in self._workers]
+        for index, item in enumerate(items):
+            if isinstance(item, (bytes, str)):
+                line = (item.encode() if isinstance(item, str) else item).strip()
+                if not line:
+                    continue
+                partition = self._route(line)
+                sampled = self.observers and self._observed % self.observe_sample == 0
+                self._observed += 1
+                if partition is not None and not sampled:
+                    # Malformed lines are counted by the worker's parse stage
+                    partitions[partition].append(line)
+                    positions[partition].append(index)
+                    continue
+                try:
+                    event = load_event(line)
+                except ValueError:
+                    self.stats["parse_errors"] += 1
+                    continue
+            else:
+                event = item
+                line = json.dumps(item, default=str).encode()
+            if not isinstance(event, dict):
+                self.stats["parse_errors"] += 1
+                continue
+            for observer in self.observers:
+                observer(event)
+            partition = partition_of(event, len(self._workers), self.partition_fields)
+            partitions[partition].append(line)
+            positions[partition].append(index)
+        return partitions, positions
+
+    def _chunks(self, lines: List[bytes]) -> List[Tuple[int, List[bytes]]]:
+        return [(i, lines[i:i + self.batch_size]) for i in range(0, len(lines), self.batch_size)]
+
+    async def submit(self, items: List[Any], timeout: Optional[float] = None,
+                     rejected: Optional[List[int]] = None) -> int:
+        """
+        Route items to their partitions, returning how many were queued
+        A saturated worker rejects the rest of its own partition only, so unlike
+        IngestPipeline.submit the accepted events are not necessarily a prefix;
+        the indices of rejected items are appended to ``rejected`` when given
+        """
+        accepted = 0
+        partitions, positions = self._partition(items)
+        for worker, lines, indices in zip(self._workers, partitions, positions):
+            for offset, chunk in self._chunks(lines):
+                try:
+                    await asyncio.to_thread(worker.inbox.put, encode_batch(chunk), True, timeout)
+                except queue.Full:
+                    if rejected is not None:
+                        rejected.extend(indices[offset:])
+                    break
+                accepted += len(chunk)
+        self.stats["accepted"] += accepted
+        self.stats["rejected"] += sum(len(lines) for lines in partitions) - accepted
+        if rejected is not None:
+            rejected.sort()
+        return accepted
+
+    def submit_nowait(self, items: List[Any]) -> int:
+        accepted = 0
+        partitions, _ = self._partition(items)
+        for worker, lines in zip(self._workers, partitions):
+            for _, chunk in self._chunks(lines):
+                try:
+                    worker.inbox.put_nowait(encode_batch(chunk))
+                except queue.Full:
+                    break
+                accepted += len(chunk)
+        self.stats["accepted"] += accepted
+        self.stats["dropped"] += sum(len(lines) for lines in partitions) - accepted
+        return accepted
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        workers = []
+        for worker in self._workers:
+            try:
+                depth = worker.inbox.qsize()
+            except NotImplementedError:  # macOS
+                depth = None
+            workers.append({
+                "id": worker.id,
+                "pid": worker.process.pid if worker.process else None,
+                "alive": bool(worker.process and worker.process.is_alive()),
+                "restarts": worker.restarts,
+                "uptime_seconds": round(now - worker.started_at, 1) if worker.process else 0,
+                "heartbeat_age_seconds": round(worker.heartbeat_age, 1) if worker.process else None,
+                "inbox_batches": depth,
+                "pipeline": worker.stats
+            })
+        return {
+            **self.stats,
+            "batch_encoding": "arrow" if PYARROW_AVAILABLE else "ndjson",
+            "partition_fields": list(self.partition_fields),
+            "events_per_second": sum(w["pipeline"].get("events_per_second", 0) for w in workers),
+            "workers": workers
+        }
+
+# Global instance
+worker_pool = None
+
+async def initialize_ingest_workers(**kwargs) -> IngestWorkerPool:
+    """Create and start the global ingest worker pool"""
+    global worker_pool
+    worker_pool = IngestWorkerPool(**kwargs)
+    await worker_pool.start()
+    return worker_pool
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Jupiter SIEM IP Range Matching
+Compiles CIDR lists into merged integer interval sets so that subnet membership
+is a binary search per address, or a single vectorized pass over a column of
+addresses when NumPy is available
+"""
+
+import bisect
+import ipaddress
+import logging
+from functools import lru_cache
+from typing import Any, Iterable, List, Optional, Tuple, Union
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# RFC 1918, loopback, link-local, CGNAT and IPv6 local ranges
+PRIVATE_CIDRS = (
+    "10.0.0.0/8", "172.16.0.0/12", "192.168.0.0/16",
+    "127.0.0.0/8", "169.254.0.0/16", "100.64.0.0/10",
+    "::1/128", "fc00::/7", "fe80::/10",
+)
+
+def parse_ip(value: Any) -> Optional[Union[ipaddress.IPv4Address, ipaddress.IPv6Address]]:
+    """Parse an address, returning None for anything that is not an IP"""
+    if value is None:
+        return None
+    try:
+        return ipaddress.ip_address(str(value).strip())
+    except ValueError:
+        return None
+
+def is_cidr(value: Any) -> bool:
+    """Check whether a value is a CIDR block (e.g. 10.0.0.0/8)"""
+    if not isinstance(value, str) or "/" not in value:
+        return False
+    try:
+        ipaddress.ip_network(value.strip(), strict=False)
+        return True
+    except ValueError:
+        return False
+
+def split_values(values: Any) -> List[str]:
+    """Normalize a list or comma separated string of CIDRs/addresses"""
+    if values is None:
+        return []
+    if isinstance(values, str):
+        values = values.strip().strip("()").split(",")
+    return [str(v).strip().strip("\"'") for v in values if str(v).strip().strip("\"'")]
+
+def _merge(intervals: List[Tuple[int, int]]) -> Tuple[List[int], List[int]]:
+    """Merge overlapping/adjacent intervals into sorted start and end lists"""
+    starts, ends = [], []
+    for start, end in sorted(intervals):
+        if ends and start <= ends[-1] + 1:
+            ends[-1] = max(ends[-1], end)
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+class IPRangeSet:
+    """
+    Immutable set of IP ranges compiled from CIDRs and single addresses
+    Overlapping blocks are merged, so lookups cost O(log n) in the number of
+    disjoint ranges regardless of how many CIDRs were supplied
+    """
+
+    def __init__(self, cidrs: Iterable[str] = ()):
+        v4, v6 = [], []
+        self.invalid = []
+        for cidr in cidrs:
+            try:
+                network = ipaddress.ip_network(str(cidr).strip(), strict=False)
+            except ValueError:
+                self.invalid.append(cidr)
+                continue
+            interval = (int(network.network_address), int(network.broadcast_address))
+            (v4 if network.version == 4 else v6).append(interval)
+
+        if self.invalid:
+            logger.debug(f"Ignoring invalid CIDR values: {self.invalid}")
+
+        self.v4_starts, self.v4_ends = _merge(v4)
+        self.v6_starts, self.v6_ends = _merge(v6)
+
+        if NUMPY_AVAILABLE:
+            self._np_starts = np.array(self.v4_starts, dtype=np.uint32)
+            self._np_ends = np.array(self.v4_ends, dtype=np.uint32)
+
+    def __len__(self) -> int:
+        return len(self.v4_starts) + len(self.v6_starts)
+
+    def __contains__(self, ip: Any) -> bool:
+        return self.contains(ip)
+
+    def contains(self, ip: Any) -> bool:
+        """Check whether a single address falls inside any range"""
+        address = parse_ip(ip)
+        if address is None:
+            return False
+        if address.version == 4:
+            starts, ends = self.v4_starts, self.v4_ends
+        else:
+            starts, ends = self.v6_starts, self.v6_ends
+        value = int(address)
+        position = bisect.bisect_right(starts, value) - 1
+        return position >= 0 and value <= ends[position]
+
+    def contains_many(self, ips: Iterable[Any]) -> List[bool]:
+        """
+        Check a column of addresses in one pass
+        IPv4 addresses are packed into a uint32 array and matched with a single
+        searchsorted; IPv6 and unparsable values fall back to per-value lookups
+        """
+        values = list(ips)
+        if not NUMPY_AVAILABLE or not values:
+            return [self.contains(ip) for ip in values]
+
+        packed = np.zeros(len(values), dtype=np.uint32)
+        is_v4 = np.zeros(len(values), dtype=bool)
+        fallback = []
+        for i, ip in enumerate(values):
+            address = parse_ip(ip)
+            if address is not None and address.version == 4:
+                packed[i] = int(address)
+                is_v4[i] = True
+            elif address is not None:
+                fallback.append(i)
+
+        result = np.zeros(len(values), dtype=bool)
+        if len(self._np_starts):
+            positions = np.searchsorted(self._np_starts, packed, side="right") - 1
+            valid = positions >= 0
+            clipped = np.clip(positions, 0, None)
+            result = is_v4 & valid & (packed <= self._np_ends[clipped])
+
+        matches = result.tolist()
+        for i in fallback:
+            matches[i] = self.contains(values[i])
+        return matches
+
+class IPIntervalIndex:
+    """
+    Static interval index mapping CIDR blocks and addresses to payloads
+    CIDR blocks are either nested or disjoint, so at build time they are
+    flattened into sorted, non-overlapping segments that each carry the payload
+    of the narrowest block covering them. A lookup is one binary search however
+    deeply blocks nest (e.g. a /8 with thousands of /24s inside it)
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, Any]] = ()):
+        v4, v6 = [], []
+        self.invalid = []
+        for cidr, payload in entries:
+            try:
+                network = ipaddress.ip_network(str(cidr).strip(), strict=False)
+            except ValueError:
+                self.invalid.append(cidr)
+                continue
+            interval = (int(network.network_address), int(network.broadcast_address), payload)
+            (v4 if network.version == 4 else v6).append(interval)
+        self._count = len(v4) + len(v6)
+        self._v4 = self._build(v4)
+        self._v6 = self._build(v6)
+
+    @staticmethod
+    def _build(intervals: List[Tuple[int, int, Any]]) -> Tuple[List[int], List[int], List[Any]]:
+        """Flatten nested blocks into (starts, ends, payloads) of disjoint segments"""
+        # Wider blocks sort before the blocks nested in them; the sort is stable,
+        # so a block listed twice keeps its last payload
+        intervals.sort(key=lambda interval: (interval[0], -interval[1]))
+        starts, ends, payloads = [], [], []
+
+        def emit(first: int, last: int, payload: Any):
+            if first <= last:
+                starts.append(first)
+                ends.append(last)
+                payloads.append(payload)
+
+        stack: List[List[Any]] = []   # enclosing blocks, innermost last
+        cursor = 0                    # first address not yet emitted
+        for start, end, payload in intervals:
+            while stack and stack[-1][1] < start:
+                _, top_end, top_payload = stack.pop()
+                emit(cursor, top_end, top_payload)
+                cursor = top_end + 1
+            if stack and stack[-1][0] == start and stack[-1][1] == end:
+                stack[-1][2] = payload
+                continue
+            if stack:
+                emit(cursor, start - 1, stack[-1][2])
+            stack.append([start, end, payload])
+            cursor = start
+        while stack:
+            _, top_end, top_payload = stack.pop()
+            emit(cursor, top_end, top_payload)
+            cursor = top_end + 1
+        return starts, ends, payloads
+
+    def __len__(self) -> int:
+        return self._count
+
+    def lookup(self, ip: Any) -> Optional[Any]:
+        """Payload of the narrowest block containing the address, or None"""
+        address = parse_ip(ip)
+        if address is None:
+            return None
+        starts, ends, payloads = self._v4 if address.version == 4 else self._v6
+        value = int(address)
+        position = bisect.bisect_right(starts, value) - 1
+        if position >= 0 and value <= ends[position]:
+            return payloads[position]
+        return None
+
+@lru_cache(maxsize=256)
+def _compile(cidrs: Tuple[str, ...]) -> IPRangeSet:
+    return IPRangeSet(cidrs)
+
+def compile_ranges(values: Any) -> IPRangeSet:
+    """Compile (and cache) a CIDR list or comma separated CIDR string"""
+    if isinstance(values, IPRangeSet):
+        return values
+    return _compile(tuple(split_values(values)))
+
+@lru_cache(maxsize=256)
+def _compile_membership_key(candidates: Tuple[str, ...]) -> Tuple[frozenset, Optional[IPRangeSet]]:
+    """Split an IN-list into plain lowercase values and compiled CIDR ranges"""
+    cidrs = [c for c in candidates if is_cidr(c)]
+    plain = frozenset(c.lower() for c in candidates if not is_cidr(c))
+    return plain, (_compile(tuple(cidrs)) if cidrs else None)
+
+def compile_membership(candidates: Any) -> Tuple[frozenset, Optional[IPRangeSet]]:
+    """Compile (and cache) an IN-list into plain values and CIDR ranges"""
+    return _compile_membership_key(tuple(split_values(candidates)))
+
+def has_cidr(candidates: Any) -> bool:
+    """Check whether an IN-list contains any CIDR block"""
+    return compile_membership(candidates)[1] is not None
+
+def match_membership(value: Any, candidates: Any) -> bool:
+    """
+    IN-list membership that understands CIDR blocks
+    Plain candidates compare case-insensitively as strings; CIDR candidates
+    match any address they contain
+    """
+    plain, ranges = compile_membership(candidates)
+    if str(value).lower() in plain:
+        return True
+    return ranges is not None and ranges.contains(value)
+
+PRIVATE_NETWORKS = IPRangeSet(PRIVATE_CIDRS)
+
+def is_private_ip(ip: Any) -> bool:
+    """Check whether an address is in a private, loopback or link-local range"""
+    return PRIVATE_NETWORKS.contains(ip)
@@ -392,6 +392,12 @@ async def create_initial_admin():
     except Exception as e:
         print(f"❌ Unexpected error: {e}")
 
+@app.on_event("shutdown")
+async def shutdown_framework_workers():
+    """Stop the batch framework analysis worker processes"""
+    from framework_routes import batch_analyzer
+    batch_analyzer.shutdown()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -3,11 +3,12 @@ import requests
 import json
 import logging
 from typing import Dict, List, Any, Optional
-from datetime import datetime
 import asyncio
 import aiohttp
 from dataclasses import dataclass
 
+from ocsf_validator import OCSFSchemaValidator, ocsf_validator
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -418,61 +419,15 @@ def process(session):
 class OCSFValidator:
     """Validate data against OCSF schema"""
     
-    def __init__(self):
-        self.required_fields = {
-            "activity_id": int,
-            "activity_name": str,
-            "category_uid": int,
-            "class_uid": int,
-            "time": str
-        }
-        
-        self.optional_fields = {
-            "severity_id": int,
-            "severity": str,
-            "user": dict,
-            "device": dict,
-            "src_endpoint": dict,
-            "dst_endpoint": dict,
-            "file": dict,
-            "process": dict,
-            "registry": dict,
-            "dns": dict,
-            "http": dict
-        }
+    def __init__(self, validator: Optional[OCSFSchemaValidator] = None):
+        self.validator = validator or ocsf_validator
     
     def validate(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Validate data against OCSF schema"""
-        errors = []
-        warnings = []
-        
-        # Check required fields
-        for field, field_type in self.required_fields.items():
-            if field not in data:
-                errors.append(f"Missing required field: {field}")
-            elif not isinstance(data[field], field_type):
-                errors.append(f"Invalid type for {field}: expected {field_type.__name__}")
-        
-        # Check optional fields
-        for field, field_type in self.optional_fields.items():
-            if field in data and not isinstance(data[field], field_type):
-                warnings.append(f"Invalid type for {field}: expected {field_type.__name__}")
-        
-        # Validate timestamp format
-        if "time" in data:
-            try:
-                datetime.fromisoformat(data["time"].replace('Z', '+00:00'))
-            except ValueError:
-                errors.append("Invalid timestamp format")
-        
-        # Validate severity values
-        if "severity" in data:
-            valid_severities = ["low", "medium", "high", "critical"]
-            if data["severity"] not in valid_severities:
-                warnings.append(f"Invalid severity value: {data['severity']}")
-        
+        bitmap = self.validator.validate(data)
+        errors, warnings = self.validator.describe(bitmap)
         return {
-            "valid": len(errors) == 0,
+            "valid": self.validator.is_valid(bitmap),
             "errors": errors,
             "warnings": warnings
         }
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Jupiter SIEM OCSF Field Catalog
+Single source of truth for OCSF field names, storage columns, types and
+indexing hints. The catalog is compiled once into lookup tables and value
+accessors that work on both nested OCSF events and flattened rows
+"""
+
+import hashlib
+import json
+import logging
+from dataclasses import dataclass, asdict
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Callable, Tuple
+
+from query_ast_schema import FieldType
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class OCSFField:
+    """Catalog entry for a single OCSF field"""
+    path: str                   # canonical dotted OCSF path (e.g. "src_endpoint.ip")
+    column: str                 # flat storage column (e.g. "src_endpoint_ip")
+    field_type: FieldType
+    group: str                  # UI grouping (core, user, network, ...)
+    description: str
+    cardinality: str = "high"   # "low", "medium" or "high"
+    indexable: bool = False     # covered by a ClickHouse sorting key or skip index
+    required: bool = False      # must be present on every ingested event
+    aliases: Tuple[str, ...] = ()
+
+    @property
+    def names(self) -> Tuple[str, ...]:
+        """Every name the field can be referenced by"""
+        return tuple(dict.fromkeys((self.path, self.column) + self.aliases))
+
+def _field(path: str, column: str, field_type: FieldType, group: str, description: str, **kwargs) -> OCSFField:
+    return OCSFField(path=path, column=column, field_type=field_type, group=group,
+                     description=description, **kwargs)
+
+S, I, F, T, IP = FieldType.STRING, FieldType.INTEGER, FieldType.FLOAT, FieldType.TIMESTAMP, FieldType.IP_ADDRESS
+
+# Columns follow scripts/clickhouse_init.sql; aliases cover the legacy flat
+# names used by the log search API and the OCSF actor.* nesting
+OCSF_FIELDS: List[OCSFField] = [
+    # Core OCSF fields
+    _field("time", "time", T, "core", "Event time", indexable=True, required=True, aliases=("timestamp",)),
+    _field("event_uid", "event_uid", S, "core", "Event unique ID", indexable=True, aliases=("id",)),
+    _field("tenant_id", "tenant_id", S, "core", "Tenant ID", cardinality="low", indexable=True),
+    _field("class_uid", "class_uid", I, "core", "Event class ID", cardinality="low", indexable=True, required=True),
+    _field("class_name", "class_name", S, "core", "Event class name", cardinality="low"),
+    _field("category_uid", "category_uid", I, "core", "Category ID", cardinality="low", required=True),
+    _field("category_name", "category_name", S, "core", "Category name", cardinality="low"),
+    _field("activity_id", "activity_id", I, "core", "Activity ID", cardinality="low", required=True),
+    _field("activity_name", "activity_name", S, "core", "Activity name", cardinality="low", indexable=True,
+           required=True),
+    _field("type_uid", "type_uid", I, "core", "Event type ID", cardinality="low"),
+    _field("severity", "severity", S, "core", "Severity level", cardinality="low", indexable=True),
+    _field("severity_id", "severity_id", I, "core", "Severity ID", cardinality="low"),
+    _field("status", "status", S, "core", "Event status", cardinality="low"),
+    _field("message", "message", S, "core", "Event message"),
+
+    # Actor/User fields
+    _field("user.name", "actor_user_name", S, "user", "User name", indexable=True,
+           aliases=("actor.user.name", "user_name")),
+    _field("user.uid", "actor_user_uid", S, "user", "User ID", aliases=("actor.user.uid", "user_uid")),
+    _field("user.type", "actor_user_type", S, "user", "User type", cardinality="low",
+           aliases=("actor.user.type", "user_type")),
+    _field("user.domain", "actor_user_domain", S, "user", "User domain", cardinality="medium",
+           aliases=("actor.user.domain", "user_domain")),
+    _field("user.email", "actor_user_email", S, "user", "User email", aliases=("actor.user.email", "user_email")),
+
+    # Device fields
+    _field("device.name", "device_name", S, "device", "Device name", indexable=True),
+    _field("device.type", "device_type", S, "device", "Device type", cardinality="low"),
+    _field("device.ip", "device_ip", IP, "device", "Device IP address"),
+    _field("device.hostname", "device_hostname", S, "device", "Device hostname"),
+    _field("device.mac", "device_mac", S, "device", "Device MAC address"),
+    _field("device.os.name", "device_os_name", S, "device", "Operating system", cardinality="low"),
+    _field("device.os.version", "device_os_version", S, "device", "Operating system version", cardinality="medium"),
+
+    # Network fields
+    _field("src_endpoint.ip", "src_endpoint_ip", IP, "network", "Source IP", indexable=True),
+    _field("src_endpoint.port", "src_endpoint_port", I, "network", "Source port"),
+    _field("dst_endpoint.ip", "dst_endpoint_ip", IP, "network", "Destination IP", indexable=True),
+    _field("dst_endpoint.port", "dst_endpoint_port", I, "network", "Destination port", cardinality="medium"),
+    _field("network.protocol", "network_protocol", S, "network", "Network protocol", cardinality="low"),
+    _field("network.direction", "network_direction", S, "network", "Traffic direction", cardinality="low"),
+
+    # Process fields
+    _field("process.name", "process_name", S, "process", "Process name", cardinality="medium", indexable=True),
+    _field("process.pid", "process_pid", I, "process", "Process ID"),
+    _field("process.cmd_line", "process_cmd_line", S, "process", "Process command line"),
+    _field("process.parent.name", "process_parent_name", S, "process", "Parent process name", cardinality="medium"),
+    _field("process.parent.pid", "process_parent_pid", I, "process", "Parent process ID"),
+
+    # File fields
+    _field("file.name", "file_name", S, "file", "File name", indexable=True),
+    _field("file.path", "file_path", S, "file", "File path"),
+    _field("file.size", "file_size", I, "file", "File size"),
+    _field("file.hash.md5", "file_hash_md5", S, "file", "File MD5 hash"),
+    _field("file.hash.sha1", "file_hash_sha1", S, "file", "File SHA1 hash"),
+    _field("file.hash.sha256", "file_hash_sha256", S, "file", "File SHA256 hash", indexable=True),
+
+    # Registry fields
+    _field("registry.key", "registry_key", S, "registry", "Registry key"),
+    _field("registry.value", "registry_value", S, "registry", "Registry value"),
+    _field("registry.type", "registry_type", S, "registry", "Registry value type", cardinality="low"),
+
+    # Authentication fields
+    _field("auth.method", "auth_method", S, "authentication", "Authentication method", cardinality="low"),
+    _field("auth.result", "auth_result", S, "authentication", "Authentication result", cardinality="low"),
+    _field("logon_type", "logon_type", S, "authentication", "Logon type", cardinality="low"),
+
+    # HTTP fields
+    _field("http.method", "http_method", S, "http", "HTTP method", cardinality="low",
+           aliases=("http.request.method", "http_request_method")),
+    _field("http.status_code", "http_status_code", I, "http", "HTTP status code", cardinality="low",
+           aliases=("http.response.status_code", "http_response_status_code")),
+    _field("http.url", "http_url", S, "http", "HTTP URL", aliases=("http.request.url", "http_request_url")),
+    _field("http.user_agent", "http_user_agent", S, "http", "HTTP user agent", cardinality="medium"),
+    _field("http.referrer", "http_referrer", S, "http", "HTTP referrer"),
+
+    # DNS fields
+    _field("dns.query", "dns_query", S, "dns", "DNS query name",
+           aliases=("dns.question.name", "dns_question_name")),
+    _field("dns.response", "dns_response", S, "dns", "DNS answer data",
+           aliases=("dns.answer.data", "dns_answer_data")),
+    _field("dns.type", "dns_type", S, "dns", "DNS query type", cardinality="low",
+           aliases=("dns.question.type", "dns_question_type")),
+
+    # Enrichment fields
+    _field("enrichment.geo.country", "enrichment_geo_country", S, "enrichment", "Geo country", cardinality="medium"),
+    _field("enrichment.geo.city", "enrichment_geo_city", S, "enrichment", "Geo city", cardinality="medium"),
+    _field("enrichment.threat_score", "enrichment_threat_score", F, "enrichment", "Threat score"),
+    _field("enrichment.reputation", "enrichment_reputation", S, "enrichment", "Reputation", cardinality="low"),
+
+    # MITRE ATT&CK fields
+    _field("mitre.technique.id", "mitre_technique_id", S, "mitre", "MITRE technique ID", cardinality="medium"),
+    _field("mitre.technique.name", "mitre_technique_name", S, "mitre", "MITRE technique name", cardinality="medium"),
+    _field("mitre.tactic.id", "mitre_tactic_id", S, "mitre", "MITRE tactic ID", cardinality="low"),
+    _field("mitre.tactic.name", "mitre_tactic_name", S, "mitre", "MITRE tactic name", cardinality="low"),
+
+    # Risk/Confidence
+    _field("risk_score", "risk_score", F, "core", "Risk score"),
+    _field("confidence", "confidence", F, "core", "Confidence"),
+]
+
+PYTHON_TYPES = {
+    FieldType.STRING: str,
+    FieldType.INTEGER: int,
+    FieldType.FLOAT: (int, float),
+    FieldType.TIMESTAMP: str,
+    FieldType.IP_ADDRESS: str,
+    FieldType.BOOLEAN: bool,
+    FieldType.JSON: dict,
+    FieldType.ARRAY: list,
+}
+
+def _compile_accessor(flat_keys: Tuple[str, ...], nested_paths: Tuple[Tuple[str, ...], ...]) -> Callable[[Dict[str, Any]], Any]:
+    """Build a getter that checks flat keys first, then nested paths"""
+    def get(event: Dict[str, Any]) -> Any:
+        for key in flat_keys:
+            value = event.get(key)
+            if value is not None:
+                return value
+        for parts in nested_paths:
+            value = event
+            for part in parts:
+                if not isinstance(value, dict):
+                    value = None
+                    break
+                value = value.get(part)
+            if value is not None:
+                return value
+        return None
+    return get
+
+@lru_cache(maxsize=1024)
+def _unknown_accessor(name: str) -> Callable[[Dict[str, Any]], Any]:
+    """Accessor for a name outside the catalog"""
+    nested = (tuple(name.split(".")),) if "." in name else ()
+    return _compile_accessor((name,), nested)
+
+class FieldCatalog:
+    """
+    Compiled OCSF field catalog
+    Every name a field is known by resolves to its entry with one dict lookup
+    """
+
+    def __init__(self, fields: List[OCSFField]):
+        self.fields = list(fields)
+        self._by_name: Dict[str, OCSFField] = {}
+        self._accessors: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+
+        for entry in self.fields:
+            # Dotted names are also tried as literal keys (e.g. projected query results)
+            flat_keys = entry.names
+            nested_paths = tuple(tuple(name.split(".")) for name in entry.names if "." in name)
+            accessor = _compile_accessor(flat_keys, nested_paths)
+            for name in entry.names:
+                if name in self._by_name and self._by_name[name] is not entry:
+                    logger.warning(f"Duplicate OCSF field name in catalog: {name}")
+                    continue
+                self._by_name[name] = entry
+                self._accessors[name] = accessor
+
+        self._columns = {name: entry.column for name, entry in self._by_name.items()}
+        self.version = hashlib.sha256(
+            json.dumps([asdict(entry) for entry in self.fields], sort_keys=True, default=str).encode()
+        ).hexdigest()[:12]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._by_name
+
+    def resolve(self, name: str) -> Optional[OCSFField]:
+        """Catalog entry for any known field name"""
+        return self._by_name.get(name)
+
+    def is_known(self, name: str) -> bool:
+        return name in self._by_name
+
+    def column(self, name: str) -> str:
+        """Storage column for a field name; unknown dotted names are flattened"""
+        entry = self._by_name.get(name)
+        return entry.column if entry else name.replace(".", "_")
+
+    def path(self, name: str) -> str:
+        """Canonical dotted path for a field name"""
+        entry = self._by_name.get(name)
+        return entry.path if entry else name
+
+    def accessor(self, name: str) -> Callable[[Dict[str, Any]], Any]:
+        """Value getter for a field name, compiled once per name"""
+        accessor = self._accessors.get(name)
+        if accessor is None:
+            # Unknown names come from queries and conditions, so they share a bounded cache
+            accessor = _unknown_accessor(name)
+        return accessor
+
+    def get_value(self, event: Dict[str, Any], name: str) -> Any:
+        """Read a field from a nested or flattened event"""
+        return self.accessor(name)(event)
+
+    def column_mapping(self) -> Dict[str, str]:
+        """Every known name mapped to its storage column (shared, do not mutate)"""
+        return self._columns
+
+    def by_group(self) -> Dict[str, List[OCSFField]]:
+        groups: Dict[str, List[OCSFField]] = {}
+        for entry in self.fields:
+            groups.setdefault(entry.group, []).append(entry)
+        return groups
+
+    def required_fields(self) -> List[OCSFField]:
+        return [entry for entry in self.fields if entry.required]
+
+    def python_type(self, name: str) -> Optional[Any]:
+        entry = self._by_name.get(name)
+        return PYTHON_TYPES.get(entry.field_type) if entry else None
+
+    def to_metadata(self, entry: OCSFField) -> Dict[str, Any]:
+        return {
+            "name": entry.column,
+            "path": entry.path,
+            "type": entry.field_type.value,
+            "description": entry.description,
+            "cardinality": entry.cardinality,
+            "indexable": entry.indexable,
+            "aliases": list(entry.aliases)
+        }
+
+# Global catalog instance
+field_catalog = FieldCatalog(OCSF_FIELDS)
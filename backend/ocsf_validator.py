@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Jupiter SIEM Compiled OCSF Validator
+Compiles the OCSF field catalog, per class_uid, into validator functions that
+return an integer error bitmap for each event (0 means valid). Every check has
+its own bit, so a batch validates to a list of ints that can be filtered with
+a mask and decoded into messages only for the rows that failed.
+
+Validators walk only the keys an event actually has against a prebuilt schema
+tree (flat columns and nested OCSF objects), so the cost grows with the event
+rather than the catalog; required-field checks are generated as straight-line
+Python per class. Type checks compare classes against frozensets and values
+that passed a format check (IPs, enumerations) are remembered, so repeats cost
+one set lookup
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from ip_ranges import parse_ip
+from ocsf_field_catalog import FieldCatalog, OCSFField, field_catalog
+from query_ast_schema import FieldType
+
+logger = logging.getLogger(__name__)
+
+# Extra required fields per event class, using this deployment's class_uid
+# numbering (see SOAREngine._generate_alert_tags)
+CLASS_SCHEMAS: Dict[int, Tuple[str, Tuple[str, ...]]] = {
+    1001: ("Authentication", ("user.name",)),
+    1002: ("Process Activity", ("process.name",)),
+    1003: ("File Activity", ("file.name",)),
+    1004: ("Network Activity", ("src_endpoint.ip", "dst_endpoint.ip")),
+}
+
+VALUE_DOMAINS: Dict[str, FrozenSet[str]] = {
+    "severity": frozenset({"unknown", "informational", "low", "medium", "high", "critical", "fatal", "other"}),
+}
+
+# OCSF timestamps are epoch milliseconds; ISO 8601 strings are accepted too
+VALUE_TYPES: Dict[FieldType, FrozenSet[type]] = {
+    FieldType.STRING: frozenset({str}),
+    FieldType.INTEGER: frozenset({int}),
+    FieldType.FLOAT: frozenset({int, float}),
+    FieldType.TIMESTAMP: frozenset({str, int, float}),
+    FieldType.IP_ADDRESS: frozenset({str}),
+    FieldType.BOOLEAN: frozenset({bool}),
+    FieldType.JSON: frozenset({dict}),
+    FieldType.ARRAY: frozenset({list}),
+}
+
+# Values remembered per field once they pass a format check
+GOOD_VALUE_CACHE_SIZE = 4096
+
+def _valid_timestamp(value: Any) -> bool:
+    if value.__class__ is not str:
+        return True
+    try:
+        datetime.fromisoformat(value)
+        return True
+    except ValueError:
+        return False
+
+def _valid_ip(value: str) -> bool:
+    return parse_ip(value) is not None
+
+def _value_check(entry: OCSFField) -> Optional[Tuple[str, Callable[[Any], bool], bool]]:
+    """(kind, check, cache passing values) for fields with a format or value domain"""
+    if entry.field_type == FieldType.TIMESTAMP:
+        return "format", _valid_timestamp, False  # timestamps rarely repeat
+    if entry.field_type == FieldType.IP_ADDRESS:
+        return "format", _valid_ip, True
+    domain = VALUE_DOMAINS.get(entry.path)
+    if domain:
+        return "value", lambda value: value.lower() in domain, True
+    return None
+
+@dataclass(frozen=True)
+class Check:
+    """One bit of the error bitmap"""
+    bit: int
+    path: str
+    kind: str       # missing, type, format or value
+    error: bool     # False for warnings
+    message: str
+
+class _Leaf:
+    __slots__ = ("type_bit", "types", "check_bit", "check", "good")
+
+    def __init__(self, type_bit: int, types: FrozenSet[type], check_bit: int = 0,
+                 check: Optional[Callable[[Any], bool]] = None, cache: bool = False):
+        self.type_bit = type_bit
+        self.types = types
+        self.check_bit = check_bit
+        self.check = check
+        self.good: Optional[set] = set() if cache else None
+
+class _Node:
+    __slots__ = ("type_bit", "children")
+
+    def __init__(self):
+        self.type_bit = 0   # every leaf below, set when the object itself has the wrong type
+        self.children: Dict[str, Any] = {}
+
+def _walk(obj: Dict[str, Any], table: Dict[str, Any]) -> int:
+    """Error bits for an object against a schema table; nested objects use a stack, not recursion"""
+    bits = 0
+    pending = []
+    while True:
+        for key, value in obj.items():
+            spec = table.get(key)
+            if spec is None or value is None:
+                continue
+            if spec.__class__ is _Node:
+                if value.__class__ is dict:
+                    pending.append((value, spec.children))
+                else:
+                    bits |= spec.type_bit
+            elif value.__class__ not in spec.types:
+                bits |= spec.type_bit
+            elif spec.check is not None:
+                good = spec.good
+                if good is not None and value in good:
+                    continue
+                if not spec.check(value):
+                    bits |= spec.check_bit
+                elif good is not None and len(good) < GOOD_VALUE_CACHE_SIZE:
+                    good.add(value)
+        if not pending:
+            return bits
+        obj, table = pending.pop()
+
+class OCSFSchemaValidator:
+    """Per-class compiled validators producing per-row error bitmaps"""
+
+    def __init__(self, catalog: FieldCatalog = field_catalog,
+                 class_schemas: Optional[Dict[int, Tuple[str, Tuple[str, ...]]]] = None):
+        self.catalog = catalog
+        self.class_schemas = CLASS_SCHEMAS if class_schemas is None else class_schemas
+        self.checks: List[Check] = []
+        self.error_mask = 0
+        self._missing_bits: Dict[str, int] = {}
+        self._sources: Dict[Optional[int], str] = {}
+
+        base_required = {entry.path for entry in catalog.required_fields()}
+        required_anywhere = set(base_required)
+        for _, paths in self.class_schemas.values():
+            required_anywhere.update(catalog.path(path) for path in paths)
+
+        self._tree: Dict[str, Any] = {}
+        for entry in catalog.fields:
+            is_error = entry.path in base_required
+            type_bit = self._add_check(entry.path, "type", is_error,
+                                       f"Invalid type for {entry.path}: expected {entry.field_type.value}")
+            check_bit, check, cache = 0, None, False
+            value_check = _value_check(entry)
+            if value_check:
+                kind, check, cache = value_check
+                check_bit = self._add_check(entry.path, kind, is_error and kind == "format",
+                                            f"Invalid {entry.field_type.value if kind == 'format' else 'value'} "
+                                            f"for {entry.path}")
+            if entry.path in required_anywhere:
+                self._missing_bits[entry.path] = self._add_check(entry.path, "missing", True,
+                                                                 f"Missing required field: {entry.path}")
+            leaf = _Leaf(type_bit, VALUE_TYPES[entry.field_type], check_bit, check, cache)
+            for name in entry.names:
+                self._insert(name, leaf)
+
+        self._default = self._compile(None, sorted(base_required))
+        self._validators: Dict[Any, Callable[[Dict[str, Any]], int]] = {}
+        for class_uid, (_, paths) in self.class_schemas.items():
+            required = sorted(base_required | {catalog.path(path) for path in paths})
+            self._validators[class_uid] = self._compile(class_uid, required)
+
+    def _add_check(self, path: str, kind: str, error: bool, message: str) -> int:
+        bit = 1 << len(self.checks)
+        self.checks.append(Check(bit, path, kind, error, message))
+        if error:
+            self.error_mask |= bit
+        return bit
+
+    def _insert(self, name: str, leaf: _Leaf):
+        # Dotted names are also accepted as literal flat keys, like the catalog accessors
+        self._tree.setdefault(name, leaf)
+        if "." not in name:
+            return
+        table = self._tree
+        parts = name.split(".")
+        nodes = []
+        for part in parts[:-1]:
+            node = table.get(part)
+            if not isinstance(node, _Node):
+                node = table[part] = _Node()
+            nodes.append(node)
+            table = node.children
+        table.setdefault(parts[-1], leaf)
+        for node in nodes:
+            node.type_bit |= leaf.type_bit
+
+    def _compile(self, class_uid: Optional[int], required: List[str]) -> Callable[[Dict[str, Any]], int]:
+        """Generate the validator for one class: a tree walk plus inline presence checks"""
+        namespace: Dict[str, Any] = {"_walk": _walk, "_tree": self._tree}
+        lines = ["def validate(event):", "    get = event.get", "    bits = _walk(event, _tree)"]
+        for index, path in enumerate(required):
+            entry = self.catalog.resolve(path)
+            names = entry.names if entry else (path,)
+            if any("." in name for name in names):
+                namespace[f"_get{index}"] = self.catalog.accessor(path)
+                condition = f"_get{index}(event) is None"
+            else:
+                condition = " and ".join(f"get({name!r}) is None" for name in names)
+            lines.append(f"    # {path}")
+            lines.append(f"    if {condition}:")
+            lines.append(f"        bits |= {self._missing_bits[path]}")
+        lines.append("    return bits")
+
+        source = "\n".join(lines) + "\n"
+        exec(compile(source, f"<ocsf-validator-{class_uid or 'default'}>", "exec"), namespace)
+        self._sources[class_uid] = source
+        return namespace["validate"]
+
+    def validator_for(self, class_uid: Any) -> Callable[[Dict[str, Any]], int]:
+        return self._validators.get(class_uid, self._default)
+
+    def validate(self, event: Dict[str, Any]) -> int:
+        """Error bitmap for one event; 0 when it passes every check"""
+        try:
+            validator = self._validators.get(event.get("class_uid"), self._default)
+        except TypeError:  # unhashable class_uid
+            validator = self._default
+        return validator(event)
+
+    def validate_batch(self, events: List[Dict[str, Any]]) -> List[int]:
+        """Error bitmaps for a batch, one int per event"""
+        validators, default = self._validators, self._default
+        bitmaps = []
+        for event in events:
+            try:
+                validator = validators.get(event.get("class_uid"), default)
+            except TypeError:
+                validator = default
+            bitmaps.append(validator(event))
+        return bitmaps
+
+    def is_valid(self, bitmap: int) -> bool:
+        """True when the bitmap has no error bits (warnings allowed)"""
+        return not bitmap & self.error_mask
+
+    def describe(self, bitmap: int) -> Tuple[List[str], List[str]]:
+        """(errors, warnings) messages for a bitmap"""
+        errors, warnings = [], []
+        while bitmap:
+            low = bitmap & -bitmap
+            check = self.checks[low.bit_length() - 1]
+            (errors if check.error else warnings).append(check.message)
+            bitmap ^= low
+        return errors, warnings
+
+    def source(self, class_uid: Optional[int] = None) -> str:
+        """Generated validator source, for debugging"""
+        return self._sources.get(class_uid if class_uid in self._validators else None, "")
+
+# Global validator instance
+ocsf_validator = OCSFSchemaValidator()
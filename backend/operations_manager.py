@@ -18,6 +18,8 @@ import subprocess
 import tarfile
 import gzip
 
+from http_client import http_client
+
 logger = logging.getLogger(__name__)
 
 class ServiceStatus(str, Enum):
@@ -309,18 +311,14 @@ class OperationsManager:
     
     async def _http_health_check(self, check: HealthCheck) -> Dict[str, Any]:
         """HTTP-based health check"""
-        import aiohttp
-        
-        timeout = aiohttp.ClientTimeout(total=check.timeout)
-        
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.get(check.target) as response:
-                if response.status == 200:
-                    return {"status": ServiceStatus.HEALTHY}
-                elif response.status < 500:
-                    return {"status": ServiceStatus.DEGRADED}
-                else:
-                    return {"status": ServiceStatus.UNHEALTHY}
+        # No retries: a health probe should report what it sees
+        async with http_client.get(check.target, timeout=check.timeout, retries=0) as response:
+            if response.status == 200:
+                return {"status": ServiceStatus.HEALTHY}
+            elif response.status < 500:
+                return {"status": ServiceStatus.DEGRADED}
+            else:
+                return {"status": ServiceStatus.UNHEALTHY}
     
     async def _tcp_health_check(self, check: HealthCheck) -> Dict[str, Any]:
         """TCP port health check"""
@@ -603,6 +601,9 @@ class OperationsManager:
         elif status_summary["warnings"]:
             status_summary["overall_status"] = ServiceStatus.DEGRADED.value
         
+        # Outbound integration pool and circuit breaker state
+        status_summary["outbound_http"] = http_client.get_stats()
+        
         return status_summary
     
     def get_backup_status(self) -> Dict[str, Any]:
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Jupiter SIEM Playbook Condition Language
+Small, eval-free expression language for PlaybookAction.condition. Conditions
+are parsed once into a tree of closures and then evaluated against an
+(event, alert) pair:
+
+    risk_score > 0.8 and severity in ["high", "critical"]
+    process.name =~ "(?i)powershell" and not alert.tags contains "benign"
+    ${risk_score} > 0.5 or src_endpoint.ip == "10.0.0.1"
+
+Bare names read event fields through the OCSF field catalog (nested or flat),
+`alert.<attr>` reads the alert, and the legacy `${risk_score}` / `${severity}`
+placeholders keep their old meaning
+"""
+
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ocsf_field_catalog import field_catalog
+
+Evaluator = Callable[[Dict[str, Any], Any], Any]
+
+class ConditionError(ValueError):
+    """Raised when a condition does not parse"""
+    pass
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<number>-?\d+(?:\.\d+)?)
+  | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<placeholder>\$\{[A-Za-z_][\w.]*\})
+  | (?P<op>==|!=|<=|>=|=~|!~|<|>|\(|\)|\[|\]|,)
+  | (?P<name>[A-Za-z_][\w.]*)
+""", re.VERBOSE)
+
+KEYWORDS = {"and", "or", "not", "in", "contains", "true", "false", "null"}
+COMPARISONS = {"==", "!=", "<", "<=", ">", ">=", "=~", "!~", "in", "not in", "contains"}
+CONSTANTS = {"true": True, "false": False, "null": None}
+
+def tokenize(text: str) -> List[Tuple[str, str]]:
+    tokens, position = [], 0
+    while position < len(text):
+        match = TOKEN_PATTERN.match(text, position)
+        if not match:
+            raise ConditionError(f"Unexpected character {text[position]!r} at {position} in: {text}")
+        position = match.end()
+        kind = match.lastgroup
+        if kind == "space":
+            continue
+        value = match.group()
+        if kind == "name" and value in KEYWORDS:
+            kind = "keyword"
+        tokens.append((kind, value))
+    return tokens
+
+class _Constant:
+    """Literal operand; lets lists of literals fold into a set at compile time"""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __call__(self, event: Dict[str, Any], alert: Any) -> Any:
+        return self.value
+
+def _unquote(literal: str) -> str:
+    # Only quotes and backslashes are escapes, so regex classes like \d survive
+    return re.sub(r"\\([\"'\\])", r"\1", literal[1:-1])
+
+def _alert_value(alert: Any, attribute: str) -> Any:
+    value = getattr(alert, attribute, None)
+    return getattr(value, "value", value)  # enums compare as their string value
+
+def _field(name: str) -> Evaluator:
+    if name.startswith("alert."):
+        attribute = name[len("alert."):]
+        return lambda event, alert: _alert_value(alert, attribute)
+    if name.startswith("event."):
+        name = name[len("event."):]
+    accessor = field_catalog.accessor(name)
+    return lambda event, alert: accessor(event)
+
+def _placeholder(name: str) -> Evaluator:
+    # Legacy substitutions: ${severity} was the alert severity, ${risk_score} defaulted to 0
+    if name == "severity":
+        return lambda event, alert: _alert_value(alert, "severity")
+    if name == "risk_score":
+        return lambda event, alert: event.get("risk_score", 0)
+    return _field(name)
+
+def _compare(op: str, left: Evaluator, right: Evaluator) -> Evaluator:
+    if op == "==":
+        return lambda e, a: left(e, a) == right(e, a)
+    if op == "!=":
+        return lambda e, a: left(e, a) != right(e, a)
+
+    ordering = {
+        "<": lambda x, y: x < y,
+        "<=": lambda x, y: x <= y,
+        ">": lambda x, y: x > y,
+        ">=": lambda x, y: x >= y,
+        "in": lambda x, y: x in y,
+        "not in": lambda x, y: x not in y,
+        "contains": lambda x, y: y in x,
+    }[op]
+
+    def evaluate(e, a):
+        try:
+            return ordering(left(e, a), right(e, a))
+        except TypeError:
+            return False  # missing fields and mismatched types never match
+    return evaluate
+
+class _Parser:
+    """Recursive descent: or > and > not > comparison > operand"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.position = 0
+
+    def peek(self) -> Optional[Tuple[str, str]]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self) -> Tuple[str, str]:
+        token = self.peek()
+        if token is None:
+            raise ConditionError(f"Unexpected end of condition: {self.text}")
+        self.position += 1
+        return token
+
+    def expect(self, value: str):
+        token = self.take()
+        if token[1] != value:
+            raise ConditionError(f"Expected {value!r} but found {token[1]!r} in: {self.text}")
+
+    def accept(self, value: str) -> bool:
+        token = self.peek()
+        if token and token[1] == value and token[0] in ("op", "keyword"):
+            self.position += 1
+            return True
+        return False
+
+    def parse(self) -> Evaluator:
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise ConditionError(f"Unexpected {self.peek()[1]!r} in: {self.text}")
+        return node
+
+    def parse_or(self) -> Evaluator:
+        terms = [self.parse_and()]
+        while self.accept("or"):
+            terms.append(self.parse_and())
+        if len(terms) == 1:
+            return terms[0]
+        return lambda e, a: any(term(e, a) for term in terms)
+
+    def parse_and(self) -> Evaluator:
+        terms = [self.parse_not()]
+        while self.accept("and"):
+            terms.append(self.parse_not())
+        if len(terms) == 1:
+            return terms[0]
+        return lambda e, a: all(term(e, a) for term in terms)
+
+    def parse_not(self) -> Evaluator:
+        if self.accept("not"):
+            operand = self.parse_not()
+            return lambda e, a: not operand(e, a)
+        return self.parse_comparison()
+
+    def parse_comparison(self) -> Evaluator:
+        left = self.parse_operand()
+        token = self.peek()
+        if token is None or token[1] not in COMPARISONS | {"not"}:
+            return left
+        self.take()
+        op = token[1]
+        if op == "not":
+            self.expect("in")
+            op = "not in"
+
+        if op in ("=~", "!~"):
+            kind, literal = self.take()
+            if kind != "string":
+                raise ConditionError(f"Regex operand must be a string literal in: {self.text}")
+            try:
+                pattern = re.compile(_unquote(literal))
+            except re.error as e:
+                raise ConditionError(f"Invalid regex {literal}: {e}") from e
+            negate = op == "!~"
+
+            def matches(e, a):
+                value = left(e, a)
+                return (value is not None and pattern.search(str(value)) is not None) != negate
+            return matches
+
+        return _compare(op, left, self.parse_operand())
+
+    def parse_operand(self) -> Evaluator:
+        kind, value = self.take()
+        if value == "(" and kind == "op":
+            node = self.parse_or()
+            self.expect(")")
+            return node
+        if value == "[" and kind == "op":
+            return self.parse_list()
+        if kind == "number":
+            return _Constant(float(value) if "." in value else int(value))
+        if kind == "string":
+            return _Constant(_unquote(value))
+        if kind == "keyword" and value in CONSTANTS:
+            return _Constant(CONSTANTS[value])
+        if kind == "placeholder":
+            return _placeholder(value[2:-1])
+        if kind == "name":
+            return _field(value)
+        raise ConditionError(f"Unexpected {value!r} in: {self.text}")
+
+    def parse_list(self) -> Evaluator:
+        items = []
+        if not self.accept("]"):
+            while True:
+                items.append(self.parse_operand())
+                if self.accept("]"):
+                    break
+                self.expect(",")
+        if all(isinstance(item, _Constant) for item in items):
+            return _Constant(frozenset(item.value for item in items))
+        return lambda e, a: [item(e, a) for item in items]
+
+def compile_condition(text: str) -> Evaluator:
+    """Parse a condition into a callable(event, alert) -> truthy value"""
+    if not text or not text.strip():
+        raise ConditionError("Empty condition")
+    return _Parser(text).parse()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Jupiter SIEM Playbook Trigger Index
+Inverted maps from trigger values (activity_name, class_uid, threat level) to
+playbooks, so matching an event only evaluates playbooks that can fire for it.
+Range predicates such as risk_score min/max are checked on those candidates only
+"""
+
+import itertools
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Equality triggers and how to read them from an event; the first one a playbook
+# uses becomes its index anchor, so the more selective keys come first
+EQUALITY_TRIGGERS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "activity_name": lambda event: event.get("activity_name"),
+    "class_uid": lambda event: event.get("class_uid"),
+    "threat_intelligence.max_threat_level": lambda event: event.get("threat_intelligence", {}).get("max_threat_level"),
+}
+
+# Numeric range triggers ({"min": ..., "max": ...})
+RANGE_TRIGGERS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "risk_score": lambda event: event.get("risk_score", 0),
+}
+
+def _value_set(values: Iterable[Any]):
+    """Hashable set of allowed values, or the original list if some are unhashable"""
+    values = list(values)
+    try:
+        return frozenset(values)
+    except TypeError:
+        return values
+
+def _contains(allowed, value: Any) -> bool:
+    try:
+        return value in allowed
+    except TypeError:
+        return False
+
+@dataclass
+class CompiledTrigger:
+    """A playbook's trigger conditions split into an index anchor and residual checks"""
+    playbook_id: str
+    sort_key: Tuple[int, int]
+    anchor: Optional[Tuple[str, frozenset]] = None
+    equals: List[Tuple[str, Any]] = field(default_factory=list)
+    ranges: List[Tuple[str, Optional[float], Optional[float]]] = field(default_factory=list)
+
+class PlaybookTriggerIndex:
+    """Incrementally maintained trigger index; matches come back in priority order"""
+
+    def __init__(self):
+        self._compiled: Dict[str, CompiledTrigger] = {}
+        self._postings: Dict[str, Dict[Any, Set[str]]] = {key: defaultdict(set) for key in EQUALITY_TRIGGERS}
+        self._unanchored: Set[str] = set()
+        self._sequence = itertools.count()
+        self.stats = {"lookups": 0, "candidates": 0, "matches": 0}
+
+    def compile(self, playbook) -> CompiledTrigger:
+        # Higher priority first; ties keep registration order like a stable sort
+        compiled = CompiledTrigger(playbook.id, (-playbook.priority, next(self._sequence)))
+        conditions = playbook.trigger_conditions
+        # Walk equality keys in EQUALITY_TRIGGERS order, not the playbook's, so the anchor is the most selective
+        for key in EQUALITY_TRIGGERS:
+            if key not in conditions:
+                continue
+            allowed = _value_set(conditions[key])
+            if compiled.anchor is None and isinstance(allowed, frozenset):
+                compiled.anchor = (key, allowed)
+            else:
+                compiled.equals.append((key, allowed))
+        for key, expected in conditions.items():
+            if key in RANGE_TRIGGERS and isinstance(expected, dict):
+                compiled.ranges.append((key, expected.get("min"), expected.get("max")))
+            # Other keys (e.g. event_count) are not evaluated per event
+        return compiled
+
+    def add(self, playbook):
+        """Index a new or changed playbook"""
+        self.remove(playbook.id)
+        compiled = self.compile(playbook)
+        self._compiled[playbook.id] = compiled
+        if compiled.anchor is None:
+            self._unanchored.add(playbook.id)
+        else:
+            key, allowed = compiled.anchor
+            for value in allowed:
+                self._postings[key][value].add(playbook.id)
+
+    def remove(self, playbook_id: str):
+        compiled = self._compiled.pop(playbook_id, None)
+        if compiled is None:
+            return
+        self._unanchored.discard(playbook_id)
+        if compiled.anchor is not None:
+            key, allowed = compiled.anchor
+            postings = self._postings[key]
+            for value in allowed:
+                postings[value].discard(playbook_id)
+                if not postings[value]:
+                    del postings[value]
+
+    def rebuild(self, playbooks: Iterable):
+        self._compiled.clear()
+        self._postings = {key: defaultdict(set) for key in EQUALITY_TRIGGERS}
+        self._unanchored.clear()
+        for playbook in playbooks:
+            self.add(playbook)
+
+    def _candidates(self, event: Dict[str, Any]) -> Set[str]:
+        candidates = set(self._unanchored)
+        for key, postings in self._postings.items():
+            if not postings:
+                continue
+            try:
+                matched = postings.get(EQUALITY_TRIGGERS[key](event))
+            except TypeError:  # unhashable event value
+                matched = None
+            if matched:
+                candidates.update(matched)
+        return candidates
+
+    def _check(self, compiled: CompiledTrigger, event: Dict[str, Any]) -> bool:
+        """Residual checks; the anchor already matched when the playbook became a candidate"""
+        for key, allowed in compiled.equals:
+            if not _contains(allowed, EQUALITY_TRIGGERS[key](event)):
+                return False
+        for key, minimum, maximum in compiled.ranges:
+            value = RANGE_TRIGGERS[key](event)
+            if minimum is not None and value < minimum:
+                return False
+            if maximum is not None and value > maximum:
+                return False
+        return True
+
+    def match(self, event: Dict[str, Any]) -> List[str]:
+        """Ids of playbooks whose triggers match the event, highest priority first"""
+        candidates = self._candidates(event)
+        matched = [self._compiled[pid] for pid in candidates if self._check(self._compiled[pid], event)]
+        matched.sort(key=lambda compiled: compiled.sort_key)
+        self.stats["lookups"] += 1
+        self.stats["candidates"] += len(candidates)
+        self.stats["matches"] += len(matched)
+        return [compiled.playbook_id for compiled in matched]
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["lookups"]
+        return {
+            **self.stats,
+            "playbooks": len(self._compiled),
+            "unanchored": len(self._unanchored),
+            "avg_candidates": self.stats["candidates"] / lookups if lookups else 0.0
+        }
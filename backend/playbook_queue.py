@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Jupiter SIEM Playbook Job Queue
+Durable SQLite-backed queue of playbook executions. Ingest enqueues a job per
+matching playbook and returns; workers claim jobs under a visibility timeout
+that they extend while the job runs, so only a job held by a crashed or stalled
+worker becomes visible again (at-least-once). A claim is identified by worker
+and attempt, and outcomes from a worker that lost its claim are discarded.
+Idempotency keys stop the same alert/playbook pair from being queued twice
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+class JobStatus:
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"  # exhausted max_attempts
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS playbook_jobs (
+    id TEXT PRIMARY KEY,
+    idempotency_key TEXT UNIQUE NOT NULL,
+    playbook_id TEXT NOT NULL,
+    alert_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    visible_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    worker TEXT,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_playbook_jobs_ready ON playbook_jobs (status, visible_at);
+CREATE INDEX IF NOT EXISTS idx_playbook_jobs_alert ON playbook_jobs (alert_id);
+"""
+
+@dataclass
+class PlaybookJob:
+    """A queued playbook execution"""
+    id: str
+    idempotency_key: str
+    playbook_id: str
+    alert_id: str
+    payload: Dict[str, Any]
+    status: str
+    attempts: int
+    created_at: float
+    updated_at: float
+    worker: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "PlaybookJob":
+        return cls(
+            id=row["id"],
+            idempotency_key=row["idempotency_key"],
+            playbook_id=row["playbook_id"],
+            alert_id=row["alert_id"],
+            payload=json.loads(row["payload"]),
+            status=row["status"],
+            attempts=row["attempts"],
+            created_at=row["created_at"],
+            updated_at=row["updated_at"],
+            worker=row["worker"],
+            result=json.loads(row["result"]) if row["result"] else None,
+            error=row["error"]
+        )
+
+    def to_dict(self, include_payload: bool = False) -> Dict[str, Any]:
+        data = {
+            "id": self.id,
+            "idempotency_key": self.idempotency_key,
+            "playbook_id": self.playbook_id,
+            "alert_id": self.alert_id,
+            "status": self.status,
+            "attempts": self.attempts,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "worker": self.worker,
+            "result": self.result,
+            "error": self.error
+        }
+        if include_payload:
+            data["payload"] = self.payload
+        return data
+
+class PlaybookJobQueue:
+    """SQLite job table with visibility timeouts and retry backoff"""
+
+    def __init__(self, db_path: str = "data/playbook_jobs.db", visibility_timeout: float = 300.0,
+                 max_attempts: int = 5, retry_backoff: float = 5.0):
+        self.db_path = db_path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        if db_path != ":memory:":
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._ready: Optional[asyncio.Event] = None
+
+    # Synchronous operations; the async wrappers run them off the event loop
+
+    def _enqueue(self, playbook_id: str, alert_id: str, payload: Dict[str, Any],
+                 idempotency_key: str, delay: float) -> PlaybookJob:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO playbook_jobs (id, idempotency_key, playbook_id, alert_id, payload, "
+                "status, attempts, visible_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?, ?)",
+                (str(uuid4()), idempotency_key, playbook_id, alert_id, json.dumps(payload, default=str),
+                 JobStatus.QUEUED, now + delay, now, now)
+            )
+            row = self._conn.execute(
+                "SELECT * FROM playbook_jobs WHERE idempotency_key = ?", (idempotency_key,)
+            ).fetchone()
+        return PlaybookJob.from_row(row)
+
+    @staticmethod
+    def _owner_clause(worker: Optional[str], attempt: Optional[int]):
+        """WHERE suffix restricting an update to the caller's current claim"""
+        if worker is None:
+            return "", ()
+        clause, params = " AND status = ? AND worker = ?", (JobStatus.RUNNING, worker)
+        if attempt is not None:
+            clause, params = clause + " AND attempts = ?", params + (attempt,)
+        return clause, params
+
+    def _claim(self, worker: str) -> Optional[PlaybookJob]:
+        # Expired RUNNING jobs belong to a worker that died or stalled mid-execution
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # A job whose last allowed attempt was abandoned (e.g. it kills its worker) is not retried
+                self._conn.execute(
+                    "UPDATE playbook_jobs SET status = ?, error = ?, updated_at = ? "
+                    "WHERE status = ? AND visible_at <= ? AND attempts >= ?",
+                    (JobStatus.FAILED, "Worker lost during final attempt", now,
+                     JobStatus.RUNNING, now, self.max_attempts)
+                )
+                row = self._conn.execute(
+                    "SELECT id FROM playbook_jobs WHERE status IN (?, ?) AND visible_at <= ? "
+                    "ORDER BY visible_at LIMIT 1",
+                    (JobStatus.QUEUED, JobStatus.RUNNING, now)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE playbook_jobs SET status = ?, attempts = attempts + 1, visible_at = ?, "
+                    "worker = ?, updated_at = ? WHERE id = ?",
+                    (JobStatus.RUNNING, now + self.visibility_timeout, worker, now, row["id"])
+                )
+                claimed = self._conn.execute("SELECT * FROM playbook_jobs WHERE id = ?", (row["id"],)).fetchone()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return PlaybookJob.from_row(claimed)
+
+    def _extend(self, job_id: str, worker: str, attempt: int) -> bool:
+        now = time.time()
+        owner, params = self._owner_clause(worker, attempt)
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE playbook_jobs SET visible_at = ?, updated_at = ? WHERE id = ?{owner}",
+                (now + self.visibility_timeout, now, job_id, *params)
+            )
+        return cursor.rowcount == 1
+
+    def _complete(self, job_id: str, result: Dict[str, Any], worker: Optional[str] = None,
+                  attempt: Optional[int] = None) -> bool:
+        owner, params = self._owner_clause(worker, attempt)
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE playbook_jobs SET status = ?, result = ?, error = NULL, updated_at = ? WHERE id = ?{owner}",
+                (JobStatus.SUCCEEDED, json.dumps(result, default=str), time.time(), job_id, *params)
+            )
+        return cursor.rowcount == 1
+
+    def _fail(self, job_id: str, error: str, worker: Optional[str] = None,
+              attempt: Optional[int] = None) -> str:
+        now = time.time()
+        owner, params = self._owner_clause(worker, attempt)
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT attempts FROM playbook_jobs WHERE id = ?{owner}", (job_id, *params)
+            ).fetchone()
+            if row is None:
+                # Unknown job, or the claim was lost: leave the current holder's state alone
+                current = self._conn.execute("SELECT status FROM playbook_jobs WHERE id = ?", (job_id,)).fetchone()
+                return current["status"] if current else JobStatus.FAILED
+            if row["attempts"] >= self.max_attempts:
+                status, visible_at = JobStatus.FAILED, now
+            else:
+                status = JobStatus.QUEUED
+                visible_at = now + self.retry_backoff * (2 ** (row["attempts"] - 1))
+            self._conn.execute(
+                "UPDATE playbook_jobs SET status = ?, error = ?, visible_at = ?, updated_at = ? WHERE id = ?",
+                (status, error, visible_at, now, job_id)
+            )
+        return status
+
+    def get(self, job_id: str) -> Optional[PlaybookJob]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM playbook_jobs WHERE id = ?", (job_id,)).fetchone()
+        return PlaybookJob.from_row(row) if row else None
+
+    def list_jobs(self, status: Optional[str] = None, alert_id: Optional[str] = None,
+                  limit: int = 50) -> List[PlaybookJob]:
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if alert_id:
+            clauses.append("alert_id = ?")
+            params.append(alert_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM playbook_jobs {where} ORDER BY created_at DESC LIMIT ?", (*params, limit)
+            ).fetchall()
+        return [PlaybookJob.from_row(row) for row in rows]
+
+    def purge(self, older_than: float) -> int:
+        """Delete finished jobs last updated more than `older_than` seconds ago"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM playbook_jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (JobStatus.SUCCEEDED, JobStatus.FAILED, time.time() - older_than)
+            )
+        return cursor.rowcount
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS n FROM playbook_jobs GROUP BY status").fetchall()
+            oldest = self._conn.execute(
+                "SELECT MIN(created_at) AS t FROM playbook_jobs WHERE status = ?", (JobStatus.QUEUED,)
+            ).fetchone()["t"]
+        counts = {status: 0 for status in (JobStatus.QUEUED, JobStatus.RUNNING, JobStatus.SUCCEEDED, JobStatus.FAILED)}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return {
+            "jobs": counts,
+            "oldest_queued_age": round(time.time() - oldest, 3) if oldest else 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # Async API
+
+    def _notify(self):
+        if self._ready is not None:
+            self._ready.set()
+
+    async def enqueue(self, playbook_id: str, alert_id: str, payload: Dict[str, Any],
+                      idempotency_key: Optional[str] = None, delay: float = 0.0) -> PlaybookJob:
+        """Queue a job; an existing job with the same idempotency key is returned instead"""
+        key = idempotency_key or f"{alert_id}:{playbook_id}"
+        job = await asyncio.to_thread(self._enqueue, playbook_id, alert_id, payload, key, delay)
+        self._notify()
+        return job
+
+    async def claim(self, worker: str, wait: float = 1.0) -> Optional[PlaybookJob]:
+        """Next visible job, waiting up to `wait` seconds for one to be enqueued"""
+        job = await asyncio.to_thread(self._claim, worker)
+        if job is None and wait > 0:
+            if self._ready is None:
+                self._ready = asyncio.Event()
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                return None
+            job = await asyncio.to_thread(self._claim, worker)
+        return job
+
+    async def heartbeat(self, job_id: str, worker: str, attempt: int) -> bool:
+        """Push back a running job's visibility timeout; False when the claim has been lost"""
+        return await asyncio.to_thread(self._extend, job_id, worker, attempt)
+
+    async def complete(self, job_id: str, result: Dict[str, Any], worker: Optional[str] = None,
+                       attempt: Optional[int] = None) -> bool:
+        """
+        Record a successful run; False when nothing was written
+        With ``worker`` (and ``attempt``) the write only applies while that claim still holds the job
+        """
+        return await asyncio.to_thread(self._complete, job_id, result, worker, attempt)
+
+    async def fail(self, job_id: str, error: str, worker: Optional[str] = None,
+                   attempt: Optional[int] = None) -> str:
+        """
+        Record a failed attempt; returns the new status (requeued or failed for good)
+        With ``worker`` (and ``attempt``) a lost claim writes nothing and the current status is returned
+        """
+        return await asyncio.to_thread(self._fail, job_id, error, worker, attempt)
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Jupiter SIEM Threat-Intel Provider Scheduler
+Token-bucket admission in front of each rate-limited reputation provider.
+Lookups wait in a priority queue (critical events first), duplicate pending
+lookups share one request, and bucket state is persisted so a restart does not
+reset the quota. When a quota is exhausted lookups are skipped rather than
+sent upstream to fail with 429s
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# APIConfig limit fields and their window lengths in seconds
+LIMIT_WINDOWS = {
+    "rate_limit_per_min": 60,
+    "rate_limit_per_hour": 3600,
+    "rate_limit_per_day": 86400,
+    "rate_limit_per_month": 30 * 86400,
+}
+
+# Free-tier quotas per provider: limit field -> (environment variable, default),
+# the same variables api_rate_limiter reads
+DEFAULT_PROVIDER_LIMITS = {
+    "virustotal": {
+        "rate_limit_per_min": ("VT_RATE_LIMIT_PER_MIN", 4),
+        "rate_limit_per_day": ("VT_RATE_LIMIT_PER_DAY", 500),
+    },
+    "abuseipdb": {
+        "rate_limit_per_day": ("ABUSEIPDB_RATE_LIMIT_CHECKS_PER_DAY", 1000),
+    },
+}
+
+# Event severity to queue priority (lower is served first)
+SEVERITY_PRIORITY = {"critical": 0, "high": 1, "medium": 2, "low": 3, "info": 4, "informational": 4}
+OCSF_SEVERITY_ID_PRIORITY = {6: 0, 5: 0, 4: 1, 3: 2, 2: 3, 1: 4}
+DEFAULT_PRIORITY = 4
+
+class QuotaExhausted(Exception):
+    """Raised when a provider's quota will not refill within the allowed wait"""
+    pass
+
+def event_priority(event: Dict[str, Any]) -> int:
+    """Queue priority for lookups triggered by an event"""
+    severity = str(event.get("severity") or "").lower()
+    if severity in SEVERITY_PRIORITY:
+        return SEVERITY_PRIORITY[severity]
+    try:
+        return OCSF_SEVERITY_ID_PRIORITY.get(int(event.get("severity_id")), DEFAULT_PRIORITY)
+    except (TypeError, ValueError):
+        return DEFAULT_PRIORITY
+
+class TokenBucket:
+    """Continuously refilling bucket; capacity equals the window limit"""
+
+    def __init__(self, limit: float, period: float):
+        self.capacity = float(limit)
+        self.refill_rate = limit / period
+        self.tokens = float(limit)
+        self.updated = time.time()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_rate)
+        self.updated = now
+
+    def wait_time(self, now: Optional[float] = None, count: int = 1) -> float:
+        """Seconds until ``count`` tokens are available"""
+        self._refill(now or time.time())
+        return 0.0 if self.tokens >= count else (count - self.tokens) / self.refill_rate
+
+    def consume(self, now: Optional[float] = None):
+        """Take a token; the balance may go negative to reserve one that has not refilled yet"""
+        self._refill(now or time.time())
+        self.tokens -= 1
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"tokens": self.tokens, "updated": self.updated}
+
+    def restore(self, state: Dict[str, float]):
+        self.tokens = min(self.capacity, float(state.get("tokens", self.capacity)))
+        self.updated = float(state.get("updated", time.time()))
+
+def provider_limits(provider) -> Dict[str, int]:
+    """Limits for a provider: free-tier defaults from the environment, overridden by provider config"""
+    limits = {}
+    for name, (variable, default) in DEFAULT_PROVIDER_LIMITS.get(provider.name.lower(), {}).items():
+        limit = int(os.getenv(variable, default))
+        if limit:
+            limits[name] = limit
+    for name in LIMIT_WINDOWS:
+        if provider.config.get(name):
+            limits[name] = int(provider.config[name])
+    return limits
+
+class ProviderScheduler:
+    """Rate-limited, prioritized and coalescing request queue for one provider"""
+
+    def __init__(self, provider, limits: Dict[str, float], redis_client=None,
+                 concurrency: int = 2, max_wait: float = 30.0):
+        self.provider = provider
+        self.buckets = {name: TokenBucket(limit, LIMIT_WINDOWS[name]) for name, limit in limits.items()}
+        self.redis = redis_client
+        self.concurrency = concurrency
+        self.max_wait = max_wait
+        self.state_key = f"threat_intel:quota:{provider.name.lower()}"
+        self._queue: List[Tuple[int, int, tuple]] = []
+        self._pending: Dict[tuple, asyncio.Future] = {}
+        self._priorities: Dict[tuple, int] = {}
+        self._deadlines: Dict[tuple, float] = {}   # loop time by which a lookup must be admitted
+        self._sequence = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._workers: List[asyncio.Task] = []
+        self._admission = None
+        self._state_loaded = False
+        self.stats = {"submitted": 0, "coalesced": 0, "dispatched": 0, "rate_limited": 0}
+
+    async def submit(self, indicator: str, indicator_type, priority: int = DEFAULT_PRIORITY):
+        """
+        Queue a lookup and wait for its result; raises QuotaExhausted when skipped
+        A lookup must be admitted within max_wait of being submitted. When the
+        lookups queued ahead of it already need longer than that to refill, it
+        fails immediately instead of waiting for its turn
+        """
+        self._ensure_workers()
+        key = (indicator, indicator_type)
+        self.stats["submitted"] += 1
+        future = self._pending.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            if priority < self._priorities[key]:
+                # Re-queue at the higher priority; the stale entry is skipped later
+                self._priorities[key] = priority
+                heapq.heappush(self._queue, (priority, next(self._sequence), key))
+                self._wakeup.set()
+        else:
+            ahead = sum(1 for queued in self._priorities.values() if 0 <= queued <= priority)
+            wait = self._wait_time(ahead + 1)
+            if wait > self.max_wait:
+                self.stats["rate_limited"] += 1
+                raise QuotaExhausted(
+                    f"{self.provider.name} quota exhausted, {ahead} lookups queued, next token in {wait:.0f}s"
+                )
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[key] = future
+            self._priorities[key] = priority
+            self._deadlines[key] = loop.time() + self.max_wait
+            heapq.heappush(self._queue, (priority, next(self._sequence), key))
+            self._wakeup.set()
+        return await asyncio.shield(future)
+
+    def _ensure_workers(self):
+        loop = asyncio.get_running_loop()
+        if self._workers and all(not w.done() for w in self._workers) and self._workers[0].get_loop() is loop:
+            return
+        self._wakeup = asyncio.Event()
+        self._admission = asyncio.Lock()
+        self._workers = [loop.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def _next_key(self) -> tuple:
+        while True:
+            while self._queue:
+                priority, _, key = heapq.heappop(self._queue)
+                if key in self._pending and self._priorities.get(key) == priority and not self._pending[key].done():
+                    self._priorities[key] = -1  # claimed
+                    return key
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+    def _wait_time(self, count: int = 1) -> float:
+        """Seconds until every bucket holds ``count`` tokens (0 before persisted state is loaded)"""
+        if not self._state_loaded:
+            return 0.0
+        now = time.time()
+        return max((bucket.wait_time(now, count) for bucket in self.buckets.values()), default=0.0)
+
+    async def _admit(self, key: tuple):
+        """Reserve a token from every bucket, then wait for it if it is still refilling"""
+        if not self._state_loaded:
+            async with self._admission:
+                if not self._state_loaded:
+                    await self._load_state()
+        wait = self._wait_time()
+        remaining = self._deadlines.get(key, 0.0) - asyncio.get_running_loop().time()
+        if wait > 0 and wait > remaining:
+            raise QuotaExhausted(f"{self.provider.name} quota exhausted, next token in {wait:.0f}s")
+        # Reserve before sleeping so concurrent workers queue behind this token instead of sharing it
+        now = time.time()
+        for bucket in self.buckets.values():
+            bucket.consume(now)
+        await self._save_state()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def _worker(self):
+        while True:
+            key = await self._next_key()
+            future = self._pending[key]
+            try:
+                await self._admit(key)
+                self.stats["dispatched"] += 1
+                result = await self.provider.lookup_indicator(*key)
+                if not future.done():
+                    future.set_result(result)
+            except QuotaExhausted as e:
+                self.stats["rate_limited"] += 1
+                if not future.done():
+                    future.set_exception(e)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self._pending.pop(key, None)
+                self._priorities.pop(key, None)
+                self._deadlines.pop(key, None)
+
+    async def _load_state(self):
+        self._state_loaded = True
+        if self.redis is None:
+            return
+        try:
+            raw = await self.redis.get(self.state_key)
+            if raw:
+                state = json.loads(raw)
+                for name, bucket in self.buckets.items():
+                    if name in state:
+                        bucket.restore(state[name])
+        except Exception as e:
+            logger.warning(f"Could not load quota state for {self.provider.name}: {e}")
+
+    async def _save_state(self):
+        if self.redis is None:
+            return
+        try:
+            state = {name: bucket.to_dict() for name, bucket in self.buckets.items()}
+            await self.redis.set(self.state_key, json.dumps(state), ex=max(LIMIT_WINDOWS.values()))
+        except Exception as e:
+            logger.warning(f"Could not persist quota state for {self.provider.name}: {e}")
+
+    async def close(self):
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "queued": len(self._pending),
+            "buckets": {
+                name: {"capacity": bucket.capacity, "tokens": round(bucket.tokens, 2)}
+                for name, bucket in self.buckets.items()
+            }
+        }
+
+def build_schedulers(providers, redis_client=None, max_wait: float = 30.0,
+                     share: Tuple[int, int] = (0, 1)) -> Dict[str, ProviderScheduler]:
+    """
+    One scheduler per provider that has rate limits
+    Buckets are process-local, so when several processes enrich events each
+    takes share (index, count) of every limit and persists its own state
+    """
+    index, count = share
+    schedulers = {}
+    for provider in providers:
+        if not getattr(provider, "enabled", True):
+            continue
+        limits = provider_limits(provider)
+        if limits:
+            if count > 1:
+                limits = {name: limit / count for name, limit in limits.items()}
+            scheduler = schedulers[provider.name] = ProviderScheduler(
+                provider, limits, redis_client,
+                concurrency=provider.config.get("max_concurrency", 2), max_wait=max_wait
+            )
+            if count > 1:
+                scheduler.state_key += f":{index}"
+            logger.info(f"Rate-limited scheduling for {provider.name}: {limits}")
+    return schedulers
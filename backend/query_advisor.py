@@ -0,0 +1,587 @@
+#!/usr/bin/env python3
+"""
+Jupiter SIEM Query Workload Advisor
+Collects field usage statistics from executed queries and recommends physical
+design changes (ClickHouse skip indexes, projections and sorting keys, DuckDB
+typed columns and indexes) with benefits estimated by replaying the workload
+"""
+
+import logging
+import math
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple, Iterable
+
+from query_ast_schema import (
+    JupiterQueryAST, ASTField, ASTCondition, ASTLogicalExpression, ASTLiteral,
+    ComparisonOperator, LogicalOperator, FieldType
+)
+from query_providers import apply_comparison
+from ocsf_field_catalog import field_catalog
+
+logger = logging.getLogger(__name__)
+
+# ClickHouse physical layout (see scripts/clickhouse_init.sql)
+CLICKHOUSE_TABLE = "jupiter_siem.ocsf_events"
+CLICKHOUSE_SORTING_KEY = ("tenant_id", "time", "class_uid", "event_uid")
+CLICKHOUSE_INDEX_GRANULARITY = 8192
+CLICKHOUSE_TTL = "time + INTERVAL 30 DAY TO DISK 'cold'"
+
+# Skip indexes already declared on ocsf_events, keyed by column
+CLICKHOUSE_EXISTING_INDEXES = {
+    "tenant_id": "minmax",
+    "time": "minmax",
+    "class_uid": "set",
+    "activity_name": "set",
+    "severity": "set",
+    "actor_user_name": "bloom_filter",
+    "device_name": "bloom_filter",
+    "src_endpoint_ip": "bloom_filter",
+    "dst_endpoint_ip": "bloom_filter",
+    "process_name": "bloom_filter",
+    "file_name": "bloom_filter",
+    "file_hash_sha256": "bloom_filter",
+}
+
+CLICKHOUSE_NUMERIC_COLUMNS = {
+    entry.column for entry in field_catalog.fields
+    if entry.field_type in (FieldType.INTEGER, FieldType.FLOAT)
+}
+
+# DuckDB stores events in the generic logs table with the OCSF payload as JSON
+DUCKDB_TABLE = "logs"
+DUCKDB_JSON_COLUMN = "parsed_data"
+DUCKDB_COLUMN_ALIASES = {"time": "timestamp"}
+DUCKDB_EXISTING_COLUMNS = {"id", "tenant_id", "timestamp", "source", "event_type", "severity", "message"}
+DUCKDB_EXISTING_INDEXES = {"tenant_id", "timestamp", "source"}
+
+def clickhouse_identifier(name: str) -> str:
+    """Backtick-quoted ClickHouse identifier"""
+    return "`" + name.replace("\\", "\\\\").replace("`", "\\`") + "`"
+
+def duckdb_identifier(name: str) -> str:
+    """Double-quoted DuckDB identifier"""
+    return '"' + name.replace('"', '""') + '"'
+
+# Operator names produced by query_routes.parse_ocsf_query
+LEGACY_OPERATORS = {
+    "equals": ComparisonOperator.EQUALS,
+    "not_equals": ComparisonOperator.NOT_EQUALS,
+    "contains": ComparisonOperator.CONTAINS,
+    "greater_than": ComparisonOperator.GREATER_THAN,
+    "less_than": ComparisonOperator.LESS_THAN,
+    "greater_equal": ComparisonOperator.GREATER_EQUAL,
+    "less_equal": ComparisonOperator.LESS_EQUAL,
+    "in": ComparisonOperator.IN,
+    "not_in": ComparisonOperator.NOT_IN,
+    "regex": ComparisonOperator.REGEX,
+    "in_subnet": ComparisonOperator.IN_SUBNET,
+}
+
+PREDICATE_KINDS = {
+    ComparisonOperator.EQUALS: "equality",
+    ComparisonOperator.IN: "equality",
+    ComparisonOperator.GREATER_THAN: "range",
+    ComparisonOperator.GREATER_EQUAL: "range",
+    ComparisonOperator.LESS_THAN: "range",
+    ComparisonOperator.LESS_EQUAL: "range",
+    ComparisonOperator.BETWEEN: "range",
+    ComparisonOperator.CONTAINS: "text",
+    ComparisonOperator.STARTS_WITH: "text",
+    ComparisonOperator.ENDS_WITH: "text",
+    ComparisonOperator.REGEX: "text",
+    ComparisonOperator.IN_SUBNET: "subnet",
+    ComparisonOperator.NOT_EQUALS: "negation",
+    ComparisonOperator.NOT_IN: "negation",
+    ComparisonOperator.IS_NULL: "null",
+    ComparisonOperator.IS_NOT_NULL: "null",
+}
+
+# Predicate kinds a skip index or sorting key can use to prune granules
+PRUNABLE_KINDS = {"equality", "range", "text", "subnet"}
+
+@dataclass
+class WorkloadPredicate:
+    """Single field predicate observed in a query"""
+    column: str
+    operator: ComparisonOperator
+    value: Any
+    prunable: bool = True  # False when nested under OR/NOT
+
+    @property
+    def kind(self) -> str:
+        return PREDICATE_KINDS.get(self.operator, "other")
+
+@dataclass
+class WorkloadQuery:
+    """Normalized shape of an executed query"""
+    predicates: List[WorkloadPredicate] = field(default_factory=list)
+    group_by: Tuple[str, ...] = ()
+    order_by: Tuple[str, ...] = ()
+    execution_time: Optional[float] = None
+    recorded_at: datetime = field(default_factory=datetime.now)
+
+@dataclass
+class FieldUsage:
+    """Aggregated usage counters for one storage column"""
+    column: str
+    filter_count: int = 0
+    group_count: int = 0
+    sort_count: int = 0
+    kinds: Counter = field(default_factory=Counter)
+
+    @property
+    def dominant_kind(self) -> Optional[str]:
+        prunable = [(count, kind) for kind, count in self.kinds.items() if kind in PRUNABLE_KINDS]
+        return max(prunable)[1] if prunable else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "column": self.column,
+            "filter_count": self.filter_count,
+            "group_count": self.group_count,
+            "sort_count": self.sort_count,
+            "predicate_kinds": dict(self.kinds)
+        }
+
+class QueryWorkloadAdvisor:
+    """
+    Workload-driven physical design advisor
+    Records the fields queries filter, group and sort on, replays the recorded
+    workload against a sample of events and emits ready-to-apply DDL
+    """
+
+    def __init__(self, max_queries: int = 1000, min_support: int = 2):
+        self.max_queries = max_queries
+        self.min_support = min_support
+        self.queries = deque(maxlen=max_queries)
+        self.catalog_version = field_catalog.version
+
+    # ------------------------------------------------------------------
+    # Workload recording
+    # ------------------------------------------------------------------
+
+    def record_query(self, ast: JupiterQueryAST, execution_time: Optional[float] = None):
+        """Record an executed query AST"""
+        try:
+            query = WorkloadQuery(execution_time=execution_time)
+            if ast.where:
+                self._collect_predicates(ast.where, query.predicates, prunable=True)
+            if ast.group_by:
+                query.group_by = self._columns(f.name for f in ast.group_by.fields)
+            query.order_by = self._columns(order.field.name for order in ast.order_by)
+            self.queries.append(query)
+        except Exception as e:
+            logger.warning(f"Failed to record query workload: {e}")
+
+    def record_conditions(self, conditions: List[Dict[str, Any]], sort_by: Optional[str] = None,
+                          execution_time: Optional[float] = None):
+        """Record a query parsed by the legacy query_routes parser"""
+        try:
+            query = WorkloadQuery(execution_time=execution_time)
+            for condition in conditions:
+                operator = LEGACY_OPERATORS.get(condition.get("operator"))
+                column = self._column(condition.get("field"))
+                if operator is None or column is None:
+                    continue
+                query.predicates.append(WorkloadPredicate(column, operator, condition.get("value")))
+            if sort_by:
+                query.order_by = self._columns([sort_by])
+            self.queries.append(query)
+        except Exception as e:
+            logger.warning(f"Failed to record query workload: {e}")
+
+    def reset(self):
+        """Discard the recorded workload"""
+        self.queries.clear()
+
+    def _collect_predicates(self, node, predicates: List[WorkloadPredicate], prunable: bool):
+        """Flatten a WHERE tree; only top-level AND conjuncts can prune granules"""
+        if isinstance(node, ASTCondition):
+            column = self._column(node.left.name) if isinstance(node.left, ASTField) else None
+            if column is not None:
+                predicates.append(WorkloadPredicate(
+                    column=column,
+                    operator=node.operator,
+                    value=self._literal_value(node.right),
+                    prunable=prunable
+                ))
+        elif isinstance(node, ASTLogicalExpression):
+            child_prunable = prunable and node.operator == LogicalOperator.AND
+            for child in node.conditions:
+                self._collect_predicates(child, predicates, child_prunable)
+
+    def _literal_value(self, right) -> Any:
+        if isinstance(right, ASTLiteral):
+            return right.value
+        if isinstance(right, list):
+            return [literal.value for literal in right]
+        return None
+
+    def _column(self, name: Any) -> Optional[str]:
+        """
+        Storage column for a catalog field, None for anything else
+        Field names come from user queries, so unknown names are never recorded
+        and cannot reach the generated DDL
+        """
+        if isinstance(name, str) and field_catalog.is_known(name):
+            return field_catalog.column(name)
+        return None
+
+    def _columns(self, names: Iterable[Any]) -> Tuple[str, ...]:
+        return tuple(column for column in map(self._column, names) if column is not None)
+
+    # ------------------------------------------------------------------
+    # Statistics
+    # ------------------------------------------------------------------
+
+    def get_field_usage(self) -> Dict[str, FieldUsage]:
+        """Aggregate per-column usage over the recorded workload"""
+        usage = {}
+        for query in self.queries:
+            for predicate in query.predicates:
+                stats = usage.setdefault(predicate.column, FieldUsage(predicate.column))
+                stats.filter_count += 1
+                stats.kinds[predicate.kind] += 1
+            for column in query.group_by:
+                usage.setdefault(column, FieldUsage(column)).group_count += 1
+            for column in query.order_by:
+                usage.setdefault(column, FieldUsage(column)).sort_count += 1
+        return usage
+
+    def get_workload_stats(self) -> Dict[str, Any]:
+        """Summary of the recorded workload"""
+        usage = self.get_field_usage()
+        group_sets = Counter(query.group_by for query in self.queries if query.group_by)
+        timed = [q.execution_time for q in self.queries if q.execution_time is not None]
+        return {
+            "queries_recorded": len(self.queries),
+            "catalog_version": self.catalog_version,
+            "avg_execution_time": sum(timed) / len(timed) if timed else None,
+            "fields": sorted(
+                (stats.to_dict() for stats in usage.values()),
+                key=lambda s: s["filter_count"] + s["group_count"] + s["sort_count"],
+                reverse=True
+            ),
+            "group_by_sets": [
+                {"columns": list(columns), "count": count} for columns, count in group_sets.most_common()
+            ]
+        }
+
+    # ------------------------------------------------------------------
+    # Workload replay
+    # ------------------------------------------------------------------
+
+    def replay(self, sample_events: List[Dict[str, Any]], granules: int = 64) -> Dict[str, Dict[str, Any]]:
+        """
+        Replay recorded predicates against sample events
+        The sample is laid out in sorting-key order and split into pseudo-granules
+        so that skip ratios approximate how many granules an index could prune
+        """
+        if not sample_events or not self.queries:
+            return {}
+
+        current_order = self._sorted_events(sample_events, ("tenant_id", "time"))
+        granule_rows = max(1, math.ceil(len(sample_events) / granules))
+        match_cache = {}
+        results = {}
+
+        for query in self.queries:
+            for predicate in query.predicates:
+                if predicate.kind not in PRUNABLE_KINDS:
+                    continue
+                key = (predicate.column, predicate.operator, repr(predicate.value))
+                if key not in match_cache:
+                    match_cache[key] = self._replay_predicate(
+                        predicate, sample_events, current_order, granule_rows
+                    )
+                replay = match_cache[key]
+                stats = results.setdefault(predicate.column, {
+                    "predicates": 0, "selectivity": 0.0,
+                    "granule_skip_ratio": 0.0, "sorted_skip_ratio": 0.0,
+                })
+                stats["predicates"] += 1
+                stats["selectivity"] += replay["selectivity"]
+                if predicate.prunable:
+                    stats["granule_skip_ratio"] += replay["granule_skip_ratio"]
+                    stats["sorted_skip_ratio"] += replay["sorted_skip_ratio"]
+
+        for column, stats in results.items():
+            count = stats["predicates"]
+            for metric in ("selectivity", "granule_skip_ratio", "sorted_skip_ratio"):
+                stats[metric] = round(stats[metric] / count, 4)
+            values = [self._get_value(event, column) for event in sample_events]
+            stats["sample_rows"] = len(values)
+            stats["distinct_values"] = len({str(v) for v in values if v is not None})
+            stats["null_ratio"] = round(sum(1 for v in values if v is None) / len(values), 4)
+
+        return results
+
+    def _replay_predicate(self, predicate: WorkloadPredicate, events: List[Dict[str, Any]],
+                          current_order: List[Dict[str, Any]], granule_rows: int) -> Dict[str, float]:
+        """Selectivity and granule skip ratios for one predicate"""
+        matched = sum(1 for event in events if self._matches(event, predicate))
+        clustered = self._sorted_events(events, ("tenant_id", predicate.column, "time"))
+        return {
+            "selectivity": matched / len(events),
+            "granule_skip_ratio": self._skip_ratio(current_order, predicate, granule_rows),
+            "sorted_skip_ratio": self._skip_ratio(clustered, predicate, granule_rows),
+        }
+
+    def _skip_ratio(self, ordered: List[Dict[str, Any]], predicate: WorkloadPredicate, granule_rows: int) -> float:
+        """Fraction of granules containing no row that satisfies the predicate"""
+        total = skipped = 0
+        for start in range(0, len(ordered), granule_rows):
+            total += 1
+            if not any(self._matches(event, predicate) for event in ordered[start:start + granule_rows]):
+                skipped += 1
+        return skipped / total if total else 0.0
+
+    def _matches(self, event: Dict[str, Any], predicate: WorkloadPredicate) -> bool:
+        return apply_comparison(self._get_value(event, predicate.column), predicate.operator, predicate.value)
+
+    def _sorted_events(self, events: List[Dict[str, Any]], key_columns: Iterable[str]) -> List[Dict[str, Any]]:
+        columns = tuple(key_columns)
+        return sorted(events, key=lambda e: tuple(str(self._get_value(e, c) or "") for c in columns))
+
+    def _get_value(self, event: Dict[str, Any], column: str) -> Any:
+        """Read a column from either a flattened or a nested OCSF event"""
+        return field_catalog.get_value(event, column)
+
+    # ------------------------------------------------------------------
+    # Recommendations
+    # ------------------------------------------------------------------
+
+    def recommend(self, backend: str = "clickhouse",
+                  sample_events: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """Recommendations with DDL for the given backend ("clickhouse" or "duckdb")"""
+        if not self.queries:
+            return []
+        usage = self.get_field_usage()
+        replay = self.replay(sample_events) if sample_events else {}
+        if backend == "duckdb":
+            recommendations = self._recommend_duckdb(usage, replay, sample_events or [])
+        else:
+            recommendations = self._recommend_clickhouse(usage, replay, sample_events or [])
+        return sorted(
+            recommendations,
+            key=lambda r: r["estimated_benefit"].get("estimated_read_reduction") or 0.0,
+            reverse=True
+        )
+
+    def recommend_for_fields(self, fields: Iterable[str], backend: str = "clickhouse",
+                             sample_events: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """Recommendations restricted to the given OCSF fields"""
+        columns = set(self._columns(fields))
+        return [
+            rec for rec in self.recommend(backend, sample_events)
+            if columns.intersection(rec["columns"])
+        ]
+
+    def _benefit(self, usage: FieldUsage, replay: Dict[str, Dict[str, Any]], skip_metric: str) -> Dict[str, Any]:
+        """Benefit estimate: share of workload touching the column times replayed skip ratio"""
+        share = usage.filter_count / len(self.queries)
+        stats = replay.get(usage.column)
+        if not stats:
+            return {"workload_share": round(share, 4), "basis": "workload_frequency"}
+        return {
+            "workload_share": round(share, 4),
+            "selectivity": stats["selectivity"],
+            "granule_skip_ratio": stats[skip_metric],
+            "estimated_read_reduction": round(share * stats[skip_metric], 4),
+            "basis": "sample_replay"
+        }
+
+    def _recommend_clickhouse(self, usage: Dict[str, FieldUsage], replay: Dict[str, Dict[str, Any]],
+                              sample_events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        recommendations = []
+
+        # Skip indexes
+        for column, stats in usage.items():
+            kind = stats.dominant_kind
+            if stats.filter_count < self.min_support or kind is None or column in CLICKHOUSE_SORTING_KEY[:2]:
+                continue
+            replayed = replay.get(column)
+            if replayed is not None and replayed["granule_skip_ratio"] < 0.1:
+                continue  # matches are spread across almost every granule
+            existing = CLICKHOUSE_EXISTING_INDEXES.get(column)
+            if existing and kind != "text":
+                continue  # set/bloom_filter/minmax already serve equality and range lookups
+            index_type = self._clickhouse_index_type(column, kind, replayed)
+            index_name = clickhouse_identifier(f"idx_{column}_{index_type.split('(')[0]}")
+            recommendations.append({
+                "type": "skip_index",
+                "backend": "clickhouse",
+                "columns": [column],
+                "reason": f"{column} is filtered by {stats.filter_count} of {len(self.queries)} recorded queries "
+                          f"({kind} predicates); a {index_type} skip index lets ClickHouse prune granules",
+                "estimated_benefit": self._benefit(stats, replay, "granule_skip_ratio"),
+                "ddl": [
+                    f"ALTER TABLE {CLICKHOUSE_TABLE} ADD INDEX IF NOT EXISTS {index_name} {clickhouse_identifier(column)} "
+                    f"TYPE {index_type} GRANULARITY 4",
+                    f"ALTER TABLE {CLICKHOUSE_TABLE} MATERIALIZE INDEX {index_name}"
+                ]
+            })
+
+        # Sorting key: cluster on the most frequently equality-filtered column
+        candidates = [
+            stats for column, stats in usage.items()
+            if column not in CLICKHOUSE_SORTING_KEY and stats.kinds.get("equality", 0) >= self.min_support
+        ]
+        for stats in sorted(candidates, key=lambda s: s.kinds["equality"], reverse=True)[:1]:
+            replayed = replay.get(stats.column)
+            if replayed is not None and replayed["sorted_skip_ratio"] - replayed["granule_skip_ratio"] < 0.2:
+                continue
+            if stats.kinds["equality"] / len(self.queries) < 0.3:
+                continue
+            new_key = ("tenant_id", stats.column) + CLICKHOUSE_SORTING_KEY[1:]
+            recommendations.append({
+                "type": "order_by",
+                "backend": "clickhouse",
+                "columns": [stats.column],
+                "reason": f"{stats.column} appears in equality filters of "
+                          f"{stats.kinds['equality']} of {len(self.queries)} queries; clustering on it "
+                          f"after tenant_id turns those filters into primary key range scans",
+                "estimated_benefit": self._benefit(stats, replay, "sorted_skip_ratio"),
+                "ddl": self._clickhouse_rebuild_ddl(new_key)
+            })
+
+        # Aggregate projections for repeated GROUP BY shapes
+        group_sets = Counter(query.group_by for query in self.queries if query.group_by)
+        for columns, count in group_sets.items():
+            if count < self.min_support:
+                continue
+            key_columns = ("tenant_id",) + tuple(c for c in columns if c != "tenant_id")
+            projection = clickhouse_identifier("prj_agg_" + "_".join(columns))
+            benefit = {"workload_share": round(count / len(self.queries), 4), "basis": "workload_frequency"}
+            if sample_events:
+                groups = {tuple(str(self._get_value(e, c)) for c in key_columns) for e in sample_events}
+                reduction = 1 - len(groups) / len(sample_events)
+                benefit.update({
+                    "row_reduction": round(reduction, 4),
+                    "estimated_read_reduction": round(benefit["workload_share"] * reduction, 4),
+                    "basis": "sample_replay"
+                })
+            select_list = ", ".join(map(clickhouse_identifier, key_columns))
+            recommendations.append({
+                "type": "projection",
+                "backend": "clickhouse",
+                "columns": list(columns),
+                "reason": f"{count} recorded queries aggregate by ({', '.join(columns)}); a pre-aggregated "
+                          f"projection answers them without scanning raw events",
+                "estimated_benefit": benefit,
+                "ddl": [
+                    f"ALTER TABLE {CLICKHOUSE_TABLE} ADD PROJECTION IF NOT EXISTS {projection} "
+                    f"(SELECT {select_list}, count() GROUP BY {select_list})",
+                    f"ALTER TABLE {CLICKHOUSE_TABLE} MATERIALIZE PROJECTION {projection}"
+                ]
+            })
+
+        # Ordering projections for frequent sorts outside the sorting key
+        for column, stats in usage.items():
+            if column in CLICKHOUSE_SORTING_KEY or stats.sort_count < self.min_support:
+                continue
+            projection = clickhouse_identifier(f"prj_order_{column}")
+            recommendations.append({
+                "type": "projection",
+                "backend": "clickhouse",
+                "columns": [column],
+                "reason": f"{stats.sort_count} recorded queries sort by {column}; an ordered projection "
+                          f"avoids a full sort for top-N reads",
+                "estimated_benefit": {
+                    "workload_share": round(stats.sort_count / len(self.queries), 4),
+                    "basis": "workload_frequency"
+                },
+                "ddl": [
+                    f"ALTER TABLE {CLICKHOUSE_TABLE} ADD PROJECTION IF NOT EXISTS {projection} "
+                    f"(SELECT * ORDER BY {clickhouse_identifier('tenant_id')}, {clickhouse_identifier(column)})",
+                    f"ALTER TABLE {CLICKHOUSE_TABLE} MATERIALIZE PROJECTION {projection}"
+                ]
+            })
+
+        return recommendations
+
+    def _clickhouse_index_type(self, column: str, kind: str, replayed: Optional[Dict[str, Any]]) -> str:
+        """Pick a skip index type for the dominant predicate kind"""
+        if kind == "text":
+            return "ngrambf_v1(3, 256, 2, 0)"
+        if kind in ("range", "subnet"):
+            return "minmax"
+        distinct = replayed["distinct_values"] if replayed else None
+        if distinct is not None and distinct <= 256 and distinct * 10 <= replayed["sample_rows"]:
+            return f"set({max(16, 2 ** math.ceil(math.log2(max(distinct, 1) * 2)))})"
+        entry = field_catalog.resolve(column)
+        if distinct is None and entry and entry.cardinality == "low":
+            return "set(256)"
+        return "bloom_filter(0.01)"
+
+    def _clickhouse_rebuild_ddl(self, sorting_key: Tuple[str, ...]) -> List[str]:
+        """Sorting keys cannot be reordered in place; rebuild (keeping retention) and swap the table"""
+        rebuilt = f"{CLICKHOUSE_TABLE}_resorted"
+        return [
+            f"CREATE TABLE {rebuilt} AS {CLICKHOUSE_TABLE} ENGINE = MergeTree() "
+            f"PARTITION BY toYYYYMM(time) ORDER BY ({', '.join(map(clickhouse_identifier, sorting_key))}) "
+            f"TTL {CLICKHOUSE_TTL} "
+            f"SETTINGS index_granularity = {CLICKHOUSE_INDEX_GRANULARITY}",
+            f"INSERT INTO {rebuilt} SELECT * FROM {CLICKHOUSE_TABLE}",
+            f"EXCHANGE TABLES {CLICKHOUSE_TABLE} AND {rebuilt}",
+        ]
+
+    def _recommend_duckdb(self, usage: Dict[str, FieldUsage], replay: Dict[str, Dict[str, Any]],
+                          sample_events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        recommendations = []
+        for column, stats in usage.items():
+            touches = stats.filter_count + stats.group_count + stats.sort_count
+            if touches < self.min_support:
+                continue
+            target = DUCKDB_COLUMN_ALIASES.get(column, column)
+            quoted = duckdb_identifier(target)
+            ddl = []
+            if target not in DUCKDB_EXISTING_COLUMNS:
+                column_type = self._duckdb_type(column, sample_events)
+                json_path = ("$." + field_catalog.path(column)).replace("'", "''")
+                ddl.append(f"ALTER TABLE {DUCKDB_TABLE} ADD COLUMN IF NOT EXISTS {quoted} {column_type}")
+                ddl.append(
+                    f"UPDATE {DUCKDB_TABLE} SET {quoted} = TRY_CAST(json_extract_string({DUCKDB_JSON_COLUMN}, "
+                    f"'{json_path}') AS {column_type}) WHERE {quoted} IS NULL"
+                )
+            # ART indexes only pay off for selective point lookups; zonemaps cover ranges
+            replayed = replay.get(column)
+            selective = replayed is None or replayed["selectivity"] <= 0.05 or \
+                replayed["distinct_values"] >= len(sample_events) / 2
+            if stats.kinds.get("equality", 0) >= self.min_support and selective \
+                    and target not in DUCKDB_EXISTING_INDEXES:
+                index_name = duckdb_identifier(f"idx_{DUCKDB_TABLE}_{target}")
+                ddl.append(f"CREATE INDEX IF NOT EXISTS {index_name} ON {DUCKDB_TABLE}({quoted})")
+            if not ddl:
+                continue
+            recommendations.append({
+                "type": "index" if len(ddl) == 1 else "typed_column",
+                "backend": "duckdb",
+                "columns": [column],
+                "reason": f"{column} is used by {touches} recorded query clauses; a typed column avoids "
+                          f"re-parsing {DUCKDB_JSON_COLUMN} JSON and enables zonemap pruning",
+                "estimated_benefit": self._benefit(stats, replay, "granule_skip_ratio"),
+                "ddl": ddl
+            })
+        return recommendations
+
+    def _duckdb_type(self, column: str, sample_events: List[Dict[str, Any]]) -> str:
+        """Infer a DuckDB column type from sample values"""
+        if column == "time":
+            return "TIMESTAMP"
+        values = [self._get_value(e, column) for e in sample_events]
+        values = [v for v in values if v is not None]
+        if values and all(isinstance(v, bool) for v in values):
+            return "BOOLEAN"
+        if values and all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+            return "BIGINT"
+        if values and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+            return "DOUBLE"
+        if not values and column in CLICKHOUSE_NUMERIC_COLUMNS:
+            return "DOUBLE"
+        return "VARCHAR"
+
+# Global advisor instance shared by the query paths
+query_advisor = QueryWorkloadAdvisor()
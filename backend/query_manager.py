@@ -14,6 +14,7 @@ from enum import Enum
 from query_ast_schema import JupiterQueryAST, EXAMPLE_ASTS
 from query_providers import QUERY_PROVIDERS, MockQueryProvider
 from clickhouse_provider import ClickHouseQueryProvider
+from query_advisor import query_advisor
 
 logger = logging.getLogger(__name__)
 
@@ -90,6 +91,7 @@ class QueryManager:
             
             # Log query execution
             self._log_query_execution(ast, result, user_id, selected_backend)
+            query_advisor.record_query(ast, execution_time)
             
             return result
             
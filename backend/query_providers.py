@@ -17,9 +17,52 @@ from query_ast_schema import (
     ASTCondition, ASTLogicalExpression, ASTSelectField,
     ComparisonOperator, LogicalOperator, AggregateFunction, FieldType
 )
+from ip_ranges import compile_ranges, match_membership
+from ocsf_field_catalog import field_catalog
 
 logger = logging.getLogger(__name__)
 
+def apply_comparison(left: Any, operator: ComparisonOperator, right: Any) -> bool:
+    """Apply a comparison operator to a field value and its operand"""
+    if left is None:
+        return operator in [ComparisonOperator.IS_NULL]
+    
+    try:
+        if operator == ComparisonOperator.EQUALS:
+            return str(left).lower() == str(right).lower()
+        elif operator == ComparisonOperator.NOT_EQUALS:
+            return str(left).lower() != str(right).lower()
+        elif operator == ComparisonOperator.CONTAINS:
+            return str(right).lower() in str(left).lower()
+        elif operator == ComparisonOperator.STARTS_WITH:
+            return str(left).lower().startswith(str(right).lower())
+        elif operator == ComparisonOperator.ENDS_WITH:
+            return str(left).lower().endswith(str(right).lower())
+        elif operator == ComparisonOperator.REGEX:
+            return bool(re.search(str(right), str(left), re.IGNORECASE))
+        elif operator == ComparisonOperator.IN:
+            return match_membership(left, right)
+        elif operator == ComparisonOperator.NOT_IN:
+            return not match_membership(left, right)
+        elif operator == ComparisonOperator.IN_SUBNET:
+            return compile_ranges(right).contains(left)
+        elif operator == ComparisonOperator.GREATER_THAN:
+            return float(left) > float(right)
+        elif operator == ComparisonOperator.LESS_THAN:
+            return float(left) < float(right)
+        elif operator == ComparisonOperator.GREATER_EQUAL:
+            return float(left) >= float(right)
+        elif operator == ComparisonOperator.LESS_EQUAL:
+            return float(left) <= float(right)
+        elif operator == ComparisonOperator.IS_NULL:
+            return left is None
+        elif operator == ComparisonOperator.IS_NOT_NULL:
+            return left is not None
+        else:
+            return False
+    except (ValueError, TypeError):
+        return False
+
 class MockQueryProvider(QueryProvider):
     """
     Mock provider that executes queries against sample OCSF data
@@ -217,53 +260,12 @@ class MockQueryProvider(QueryProvider):
         else:
             return None
             
-        # Handle nested field access (e.g., "user.name", "src_endpoint.ip")
-        value = record
-        for part in field_name.split('.'):
-            if isinstance(value, dict) and part in value:
-                value = value[part]
-            else:
-                return None
-        return value
+        # Handles nested (e.g., "user.name") and flattened (e.g., "actor_user_name") records
+        return field_catalog.get_value(record, field_name)
     
     def _apply_operator(self, left: Any, operator: ComparisonOperator, right: Any) -> bool:
         """Apply comparison operator"""
-        if left is None:
-            return operator in [ComparisonOperator.IS_NULL]
-        
-        try:
-            if operator == ComparisonOperator.EQUALS:
-                return str(left).lower() == str(right).lower()
-            elif operator == ComparisonOperator.NOT_EQUALS:
-                return str(left).lower() != str(right).lower()
-            elif operator == ComparisonOperator.CONTAINS:
-                return str(right).lower() in str(left).lower()
-            elif operator == ComparisonOperator.STARTS_WITH:
-                return str(left).lower().startswith(str(right).lower())
-            elif operator == ComparisonOperator.ENDS_WITH:
-                return str(left).lower().endswith(str(right).lower())
-            elif operator == ComparisonOperator.REGEX:
-                return bool(re.search(str(right), str(left), re.IGNORECASE))
-            elif operator == ComparisonOperator.IN:
-                return str(left).lower() in [str(v).lower() for v in right]
-            elif operator == ComparisonOperator.NOT_IN:
-                return str(left).lower() not in [str(v).lower() for v in right]
-            elif operator == ComparisonOperator.GREATER_THAN:
-                return float(left) > float(right)
-            elif operator == ComparisonOperator.LESS_THAN:
-                return float(left) < float(right)
-            elif operator == ComparisonOperator.GREATER_EQUAL:
-                return float(left) >= float(right)
-            elif operator == ComparisonOperator.LESS_EQUAL:
-                return float(left) <= float(right)
-            elif operator == ComparisonOperator.IS_NULL:
-                return left is None
-            elif operator == ComparisonOperator.IS_NOT_NULL:
-                return left is not None
-            else:
-                return False
-        except (ValueError, TypeError):
-            return False
+        return apply_comparison(left, operator, right)
     
     def _apply_time_filter(self, results: List[Dict], time_range) -> List[Dict]:
         """Apply time range filter"""
@@ -367,8 +369,9 @@ class MockQueryProvider(QueryProvider):
         field_name = order_field.field.name
         reverse = order_field.direction.value == "desc"
         
+        accessor = field_catalog.accessor(field_name)
         try:
-            return sorted(results, key=lambda x: x.get(field_name, ''), reverse=reverse)
+            return sorted(results, key=lambda x: accessor(x) or '', reverse=reverse)
         except (TypeError, KeyError):
             return results
     
@@ -8,6 +8,7 @@ import csv
 import io
 from datetime import datetime, timedelta
 import re
+import difflib
 import logging
 
 from auth_middleware import get_current_user
@@ -16,6 +17,10 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from security_utils import SecurityValidator, UserFriendlyValidator, sanitize_string
+from query_advisor import query_advisor
+from ip_ranges import compile_ranges, compile_membership, has_cidr, match_membership
+from ocsf_field_catalog import field_catalog
+from query_suggestions import suggestion_engine
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -55,9 +60,8 @@ class QueryRequest(BaseModel):
     @validator('sortBy')
     def validate_sort_field(cls, v):
         """Validate sort field"""
-        valid_fields = ['time', 'severity', 'activity_name', 'user_name', 'src_endpoint_ip', 'dst_endpoint_ip']
-        if v not in valid_fields:
-            raise ValueError(f"Invalid sort field. Valid options: {', '.join(valid_fields)}")
+        if not field_catalog.is_known(v):
+            raise ValueError(f"Invalid sort field '{v}'. Use a field listed by /api/logs/fields")
         return v
     
     @validator('sortOrder')
@@ -213,6 +217,9 @@ MOCK_LOG_DATA = [
     }
 ]
 
+# Seed value statistics so suggestions work against the demo data
+suggestion_engine.observe_many(MOCK_LOG_DATA)
+
 @router.post("/search", response_model=QueryResponse)
 async def execute_query(
     request: QueryRequest,
@@ -241,6 +248,7 @@ async def execute_query(
         paginated_results = filtered_results[request.offset:request.offset + request.limit]
         
         execution_time = (datetime.now() - start_time).total_seconds()
+        query_advisor.record_conditions(parsed_query['conditions'], request.sortBy, execution_time)
         
         logger.info(f"Query executed by user {current_user.username}: {request.query}")
         
@@ -301,7 +309,7 @@ async def get_suggestions(
     Get query suggestions based on partial input
     """
     try:
-        suggestions = generate_query_suggestions(request.query, request.position)
+        suggestions = generate_query_suggestions(request.query, request.position, current_user.tenant_id)
         
         return SuggestionResponse(
             success=True,
@@ -321,49 +329,12 @@ async def get_field_metadata(current_user: User = Depends(get_current_user)):
     Get available OCSF fields and their metadata
     """
     try:
-        # This would typically come from a database or configuration
         fields = {
-            "activity": [
-                {"name": "activity_name", "type": "string", "description": "Activity name"},
-                {"name": "severity", "type": "string", "description": "Severity level"},
-                {"name": "category_uid", "type": "integer", "description": "Category ID"}
-            ],
-            "user": [
-                {"name": "user_name", "type": "string", "description": "User name"},
-                {"name": "user_type", "type": "string", "description": "User type"}
-            ],
-            "network": [
-                {"name": "src_endpoint_ip", "type": "ip_address", "description": "Source IP"},
-                {"name": "dst_endpoint_ip", "type": "ip_address", "description": "Destination IP"},
-                {"name": "dst_endpoint_port", "type": "integer", "description": "Destination port"}
-            ],
-            "file": [
-                {"name": "file_name", "type": "string", "description": "File name"},
-                {"name": "file_path", "type": "string", "description": "File path"},
-                {"name": "file_hash_sha256", "type": "string", "description": "File SHA256 hash"}
-            ],
-            "process": [
-                {"name": "process_name", "type": "string", "description": "Process name"},
-                {"name": "process_cmd_line", "type": "string", "description": "Process command line"}
-            ],
-            "registry": [
-                {"name": "registry_key", "type": "string", "description": "Registry key"},
-                {"name": "registry_value", "type": "string", "description": "Registry value"},
-                {"name": "registry_data", "type": "string", "description": "Registry data"}
-            ],
-            "dns": [
-                {"name": "dns_question_name", "type": "string", "description": "DNS query name"},
-                {"name": "dns_question_type", "type": "string", "description": "DNS query type"},
-                {"name": "dns_answer_data", "type": "string", "description": "DNS answer data"}
-            ],
-            "http": [
-                {"name": "http_request_method", "type": "string", "description": "HTTP method"},
-                {"name": "http_request_url", "type": "string", "description": "HTTP URL"},
-                {"name": "http_response_status_code", "type": "integer", "description": "HTTP status code"}
-            ]
+            group: [field_catalog.to_metadata(entry) for entry in entries]
+            for group, entries in field_catalog.by_group().items()
         }
         
-        return {"fields": fields}
+        return {"fields": fields, "version": field_catalog.version}
         
     except Exception as e:
         logger.error(f"Failed to get field metadata: {str(e)}")
@@ -406,12 +377,14 @@ async def get_query_metrics(
         # Parse the query
         parsed_query = parse_ocsf_query(request.query)
         
-        # Generate metrics and suggestions
+        # Generate metrics and suggestions; the workload replay runs once per request
+        physical_design = get_physical_design_recommendations(parsed_query)
         metrics = {
             "estimated_execution_time": estimate_query_time(parsed_query),
             "complexity_score": calculate_query_complexity(parsed_query),
-            "optimization_suggestions": generate_optimization_suggestions(parsed_query),
-            "index_recommendations": get_index_recommendations(parsed_query)
+            "optimization_suggestions": generate_optimization_suggestions(parsed_query, physical_design),
+            "index_recommendations": get_index_recommendations(parsed_query, physical_design),
+            "physical_design": physical_design
         }
         
         return {"metrics": metrics}
@@ -420,6 +393,24 @@ async def get_query_metrics(
         logger.error(f"Failed to get query metrics: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get query metrics: {str(e)}")
 
+@router.get("/advisor")
+async def get_workload_advice(
+    backend: str = Query("clickhouse", pattern="^(clickhouse|duckdb)$", description="Target storage backend"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get workload statistics and index/projection recommendations with DDL
+    """
+    try:
+        return {
+            "workload": query_advisor.get_workload_stats(),
+            "recommendations": query_advisor.recommend(backend, MOCK_LOG_DATA)
+        }
+        
+    except Exception as e:
+        logger.error(f"Failed to get workload advice: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to get workload advice: {str(e)}")
+
 # Helper functions
 def parse_ocsf_query(query: str) -> Dict[str, Any]:
     """
@@ -477,6 +468,22 @@ def parse_ocsf_query(query: str) -> Dict[str, Any]:
                 'operator': 'less_equal',
                 'value': value.strip()
             })
+        elif ' IN_SUBNET ' in part:
+            field, value = part.split(' IN_SUBNET ', 1)
+            value = value.strip().strip('()')
+            conditions.append({
+                'field': field.strip(),
+                'operator': 'in_subnet',
+                'value': [v.strip().strip('"\'') for v in value.split(',')]
+            })
+        elif ' NOT IN ' in part:
+            field, value = part.split(' NOT IN ', 1)
+            value = value.strip().strip('()')
+            conditions.append({
+                'field': field.strip(),
+                'operator': 'not_in',
+                'value': [v.strip().strip('"\'') for v in value.split(',')]
+            })
         elif ' IN ' in part:
             field, value = part.split(' IN ', 1)
             # Parse list values
@@ -511,6 +518,22 @@ def apply_query_filters(data: List[Dict], parsed_query: Dict) -> List[Dict]:
         operator = condition['operator']
         value = condition['value']
         
+        if operator == 'in_subnet' or (operator in ('in', 'not_in') and has_cidr(value)):
+            # Match the whole column against the compiled ranges in one pass
+            if operator == 'in_subnet':
+                plain, ranges = frozenset(), compile_ranges(value)
+            else:
+                plain, ranges = compile_membership(value)
+            accessor = field_catalog.accessor(field)
+            column = [accessor(item) for item in filtered_data]
+            in_range = ranges.contains_many(column) if ranges else [False] * len(column)
+            keep = operator != 'not_in'
+            filtered_data = [
+                item for item, item_value, matched in zip(filtered_data, column, in_range)
+                if item_value is not None and (matched or str(item_value).lower() in plain) == keep
+            ]
+            continue
+        
         filtered_data = [item for item in filtered_data if evaluate_condition(item, field, operator, value)]
     
     return filtered_data
@@ -519,7 +542,7 @@ def evaluate_condition(item: Dict, field: str, operator: str, value: Any) -> boo
     """
     Evaluate a single condition against a log item
     """
-    item_value = item.get(field)
+    item_value = field_catalog.get_value(item, field)
     
     if item_value is None:
         return False
@@ -538,7 +561,11 @@ def evaluate_condition(item: Dict, field: str, operator: str, value: Any) -> boo
         elif operator == 'less_equal':
             return float(item_value) <= float(value)
         elif operator == 'in':
-            return str(item_value).lower() in [str(v).lower() for v in value]
+            return match_membership(item_value, value)
+        elif operator == 'not_in':
+            return not match_membership(item_value, value)
+        elif operator == 'in_subnet':
+            return compile_ranges(value).contains(item_value)
         elif operator == 'regex':
             return bool(re.search(value, str(item_value), re.IGNORECASE))
         else:
@@ -582,7 +609,8 @@ def sort_results(data: List[Dict], sort_by: str, sort_order: str) -> List[Dict]:
     """
     try:
         reverse = sort_order.lower() == 'desc'
-        return sorted(data, key=lambda x: x.get(sort_by, ''), reverse=reverse)
+        accessor = field_catalog.accessor(sort_by)
+        return sorted(data, key=lambda x: accessor(x) or '', reverse=reverse)
     except (KeyError, TypeError):
         return data
 
@@ -590,14 +618,9 @@ def validate_query_fields(parsed_query: Dict) -> Dict[str, Any]:
     """
     Validate field names and operators in the query
     """
-    valid_fields = {
-        'activity_name', 'severity', 'user_name', 'src_endpoint_ip', 'dst_endpoint_ip',
-        'file_name', 'process_name', 'registry_key', 'dns_question_name', 'http_request_method'
-    }
-    
     valid_operators = {
         'equals', 'contains', 'greater_than', 'less_than', 'greater_equal', 
-        'less_equal', 'in', 'regex'
+        'less_equal', 'in', 'not_in', 'in_subnet', 'regex'
     }
     
     suggestions = []
@@ -607,8 +630,10 @@ def validate_query_fields(parsed_query: Dict) -> Dict[str, Any]:
         field = condition['field']
         operator = condition['operator']
         
-        if field not in valid_fields:
-            suggestions.append(f"Unknown field '{field}'. Did you mean one of: {', '.join(valid_fields)}?")
+        if not field_catalog.is_known(field):
+            close_matches = difflib.get_close_matches(field, field_catalog.column_mapping().keys(), n=5)
+            suggestions.append(f"Unknown field '{field}'. Did you mean one of: {', '.join(close_matches)}?"
+                               if close_matches else f"Unknown field '{field}'")
         
         if operator not in valid_operators:
             suggestions.append(f"Unknown operator '{operator}'. Valid operators: {', '.join(valid_operators)}")
@@ -619,48 +644,11 @@ def validate_query_fields(parsed_query: Dict) -> Dict[str, Any]:
         'warnings': warnings
     }
 
-def generate_query_suggestions(query: str, position: int) -> List[Dict[str, Any]]:
+def generate_query_suggestions(query: str, position: int, tenant_id: Optional[str] = None) -> List[Dict[str, Any]]:
     """
-    Generate query suggestions based on partial input
+    Generate query suggestions for the token under the cursor
     """
-    suggestions = []
-    
-    # Field suggestions
-    field_suggestions = [
-        {"type": "field", "value": "activity_name", "description": "Activity name"},
-        {"type": "field", "value": "severity", "description": "Severity level"},
-        {"type": "field", "value": "user_name", "description": "User name"},
-        {"type": "field", "value": "src_endpoint_ip", "description": "Source IP address"},
-        {"type": "field", "value": "dst_endpoint_ip", "description": "Destination IP address"},
-        {"type": "field", "value": "file_name", "description": "File name"},
-        {"type": "field", "value": "process_name", "description": "Process name"}
-    ]
-    
-    # Operator suggestions
-    operator_suggestions = [
-        {"type": "operator", "value": "=", "description": "Equals"},
-        {"type": "operator", "value": "CONTAINS", "description": "Contains"},
-        {"type": "operator", "value": ">", "description": "Greater than"},
-        {"type": "operator", "value": "<", "description": "Less than"},
-        {"type": "operator", "value": "IN", "description": "In list"},
-        {"type": "operator", "value": "REGEX", "description": "Regular expression"}
-    ]
-    
-    # Value suggestions
-    value_suggestions = [
-        {"type": "value", "value": "failed_login", "description": "Failed login activity"},
-        {"type": "value", "value": "high", "description": "High severity"},
-        {"type": "value", "value": "critical", "description": "Critical severity"},
-        {"type": "value", "value": "powershell.exe", "description": "PowerShell process"},
-        {"type": "value", "value": "192.168.1.100", "description": "Example IP address"}
-    ]
-    
-    # Combine all suggestions
-    suggestions.extend(field_suggestions)
-    suggestions.extend(operator_suggestions)
-    suggestions.extend(value_suggestions)
-    
-    return suggestions
+    return suggestion_engine.suggest(query, position, tenant_id)
 
 def estimate_query_time(parsed_query: Dict) -> float:
     """
@@ -685,7 +673,8 @@ def calculate_query_complexity(parsed_query: Dict) -> int:
     
     return min(score, 10)
 
-def generate_optimization_suggestions(parsed_query: Dict) -> List[str]:
+def generate_optimization_suggestions(parsed_query: Dict,
+                                      physical_design: Optional[List[Dict[str, Any]]] = None) -> List[str]:
     """
     Generate query optimization suggestions
     """
@@ -696,11 +685,11 @@ def generate_optimization_suggestions(parsed_query: Dict) -> List[str]:
     if not has_time_filter:
         suggestions.append("Add a time filter to improve query performance")
     
-    # Check for high-cardinality fields
-    high_cardinality_fields = ['src_endpoint_ip', 'dst_endpoint_ip', 'file_hash_sha256']
-    for condition in parsed_query['conditions']:
-        if condition['field'] in high_cardinality_fields:
-            suggestions.append(f"Consider adding an index on {condition['field']} for better performance")
+    # Index suggestions backed by the recorded workload
+    if physical_design is None:
+        physical_design = get_physical_design_recommendations(parsed_query)
+    for recommendation in physical_design:
+        suggestions.append(recommendation['reason'])
     
     # Check for regex usage
     has_regex = any(condition['operator'] == 'regex' for condition in parsed_query['conditions'])
@@ -709,18 +698,27 @@ def generate_optimization_suggestions(parsed_query: Dict) -> List[str]:
     
     return suggestions
 
-def get_index_recommendations(parsed_query: Dict) -> List[str]:
+def get_index_recommendations(parsed_query: Dict,
+                              physical_design: Optional[List[Dict[str, Any]]] = None) -> List[str]:
     """
     Get index recommendations for the query
     """
     recommendations = []
     
-    for condition in parsed_query['conditions']:
-        field = condition['field']
-        if field in ['time', 'activity_name', 'severity', 'user_name']:
-            recommendations.append(f"Index on {field} for faster filtering")
+    if physical_design is None:
+        physical_design = get_physical_design_recommendations(parsed_query)
+    for recommendation in physical_design:
+        columns = ', '.join(recommendation['columns'])
+        recommendations.append(f"{recommendation['type'].replace('_', ' ').title()} on {columns} for faster filtering")
     
-    return list(set(recommendations))
+    return list(dict.fromkeys(recommendations))
+
+def get_physical_design_recommendations(parsed_query: Dict, backend: str = "clickhouse") -> List[Dict[str, Any]]:
+    """
+    Get workload advisor recommendations (with DDL) touching the query's fields
+    """
+    fields = [condition['field'] for condition in parsed_query['conditions']]
+    return query_advisor.recommend_for_fields(fields, backend, MOCK_LOG_DATA)
 
 def export_csv(data: List[Dict], filename: str):
     """
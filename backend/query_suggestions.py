@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Jupiter SIEM Query Suggestion Engine
+Serves cursor-aware completions for the OCSF query language from in-memory
+per-tenant field value statistics (count-min sketch + top-K heap) so that
+suggestions never touch the event store
+"""
+
+import asyncio
+import heapq
+import logging
+import re
+from typing import Dict, List, Any, Optional, Tuple, Iterable
+
+from ocsf_field_catalog import field_catalog
+
+logger = logging.getLogger(__name__)
+
+# Tenant key used for events observed without a tenant (e.g. demo data)
+GLOBAL_TENANT = "__global__"
+
+QUERY_OPERATORS = [
+    ("=", "Equals"),
+    ("!=", "Not equals"),
+    ("CONTAINS", "Contains"),
+    (">", "Greater than"),
+    (">=", "Greater than or equal"),
+    ("<", "Less than"),
+    ("<=", "Less than or equal"),
+    ("IN", "In list"),
+    ("NOT IN", "Not in list"),
+    ("IN_SUBNET", "In CIDR range"),
+    ("REGEX", "Regular expression"),
+]
+
+LOGICAL_OPERATORS = [("AND", "Both conditions"), ("OR", "Either condition"), ("NOT", "Negate condition")]
+
+# Rollup tables that already hold per-tenant counts for some columns
+# (see scripts/clickhouse_init.sql); everything else is aggregated from ocsf_events
+CLICKHOUSE_ROLLUPS = {
+    "severity": ("jupiter_siem.ocsf_events_hourly", "sum(event_count)", "hour"),
+    "class_name": ("jupiter_siem.ocsf_events_hourly", "sum(event_count)", "hour"),
+    "process_name": ("jupiter_siem.top_processes_daily", "sum(execution_count)", "date"),
+    "network_protocol": ("jupiter_siem.network_connections_hourly", "sum(connection_count)", "hour"),
+    "dst_endpoint_port": ("jupiter_siem.network_connections_hourly", "sum(connection_count)", "hour"),
+}
+
+_TOKEN_PATTERN = re.compile(r'"[^"]*"?|\'[^\']*\'?|[()]|,|!=|>=|<=|[=<>]|[^\s()=<>!,]+')
+
+class CountMinSketch:
+    """Fixed-size frequency sketch; estimates never undercount"""
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.rows = [[0] * width for _ in range(depth)]
+
+    def _buckets(self, key: str) -> Iterable[Tuple[List[int], int]]:
+        for seed, row in enumerate(self.rows):
+            yield row, hash((seed, key)) % self.width
+
+    def add(self, key: str, count: int = 1) -> int:
+        """Add occurrences of key and return its new estimate"""
+        estimate = None
+        for row, bucket in self._buckets(key):
+            row[bucket] += count
+            estimate = row[bucket] if estimate is None else min(estimate, row[bucket])
+        return estimate
+
+    def estimate(self, key: str) -> int:
+        return min(row[bucket] for row, bucket in self._buckets(key))
+
+class TopKValues:
+    """Heavy hitters for one field: count-min estimates feeding a bounded min-heap"""
+
+    def __init__(self, k: int = 50, width: int = 2048, depth: int = 4):
+        self.k = k
+        self.sketch = CountMinSketch(width, depth)
+        self.top: Dict[str, int] = {}
+        self._heap: List[Tuple[int, str]] = []  # lazy: stale entries skipped on pop
+        self.version = 0  # bumped when top-K membership changes
+
+    def add(self, value: str, count: int = 1):
+        estimate = self.sketch.add(value, count)
+        if value in self.top:
+            self.top[value] = estimate
+            heapq.heappush(self._heap, (estimate, value))
+        elif len(self.top) < self.k:
+            self._admit(value, estimate)
+        elif estimate > self._min_count():
+            _, evicted = heapq.heappop(self._heap)
+            del self.top[evicted]
+            self._admit(value, estimate)
+        if len(self._heap) > 4 * self.k:
+            self._heap = [(count, value) for value, count in self.top.items()]
+            heapq.heapify(self._heap)
+
+    def _admit(self, value: str, estimate: int):
+        self.top[value] = estimate
+        heapq.heappush(self._heap, (estimate, value))
+        self.version += 1
+
+    def _min_count(self) -> int:
+        while self._heap and self.top.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else 0
+
+    def most_common(self, limit: Optional[int] = None) -> List[Tuple[str, int]]:
+        items = sorted(self.top.items(), key=lambda item: item[1], reverse=True)
+        return items[:limit] if limit else items
+
+class PrefixTrie:
+    """Case-insensitive prefix trie returning the heaviest completions"""
+
+    def __init__(self):
+        self.root: Dict[str, Any] = {}
+
+    def insert(self, term: str, weight: int = 0, payload: Any = None):
+        node = self.root
+        for char in term.lower():
+            node = node.setdefault(char, {})
+        node[None] = (weight, term, payload)
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Tuple[int, str, Any]]:
+        node = self.root
+        for char in prefix.lower():
+            node = node.get(char)
+            if node is None:
+                return []
+        matches = []
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            for key, child in current.items():
+                if key is None:
+                    matches.append(child)
+                else:
+                    stack.append(child)
+        return heapq.nlargest(limit, matches, key=lambda match: match[0])
+
+class QuerySuggestionEngine:
+    """
+    Cursor-aware query completion backed by live field statistics
+    Statistics are fed incrementally from the ingest path (observe) or
+    refreshed from ClickHouse rollups (refresh_from_clickhouse)
+    """
+
+    def __init__(self, top_k: int = 50, max_tenants: int = 1000):
+        self.top_k = top_k
+        self.max_tenants = max_tenants
+        self.tracked_fields = [
+            entry for entry in field_catalog.fields if entry.cardinality in ("low", "medium")
+        ]
+        self.stats: Dict[str, Dict[str, TopKValues]] = {}
+        self._value_tries: Dict[Tuple[str, str], Tuple[int, PrefixTrie]] = {}
+
+        self.field_trie = PrefixTrie()
+        for entry in field_catalog.fields:
+            # Indexed fields rank first; flat column names win over dotted paths
+            weight = 4 if entry.indexable else 2
+            for name in entry.names:
+                self.field_trie.insert(name, weight if "." in name else weight + 1, entry)
+
+    # ------------------------------------------------------------------
+    # Statistics
+    # ------------------------------------------------------------------
+
+    def _tenant_stats(self, tenant_id: Optional[str]) -> Optional[Dict[str, TopKValues]]:
+        key = tenant_id or GLOBAL_TENANT
+        stats = self.stats.get(key)
+        if stats is None:
+            if len(self.stats) >= self.max_tenants:
+                return None
+            stats = self.stats[key] = {}
+        return stats
+
+    def observe(self, event: Dict[str, Any], tenant_id: Optional[str] = None):
+        """Update value statistics from one ingested event"""
+        stats = self._tenant_stats(tenant_id or event.get("tenant_id"))
+        if stats is None:
+            return
+        for entry in self.tracked_fields:
+            value = field_catalog.get_value(event, entry.column)
+            if value is None or value == "" or isinstance(value, (dict, list)):
+                continue
+            values = stats.get(entry.column)
+            if values is None:
+                values = stats[entry.column] = TopKValues(self.top_k)
+            values.add(str(value))
+
+    def observe_many(self, events: Iterable[Dict[str, Any]], tenant_id: Optional[str] = None):
+        for event in events:
+            self.observe(event, tenant_id)
+
+    def load_counts(self, tenant_id: Optional[str], column: str, counts: Iterable[Tuple[Any, int]]):
+        """Replace a field's statistics with externally aggregated counts"""
+        stats = self._tenant_stats(tenant_id)
+        if stats is None:
+            return
+        values = TopKValues(self.top_k)
+        for value, count in counts:
+            if value not in (None, ""):
+                values.add(str(value), int(count))
+        stats[column] = values
+
+    async def refresh_from_clickhouse(self, provider, lookback_hours: int = 24):
+        """Rebuild statistics from ClickHouse rollups (or ocsf_events) for all tenants"""
+        for entry in self.tracked_fields:
+            table, count_expr, time_column = CLICKHOUSE_ROLLUPS.get(
+                entry.column, ("jupiter_siem.ocsf_events", "count()", "time")
+            )
+            sql = (
+                f"SELECT tenant_id, toString({entry.column}) AS value, {count_expr} AS cnt FROM {table} "
+                f"WHERE {time_column} >= now() - INTERVAL {int(lookback_hours)} HOUR "
+                f"GROUP BY tenant_id, value ORDER BY cnt DESC LIMIT {self.top_k} BY tenant_id"
+            )
+            try:
+                rows = await provider.execute_sql(sql)
+            except Exception as e:
+                logger.warning(f"Suggestion refresh failed for {entry.column}: {e}")
+                continue
+            by_tenant: Dict[str, List[Tuple[Any, int]]] = {}
+            for row in rows:
+                by_tenant.setdefault(row["tenant_id"], []).append((row["value"], row["cnt"]))
+            for tenant_id, counts in by_tenant.items():
+                self.load_counts(tenant_id, entry.column, counts)
+
+    async def run_refresh_loop(self, provider, interval: int = 300):
+        """Periodically refresh statistics from ClickHouse"""
+        while True:
+            await self.refresh_from_clickhouse(provider)
+            await asyncio.sleep(interval)
+
+    def _field_values(self, tenant_id: Optional[str], column: str) -> Optional[Tuple[str, TopKValues]]:
+        for key in (tenant_id, GLOBAL_TENANT):
+            values = self.stats.get(key or GLOBAL_TENANT, {}).get(column)
+            if values and values.top:
+                return key or GLOBAL_TENANT, values
+        return None
+
+    def _value_trie(self, tenant_key: str, column: str, values: TopKValues) -> PrefixTrie:
+        cached = self._value_tries.get((tenant_key, column))
+        if cached and cached[0] == values.version:
+            trie = cached[1]
+        else:
+            trie = PrefixTrie()
+            self._value_tries[(tenant_key, column)] = (values.version, trie)
+            for value in values.top:
+                trie.insert(value)
+        return trie
+
+    # ------------------------------------------------------------------
+    # Suggestions
+    # ------------------------------------------------------------------
+
+    def suggest(self, query: str, position: Optional[int] = None, tenant_id: Optional[str] = None,
+                limit: int = 20) -> List[Dict[str, Any]]:
+        """Suggestions for the token under the cursor"""
+        position = len(query) if position is None else max(0, min(position, len(query)))
+        before = query[:position]
+        tokens = [(m.group(), m.start()) for m in _TOKEN_PATTERN.finditer(before)]
+
+        # The token under the cursor is only "partial" if the cursor touches it
+        if tokens and tokens[-1][1] + len(tokens[-1][0]) == position and tokens[-1][0] not in ("(", ",", ")"):
+            partial, start = tokens.pop()
+        else:
+            partial, start = "", position
+        context = self._context([token for token, _ in tokens])
+        replace = {"start": start, "end": position}
+
+        if context[0] == "field":
+            suggestions = self._suggest_fields(partial, limit)
+            suggestions += self._suggest_keywords(LOGICAL_OPERATORS[2:], partial, "logical")
+        elif context[0] == "operator":
+            suggestions = self._suggest_keywords(QUERY_OPERATORS, partial, "operator")
+        elif context[0] == "value":
+            suggestions = self._suggest_values(context[1], partial, tenant_id, limit)
+        else:
+            suggestions = self._suggest_keywords(LOGICAL_OPERATORS[:2], partial, "logical")
+
+        for suggestion in suggestions:
+            suggestion["replace"] = replace
+        return suggestions[:limit]
+
+    def _context(self, tokens: List[str]) -> Tuple[str, Optional[str]]:
+        """Classify what the next token should be: field, operator, value or logical"""
+        state, field = "field", None
+        index = 0
+        while index < len(tokens):
+            token = tokens[index]
+            upper = token.upper()
+            if state == "field":
+                if upper in ("AND", "OR", "NOT", "("):
+                    pass
+                else:
+                    state, field = "operator", token
+            elif state == "operator":
+                if upper == "NOT":
+                    pass
+                else:
+                    state = "list" if upper in ("IN", "IN_SUBNET") else "value"
+            elif state == "list":
+                if token == ")":
+                    state = "logical"
+            elif state == "value":
+                state = "list" if token == "(" else "logical"
+            else:
+                if upper in ("AND", "OR"):
+                    state, field = "field", None
+            index += 1
+        if state == "list":
+            return "value", field
+        return state, field
+
+    def _suggest_fields(self, prefix: str, limit: int) -> List[Dict[str, Any]]:
+        suggestions, seen = [], set()
+        for _, name, entry in self.field_trie.complete(prefix, limit * 2):
+            if entry.column in seen:
+                continue
+            seen.add(entry.column)
+            suggestions.append({"type": "field", "value": name, "description": entry.description})
+        return suggestions
+
+    def _suggest_keywords(self, keywords: List[Tuple[str, str]], prefix: str, kind: str) -> List[Dict[str, Any]]:
+        prefix = prefix.upper()
+        return [
+            {"type": kind, "value": keyword, "description": description}
+            for keyword, description in keywords if keyword.startswith(prefix)
+        ]
+
+    def _suggest_values(self, field: Optional[str], partial: str, tenant_id: Optional[str],
+                        limit: int) -> List[Dict[str, Any]]:
+        entry = field_catalog.resolve(field) if field else None
+        if entry is None:
+            return []
+        found = self._field_values(tenant_id, entry.column)
+        if not found:
+            return []
+        tenant_key, values = found
+        prefix = partial.strip("\"'")
+        matches = self._value_trie(tenant_key, entry.column, values).complete(prefix, len(values.top))
+        ranked = sorted(((values.top.get(term, 0), term) for _, term, _ in matches), reverse=True)[:limit]
+        return [
+            {
+                "type": "value",
+                "value": f'"{term}"',
+                "description": f"{entry.description} (~{count} events)",
+                "count": count
+            }
+            for count, term in ranked
+        ]
+
+# Global suggestion engine instance
+suggestion_engine = QuerySuggestionEngine()
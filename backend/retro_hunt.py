@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+Jupiter SIEM Retroactive IOC Sweep
+Matches newly received indicators against historical events. A batch of IOCs is
+compiled into one matcher (hash sets, a CIDR interval index and an Aho-Corasick
+automaton for domains/URLs) and each time partition of ocsf_events / DuckDB logs
+is scanned once, however many indicators are in the batch
+"""
+
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+from uuid import uuid4
+
+from aho_corasick import AhoCorasick
+from ip_ranges import IPIntervalIndex, is_cidr
+from ocsf_field_catalog import field_catalog
+from soar_engine import Alert, AlertSeverity
+from threat_feeds import THREAT_LEVEL_RANK, infer_indicator_type, normalize_indicator
+from threat_intelligence import IndicatorType, ThreatIndicator, ThreatLevel
+import soar_engine as soar
+
+logger = logging.getLogger(__name__)
+
+# Event fields checked for each indicator type
+IP_FIELDS = ("src_endpoint_ip", "dst_endpoint_ip", "device_ip")
+HASH_FIELDS = ("file_hash_sha256", "file_hash_sha1", "file_hash_md5")
+TEXT_FIELDS = ("http_url", "http_referrer", "dns_query", "device_hostname")
+EXACT_FIELDS = {
+    IndicatorType.IP_ADDRESS: IP_FIELDS,
+    IndicatorType.FILE_HASH: HASH_FIELDS,
+    IndicatorType.EMAIL: ("actor_user_email",),
+    IndicatorType.USER_AGENT: ("http_user_agent",),
+    IndicatorType.REGISTRY_KEY: ("registry_key",),
+}
+
+THREAT_LEVEL_SEVERITY = {
+    ThreatLevel.CRITICAL: AlertSeverity.CRITICAL,
+    ThreatLevel.HIGH: AlertSeverity.HIGH,
+    ThreatLevel.MEDIUM: AlertSeverity.MEDIUM,
+    ThreatLevel.LOW: AlertSeverity.LOW,
+    ThreatLevel.INFO: AlertSeverity.INFO,
+}
+
+# Characters that continue a hostname; a domain IOC must not be flanked by them
+_HOSTNAME_CHARS = frozenset("abcdefghijklmnopqrstuvwxyz0123456789-")
+
+@dataclass
+class IOCMatch:
+    """One indicator observed in one event"""
+    indicator: ThreatIndicator
+    field: str
+    observed: str
+
+class IOCMatcher:
+    """Compiled matcher for a batch of indicators"""
+
+    def __init__(self, indicators: Iterable[ThreatIndicator]):
+        self.exact: Dict[IndicatorType, Dict[str, ThreatIndicator]] = {}
+        networks: Dict[str, ThreatIndicator] = {}
+        text_patterns: Dict[str, ThreatIndicator] = {}
+        self.count = 0
+
+        for indicator in indicators:
+            value = normalize_indicator(indicator.value, indicator.indicator_type)
+            if indicator.indicator_type == IndicatorType.IP_ADDRESS and is_cidr(value):
+                target, key = networks, value
+            elif indicator.indicator_type in (IndicatorType.DOMAIN, IndicatorType.URL):
+                target, key = text_patterns, value.lower()
+            elif indicator.indicator_type in EXACT_FIELDS:
+                target, key = self.exact.setdefault(indicator.indicator_type, {}), value.lower()
+            else:
+                continue
+            current = target.get(key)
+            if current is None or THREAT_LEVEL_RANK[indicator.threat_level] > THREAT_LEVEL_RANK[current.threat_level]:
+                target[key] = indicator
+            self.count += 1
+
+        self.networks = IPIntervalIndex(networks.items())
+        self.automaton = AhoCorasick(text_patterns)
+        self._text_indicators = [text_patterns[pattern] for pattern in self.automaton.patterns]
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def columns(self) -> List[str]:
+        """Event columns the matcher reads (for projected scans)"""
+        columns = set(IP_FIELDS) if len(self.networks) else set()
+        for indicator_type in self.exact:
+            columns.update(EXACT_FIELDS[indicator_type])
+        if len(self.automaton):
+            columns.update(TEXT_FIELDS)
+        return sorted(columns)
+
+    def match(self, event: Dict[str, Any]) -> List[IOCMatch]:
+        matches = []
+        for indicator_type, indicators in self.exact.items():
+            for field_name in EXACT_FIELDS[indicator_type]:
+                value = field_catalog.get_value(event, field_name)
+                if value and str(value).lower() in indicators:
+                    matches.append(IOCMatch(indicators[str(value).lower()], field_name, str(value)))
+
+        if len(self.networks):
+            for field_name in IP_FIELDS:
+                value = field_catalog.get_value(event, field_name)
+                indicator = self.networks.lookup(value) if value else None
+                if indicator:
+                    matches.append(IOCMatch(indicator, field_name, str(value)))
+
+        if len(self.automaton):
+            for field_name in TEXT_FIELDS:
+                value = field_catalog.get_value(event, field_name)
+                if not value:
+                    continue
+                text = str(value).lower()
+                seen = set()
+                for start, index in self.automaton.search(text):
+                    indicator = self._text_indicators[index]
+                    if index in seen or not self._on_boundary(text, start, len(self.automaton.patterns[index]), indicator):
+                        continue
+                    seen.add(index)
+                    matches.append(IOCMatch(indicator, field_name, str(value)))
+        return matches
+
+    @staticmethod
+    def _on_boundary(text: str, start: int, length: int, indicator: ThreatIndicator) -> bool:
+        """Domains match whole labels (sub.evil.com, not notevil.com or evil.com.au)"""
+        if indicator.indicator_type != IndicatorType.DOMAIN:
+            return True
+        end = start + length
+        before_ok = start == 0 or text[start - 1] not in _HOSTNAME_CHARS
+        after_ok = end == len(text) or (text[end] not in _HOSTNAME_CHARS and text[end] != ".")
+        return before_ok and after_ok
+
+def indicator_from_record(record: Dict[str, Any], source: str = "retro_hunt") -> Optional[ThreatIndicator]:
+    """ThreatIndicator from an iocs table row or API payload ({type, value, ...})"""
+    value = str(record.get("value") or "").strip()
+    if not value:
+        return None
+    try:
+        indicator_type = IndicatorType(record["type"]) if record.get("type") else infer_indicator_type(value)
+    except ValueError:
+        indicator_type = infer_indicator_type(value)
+    if indicator_type is None:
+        return None
+    try:
+        threat_level = ThreatLevel(record.get("threat_level") or "high")
+    except ValueError:
+        threat_level = ThreatLevel.HIGH
+    tags = record.get("tags") or []
+    if isinstance(tags, str):
+        tags = json.loads(tags) if tags.startswith("[") else [tags]
+    now = datetime.now()
+    return ThreatIndicator(
+        value=value, indicator_type=indicator_type, threat_level=threat_level,
+        confidence=float(record.get("confidence") or 0.5), source=record.get("source") or source,
+        first_seen=now, last_seen=now, tags=list(tags), context={"ioc_id": record.get("id")}
+    )
+
+class DuckDBEventSource:
+    """Historical events from the DuckDB logs table"""
+
+    def __init__(self, conn=None):
+        self._conn = conn
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            from database import get_db_manager
+            self._conn = get_db_manager().conn
+        return self._conn
+
+    async def stream_partition(self, start: datetime, end: datetime, tenant_id: Optional[str] = None,
+                               columns: Optional[List[str]] = None,
+                               batch_size: int = 10000) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield the partition's events in batches, fetching each batch off the event loop"""
+        sql = "SELECT id, tenant_id, timestamp, parsed_data FROM logs WHERE timestamp >= ? AND timestamp < ?"
+        params: List[Any] = [start, end]
+        if tenant_id:
+            sql += " AND tenant_id = ?"
+            params.append(tenant_id)
+        cursor = self.conn.cursor()
+        try:
+            await asyncio.to_thread(cursor.execute, sql, params)
+            while True:
+                rows = await asyncio.to_thread(cursor.fetchmany, batch_size)
+                if not rows:
+                    break
+                yield [self._to_event(*row) for row in rows]
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _to_event(log_id, log_tenant, timestamp, parsed_data) -> Dict[str, Any]:
+        event = json.loads(parsed_data) if isinstance(parsed_data, str) else dict(parsed_data or {})
+        event.setdefault("event_uid", log_id)
+        event.setdefault("tenant_id", log_tenant)
+        event.setdefault("time", timestamp.isoformat() if hasattr(timestamp, "isoformat") else timestamp)
+        return event
+
+    async def load_iocs(self, since: datetime, tenant_id: Optional[str] = None) -> List[ThreatIndicator]:
+        """Indicators added to the iocs table since a point in time"""
+        def fetch():
+            sql = "SELECT id, type, value, confidence, source, tags FROM iocs WHERE created_at >= ?"
+            params: List[Any] = [since]
+            if tenant_id:
+                sql += " AND tenant_id = ?"
+                params.append(tenant_id)
+            cursor = self.conn.cursor()
+            try:
+                result = cursor.execute(sql, params)
+                columns = [desc[0] for desc in result.description]
+                return [dict(zip(columns, row)) for row in result.fetchall()]
+            finally:
+                cursor.close()
+        records = await asyncio.to_thread(fetch)
+        return [i for i in (indicator_from_record(r, source="iocs") for r in records) if i]
+
+class ClickHouseEventSource:
+    """Historical events from ocsf_events, projected to the columns the matcher reads"""
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    async def stream_partition(self, start: datetime, end: datetime, tenant_id: Optional[str] = None,
+                               columns: Optional[List[str]] = None,
+                               batch_size: int = 10000) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield the partition's events in batches streamed from the server"""
+        projected = ", ".join(["event_uid", "tenant_id", "time"] + list(columns or []))
+        # Partition bounds are naive UTC, like stored event times
+        sql = (
+            f"SELECT {projected} FROM jupiter_siem.ocsf_events "
+            f"WHERE time >= toDateTime('{start:%Y-%m-%d %H:%M:%S}', 'UTC') "
+            f"AND time < toDateTime('{end:%Y-%m-%d %H:%M:%S}', 'UTC')"
+        )
+        if tenant_id:
+            sql += f" AND tenant_id = '{self.provider.sql_builder._escape_string(tenant_id)}'"
+        async for rows in self.provider.stream_sql(sql, batch_size):
+            yield rows
+
+@dataclass
+class RetroHuntJob:
+    """Progress and outcome of one sweep"""
+    id: str = field(default_factory=lambda: str(uuid4()))
+    indicator_count: int = 0
+    days: int = 30
+    tenant_id: Optional[str] = None
+    status: str = "pending"
+    partitions_total: int = 0
+    partitions_scanned: int = 0
+    events_scanned: int = 0
+    matches: int = 0
+    alerts_raised: int = 0
+    created_at: datetime = field(default_factory=datetime.now)
+    completed_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "indicator_count": self.indicator_count,
+            "days": self.days,
+            "tenant_id": self.tenant_id,
+            "status": self.status,
+            "partitions_total": self.partitions_total,
+            "partitions_scanned": self.partitions_scanned,
+            "events_scanned": self.events_scanned,
+            "matches": self.matches,
+            "alerts_raised": self.alerts_raised,
+            "created_at": self.created_at.isoformat(),
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None,
+            "error": self.error
+        }
+
+async def _soar_alert_sink(alert: Alert, event: Dict[str, Any]):
+    if soar.soar_engine:
+        await soar.soar_engine.process_alert(alert, event)
+
+class RetroHunter:
+    """Runs retro-hunt sweeps and raises one alert per indicator and tenant"""
+
+    def __init__(self, source, alert_sink: Optional[Callable] = None, partition_hours: int = 24,
+                 max_jobs: int = 100, batch_size: int = 10000):
+        self.source = source
+        self.alert_sink = alert_sink or _soar_alert_sink
+        self.partition_hours = partition_hours
+        self.batch_size = batch_size
+        self.max_jobs = max_jobs
+        self.jobs: Dict[str, RetroHuntJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self, indicators: List[ThreatIndicator], days: int = 30,
+              tenant_id: Optional[str] = None) -> RetroHuntJob:
+        """Schedule a sweep in the background and return its job record"""
+        job = RetroHuntJob(indicator_count=len(indicators), days=days, tenant_id=tenant_id)
+        self.jobs[job.id] = job
+        while len(self.jobs) > self.max_jobs:
+            self.jobs.pop(next(iter(self.jobs)))
+        task = asyncio.create_task(self.sweep(indicators, days, tenant_id, job))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+        return job
+
+    def _partitions(self, days: int, now: datetime) -> List[Tuple[datetime, datetime]]:
+        """Newest-first windows covering the lookback"""
+        step = timedelta(hours=self.partition_hours)
+        start_limit = now - timedelta(days=days)
+        partitions = []
+        end = now
+        while end > start_limit:
+            start = max(start_limit, end - step)
+            partitions.append((start, end))
+            end = start
+        return partitions
+
+    async def sweep(self, indicators: List[ThreatIndicator], days: int = 30, tenant_id: Optional[str] = None,
+                    job: Optional[RetroHuntJob] = None) -> RetroHuntJob:
+        """Scan the lookback window once per partition and raise alerts for matches"""
+        job = job or RetroHuntJob(indicator_count=len(indicators), days=days, tenant_id=tenant_id)
+        job.status = "running"
+        try:
+            matcher = IOCMatcher(indicators)
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            partitions = self._partitions(days, now) if len(matcher) else []
+            job.partitions_total = len(partitions)
+            sightings: Dict[Tuple[str, str, Optional[str]], Dict[str, Any]] = {}
+
+            for start, end in partitions:
+                # Only one batch of the partition is held in memory at a time
+                async for events in self.source.stream_partition(start, end, tenant_id, matcher.columns,
+                                                                 self.batch_size):
+                    for event in events:
+                        for match in matcher.match(event):
+                            self._record(sightings, match, event)
+                            job.matches += 1
+                    job.events_scanned += len(events)
+                job.partitions_scanned += 1
+
+            for sighting in sightings.values():
+                await self.alert_sink(*self._build_alert(sighting))
+                job.alerts_raised += 1
+
+            job.status = "completed"
+            logger.info(
+                f"Retro-hunt {job.id}: {len(matcher)} indicators over {job.events_scanned} events, "
+                f"{job.matches} matches, {job.alerts_raised} alerts"
+            )
+        except Exception as e:
+            logger.error(f"Retro-hunt {job.id} failed: {e}")
+            job.status = "failed"
+            job.error = str(e)
+        job.completed_at = datetime.now()
+        return job
+
+    @staticmethod
+    def _record(sightings: Dict, match: IOCMatch, event: Dict[str, Any]):
+        indicator = match.indicator
+        tenant = field_catalog.get_value(event, "tenant_id")
+        key = (indicator.indicator_type.value, indicator.value, tenant)
+        sighting = sightings.setdefault(key, {
+            "indicator": indicator, "tenant_id": tenant, "count": 0, "fields": set(),
+            "assets": set(), "first_seen": None, "last_seen": None, "sample_event": event
+        })
+        sighting["count"] += 1
+        sighting["fields"].add(match.field)
+        for asset_field in ("device_name", "src_endpoint_ip"):
+            asset = field_catalog.get_value(event, asset_field)
+            if asset:
+                sighting["assets"].add(str(asset))
+        seen = str(field_catalog.get_value(event, "time") or "")
+        if seen:
+            sighting["first_seen"] = min(filter(None, [sighting["first_seen"], seen]))
+            sighting["last_seen"] = max(filter(None, [sighting["last_seen"], seen]))
+
+    @staticmethod
+    def _build_alert(sighting: Dict[str, Any]) -> Tuple[Alert, Dict[str, Any]]:
+        indicator: ThreatIndicator = sighting["indicator"]
+        indicator_dict = {
+            "value": indicator.value,
+            "indicator_type": indicator.indicator_type.value,
+            "threat_level": indicator.threat_level.value,
+            "confidence": indicator.confidence,
+            "source": indicator.source,
+            "tags": indicator.tags
+        }
+        event = dict(sighting["sample_event"])
+        event["threat_intelligence"] = {
+            "indicators": [indicator_dict],
+            "max_threat_level": indicator.threat_level.value,
+            "confidence_score": indicator.confidence,
+            "retro_hunt": True
+        }
+        alert = Alert(
+            title=f"Retro-hunt: {indicator.indicator_type.value} {indicator.value} seen in {sighting['count']} past events",
+            description=(
+                f"Indicator from {indicator.source} matched {sighting['count']} historical events "
+                f"between {sighting['first_seen']} and {sighting['last_seen']} "
+                f"(fields: {', '.join(sorted(sighting['fields']))})"
+            ),
+            severity=THREAT_LEVEL_SEVERITY[indicator.threat_level],
+            source_event=event,
+            indicators=[indicator_dict],
+            affected_assets=sorted(sighting["assets"]),
+            tags=["retro-hunt", "threat-intelligence"] + list(indicator.tags)
+        )
+        return alert, event
+
+    def get_job(self, job_id: str) -> Optional[RetroHuntJob]:
+        return self.jobs.get(job_id)
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        return [job.to_dict() for job in reversed(list(self.jobs.values()))]
+
+# Global instance
+retro_hunter: Optional[RetroHunter] = None
+
+def initialize_retro_hunter(source=None, **kwargs) -> RetroHunter:
+    """Initialize the retro-hunter (DuckDB logs unless another event source is given)"""
+    global retro_hunter
+    retro_hunter = RetroHunter(source or DuckDBEventSource(), **kwargs)
+    logger.info(f"Retro-hunter initialized with {type(retro_hunter.source).__name__}")
+    return retro_hunter
@@ -5,12 +5,14 @@ Integrated with Query AST System and ClickHouse
 """
 
 import os
+import json
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 
-from fastapi import FastAPI, HTTPException, Depends, Query, Body
+from fastapi import FastAPI, HTTPException, Depends, Query, Body, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, FileResponse
 from pydantic import BaseModel
@@ -19,12 +21,26 @@ from pydantic import BaseModel
 from query_ast_schema import JupiterQueryAST, EXAMPLE_ASTS, ASTTimeRange
 from query_manager import query_manager, execute_ocsf_query, get_example_queries, QueryBackend
 from query_providers import MockQueryProvider
+from ocsf_field_catalog import field_catalog
+from ocsf_validator import ocsf_validator
+from query_suggestions import suggestion_engine
 
 # Import Phase 3, 4 & 5 components
-from threat_intelligence import initialize_threat_intelligence, enrich_event_with_threat_intel
+from threat_intelligence import initialize_threat_intelligence, enrich_event_with_threat_intel, enrich_events_with_threat_intel, get_threat_intel_cache_stats
+from threat_feeds import initialize_threat_feeds, get_threat_feed_stats, register_new_indicator_handler
+from retro_hunt import ClickHouseEventSource, DuckDBEventSource, indicator_from_record, initialize_retro_hunter
+import retro_hunt
 from soar_engine import initialize_soar_engine, process_event_for_soar
+from playbook_queue import PlaybookJobQueue
+from webhook_dispatcher import initialize_webhook_dispatcher
+import webhook_dispatcher
+from ingest_pipeline import BatchTooLarge, DuckDBEventSink, initialize_ingest_pipeline, split_body
+import ingest_pipeline
+from ingest_workers import initialize_ingest_workers
+import ingest_workers
 from reporting_engine import initialize_reporting_engine, generate_report_async
 from operations_manager import initialize_operations_manager, run_health_checks, execute_backup_job
+from http_client import initialize_http_client, http_client
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -38,6 +54,12 @@ async def lifespan(app: FastAPI):
     # Initialize query providers
     logger.info(f"Available query backends: {query_manager.get_available_backends()}")
     
+    # Shared outbound HTTP pool for threat intel, SOAR webhooks and health checks
+    await initialize_http_client({
+        "max_connections": int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+        "max_connections_per_host": int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "10"))
+    })
+    
     # Initialize Phase 3 & 4 components
     redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
     
@@ -45,6 +67,7 @@ async def lifespan(app: FastAPI):
     threat_config = {
         "cache_ttl": 3600,
         "providers": {
+            # Quotas default to the free tier (see provider_scheduler.DEFAULT_PROVIDER_LIMITS)
             "abuseipdb": {
                 "enabled": bool(os.getenv("ABUSEIPDB_API_KEY")),
                 "api_key": os.getenv("ABUSEIPDB_API_KEY", "")
@@ -58,13 +81,79 @@ async def lifespan(app: FastAPI):
             }
         }
     }
-    await initialize_threat_intelligence(redis_url, threat_config)
+    ingest_worker_count = int(os.getenv("INGEST_WORKERS", "0"))
+    # Ingest worker processes enrich too; the parent keeps one share of each provider quota
+    parent_config = dict(threat_config, quota_share=(0, ingest_worker_count + 1))
+    await initialize_threat_intelligence(redis_url, parent_config)
+    
+    # Bulk feeds (STIX/CSV/MISP) loaded into the local indicator store
+    feed_task = None
+    feeds_file = os.getenv("THREAT_FEEDS_FILE")
+    if feeds_file and os.path.exists(feeds_file):
+        with open(feeds_file) as f:
+            feed_task = initialize_threat_feeds(json.load(f))
     
     # Initialize SOAR Engine
     soar_config = {
-        "n8n_webhook_url": os.getenv("N8N_WEBHOOK_URL", "http://n8n:5678/webhook")
+        "n8n_webhook_url": os.getenv("N8N_WEBHOOK_URL", "http://n8n:5678/webhook"),
+        "alert_hot_size": int(os.getenv("ALERT_HOT_SIZE", "10000")),
+        "dedup_window": float(os.getenv("ALERT_DEDUP_WINDOW", "300"))
     }
-    initialize_soar_engine(soar_config)
+    if os.getenv("ALERT_DEDUP_FIELDS"):
+        soar_config["dedup_fields"] = [name.strip() for name in os.getenv("ALERT_DEDUP_FIELDS").split(",")]
+    soar = initialize_soar_engine(soar_config)
+    
+    # Coalesce n8n action calls into compressed NDJSON batches (needs the soar-action-batch workflow)
+    dispatcher = None
+    if os.getenv("WEBHOOK_BATCHING", "false").lower() == "true":
+        dispatcher = initialize_webhook_dispatcher({
+            "max_batch_size": int(os.getenv("WEBHOOK_BATCH_SIZE", "100")),
+            "max_wait": float(os.getenv("WEBHOOK_BATCH_WAIT", "0.5")),
+            "max_concurrency": int(os.getenv("WEBHOOK_BATCH_CONCURRENCY", "4")),
+            "batch_format": os.getenv("WEBHOOK_BATCH_FORMAT", "ndjson"),
+            "dead_letter_path": os.getenv("WEBHOOK_DEAD_LETTER_FILE", "data/webhook_dead_letter.ndjson")
+        })
+        soar.webhook_dispatcher = dispatcher
+    
+    # Alerts beyond the in-memory hot set live in the DuckDB alerts table
+    alert_flush_task = None
+    if os.getenv("ALERT_STORE_PERSIST", "true").lower() == "true":
+        try:
+            from database import get_db_manager
+            await soar.alerts.attach(get_db_manager().conn)
+            alert_flush_task = asyncio.create_task(
+                soar.alerts.run_flush_loop(float(os.getenv("ALERT_FLUSH_INTERVAL", "1")))
+            )
+        except Exception as e:
+            logger.warning(f"Alert persistence unavailable, keeping alerts in memory only: {e}")
+    
+    # Playbooks run from a durable queue so slow webhooks never hold up ingest
+    playbook_queue = None
+    soar_workers = int(os.getenv("SOAR_WORKERS", "4"))
+    if soar_workers > 0:
+        playbook_queue = PlaybookJobQueue(
+            os.getenv("SOAR_QUEUE_PATH", "data/playbook_jobs.db"),
+            visibility_timeout=float(os.getenv("SOAR_JOB_VISIBILITY_TIMEOUT", "300")),
+            max_attempts=int(os.getenv("SOAR_JOB_MAX_ATTEMPTS", "5"))
+        )
+        await soar.start_workers(playbook_queue, soar_workers)
+    
+    # Windowed playbook triggers survive restarts when a state file is configured
+    correlation_task = None
+    correlation_state_file = os.getenv("CORRELATION_STATE_FILE")
+    if correlation_state_file:
+        restored = soar.correlator.restore(correlation_state_file)
+        logger.info(f"Restored {restored} correlation windows")
+        correlation_task = asyncio.create_task(soar.correlator.run_snapshots(
+            correlation_state_file, float(os.getenv("CORRELATION_SNAPSHOT_INTERVAL", "60"))
+        ))
+    
+    # Retro-hunt historical events whenever feeds deliver new indicators
+    clickhouse_provider = query_manager.providers.get(QueryBackend.CLICKHOUSE)
+    hunter = initialize_retro_hunter(
+        ClickHouseEventSource(clickhouse_provider) if clickhouse_provider else DuckDBEventSource()
+    )
+    register_new_indicator_handler(lambda indicators: hunter.start(indicators))
     
     # Initialize Reporting Engine
     reporting_config = {
@@ -78,10 +167,80 @@ async def lifespan(app: FastAPI):
     }
     initialize_operations_manager(operations_config)
     
+    # Keep query suggestion statistics fresh from ClickHouse rollups
+    suggestion_task = None
+    if clickhouse_provider:
+        suggestion_task = asyncio.create_task(suggestion_engine.run_refresh_loop(clickhouse_provider))
+    
+    # Streaming ingest: batched parse -> validate -> enrich -> correlate -> alert -> store
+    event_sink = None
+    if os.getenv("INGEST_STORE_EVENTS", "true").lower() == "true":
+        try:
+            from database import get_db_manager
+            event_sink = DuckDBEventSink(get_db_manager().conn)
+        except Exception as e:
+            logger.warning(f"Event storage unavailable, ingest pipeline will not persist events: {e}")
+    ingest_batch_size = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+    validation_mode = os.getenv("INGEST_VALIDATION", "monitor")  # off, monitor or enforce
+    if ingest_worker_count > 0:
+        # One pipeline per process, partitioned by tenant so correlation state stays local
+        pipeline = await initialize_ingest_workers(
+            workers=ingest_worker_count,
+            config={
+                "soar": soar_config,
+                "threat_intel": threat_config,
+                "redis_url": redis_url,
+                "queue_path": playbook_queue.db_path if playbook_queue else None,
+                "queue_batches": int(os.getenv("INGEST_QUEUE_BATCHES", "64")),
+                "validation": validation_mode
+            },
+            soar=soar,
+            sink=event_sink,
+            observers=[suggestion_engine.observe],
+            partition_fields=[name.strip() for name in os.getenv("INGEST_PARTITION_FIELDS", "tenant_id").split(",")],
+            batch_size=ingest_batch_size,
+            heartbeat_timeout=float(os.getenv("INGEST_WORKER_HEARTBEAT_TIMEOUT", "15"))
+        )
+    else:
+        pipeline = await initialize_ingest_pipeline(
+            enricher=enrich_events_with_threat_intel,
+            soar=soar,
+            sink=event_sink,
+            observers=[suggestion_engine.observe],
+            batch_size=ingest_batch_size,
+            queue_batches=int(os.getenv("INGEST_QUEUE_BATCHES", "64")),
+            validator=ocsf_validator if validation_mode != "off" else None,
+            validation_mode=validation_mode
+        )
+    if os.getenv("INGEST_TCP_PORT"):
+        await pipeline.start_tcp(os.getenv("INGEST_BIND", "0.0.0.0"), int(os.getenv("INGEST_TCP_PORT")))
+    if os.getenv("INGEST_UDP_PORT"):
+        await pipeline.start_udp(os.getenv("INGEST_BIND", "0.0.0.0"), int(os.getenv("INGEST_UDP_PORT")))
+    
     logger.info("All systems initialized successfully")
     
     yield
     
+    await pipeline.stop()
+    
+    if suggestion_task:
+        suggestion_task.cancel()
+    if feed_task:
+        feed_task.cancel()
+    if correlation_task:
+        correlation_task.cancel()
+        soar.correlator.snapshot(correlation_state_file)
+    if playbook_queue:
+        await soar.stop_workers()
+        playbook_queue.close()
+    if alert_flush_task:
+        alert_flush_task.cancel()
+        await soar.alerts.flush()
+    if dispatcher:
+        await dispatcher.close()
+    
+    await http_client.close()
+    
     logger.info("Jupiter SIEM Backend shutting down...")
 
 # FastAPI application
@@ -124,6 +283,13 @@ class ThreatIntelRequest(BaseModel):
     """Request for threat intelligence enrichment"""
     event: Dict[str, Any]
 
+class RetroHuntRequest(BaseModel):
+    """Request to sweep historical events for indicators"""
+    indicators: List[Dict[str, Any]] = []
+    ioc_since: Optional[datetime] = None  # also sweep iocs added since this time
+    days: int = 30
+    tenant_id: Optional[str] = None
+
 class SOARTriggerRequest(BaseModel):
     """Request to trigger SOAR workflow"""
     event: Dict[str, Any]
@@ -289,28 +455,12 @@ async def get_ocsf_classes():
 @app.get("/api/ocsf/fields")
 async def get_ocsf_fields():
     """Get available OCSF fields for query building"""
-    return {
-        "core_fields": [
-            "time", "event_uid", "tenant_id", "class_uid", "category_uid", 
-            "activity_name", "severity", "message"
-        ],
-        "user_fields": [
-            "user.name", "user.uid", "user.type", "user.domain", "user.email"
-        ],
-        "device_fields": [
-            "device.name", "device.type", "device.ip", "device.hostname", "device.os.name"
-        ],
-        "network_fields": [
-            "src_endpoint.ip", "src_endpoint.port", "dst_endpoint.ip", "dst_endpoint.port",
-            "network.protocol"
-        ],
-        "process_fields": [
-            "process.name", "process.pid", "process.cmd_line", "process.parent.name"
-        ],
-        "file_fields": [
-            "file.name", "file.path", "file.size", "file.hash.sha256"
-        ]
+    fields = {
+        f"{group}_fields": [entry.path for entry in entries]
+        for group, entries in field_catalog.by_group().items()
     }
+    # The version travels in a header so every body value stays a field list
+    return JSONResponse(fields, headers={"X-OCSF-Catalog-Version": field_catalog.version})
 
 # ==============================================================================
 # DASHBOARD & ANALYTICS ENDPOINTS
@@ -436,6 +586,48 @@ async def enrich_with_threat_intelligence(request: ThreatIntelRequest):
         logger.error(f"Threat intelligence enrichment failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/threat-intelligence/cache-stats")
+async def threat_intelligence_cache_stats():
+    """Indicator cache and bloom prefilter statistics"""
+    return {"success": True, "stats": get_threat_intel_cache_stats()}
+
+@app.get("/api/threat-intelligence/feeds")
+async def threat_intelligence_feeds():
+    """Bulk feed ingestion status and local indicator store statistics"""
+    return {"success": True, "stats": get_threat_feed_stats()}
+
+@app.post("/api/threat-intelligence/retro-hunt")
+async def start_retro_hunt(request: RetroHuntRequest):
+    """Sweep historical events for a batch of indicators in the background"""
+    hunter = retro_hunt.retro_hunter
+    if not hunter:
+        raise HTTPException(status_code=503, detail="Retro-hunter not initialized")
+    
+    indicators = [i for i in (indicator_from_record(r) for r in request.indicators) if i]
+    if request.ioc_since:
+        if not isinstance(hunter.source, DuckDBEventSource):
+            raise HTTPException(status_code=400, detail="ioc_since requires the DuckDB event source")
+        indicators.extend(await hunter.source.load_iocs(request.ioc_since, request.tenant_id))
+    if not indicators:
+        raise HTTPException(status_code=400, detail="No valid indicators supplied")
+    
+    job = hunter.start(indicators, days=request.days, tenant_id=request.tenant_id)
+    return {"success": True, "job": job.to_dict()}
+
+@app.get("/api/threat-intelligence/retro-hunt")
+async def list_retro_hunts():
+    """Recent retro-hunt jobs"""
+    hunter = retro_hunt.retro_hunter
+    return {"success": True, "jobs": hunter.list_jobs() if hunter else []}
+
+@app.get("/api/threat-intelligence/retro-hunt/{job_id}")
+async def get_retro_hunt(job_id: str):
+    """Retro-hunt job progress"""
+    job = retro_hunt.retro_hunter.get_job(job_id) if retro_hunt.retro_hunter else None
+    if not job:
+        raise HTTPException(status_code=404, detail="Retro-hunt job not found")
+    return {"success": True, "job": job.to_dict()}
+
 @app.post("/api/soar/trigger")
 async def trigger_soar_workflow(request: SOARTriggerRequest):
     """Trigger SOAR workflow for security event"""
@@ -461,38 +653,85 @@ async def trigger_soar_workflow(request: SOARTriggerRequest):
 async def get_alerts(
     status: Optional[str] = Query(None),
     severity: Optional[str] = Query(None),
-    limit: int = Query(50, le=1000)
+    tenant_id: Optional[str] = Query(None),
+    limit: int = Query(50, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page")
 ):
-    """Get security alerts"""
+    """Get security alerts, newest first"""
     try:
         from soar_engine import soar_engine
         
         if soar_engine:
-            alerts = list(soar_engine.alerts.values())
-            
-            # Apply filters
-            if status:
-                alerts = [a for a in alerts if a.status.value == status]
-            if severity:
-                alerts = [a for a in alerts if a.severity.value == severity]
-            
-            # Sort by creation time (newest first)
-            alerts.sort(key=lambda x: x.created_at, reverse=True)
-            
-            # Apply limit
-            alerts = alerts[:limit]
+            alerts, next_cursor = await soar_engine.alerts.list_alerts(
+                tenant_id=tenant_id, severity=severity, status=status, limit=limit, cursor=cursor
+            )
             
             return {
                 "success": True,
                 "alerts": [alert.to_dict() for alert in alerts],
-                "total": len(alerts)
+                "total": len(alerts),
+                "next_cursor": next_cursor
             }
         else:
             return {"success": False, "error": "SOAR engine not initialized"}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to retrieve alerts: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/soar/dedup/stats")
+async def get_alert_dedup_stats():
+    """Alerts folded into existing ones by fingerprint"""
+    from soar_engine import soar_engine
+    
+    if not soar_engine:
+        raise HTTPException(status_code=503, detail="SOAR engine not initialized")
+    return {"success": True, "stats": soar_engine.get_dedup_stats()}
+
+@app.get("/api/soar/webhooks/stats")
+async def get_webhook_dispatch_stats():
+    """Batched n8n delivery counters per target"""
+    if not webhook_dispatcher.webhook_dispatcher:
+        raise HTTPException(status_code=503, detail="Webhook batching not enabled")
+    return {"success": True, "stats": webhook_dispatcher.webhook_dispatcher.get_stats()}
+
+@app.get("/api/soar/jobs")
+async def list_playbook_jobs(
+    status: Optional[str] = Query(None),
+    alert_id: Optional[str] = Query(None),
+    limit: int = Query(50, le=1000)
+):
+    """Queued and recent playbook executions"""
+    from soar_engine import soar_engine
+    
+    if not soar_engine or not soar_engine.job_queue:
+        raise HTTPException(status_code=503, detail="Playbook job queue not enabled")
+    jobs = await asyncio.to_thread(soar_engine.job_queue.list_jobs, status, alert_id, limit)
+    return {"success": True, "jobs": [job.to_dict() for job in jobs]}
+
+@app.get("/api/soar/jobs/stats")
+async def get_playbook_job_stats():
+    """Playbook job counts by status and queue age"""
+    from soar_engine import soar_engine
+    
+    if not soar_engine or not soar_engine.job_queue:
+        raise HTTPException(status_code=503, detail="Playbook job queue not enabled")
+    stats = await asyncio.to_thread(soar_engine.job_queue.get_stats)
+    return {"success": True, "stats": {**stats, "workers": len(soar_engine.workers)}}
+
+@app.get("/api/soar/jobs/{job_id}")
+async def get_playbook_job(job_id: str):
+    """Status and result of one playbook execution"""
+    from soar_engine import soar_engine
+    
+    if not soar_engine or not soar_engine.job_queue:
+        raise HTTPException(status_code=503, detail="Playbook job queue not enabled")
+    job = await asyncio.to_thread(soar_engine.job_queue.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Playbook job not found")
+    return {"success": True, "job": job.to_dict(include_payload=True)}
+
 @app.get("/api/soar/playbooks")
 async def get_playbooks():
     """Get available SOAR playbooks"""
@@ -633,6 +872,73 @@ async def download_report(execution_id: str):
 # INTEGRATED EVENT PROCESSING PIPELINE
 # ==============================================================================
 
+# Request limits for /api/events/batch: body as sent, body after gzip, and events
+MAX_INGEST_BODY_BYTES = int(os.getenv("INGEST_MAX_BODY_BYTES", str(16 * 1024 * 1024)))
+MAX_INGEST_BATCH_BYTES = int(os.getenv("INGEST_MAX_BATCH_BYTES", str(128 * 1024 * 1024)))
+MAX_INGEST_BATCH_EVENTS = int(os.getenv("INGEST_MAX_BATCH_EVENTS", "100000"))
+
+def _ingest_target():
+    """The worker pool in multi-process mode, else the in-process pipeline"""
+    return ingest_workers.worker_pool or ingest_pipeline.ingest_pipeline
+
+async def _read_limited_body(request: Request, limit: int) -> bytes:
+    """Request body, refused with 413 as soon as it exceeds limit bytes"""
+    try:
+        declared = int(request.headers.get("content-length") or 0)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Content-Length")
+    if declared > limit:
+        raise HTTPException(status_code=413, detail=f"Batch body exceeds {limit} bytes")
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > limit:
+            raise HTTPException(status_code=413, detail=f"Batch body exceeds {limit} bytes")
+    return bytes(body)
+
+@app.post("/api/events/batch", status_code=202)
+async def ingest_event_batch(request: Request):
+    """
+    High-volume ingest: NDJSON or a JSON array, optionally gzip-compressed.
+    Events are queued for the streaming pipeline; 503 means it is saturated and
+    the events listed in "rejected" should be retried later
+    """
+    pipeline = _ingest_target()
+    if not pipeline:
+        raise HTTPException(status_code=503, detail="Ingest pipeline not initialized")
+    body = await _read_limited_body(request, MAX_INGEST_BODY_BYTES)
+    try:
+        items = split_body(body, request.headers.get("content-encoding"),
+                           max_bytes=MAX_INGEST_BATCH_BYTES, max_events=MAX_INGEST_BATCH_EVENTS)
+    except BatchTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except (OSError, EOFError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Unreadable batch: {e}")
+    
+    timeout = float(os.getenv("INGEST_SUBMIT_TIMEOUT", "2"))
+    rejected: List[int] = []
+    accepted = await pipeline.submit(items, timeout=timeout, rejected=rejected)
+    if rejected:
+        # The single-process pipeline accepts a prefix of the batch; worker partitions
+        # reject per tenant. Accepted events are already being processed: resending
+        # them would count them again in correlation windows, and store them twice
+        # when they have no event_uid, so clients resend only these indices
+        return JSONResponse(
+            status_code=503,
+            headers={"Retry-After": "1"},
+            content={"success": False, "error": "Ingest pipeline is saturated",
+                     "accepted": accepted, "rejected": rejected}
+        )
+    return {"success": True, "accepted": accepted}
+
+@app.get("/api/events/pipeline/stats")
+async def get_ingest_pipeline_stats():
+    """Per-stage throughput, batch sizes and queue depths of the ingest pipeline (per worker in multi-process mode)"""
+    pipeline = _ingest_target()
+    if not pipeline:
+        raise HTTPException(status_code=503, detail="Ingest pipeline not initialized")
+    return {"success": True, "stats": pipeline.get_stats()}
+
 @app.post("/api/events/process")
 async def process_security_event(event: Dict[str, Any] = Body(...)):
     """
@@ -648,6 +954,9 @@ async def process_security_event(event: Dict[str, Any] = Body(...)):
             "processing_steps": []
         }
         
+        # Feed live field statistics used by query suggestions
+        suggestion_engine.observe(event)
+        
         # Step 1: Threat Intelligence Enrichment
         try:
             enriched_event = await enrich_event_with_threat_intel(event)
@@ -676,7 +985,8 @@ async def process_security_event(event: Dict[str, Any] = Body(...)):
                     "status": "success",
                     "alert_created": True,
                     "alert_id": alert.id,
-                    "playbooks_executed": len(alert.playbooks_executed)
+                    "playbooks_executed": len(alert.playbooks_executed),
+                    "playbooks_queued": len(alert.playbook_jobs)
                 })
             else:
                 processing_results["processing_steps"].append({
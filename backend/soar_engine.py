@@ -5,17 +5,31 @@ Security Orchestration, Automation and Response workflows
 """
 
 import asyncio
+import hashlib
 import json
 import logging
-from typing import Dict, List, Any, Optional, Callable
+import random
+from collections import deque
+from typing import Dict, List, Any, Optional, Callable, Tuple
 from datetime import datetime, timedelta
 from enum import Enum
 from dataclasses import dataclass, field
 from uuid import uuid4
-import aiohttp
+
+from alert_store import AlertStore
+from correlation_engine import CorrelationEngine, CorrelationRule, CorrelationTrigger
+from http_client import http_client
+from indicator_cache import MISSING, LRUTTLCache
+from ocsf_field_catalog import field_catalog
+from playbook_conditions import compile_condition
+from playbook_index import PlaybookTriggerIndex
+from playbook_queue import PlaybookJob, PlaybookJobQueue
 
 logger = logging.getLogger(__name__)
 
+# Event fields that identify a repeat of the same alert
+DEFAULT_DEDUP_FIELDS = ("tenant_id", "activity_name", "src_endpoint_ip", "device_name")
+
 class AlertSeverity(str, Enum):
     """Alert severity levels"""
     CRITICAL = "critical"
@@ -55,11 +69,20 @@ class Alert:
     mitre_techniques: List[str] = field(default_factory=list)
     affected_assets: List[str] = field(default_factory=list)
     assigned_to: Optional[str] = None
+    tenant_id: Optional[str] = None
     created_at: datetime = field(default_factory=datetime.now)
     updated_at: datetime = field(default_factory=datetime.now)
     resolved_at: Optional[datetime] = None
     tags: List[str] = field(default_factory=list)
     playbooks_executed: List[str] = field(default_factory=list)
+    playbook_jobs: List[str] = field(default_factory=list)
+    fingerprint: Optional[str] = None
+    occurrence_count: int = 1
+    last_seen: Optional[datetime] = None
+    
+    def __post_init__(self):
+        if self.tenant_id is None:
+            self.tenant_id = self.source_event.get("tenant_id")
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert alert to dictionary"""
@@ -75,12 +98,44 @@ class Alert:
             "mitre_techniques": self.mitre_techniques,
             "affected_assets": self.affected_assets,
             "assigned_to": self.assigned_to,
+            "tenant_id": self.tenant_id,
             "created_at": self.created_at.isoformat(),
             "updated_at": self.updated_at.isoformat(),
             "resolved_at": self.resolved_at.isoformat() if self.resolved_at else None,
             "tags": self.tags,
-            "playbooks_executed": self.playbooks_executed
+            "playbooks_executed": self.playbooks_executed,
+            "playbook_jobs": self.playbook_jobs,
+            "fingerprint": self.fingerprint,
+            "occurrence_count": self.occurrence_count,
+            "last_seen": self.last_seen.isoformat() if self.last_seen else None
         }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Alert":
+        """Rebuild an alert serialized with to_dict"""
+        return cls(
+            id=data["id"],
+            title=data.get("title", ""),
+            description=data.get("description", ""),
+            severity=AlertSeverity(data.get("severity", AlertSeverity.MEDIUM.value)),
+            status=AlertStatus(data.get("status", AlertStatus.OPEN.value)),
+            source_event=data.get("source_event", {}),
+            indicators=data.get("indicators", []),
+            mitre_tactics=data.get("mitre_tactics", []),
+            mitre_techniques=data.get("mitre_techniques", []),
+            affected_assets=data.get("affected_assets", []),
+            assigned_to=data.get("assigned_to"),
+            tenant_id=data.get("tenant_id"),
+            created_at=datetime.fromisoformat(data["created_at"]) if data.get("created_at") else datetime.now(),
+            updated_at=datetime.fromisoformat(data["updated_at"]) if data.get("updated_at") else datetime.now(),
+            resolved_at=datetime.fromisoformat(data["resolved_at"]) if data.get("resolved_at") else None,
+            tags=data.get("tags", []),
+            playbooks_executed=data.get("playbooks_executed", []),
+            playbook_jobs=data.get("playbook_jobs", []),
+            fingerprint=data.get("fingerprint"),
+            occurrence_count=data.get("occurrence_count", 1),
+            last_seen=datetime.fromisoformat(data["last_seen"]) if data.get("last_seen") else None
+        )
 
 @dataclass
 class PlaybookAction:
@@ -91,6 +146,8 @@ class PlaybookAction:
     timeout_seconds: int = 300
     retry_count: int = 3
     condition: Optional[str] = None  # Condition for execution
+    # Names of actions that must finish first; None means "after the previous action"
+    depends_on: Optional[List[str]] = None
 
 @dataclass
 class Playbook:
@@ -109,11 +166,30 @@ class SOAREngine:
     
     def __init__(self, config: Dict[str, Any]):
         self.config = config
-        self.alerts = {}  # In production, this would be MongoDB
+        self.alerts = AlertStore(
+            hot_size=config.get("alert_hot_size", 10000),
+            flush_batch_size=config.get("alert_flush_batch_size", 500)
+        )
         self.playbooks = {}
-        self.execution_history = []
+        self.trigger_index = PlaybookTriggerIndex()
+        self.correlator = CorrelationEngine(max_keys=config.get("correlation_max_keys", 100000))
+        self.execution_history = deque(maxlen=config.get("execution_history_size", 1000))
         self.action_handlers = {}
         self.n8n_webhook_url = config.get("n8n_webhook_url", "http://n8n:5678/webhook")
+        self.max_concurrent_actions = config.get("max_concurrent_actions", 20)
+        self.retry_backoff_base = config.get("action_retry_backoff", 1.0)
+        self.retry_backoff_max = config.get("action_retry_backoff_max", 30.0)
+        self._action_semaphore: Optional[asyncio.Semaphore] = None
+        self.job_queue: Optional[PlaybookJobQueue] = None
+        # Batched delivery to n8n; None posts one request per action
+        self.webhook_dispatcher = None
+        # Repeats of an open alert within the window are folded into it instead of re-running playbooks
+        self.dedup_window = config.get("dedup_window", 300)
+        self.dedup_accessors = [field_catalog.accessor(name) for name in config.get("dedup_fields", DEFAULT_DEDUP_FIELDS)]
+        self.dedup_cache = LRUTTLCache(max_size=config.get("dedup_max_keys", 100000), ttl=self.dedup_window)
+        self.alerts_folded = 0
+        self._conditions: Dict[str, Callable[[Dict[str, Any], Any], Any]] = {}
+        self.workers: List[asyncio.Task] = []
         self._register_default_actions()
         self._load_default_playbooks()
     
@@ -154,12 +230,14 @@ class SOAREngine:
                 PlaybookAction(
                     name="Quarantine malicious file",
                     action_type="containment",
-                    parameters={"action": "quarantine"}
+                    parameters={"action": "quarantine"},
+                    depends_on=["Enrich with threat intelligence"]
                 ),
                 PlaybookAction(
                     name="Isolate affected host",
                     action_type="containment", 
-                    parameters={"isolation_type": "network"}
+                    parameters={"isolation_type": "network"},
+                    depends_on=["Enrich with threat intelligence"]
                 ),
                 PlaybookAction(
                     name="Notify security team",
@@ -167,12 +245,14 @@ class SOAREngine:
                     parameters={
                         "recipients": ["security-team@company.com"],
                         "urgency": "high"
-                    }
+                    },
+                    depends_on=["Enrich with threat intelligence"]
                 ),
                 PlaybookAction(
                     name="Create incident ticket",
                     action_type="investigation",
-                    parameters={"priority": "high", "category": "malware"}
+                    parameters={"priority": "high", "category": "malware"},
+                    depends_on=["Enrich with threat intelligence"]
                 )
             ]
         )
@@ -190,22 +270,26 @@ class SOAREngine:
                 PlaybookAction(
                     name="Block source IP",
                     action_type="containment",
-                    parameters={"duration": "1h", "scope": "global"}
+                    parameters={"duration": "1h", "scope": "global"},
+                    depends_on=[]
                 ),
                 PlaybookAction(
                     name="Disable targeted account",
                     action_type="containment",
-                    parameters={"duration": "2h", "require_approval": True}
+                    parameters={"duration": "2h", "require_approval": True},
+                    depends_on=[]
                 ),
                 PlaybookAction(
                     name="Hunt for lateral movement",
                     action_type="investigation",
-                    parameters={"timeframe": "24h", "scope": "network"}
+                    parameters={"timeframe": "24h", "scope": "network"},
+                    depends_on=[]
                 ),
                 PlaybookAction(
                     name="Generate forensic report", 
                     action_type="investigation",
-                    parameters={"include_timeline": True}
+                    parameters={"include_timeline": True},
+                    depends_on=["Hunt for lateral movement"]
                 )
             ]
         )
@@ -229,49 +313,193 @@ class SOAREngine:
                 PlaybookAction(
                     name="Collect process artifacts",
                     action_type="investigation",
-                    parameters={"include_memory_dump": True}
+                    parameters={"include_memory_dump": True},
+                    depends_on=["Terminate suspicious process"]
                 ),
                 PlaybookAction(
                     name="Scan process parent chain", 
                     action_type="investigation",
-                    parameters={"depth": 5}
+                    parameters={"depth": 5},
+                    depends_on=["Terminate suspicious process"]
                 ),
                 PlaybookAction(
                     name="Update detection rules",
                     action_type="enrichment",
-                    parameters={"rule_type": "behavioral"}
+                    parameters={"rule_type": "behavioral"},
+                    depends_on=["Scan process parent chain"]
                 )
             ]
         )
         
-        self.playbooks = {
-            "malware_detection": malware_playbook,
-            "brute_force_response": brute_force_playbook,
-            "suspicious_process_response": process_playbook
-        }
+        self.playbooks = {}
+        for playbook in (malware_playbook, brute_force_playbook, process_playbook):
+            self.add_playbook(playbook)
+    
+    def add_playbook(self, playbook: Playbook):
+        """Register a playbook, or re-index one whose triggers or priority changed"""
+        self._action_order(playbook)  # reject unknown dependencies and cycles up front
+        for action in playbook.actions:
+            if action.condition:
+                self._compiled_condition(action.condition)  # ConditionError is a ValueError
+        self.playbooks[playbook.id] = playbook
+        self.trigger_index.add(playbook)
+        
+        # Windowed "event_count" triggers are counted by the correlation engine
+        event_count = playbook.trigger_conditions.get("event_count")
+        if isinstance(event_count, dict):
+            self.correlator.add_rule(CorrelationRule.from_condition(playbook.id, event_count))
+        else:
+            self.correlator.remove_rule(playbook.id)
+    
+    def remove_playbook(self, playbook_id: str) -> Optional[Playbook]:
+        """Unregister a playbook"""
+        self.trigger_index.remove(playbook_id)
+        self.correlator.remove_rule(playbook_id)
+        return self.playbooks.pop(playbook_id, None)
     
     async def process_security_event(self, event: Dict[str, Any]) -> Optional[Alert]:
         """Process security event and trigger appropriate playbooks"""
         try:
-            # Check if event should generate an alert
-            alert = await self._create_alert_from_event(event)
-            if not alert:
-                return None
-            
-            # Store alert
-            self.alerts[alert.id] = alert
-            
-            # Find and execute matching playbooks
-            matching_playbooks = self._find_matching_playbooks(event, alert)
-            for playbook in matching_playbooks:
-                await self._execute_playbook(playbook, alert, event)
-            
-            return alert
+            # Every event is matched so windowed triggers see the ones that don't alert
+            matching_playbooks, triggers = self._match_playbooks(event)
+            return await self.raise_alert(event, matching_playbooks, triggers)
             
         except Exception as e:
             logger.error(f"Error processing security event: {e}")
             return None
     
+    async def raise_alert(self, event: Dict[str, Any], matching_playbooks: List[Playbook],
+                          triggers: List[CorrelationTrigger]) -> Optional[Alert]:
+        """Alert (new or folded) for an event already run through _match_playbooks"""
+        # Check if event should generate an alert
+        alert = await self._create_alert_from_event(event)
+        if alert:
+            existing = await self._fold_duplicate(alert, event)
+            if existing:
+                return existing
+        else:
+            if not triggers:
+                return None
+            alert = self._create_correlation_alert(event, triggers)
+            fired = {trigger.rule for trigger in triggers}
+            matching_playbooks = [p for p in matching_playbooks if p.id in fired]
+        
+        return await self.process_alert(alert, event, matching_playbooks)
+    
+    async def process_alert(self, alert: Alert, event: Dict[str, Any],
+                            playbooks: Optional[List[Playbook]] = None) -> Alert:
+        """Store an alert raised elsewhere (e.g. retro-hunts) and run matching playbooks"""
+        # Store alert
+        self.alerts.save(alert)
+        
+        # Find and execute matching playbooks, via the job queue when workers are running
+        matching_playbooks = self._find_matching_playbooks(event, alert) if playbooks is None else playbooks
+        for playbook in matching_playbooks:
+            if self.job_queue:
+                job = await self.job_queue.enqueue(playbook.id, alert.id, {"alert": alert.to_dict(), "event": event})
+                alert.playbook_jobs.append(job.id)
+            else:
+                await self._execute_playbook(playbook, alert, event)
+        
+        return alert
+    
+    def _alert_fingerprint(self, alert: Alert, event: Dict[str, Any]) -> str:
+        """Stable hash of the configured event fields; severity is included so escalations alert again"""
+        parts = [alert.severity.value] + [str(accessor(event)) for accessor in self.dedup_accessors]
+        return hashlib.sha1("\x1f".join(parts).encode()).hexdigest()
+    
+    async def _fold_duplicate(self, alert: Alert, event: Dict[str, Any]) -> Optional[Alert]:
+        """The alert this one repeats, updated with the new occurrence; None for a new alert"""
+        if not self.dedup_window:
+            return None
+        alert.fingerprint = self._alert_fingerprint(alert, event)
+        existing_id = self.dedup_cache.get(alert.fingerprint)
+        existing = None if existing_id is MISSING else await self.alerts.fetch(existing_id)
+        if existing is None or existing.status not in (AlertStatus.OPEN, AlertStatus.INVESTIGATING):
+            self.dedup_cache.set(alert.fingerprint, alert.id)
+            return None
+        
+        existing.occurrence_count += 1
+        existing.last_seen = alert.created_at
+        existing.updated_at = datetime.now()
+        self.alerts.save(existing)
+        self.alerts_folded += 1
+        return existing
+    
+    def get_dedup_stats(self) -> Dict[str, Any]:
+        return {
+            "window": self.dedup_window,
+            "alerts_folded": self.alerts_folded,
+            "fingerprints": self.dedup_cache.get_stats()
+        }
+    
+    async def start_workers(self, queue: PlaybookJobQueue, count: int = 4):
+        """Run playbooks from a durable queue instead of inline with ingest"""
+        self.job_queue = queue
+        self.workers = [asyncio.create_task(self._worker_loop(f"soar-worker-{i}")) for i in range(count)]
+        logger.info(f"Started {count} SOAR playbook workers")
+    
+    async def stop_workers(self):
+        """Stop claiming jobs; a job interrupted mid-run is reclaimed after its visibility timeout"""
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        self.job_queue = None
+    
+    async def _worker_loop(self, name: str):
+        queue = self.job_queue
+        while True:
+            try:
+                job = await queue.claim(name)
+                if job:
+                    await self._run_job(queue, job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"SOAR worker {name} error: {e}")
+                await asyncio.sleep(1)
+    
+    async def _run_job(self, queue: PlaybookJobQueue, job: PlaybookJob):
+        """Execute one queued playbook run and record its outcome"""
+        claim = {"worker": job.worker, "attempt": job.attempts}
+        playbook = self.playbooks.get(job.playbook_id)
+        if playbook is None:
+            await queue.fail(job.id, f"Unknown playbook: {job.playbook_id}", **claim)
+            return
+        alert = await self.alerts.fetch(job.alert_id)
+        if alert is None:
+            # Queued before a restart and never persisted; the payload carries the alert
+            alert = Alert.from_dict(job.payload["alert"])
+            self.alerts.save(alert)
+        
+        # Retries and backoff can outlast the visibility timeout, so keep the claim alive while running
+        heartbeat = asyncio.create_task(self._heartbeat_job(queue, job))
+        try:
+            execution_log = await self._execute_playbook(playbook, alert, job.payload.get("event", {}))
+        finally:
+            heartbeat.cancel()
+        if execution_log["status"] == PlaybookStatus.FAILED:
+            status = await queue.fail(job.id, execution_log.get("error", "Playbook execution failed"), **claim)
+            logger.warning(f"Playbook job {job.id} attempt {job.attempts} failed, now {status}")
+        elif not await queue.complete(job.id, {
+            "execution_id": execution_log["execution_id"],
+            "actions_completed": execution_log["actions_completed"],
+            "actions_total": execution_log["actions_total"]
+        }, **claim):
+            logger.warning(f"Playbook job {job.id} attempt {job.attempts} finished after losing its claim")
+    
+    async def _heartbeat_job(self, queue: PlaybookJobQueue, job: PlaybookJob):
+        """Extend a running job's visibility timeout until cancelled or the claim is lost"""
+        while True:
+            await asyncio.sleep(queue.visibility_timeout / 3)
+            try:
+                if not await queue.heartbeat(job.id, job.worker, job.attempts):
+                    logger.warning(f"Playbook job {job.id} claim lost; another worker may run it")
+                    return
+            except Exception as e:
+                logger.warning(f"Heartbeat for playbook job {job.id} failed: {e}")
+    
     async def _create_alert_from_event(self, event: Dict[str, Any]) -> Optional[Alert]:
         """Create alert from security event if conditions are met"""
         
@@ -321,45 +549,43 @@ class SOAREngine:
         
         return alert
     
-    def _find_matching_playbooks(self, event: Dict[str, Any], alert: Alert) -> List[Playbook]:
-        """Find playbooks that match the event/alert"""
+    def _create_correlation_alert(self, event: Dict[str, Any], triggers: List[CorrelationTrigger]) -> Alert:
+        """Alert for a windowed threshold crossed by otherwise unremarkable events"""
+        trigger = triggers[0]
+        group = ", ".join(f"{name}={value}" for name, value in trigger.group.items() if value is not None)
+        return Alert(
+            title=f"{self.playbooks[trigger.rule].name}: {trigger.count} events in {int(trigger.window)}s",
+            description=f"Correlation threshold reached for {group or 'all events'}",
+            severity=AlertSeverity.HIGH,
+            source_event=event,
+            mitre_tactics=self._extract_mitre_tactics(event),
+            mitre_techniques=self._extract_mitre_techniques(event),
+            affected_assets=self._extract_affected_assets(event),
+            tags=self._generate_alert_tags(event) + ["correlation"]
+        )
+    
+    def _match_playbooks(self, event: Dict[str, Any]) -> Tuple[List[Playbook], List[CorrelationTrigger]]:
+        """Matching playbooks, highest priority first, and the windowed triggers this event fired"""
         matching_playbooks = []
-        
-        for playbook in self.playbooks.values():
+        triggers = []
+        for playbook_id in self.trigger_index.match(event):
+            playbook = self.playbooks[playbook_id]
             if not playbook.enabled:
                 continue
-                
-            if self._check_trigger_conditions(playbook.trigger_conditions, event, alert):
-                matching_playbooks.append(playbook)
-        
-        # Sort by priority
-        matching_playbooks.sort(key=lambda p: p.priority, reverse=True)
-        return matching_playbooks
-    
-    def _check_trigger_conditions(self, conditions: Dict[str, Any], event: Dict[str, Any], alert: Alert) -> bool:
-        """Check if trigger conditions are met"""
-        for key, expected_values in conditions.items():
-            if key == "class_uid":
-                if event.get("class_uid") not in expected_values:
-                    return False
-            elif key == "activity_name":
-                if event.get("activity_name") not in expected_values:
-                    return False
-            elif key == "threat_intelligence.max_threat_level":
-                threat_level = event.get("threat_intelligence", {}).get("max_threat_level")
-                if threat_level not in expected_values:
-                    return False
-            elif key == "risk_score":
-                risk_score = event.get("risk_score", 0)
-                if "min" in expected_values and risk_score < expected_values["min"]:
-                    return False
-                if "max" in expected_values and risk_score > expected_values["max"]:
-                    return False
-        
-        return True
-    
-    async def _execute_playbook(self, playbook: Playbook, alert: Alert, event: Dict[str, Any]):
-        """Execute playbook actions"""
+            if playbook_id in self.correlator.rules:
+                trigger = self.correlator.observe_rule(playbook_id, event)
+                if trigger is None:
+                    continue
+                triggers.append(trigger)
+            matching_playbooks.append(playbook)
+        return matching_playbooks, triggers
+    
+    def _find_matching_playbooks(self, event: Dict[str, Any], alert: Alert) -> List[Playbook]:
+        """Find playbooks that match the event/alert, highest priority first"""
+        return self._match_playbooks(event)[0]
+    
+    async def _execute_playbook(self, playbook: Playbook, alert: Alert, event: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute playbook actions and return the execution log"""
         execution_id = str(uuid4())
         
         logger.info(f"Executing playbook '{playbook.name}' for alert {alert.id}")
@@ -376,29 +602,7 @@ class SOAREngine:
         }
         
         try:
-            for i, action in enumerate(playbook.actions):
-                logger.info(f"Executing action: {action.name}")
-                
-                # Check condition if specified
-                if action.condition and not self._evaluate_condition(action.condition, event, alert):
-                    logger.info(f"Skipping action '{action.name}' - condition not met")
-                    continue
-                
-                # Execute action
-                action_result = await self._execute_action(action, alert, event)
-                execution_log["results"].append({
-                    "action": action.name,
-                    "status": "success" if action_result.get("success") else "failed",
-                    "result": action_result,
-                    "timestamp": datetime.now().isoformat()
-                })
-                
-                execution_log["actions_completed"] = i + 1
-                
-                # Stop on critical failure
-                if not action_result.get("success") and action_result.get("critical", False):
-                    logger.error(f"Critical action failed: {action.name}")
-                    break
+            await self._run_action_graph(playbook, alert, event, execution_log)
             
             execution_log["status"] = PlaybookStatus.SUCCESS
             execution_log["completed_at"] = datetime.now().isoformat()
@@ -406,6 +610,7 @@ class SOAREngine:
             # Update alert
             alert.playbooks_executed.append(execution_id)
             alert.updated_at = datetime.now()
+            self.alerts.save(alert)
             
         except Exception as e:
             logger.error(f"Playbook execution failed: {e}")
@@ -414,6 +619,113 @@ class SOAREngine:
             execution_log["completed_at"] = datetime.now().isoformat()
         
         self.execution_history.append(execution_log)
+        return execution_log
+    
+    @staticmethod
+    def _action_dependencies(playbook: Playbook) -> Dict[str, List[str]]:
+        """Action name -> names it waits for; actions without depends_on follow the previous one"""
+        dependencies = {}
+        previous = None
+        for action in playbook.actions:
+            if action.name in dependencies:
+                raise ValueError(f"Playbook '{playbook.id}' has duplicate action '{action.name}'")
+            if action.depends_on is None:
+                dependencies[action.name] = [previous] if previous else []
+            else:
+                dependencies[action.name] = list(action.depends_on)
+            previous = action.name
+        for name, needs in dependencies.items():
+            for dependency in needs:
+                if dependency not in dependencies:
+                    raise ValueError(f"Action '{name}' in playbook '{playbook.id}' depends on unknown action '{dependency}'")
+        return dependencies
+    
+    def _action_order(self, playbook: Playbook) -> List[PlaybookAction]:
+        """Actions in dependency order; raises ValueError on cycles"""
+        dependencies = self._action_dependencies(playbook)
+        actions = {action.name: action for action in playbook.actions}
+        ordered, state = [], {}
+        
+        def visit(name: str, path: Tuple[str, ...]):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Playbook '{playbook.id}' has a dependency cycle: {' -> '.join(path + (name,))}")
+            state[name] = "visiting"
+            for dependency in dependencies[name]:
+                visit(dependency, path + (name,))
+            state[name] = "done"
+            ordered.append(actions[name])
+        
+        for action in playbook.actions:
+            visit(action.name, ())
+        return ordered
+    
+    async def _run_action_graph(self, playbook: Playbook, alert: Alert, event: Dict[str, Any],
+                                execution_log: Dict[str, Any]):
+        """Run actions as soon as their dependencies finish, independent ones concurrently"""
+        if self._action_semaphore is None:
+            self._action_semaphore = asyncio.Semaphore(self.max_concurrent_actions)
+        dependencies = self._action_dependencies(playbook)
+        tasks: Dict[str, asyncio.Task] = {}
+        halted = asyncio.Event()
+        
+        async def run(action: PlaybookAction):
+            if dependencies[action.name]:
+                await asyncio.gather(*(tasks[name] for name in dependencies[action.name]))
+            if halted.is_set():
+                execution_log["results"].append({
+                    "action": action.name,
+                    "status": "cancelled",
+                    "timestamp": datetime.now().isoformat()
+                })
+                return
+            
+            # Check condition if specified
+            if action.condition and not self._evaluate_condition(action.condition, event, alert):
+                logger.info(f"Skipping action '{action.name}' - condition not met")
+                execution_log["actions_completed"] += 1
+                return
+            
+            logger.info(f"Executing action: {action.name}")
+            async with self._action_semaphore:
+                action_result = await self._execute_action_with_retries(action, alert, event)
+            execution_log["results"].append({
+                "action": action.name,
+                "status": "success" if action_result.get("success") else "failed",
+                "result": action_result,
+                "timestamp": datetime.now().isoformat()
+            })
+            execution_log["actions_completed"] += 1
+            
+            # Stop on critical failure
+            if not action_result.get("success") and action_result.get("critical", False):
+                logger.error(f"Critical action failed: {action.name}")
+                halted.set()
+        
+        for action in self._action_order(playbook):
+            tasks[action.name] = asyncio.create_task(run(action))
+        await asyncio.gather(*tasks.values())
+    
+    async def _execute_action_with_retries(self, action: PlaybookAction, alert: Alert,
+                                           event: Dict[str, Any]) -> Dict[str, Any]:
+        """Run an action under its timeout, retrying failures with full-jitter backoff"""
+        attempts = max(0, action.retry_count) + 1
+        for attempt in range(attempts):
+            try:
+                result = await asyncio.wait_for(
+                    self._execute_action(action, alert, event), timeout=action.timeout_seconds
+                )
+            except asyncio.TimeoutError:
+                result = {"success": False, "error": f"Timed out after {action.timeout_seconds}s"}
+            if result.get("success") or "dead_lettered" in result:
+                break  # the webhook dispatcher already retried this delivery and dead-lettered it
+            if attempt < attempts - 1:
+                delay = random.uniform(0, min(self.retry_backoff_max, self.retry_backoff_base * (2 ** attempt)))
+                logger.warning(f"Action '{action.name}' failed (attempt {attempt + 1}/{attempts}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+        result["attempts"] = attempt + 1
+        return result
     
     async def _execute_action(self, action: PlaybookAction, alert: Alert, event: Dict[str, Any]) -> Dict[str, Any]:
         """Execute individual SOAR action"""
@@ -535,33 +847,41 @@ class SOAREngine:
             "event": event
         }
         
+        if self.webhook_dispatcher:
+            return await self.webhook_dispatcher.submit(
+                f"{self.n8n_webhook_url}/soar-action-batch", webhook_payload, key=f"{alert.id}:{action.name}"
+            )
+        
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.n8n_webhook_url}/soar-action",
-                    json=webhook_payload,
-                    timeout=aiohttp.ClientTimeout(total=action.timeout_seconds)
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        return {"success": True, "result": result}
-                    else:
-                        return {"success": False, "error": f"HTTP {response.status}"}
+            async with http_client.post(
+                f"{self.n8n_webhook_url}/soar-action",
+                json=webhook_payload,
+                timeout=action.timeout_seconds
+            ) as response:
+                if response.status == 200:
+                    result = await response.json()
+                    return {"success": True, "result": result}
+                else:
+                    return {"success": False, "error": f"HTTP {response.status}"}
         
         except Exception as e:
             logger.error(f"n8n webhook execution failed: {e}")
             return {"success": False, "error": str(e)}
     
+    def _compiled_condition(self, condition: str) -> Callable[[Dict[str, Any], Any], Any]:
+        """Condition compiled once per distinct text"""
+        compiled = self._conditions.get(condition)
+        if compiled is None:
+            compiled = self._conditions[condition] = compile_condition(condition)
+        return compiled
+    
     def _evaluate_condition(self, condition: str, event: Dict[str, Any], alert: Alert) -> bool:
         """Evaluate action condition"""
-        # Simple condition evaluation - in production, use a proper expression parser
         try:
-            # Replace placeholders with actual values
-            condition = condition.replace("${risk_score}", str(event.get("risk_score", 0)))
-            condition = condition.replace("${severity}", f"'{alert.severity.value}'")
-            return eval(condition)  # SECURITY: Never use eval in production!
-        except:
-            return True
+            return bool(self._compiled_condition(condition)(event, alert))
+        except ValueError as e:
+            logger.error(f"Invalid action condition, skipping action: {e}")
+            return False
     
     # Utility methods for alert generation
     def _generate_alert_title(self, event: Dict[str, Any]) -> str:
@@ -646,6 +966,7 @@ def initialize_soar_engine(config: Dict[str, Any]):
     global soar_engine
     soar_engine = SOAREngine(config)
     logger.info("SOAR Engine initialized")
+    return soar_engine
 
 async def process_event_for_soar(event: Dict[str, Any]) -> Optional[Alert]:
     """Process event through SOAR engine (convenience function)"""
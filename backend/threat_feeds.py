@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+"""
+Jupiter SIEM Threat Feed Ingestion
+Downloads bulk STIX 2.x, CSV and MISP feeds on a schedule and normalizes them
+into a local in-memory indicator store so enrichment is a dictionary or interval
+lookup, with external reputation APIs consulted only for unknown indicators
+"""
+
+import asyncio
+import csv
+import io
+import json
+import logging
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from enum import Enum
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from http_client import http_client
+from ip_ranges import IPIntervalIndex, is_cidr, parse_ip
+from threat_intelligence import IndicatorType, ThreatIndicator, ThreatLevel, normalize_indicator
+import threat_intelligence
+
+logger = logging.getLogger(__name__)
+
+THREAT_LEVEL_RANK = {
+    ThreatLevel.INFO: 0, ThreatLevel.LOW: 1, ThreatLevel.MEDIUM: 2,
+    ThreatLevel.HIGH: 3, ThreatLevel.CRITICAL: 4
+}
+
+# STIX cyber-observable types to indicator types
+STIX_OBJECT_TYPES = {
+    "ipv4-addr": IndicatorType.IP_ADDRESS,
+    "ipv6-addr": IndicatorType.IP_ADDRESS,
+    "domain-name": IndicatorType.DOMAIN,
+    "url": IndicatorType.URL,
+    "file": IndicatorType.FILE_HASH,
+    "email-addr": IndicatorType.EMAIL,
+    "mutex": IndicatorType.MUTEX,
+    "windows-registry-key": IndicatorType.REGISTRY_KEY,
+}
+
+# MISP attribute types to indicator types
+MISP_ATTRIBUTE_TYPES = {
+    "ip-src": IndicatorType.IP_ADDRESS,
+    "ip-dst": IndicatorType.IP_ADDRESS,
+    "domain": IndicatorType.DOMAIN,
+    "hostname": IndicatorType.DOMAIN,
+    "url": IndicatorType.URL,
+    "md5": IndicatorType.FILE_HASH,
+    "sha1": IndicatorType.FILE_HASH,
+    "sha256": IndicatorType.FILE_HASH,
+    "email-src": IndicatorType.EMAIL,
+    "email-dst": IndicatorType.EMAIL,
+    "mutex": IndicatorType.MUTEX,
+    "regkey": IndicatorType.REGISTRY_KEY,
+    "user-agent": IndicatorType.USER_AGENT,
+}
+
+MISP_THREAT_LEVELS = {"1": ThreatLevel.HIGH, "2": ThreatLevel.MEDIUM, "3": ThreatLevel.LOW, "4": ThreatLevel.INFO}
+
+_STIX_COMPARISON = re.compile(r"([\w-]+):([^\s=]+)\s*=\s*'((?:[^'\\]|\\.)*)'")
+_HASH_PATTERN = re.compile(r"^[0-9a-fA-F]{32}$|^[0-9a-fA-F]{40}$|^[0-9a-fA-F]{64}$")
+_DOMAIN_PATTERN = re.compile(r"^(?=.{1,253}$)(?:[a-zA-Z0-9-]{1,63}\.)+[a-zA-Z]{2,63}$")
+
+class FeedFormat(str, Enum):
+    """Supported bulk feed formats"""
+    STIX = "stix"
+    CSV = "csv"
+    MISP = "misp"
+    AUTO = "auto"
+
+@dataclass
+class FeedConfig:
+    """Bulk threat feed source"""
+    name: str
+    location: str  # local path or http(s) mirror URL
+    format: FeedFormat = FeedFormat.AUTO
+    refresh_interval: int = 3600  # seconds
+    ttl: int = 86400  # seconds an indicator stays valid without a refresh
+    threat_level: ThreatLevel = ThreatLevel.HIGH
+    confidence: float = 0.8
+    enabled: bool = True
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FeedConfig":
+        return cls(
+            name=data["name"],
+            location=data["location"],
+            format=FeedFormat(data.get("format", "auto")),
+            refresh_interval=data.get("refresh_interval", 3600),
+            ttl=data.get("ttl", 86400),
+            threat_level=ThreatLevel(data.get("threat_level", "high")),
+            confidence=data.get("confidence", 0.8),
+            enabled=data.get("enabled", True)
+        )
+
+def infer_indicator_type(value: str) -> Optional[IndicatorType]:
+    """Guess the indicator type of a bare feed value"""
+    value = value.strip()
+    if parse_ip(value) is not None or is_cidr(value):
+        return IndicatorType.IP_ADDRESS
+    if _HASH_PATTERN.match(value):
+        return IndicatorType.FILE_HASH
+    if value.lower().startswith(("http://", "https://")):
+        return IndicatorType.URL
+    if "@" in value:
+        return IndicatorType.EMAIL
+    if _DOMAIN_PATTERN.match(value):
+        return IndicatorType.DOMAIN
+    return None
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        # Naive local time, matching the rest of the threat-intel module
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        return parsed.astimezone().replace(tzinfo=None) if parsed.tzinfo else parsed
+    except ValueError:
+        return None
+
+def _make_indicator(feed: FeedConfig, value: str, indicator_type: IndicatorType, now: datetime,
+                    threat_level: Optional[ThreatLevel] = None, confidence: Optional[float] = None,
+                    tags: Optional[List[str]] = None, context: Optional[Dict[str, Any]] = None,
+                    expires: Optional[datetime] = None) -> ThreatIndicator:
+    return ThreatIndicator(
+        value=normalize_indicator(value, indicator_type),
+        indicator_type=indicator_type,
+        threat_level=threat_level or feed.threat_level,
+        confidence=feed.confidence if confidence is None else confidence,
+        source=feed.name,
+        first_seen=now,
+        last_seen=now,
+        tags=tags or [],
+        context=context or {},
+        ttl=expires or now + timedelta(seconds=feed.ttl)
+    )
+
+def parse_stix(data: Dict[str, Any], feed: FeedConfig) -> List[ThreatIndicator]:
+    """Indicators from a STIX 2.x bundle (indicator patterns and bare observables)"""
+    now = datetime.now()
+    indicators = []
+    for obj in data.get("objects", []):
+        obj_type = obj.get("type")
+        if obj_type == "indicator":
+            if obj.get("revoked") or obj.get("pattern_type", "stix") != "stix":
+                continue
+            confidence = obj["confidence"] / 100.0 if "confidence" in obj else None
+            expires = _parse_timestamp(obj.get("valid_until"))
+            if expires and expires < now:
+                continue
+            tags = list(obj.get("labels", [])) + list(obj.get("indicator_types", []))
+            context = {"stix_id": obj.get("id"), "name": obj.get("name")}
+            for object_type, _, value in _STIX_COMPARISON.findall(obj.get("pattern", "")):
+                indicator_type = STIX_OBJECT_TYPES.get(object_type)
+                if indicator_type:
+                    indicators.append(_make_indicator(
+                        feed, value.replace("\\'", "'"), indicator_type, now,
+                        confidence=confidence, tags=tags, context=context, expires=expires
+                    ))
+        elif obj_type in STIX_OBJECT_TYPES and obj.get("value"):
+            indicators.append(_make_indicator(feed, obj["value"], STIX_OBJECT_TYPES[obj_type], now))
+    return indicators
+
+def parse_csv(text: str, feed: FeedConfig) -> List[ThreatIndicator]:
+    """
+    Indicators from a CSV feed
+    Accepts a header with an indicator/value/ioc column (plus optional type,
+    threat_level, confidence and tags columns) or headerless one-value-per-line
+    lists; '#' comment lines are skipped
+    """
+    now = datetime.now()
+    lines = [line for line in text.splitlines() if line.strip() and not line.lstrip().startswith("#")]
+    if not lines:
+        return []
+
+    rows = list(csv.reader(io.StringIO("\n".join(lines))))
+    header = [column.strip().lower() for column in rows[0]]
+    value_column = next((header.index(c) for c in ("indicator", "value", "ioc") if c in header), None)
+    if value_column is None:
+        header, value_column = [], 0
+    else:
+        rows = rows[1:]
+
+    def column(row: List[str], name: str) -> Optional[str]:
+        if name in header and header.index(name) < len(row):
+            return row[header.index(name)].strip() or None
+        return None
+
+    indicators = []
+    for row in rows:
+        if value_column >= len(row) or not row[value_column].strip():
+            continue
+        value = row[value_column].strip()
+        try:
+            indicator_type = IndicatorType(column(row, "type")) if column(row, "type") else infer_indicator_type(value)
+            threat_level = ThreatLevel(column(row, "threat_level").lower()) if column(row, "threat_level") else None
+            confidence = float(column(row, "confidence")) if column(row, "confidence") else None
+        except ValueError:
+            logger.debug(f"Skipping malformed row in feed {feed.name}: {row}")
+            continue
+        if indicator_type is None:
+            continue
+        if confidence is not None and confidence > 1:
+            confidence /= 100.0
+        tags = [t for t in re.split(r"[;|]", column(row, "tags") or "") if t]
+        indicators.append(_make_indicator(
+            feed, value, indicator_type, now, threat_level=threat_level, confidence=confidence, tags=tags
+        ))
+    return indicators
+
+def parse_misp(data: Any, feed: FeedConfig) -> List[ThreatIndicator]:
+    """Indicators from MISP event exports (single event, list, or REST response)"""
+    now = datetime.now()
+    if isinstance(data, dict) and "response" in data:
+        data = data["response"]
+    events = data if isinstance(data, list) else [data]
+
+    indicators = []
+    for wrapper in events:
+        event = wrapper.get("Event", wrapper)
+        threat_level = MISP_THREAT_LEVELS.get(str(event.get("threat_level_id")))
+        event_tags = [tag.get("name") for tag in event.get("Tag", []) if tag.get("name")]
+        attributes = list(event.get("Attribute", []))
+        for misp_object in event.get("Object", []):
+            attributes.extend(misp_object.get("Attribute", []))
+
+        for attribute in attributes:
+            if not attribute.get("to_ids", True) or attribute.get("deleted"):
+                continue
+            types = attribute.get("type", "").split("|")
+            values = str(attribute.get("value", "")).split("|")
+            for attribute_type, value in zip(types, values):
+                indicator_type = MISP_ATTRIBUTE_TYPES.get(attribute_type)
+                if indicator_type and value:
+                    tags = event_tags + [tag.get("name") for tag in attribute.get("Tag", []) if tag.get("name")]
+                    indicators.append(_make_indicator(
+                        feed, value, indicator_type, now, threat_level=threat_level, tags=tags,
+                        context={"misp_event": event.get("uuid") or event.get("id"), "category": attribute.get("category")}
+                    ))
+    return indicators
+
+def parse_feed(text: str, feed: FeedConfig) -> List[ThreatIndicator]:
+    """Parse feed content, detecting the format when configured as auto"""
+    feed_format = feed.format
+    data = None
+    if feed_format == FeedFormat.AUTO:
+        stripped = text.lstrip()
+        if stripped.startswith(("{", "[")):
+            data = json.loads(text)
+            is_bundle = isinstance(data, dict) and (data.get("type") == "bundle" or "objects" in data)
+            feed_format = FeedFormat.STIX if is_bundle else FeedFormat.MISP
+        else:
+            feed_format = FeedFormat.CSV
+
+    if feed_format == FeedFormat.CSV:
+        return parse_csv(text, feed)
+    data = json.loads(text) if data is None else data
+    if feed_format == FeedFormat.STIX:
+        return parse_stix(data, feed)
+    return parse_misp(data, feed)
+
+class LocalIndicatorStore:
+    """
+    In-memory indicator index built from bulk feeds
+    Exact indicators live in per-type hash maps; IP feed entries that are CIDR
+    blocks go into an interval index. Each feed replaces its own entries on
+    refresh, and entries expire lazily on lookup and eagerly on purge.
+
+    Indexes are rebuilt as a whole and swapped in, never mutated, so the async
+    update methods build them in a worker thread while lookups keep using the
+    previous index
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, List[ThreatIndicator]] = {}
+        self._exact: Dict[IndicatorType, Dict[str, ThreatIndicator]] = {}
+        self._networks = IPIntervalIndex()
+        self._next_expiry: Optional[datetime] = None
+        self._update_lock = asyncio.Lock()
+        self.lookups = 0
+        self.hits = 0
+
+    def replace_source(self, source: str, indicators: Iterable[ThreatIndicator]) -> List[ThreatIndicator]:
+        """Swap in a feed's latest indicators, returning those the feed did not list before"""
+        sources = dict(self._sources)
+        sources[source] = list(indicators)
+        added = self._added(source, sources[source])
+        self._swap(sources, self._build(sources))
+        return added
+
+    async def replace_sources(self, updates: Dict[str, List[ThreatIndicator]]) -> Dict[str, List[ThreatIndicator]]:
+        """replace_source for several feeds with one rebuild, built off the event loop"""
+        async with self._update_lock:
+            sources = dict(self._sources)
+            sources.update(updates)
+            added = {source: self._added(source, indicators) for source, indicators in updates.items()}
+            self._swap(sources, await asyncio.to_thread(self._build, sources))
+            return added
+
+    def remove_source(self, source: str):
+        if source in self._sources:
+            sources = dict(self._sources)
+            del sources[source]
+            self._swap(sources, self._build(sources))
+
+    def purge_expired(self) -> int:
+        """Drop expired indicators, returning how many were removed"""
+        if not self._expiry_due():
+            return 0
+        sources, removed = self._unexpired(self._sources)
+        if removed:
+            self._swap(sources, self._build(sources))
+        return removed
+
+    async def purge_expired_async(self) -> int:
+        """purge_expired with the scan and rebuild in a worker thread"""
+        if not self._expiry_due():
+            return 0
+        async with self._update_lock:
+            def purge():
+                sources, removed = self._unexpired(self._sources)
+                return sources, removed, self._build(sources) if removed else None
+
+            sources, removed, built = await asyncio.to_thread(purge)
+            if removed:
+                self._swap(sources, built)
+            return removed
+
+    def _expiry_due(self) -> bool:
+        return self._next_expiry is not None and self._next_expiry < datetime.now()
+
+    def _added(self, source: str, indicators: List[ThreatIndicator]) -> List[ThreatIndicator]:
+        previous = {(i.indicator_type, i.value) for i in self._sources.get(source, [])}
+        return [i for i in indicators if (i.indicator_type, i.value) not in previous]
+
+    @staticmethod
+    def _unexpired(sources: Dict[str, List[ThreatIndicator]]) -> Tuple[Dict[str, List[ThreatIndicator]], int]:
+        now = datetime.now()
+        live_sources, removed = {}, 0
+        for source, indicators in sources.items():
+            live = [i for i in indicators if not i.ttl or i.ttl >= now]
+            removed += len(indicators) - len(live)
+            live_sources[source] = live
+        return live_sources, removed
+
+    @staticmethod
+    def _build(sources: Dict[str, List[ThreatIndicator]]) -> tuple:
+        """(exact maps, interval index, earliest expiry) for a set of sources"""
+        exact: Dict[IndicatorType, Dict[str, ThreatIndicator]] = {}
+        networks: Dict[str, ThreatIndicator] = {}
+        next_expiry = None
+        for indicators in sources.values():
+            for indicator in indicators:
+                if indicator.ttl and (next_expiry is None or indicator.ttl < next_expiry):
+                    next_expiry = indicator.ttl
+                if indicator.indicator_type == IndicatorType.IP_ADDRESS and is_cidr(indicator.value):
+                    target, key = networks, indicator.value
+                else:
+                    target, key = exact.setdefault(indicator.indicator_type, {}), indicator.value
+                current = target.get(key)
+                # Overlapping feeds: keep the most severe, then most confident, verdict
+                if current is None or (THREAT_LEVEL_RANK[indicator.threat_level], indicator.confidence) > \
+                        (THREAT_LEVEL_RANK[current.threat_level], current.confidence):
+                    target[key] = indicator
+        return exact, IPIntervalIndex(networks.items()), next_expiry
+
+    def _swap(self, sources: Dict[str, List[ThreatIndicator]], built: tuple):
+        self._sources = sources
+        self._exact, self._networks, self._next_expiry = built
+
+    def lookup(self, value: str, indicator_type: IndicatorType) -> Optional[ThreatIndicator]:
+        """Feed verdict for an indicator, or None when no live feed lists it"""
+        self.lookups += 1
+        key = normalize_indicator(value, indicator_type)
+        indicator = self._exact.get(indicator_type, {}).get(key)
+        if indicator is None and indicator_type == IndicatorType.IP_ADDRESS:
+            indicator = self._networks.lookup(key)
+        if indicator is None or (indicator.ttl and indicator.ttl < datetime.now()):
+            return None
+        self.hits += 1
+        return indicator
+
+    def exact_keys(self) -> Iterable[Tuple[str, IndicatorType]]:
+        """(value, type) pairs of exact indicators, e.g. for a bloom prefilter"""
+        exact = self._exact  # a later swap does not disturb an iteration in progress
+        for indicator_type, indicators in exact.items():
+            for value in indicators:
+                yield value, indicator_type
+
+    def __len__(self) -> int:
+        return sum(len(indicators) for indicators in self._exact.values()) + len(self._networks)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "indicators": len(self),
+            "by_type": {t.value: len(indicators) for t, indicators in self._exact.items()},
+            "ip_networks": len(self._networks),
+            "sources": {source: len(indicators) for source, indicators in self._sources.items()},
+            "lookups": self.lookups,
+            "hits": self.hits
+        }
+
+class ThreatFeedIngestor:
+    """Scheduled download, parse and load of configured feeds"""
+
+    def __init__(self, store: LocalIndicatorStore, feeds: List[FeedConfig], manager=None):
+        self.store = store
+        self.feeds = [feed for feed in feeds if feed.enabled]
+        self.manager = manager
+        self.feed_status: Dict[str, Dict[str, Any]] = {}
+        # Called with indicators that appeared in a refreshed feed (e.g. retro-hunts)
+        self.new_indicator_handlers: List[Callable[[List[ThreatIndicator]], Any]] = []
+        if manager is not None:
+            manager.local_store = store
+
+    async def _read(self, feed: FeedConfig) -> str:
+        if feed.location.startswith(("http://", "https://")):
+            async with http_client.get(feed.location, timeout=120) as response:
+                response.raise_for_status()
+                return await response.text()
+        return await asyncio.to_thread(Path(feed.location).read_text, encoding="utf-8")
+
+    async def ingest_feed(self, feed: FeedConfig) -> int:
+        """Refresh one feed, returning the number of indicators loaded"""
+        return (await self._ingest([feed]))[feed.name]
+
+    async def _fetch(self, feed: FeedConfig) -> Optional[List[ThreatIndicator]]:
+        started = datetime.now()
+        try:
+            text = await self._read(feed)
+            indicators = await asyncio.to_thread(parse_feed, text, feed)
+        except Exception as e:
+            logger.error(f"Threat feed {feed.name} ingestion failed: {e}")
+            self.feed_status.setdefault(feed.name, {})["error"] = str(e)
+            self.feed_status[feed.name]["last_failure"] = started.isoformat()
+            return None
+        self.feed_status.setdefault(feed.name, {})["duration_seconds"] = (datetime.now() - started).total_seconds()
+        return indicators
+
+    async def _ingest(self, feeds: List[FeedConfig]) -> Dict[str, int]:
+        """Download and parse feeds concurrently, then load them with a single index rebuild"""
+        results = await asyncio.gather(*(self._fetch(feed) for feed in feeds))
+        updates = {feed.name: indicators for feed, indicators in zip(feeds, results) if indicators is not None}
+        if not updates:
+            return {feed.name: 0 for feed in feeds}
+        first_loads = {name for name in updates if "last_success" not in self.feed_status.get(name, {})}
+        added = await self.store.replace_sources(updates)
+
+        now = datetime.now().isoformat()
+        for name, indicators in updates.items():
+            self.feed_status[name].update({"last_success": now, "indicators": len(indicators), "error": None})
+            logger.info(f"Loaded {len(indicators)} indicators from feed {name}")
+        # The first load is the baseline; only later additions are news
+        news = [indicator for name, new in added.items() if name not in first_loads for indicator in new]
+        if news:
+            await self._notify_new_indicators(news)
+        return {feed.name: len(updates.get(feed.name) or []) for feed in feeds}
+
+    async def _notify_new_indicators(self, indicators: List[ThreatIndicator]):
+        for handler in self.new_indicator_handlers:
+            try:
+                result = handler(indicators)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.error(f"New indicator handler failed: {e}")
+
+    async def ingest_all(self) -> Dict[str, int]:
+        """Refresh every enabled feed concurrently"""
+        counts = await self._ingest(self.feeds)
+        await self._refresh_prefilter()
+        return counts
+
+    async def _refresh_prefilter(self):
+        if self.manager is not None:
+            await self.manager.refresh_known_bad(self.store.exact_keys())
+
+    async def run_schedule(self, tick: float = 60.0):
+        """Refresh each feed on its own interval and purge expired indicators"""
+        next_run = {feed.name: 0.0 for feed in self.feeds}
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            due = [feed for feed in self.feeds if next_run[feed.name] <= now]
+            if due:
+                await self._ingest(due)
+                for feed in due:
+                    next_run[feed.name] = now + feed.refresh_interval
+            if await self.store.purge_expired_async() or due:
+                await self._refresh_prefilter()
+            await asyncio.sleep(tick)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"feeds": self.feed_status, "store": self.store.get_stats()}
+
+# Global instance
+feed_ingestor: Optional[ThreatFeedIngestor] = None
+
+def initialize_threat_feeds(feeds: List[Dict[str, Any]]) -> Optional[asyncio.Task]:
+    """Attach a feed-backed local store to the threat manager and start the refresh schedule"""
+    global feed_ingestor
+
+    if not feeds:
+        return None
+
+    feed_ingestor = ThreatFeedIngestor(
+        LocalIndicatorStore(),
+        [FeedConfig.from_dict(feed) for feed in feeds],
+        manager=threat_intelligence.threat_manager
+    )
+    logger.info(f"Threat feed ingestion scheduled for {len(feed_ingestor.feeds)} feeds")
+    return asyncio.create_task(feed_ingestor.run_schedule())
+
+def register_new_indicator_handler(handler: Callable[[List[ThreatIndicator]], Any]):
+    """Subscribe to indicators that newly appear in refreshed feeds"""
+    if feed_ingestor:
+        feed_ingestor.new_indicator_handlers.append(handler)
+
+def get_threat_feed_stats() -> Dict[str, Any]:
+    """Feed and local store statistics (convenience function)"""
+    return feed_ingestor.get_stats() if feed_ingestor else {}
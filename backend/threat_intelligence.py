@@ -7,14 +7,20 @@ Integrates with external threat feeds and enriches security events
 import asyncio
 import logging
 import json
-from typing import Dict, List, Any, Optional, Set
+from typing import Dict, List, Any, Optional, Set, Iterable
 from datetime import datetime, timedelta
 from dataclasses import dataclass
 from enum import Enum
 import hashlib
-import aiohttp
 import redis.asyncio as aioredis
 
+from http_client import http_client
+from indicator_cache import BloomFilter, LRUTTLCache, MISSING
+from provider_scheduler import DEFAULT_PRIORITY, QuotaExhausted, build_schedulers, event_priority
+
+from ip_ranges import PRIVATE_CIDRS, compile_ranges, parse_ip
+from ocsf_field_catalog import field_catalog
+
 logger = logging.getLogger(__name__)
 
 class ThreatLevel(str, Enum):
@@ -36,6 +42,16 @@ class IndicatorType(str, Enum):
     MUTEX = "mutex"
     REGISTRY_KEY = "registry"
 
+def normalize_indicator(value: str, indicator_type: IndicatorType) -> str:
+    """Canonical lookup key: case-folded, IPs in compressed form"""
+    value = value.strip()
+    if indicator_type == IndicatorType.IP_ADDRESS:
+        address = parse_ip(value)
+        return str(address) if address is not None else value
+    if indicator_type in (IndicatorType.DOMAIN, IndicatorType.FILE_HASH, IndicatorType.EMAIL):
+        return value.lower().rstrip(".")
+    return value
+
 @dataclass
 class ThreatIndicator:
     """Threat intelligence indicator"""
@@ -91,33 +107,32 @@ class AbuseIPDBProvider(ThreatIntelligenceProvider):
                 "verbose": ""
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.base_url}/check", headers=headers, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        ip_data = data.get("data", {})
+            async with http_client.get(f"{self.base_url}/check", headers=headers, params=params) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    ip_data = data.get("data", {})
                         
-                        if ip_data.get("abuseConfidencePercentage", 0) > 0:
-                            threat_level = self._map_confidence_to_threat_level(
-                                ip_data.get("abuseConfidencePercentage", 0)
-                            )
+                    if ip_data.get("abuseConfidencePercentage", 0) > 0:
+                        threat_level = self._map_confidence_to_threat_level(
+                            ip_data.get("abuseConfidencePercentage", 0)
+                        )
                             
-                            return ThreatIndicator(
-                                value=indicator,
-                                indicator_type=IndicatorType.IP_ADDRESS,
-                                threat_level=threat_level,
-                                confidence=ip_data.get("abuseConfidencePercentage", 0) / 100.0,
-                                source="AbuseIPDB",
-                                first_seen=datetime.now(),
-                                last_seen=datetime.now(),
-                                tags=["malicious_ip", "abuse"],
-                                context={
-                                    "country_code": ip_data.get("countryCode"),
-                                    "usage_type": ip_data.get("usageType"),
-                                    "isp": ip_data.get("isp"),
-                                    "total_reports": ip_data.get("totalReports", 0)
-                                }
-                            )
+                        return ThreatIndicator(
+                            value=indicator,
+                            indicator_type=IndicatorType.IP_ADDRESS,
+                            threat_level=threat_level,
+                            confidence=ip_data.get("abuseConfidencePercentage", 0) / 100.0,
+                            source="AbuseIPDB",
+                            first_seen=datetime.now(),
+                            last_seen=datetime.now(),
+                            tags=["malicious_ip", "abuse"],
+                            context={
+                                "country_code": ip_data.get("countryCode"),
+                                "usage_type": ip_data.get("usageType"),
+                                "isp": ip_data.get("isp"),
+                                "total_reports": ip_data.get("totalReports", 0)
+                            }
+                        )
         
         except Exception as e:
             logger.error(f"AbuseIPDB lookup failed for {indicator}: {e}")
@@ -164,35 +179,34 @@ class VirusTotalProvider(ThreatIntelligenceProvider):
             else:
                 return None
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.base_url}/{endpoint}", params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
+            async with http_client.get(f"{self.base_url}/{endpoint}", params=params) as response:
+                if response.status == 200:
+                    data = await response.json()
                         
-                        if data.get("response_code") == 1:
-                            positives = data.get("positives", 0)
-                            total = data.get("total", 1)
-                            detection_ratio = positives / total if total > 0 else 0
+                    if data.get("response_code") == 1:
+                        positives = data.get("positives", 0)
+                        total = data.get("total", 1)
+                        detection_ratio = positives / total if total > 0 else 0
                             
-                            if detection_ratio > 0:
-                                threat_level = self._map_detection_to_threat_level(detection_ratio)
+                        if detection_ratio > 0:
+                            threat_level = self._map_detection_to_threat_level(detection_ratio)
                                 
-                                return ThreatIndicator(
-                                    value=indicator,
-                                    indicator_type=indicator_type,
-                                    threat_level=threat_level,
-                                    confidence=detection_ratio,
-                                    source="VirusTotal",
-                                    first_seen=datetime.now(),
-                                    last_seen=datetime.now(),
-                                    tags=["malware", "virus"],
-                                    context={
-                                        "positives": positives,
-                                        "total": total,
-                                        "scan_date": data.get("scan_date"),
-                                        "detection_ratio": detection_ratio
-                                    }
-                                )
+                            return ThreatIndicator(
+                                value=indicator,
+                                indicator_type=indicator_type,
+                                threat_level=threat_level,
+                                confidence=detection_ratio,
+                                source="VirusTotal",
+                                first_seen=datetime.now(),
+                                last_seen=datetime.now(),
+                                tags=["malware", "virus"],
+                                context={
+                                    "positives": positives,
+                                    "total": total,
+                                    "scan_date": data.get("scan_date"),
+                                    "detection_ratio": detection_ratio
+                                }
+                            )
         
         except Exception as e:
             logger.error(f"VirusTotal lookup failed for {indicator}: {e}")
@@ -218,6 +232,10 @@ class MITREAttackProvider(ThreatIntelligenceProvider):
         self.techniques_cache = {}
         self.last_update = None
     
+    async def lookup_indicator(self, indicator: str, indicator_type: IndicatorType) -> Optional[ThreatIndicator]:
+        """ATT&CK maps techniques, not indicators"""
+        return None
+    
     async def fetch_techniques(self) -> Dict[str, Any]:
         """Fetch MITRE ATT&CK techniques"""
         # In production, this would fetch from MITRE ATT&CK STIX data
@@ -251,7 +269,30 @@ class ThreatIntelligenceManager:
         self.config = config
         self.providers = []
         self.cache_ttl = config.get("cache_ttl", 3600)  # 1 hour default
+        self.negative_cache_ttl = config.get("negative_cache_ttl", self.cache_ttl // 4)
+        # In-process tier in front of Redis for indicators that repeat within seconds
+        self.local_cache = LRUTTLCache(
+            max_size=config.get("local_cache_size", 10000),
+            ttl=config.get("local_cache_ttl", 300)
+        )
+        # Exact indicators listed by loaded feeds. A bloom miss only means no feed
+        # lists the indicator (so the feed store is not probed); it is not a clean verdict
+        self.known_bad: Optional[BloomFilter] = None
+        self.bloom_prefilter = config.get("bloom_prefilter", True)
+        self.prefiltered = 0
+        # Feed-backed in-memory indicator index (see threat_feeds)
+        self.local_store = None
+        # Internal/reserved ranges are never sent to external reputation providers
+        self.excluded_networks = compile_ranges(config.get("excluded_networks", PRIVATE_CIDRS))
         self._initialize_providers()
+        # Bound in-flight requests per provider so large batches respect upstream limits
+        self.provider_semaphores = {
+            provider.name: asyncio.Semaphore(provider.config.get("max_concurrency", 5))
+            for provider in self.providers
+        }
+        # Token-bucket queues for providers with API quotas
+        self.provider_schedulers = build_schedulers(self.providers, redis_client, config.get("quota_max_wait", 30.0),
+                                                    tuple(config.get("quota_share", (0, 1))))
     
     def _initialize_providers(self):
         """Initialize threat intelligence providers"""
@@ -273,17 +314,33 @@ class ThreatIntelligenceManager:
     
     async def enrich_event(self, event: Dict[str, Any]) -> Dict[str, Any]:
         """Enrich security event with threat intelligence"""
-        enriched_event = event.copy()
-        enrichments = []
+        return (await self.enrich_events([event]))[0]
+    
+    async def enrich_events(self, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Enrich a batch of security events
+        Each distinct indicator in the batch is looked up once: cache hits are
+        resolved with a single MGET and misses fan out to providers concurrently
+        """
+        event_indicators = [self._extract_indicators(event) for event in events]
         
-        # Extract indicators from event
-        indicators = self._extract_indicators(event)
+        # Quota-limited providers serve indicators from the most severe events first
+        priorities = {}
+        for event, indicators in zip(events, event_indicators):
+            priority = event_priority(event)
+            for indicator in indicators:
+                priorities[indicator] = min(priority, priorities.get(indicator, priority))
         
-        # Look up each indicator
-        for indicator_value, indicator_type in indicators:
-            threat_info = await self._lookup_indicator_cached(indicator_value, indicator_type)
-            if threat_info:
-                enrichments.append(threat_info)
+        results = await self._lookup_indicators_batch(list(priorities), priorities)
+        
+        return [
+            self._apply_enrichments(event, [results[i] for i in dict.fromkeys(indicators) if results.get(i)])
+            for event, indicators in zip(events, event_indicators)
+        ]
+    
+    def _apply_enrichments(self, event: Dict[str, Any], enrichments: List[ThreatIndicator]) -> Dict[str, Any]:
+        """Attach threat intelligence results to a copy of the event"""
+        enriched_event = event.copy()
         
         # Add enrichments to event
         if enrichments:
@@ -310,19 +367,22 @@ class ThreatIntelligenceManager:
         
         # Extract IP addresses
         for ip_field in ["src_endpoint_ip", "dst_endpoint_ip", "device_ip"]:
-            if ip_field in event and event[ip_field]:
-                indicators.append((event[ip_field], IndicatorType.IP_ADDRESS))
+            value = field_catalog.get_value(event, ip_field)
+            if value and not self.excluded_networks.contains(value):
+                indicators.append((value, IndicatorType.IP_ADDRESS))
         
         # Extract file hashes
         for hash_field in ["file_hash_sha256", "file_hash_md5", "file_hash_sha1"]:
-            if hash_field in event and event[hash_field]:
-                indicators.append((event[hash_field], IndicatorType.FILE_HASH))
+            value = field_catalog.get_value(event, hash_field)
+            if value:
+                indicators.append((value, IndicatorType.FILE_HASH))
         
         # Extract domains from URLs
-        if "http_url" in event and event["http_url"]:
+        url = field_catalog.get_value(event, "http_url")
+        if url:
             try:
                 from urllib.parse import urlparse
-                domain = urlparse(event["http_url"]).netloc
+                domain = urlparse(url).netloc
                 if domain:
                     indicators.append((domain, IndicatorType.DOMAIN))
             except Exception:
@@ -332,44 +392,162 @@ class ThreatIntelligenceManager:
     
     async def _lookup_indicator_cached(self, indicator: str, indicator_type: IndicatorType) -> Optional[ThreatIndicator]:
         """Look up indicator with caching"""
-        cache_key = f"threat_intel:{indicator_type.value}:{indicator}"
+        results = await self._lookup_indicators_batch([(indicator, indicator_type)])
+        return results.get((indicator, indicator_type))
+    
+    async def _lookup_indicators_batch(self, indicators: List[tuple],
+                                       priorities: Optional[Dict[tuple, int]] = None) -> Dict[tuple, Optional[ThreatIndicator]]:
+        """
+        Look up distinct indicators through the cache tiers and providers
+        Order: in-process LRU, local feed store (behind the bloom prefilter), one
+        Redis MGET, concurrent providers. Indicators no feed lists are unknown and
+        fall through to Redis and the providers. Negative results are cached in
+        both cache tiers and count as hits
+        """
+        results = {}
+        pending = []
+        for key in indicators:
+            cached = self.local_cache.get(key)
+            if cached is not MISSING:
+                results[key] = cached
+                continue
+            feed_hit = self._feed_verdict(*key)
+            if feed_hit:
+                results[key] = feed_hit
+            else:
+                pending.append(key)
+        
+        if not pending:
+            return results
         
-        # Check cache first
+        cache_keys = [self._cache_key(indicator, indicator_type) for indicator, indicator_type in pending]
+        
+        # Check Redis next, one round-trip for the whole batch
         try:
-            cached_result = await self.redis.get(cache_key)
-            if cached_result:
-                cached_data = json.loads(cached_result)
-                if cached_data.get("threat_level"):  # Valid cached result
-                    return self._dict_to_threat_indicator(cached_data)
+            cached_results = await self.redis.mget(cache_keys)
         except Exception as e:
-            logger.warning(f"Cache lookup failed for {cache_key}: {e}")
+            logger.warning(f"Cache lookup failed for {len(cache_keys)} indicators: {e}")
+            cached_results = [None] * len(cache_keys)
         
-        # Look up in providers
-        for provider in self.providers:
+        misses = []
+        for key, cached_result in zip(pending, cached_results):
             try:
-                result = await provider.lookup_indicator(indicator, indicator_type)
-                if result:
-                    # Cache the result
-                    try:
-                        await self.redis.setex(
-                            cache_key,
-                            self.cache_ttl,
-                            json.dumps(self._threat_indicator_to_dict(result))
-                        )
-                    except Exception as e:
-                        logger.warning(f"Cache store failed for {cache_key}: {e}")
-                    
-                    return result
+                if cached_result:
+                    cached_data = json.loads(cached_result)
+                    result = self._dict_to_threat_indicator(cached_data) if cached_data.get("threat_level") else None
+                    results[key] = result
+                    self.local_cache.set(key, result, None if result else self._local_negative_ttl)
+                    continue
             except Exception as e:
-                logger.error(f"Provider {provider.name} lookup failed for {indicator}: {e}")
+                logger.warning(f"Invalid cache entry for {key[0]}: {e}")
+            misses.append(key)
+        
+        # Look up misses in providers concurrently
+        priorities = priorities or {}
+        skipped = set()
+        lookups = await asyncio.gather(*(
+            self._lookup_providers(*key, priorities.get(key, DEFAULT_PRIORITY), skipped) for key in misses
+        ))
+        
+        # A miss caused by an exhausted quota is not a clean verdict; leave it uncached
+        cacheable = []
+        for key, result in zip(misses, lookups):
+            results[key] = result
+            if result or key not in skipped:
+                cacheable.append((key, result))
+                self.local_cache.set(key, result, None if result else self._local_negative_ttl)
         
-        # Cache negative result to prevent repeated lookups
         try:
-            await self.redis.setex(cache_key, self.cache_ttl // 4, json.dumps({"threat_level": None}))
-        except Exception:
-            pass
+            pipeline = self.redis.pipeline(transaction=False)
+            for (indicator, indicator_type), result in cacheable:
+                cache_key = self._cache_key(indicator, indicator_type)
+                if result:
+                    pipeline.setex(cache_key, self.cache_ttl, json.dumps(self._threat_indicator_to_dict(result)))
+                else:
+                    # Cache negative result to prevent repeated lookups
+                    pipeline.setex(cache_key, self.negative_cache_ttl, json.dumps({"threat_level": None}))
+            if cacheable:
+                await pipeline.execute()
+        except Exception as e:
+            logger.warning(f"Cache store failed for {len(cacheable)} indicators: {e}")
         
-        return None
+        return results
+    
+    @property
+    def _local_negative_ttl(self) -> float:
+        return min(self.local_cache.ttl, self.negative_cache_ttl)
+    
+    @staticmethod
+    def _cache_key(indicator: str, indicator_type: IndicatorType) -> str:
+        return f"threat_intel:{indicator_type.value}:{indicator}"
+    
+    def _feed_verdict(self, indicator: str, indicator_type: IndicatorType) -> Optional[ThreatIndicator]:
+        """Local feed store verdict, or None when no loaded feed lists the indicator"""
+        if self.local_store is None:
+            return None
+        # IPs can match feed CIDR blocks, which the bloom filter does not hold
+        if self.bloom_prefilter and self.known_bad and indicator_type != IndicatorType.IP_ADDRESS:
+            if self._cache_key(normalize_indicator(indicator, indicator_type), indicator_type) not in self.known_bad:
+                self.prefiltered += 1
+                return None
+        return self.local_store.lookup(indicator, indicator_type)
+    
+    def load_known_bad(self, indicators: Iterable[tuple], error_rate: float = 0.001):
+        """Replace the bloom prefilter with normalized (value, IndicatorType) pairs from threat feeds"""
+        self._install_known_bad(self._build_known_bad(indicators, error_rate))
+
+    async def refresh_known_bad(self, indicators: Iterable[tuple], error_rate: float = 0.001):
+        """load_known_bad with the filter built in a worker thread"""
+        self._install_known_bad(await asyncio.to_thread(self._build_known_bad, indicators, error_rate))
+
+    def _build_known_bad(self, indicators: Iterable[tuple], error_rate: float) -> BloomFilter:
+        return BloomFilter.from_iterable(
+            (self._cache_key(value, indicator_type) for value, indicator_type in indicators),
+            error_rate=error_rate
+        )
+
+    def _install_known_bad(self, known_bad: BloomFilter):
+        self.known_bad = known_bad
+        # Cached negatives may predate the new feed contents
+        self.local_cache.clear()
+        logger.info(f"Loaded {len(self.known_bad)} known-bad indicators into bloom prefilter")
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Hit rates for the in-process tier and bloom prefilter"""
+        return {
+            "local_cache": self.local_cache.get_stats(),
+            "bloom_filter": self.known_bad.get_stats() if self.known_bad else None,
+            "bloom_prefilter_enabled": self.bloom_prefilter,
+            "prefiltered_lookups": self.prefiltered,
+            "local_store": self.local_store.get_stats() if self.local_store else None,
+            "provider_schedulers": {name: scheduler.get_stats() for name, scheduler in self.provider_schedulers.items()}
+        }
+    
+    async def _lookup_providers(self, indicator: str, indicator_type: IndicatorType,
+                                priority: int = DEFAULT_PRIORITY, skipped: Optional[Set[tuple]] = None) -> Optional[ThreatIndicator]:
+        """Query all providers concurrently; the first provider in priority order with a hit wins"""
+        responses = await asyncio.gather(*(
+            self._lookup_provider(provider, indicator, indicator_type, priority, skipped) for provider in self.providers
+        ))
+        return next((response for response in responses if response), None)
+    
+    async def _lookup_provider(self, provider: ThreatIntelligenceProvider, indicator: str, indicator_type: IndicatorType,
+                               priority: int = DEFAULT_PRIORITY, skipped: Optional[Set[tuple]] = None) -> Optional[ThreatIndicator]:
+        """Single provider lookup through its quota scheduler, or under its concurrency limit"""
+        try:
+            scheduler = self.provider_schedulers.get(provider.name)
+            if scheduler:
+                return await scheduler.submit(indicator, indicator_type, priority)
+            async with self.provider_semaphores[provider.name]:
+                return await provider.lookup_indicator(indicator, indicator_type)
+        except QuotaExhausted as e:
+            logger.debug(f"Skipping {provider.name} lookup for {indicator}: {e}")
+            if skipped is not None:
+                skipped.add((indicator, indicator_type))
+            return None
+        except Exception as e:
+            logger.error(f"Provider {provider.name} lookup failed for {indicator}: {e}")
+            return None
     
     def _threat_indicator_to_dict(self, indicator: ThreatIndicator) -> Dict[str, Any]:
         """Convert ThreatIndicator to dictionary"""
@@ -442,7 +620,7 @@ class ThreatIntelligenceManager:
         
         # Basic technique mapping based on event content
         activity_name = event.get("activity_name", "")
-        process_name = event.get("process_name", "")
+        process_name = field_catalog.get_value(event, "process_name") or ""
         
         if "powershell" in process_name.lower():
             mappings["T1059.001"] = {
@@ -476,4 +654,14 @@ async def enrich_event_with_threat_intel(event: Dict[str, Any]) -> Dict[str, Any
     """Enrich event with threat intelligence (convenience function)"""
     if threat_manager:
         return await threat_manager.enrich_event(event)
-    return event
\ No newline at end of file
+    return event
+
+async def enrich_events_with_threat_intel(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Enrich a batch of events with threat intelligence (convenience function)"""
+    if threat_manager:
+        return await threat_manager.enrich_events(events)
+    return events
+
+def get_threat_intel_cache_stats() -> Dict[str, Any]:
+    """Cache tier statistics (convenience function)"""
+    return threat_manager.get_cache_stats() if threat_manager else {}
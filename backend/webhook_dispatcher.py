@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Jupiter SIEM Batched Webhook Dispatcher
+Buffers outgoing SOAR webhook calls per target URL and delivers them as one
+NDJSON (or JSON array) request per batch, gzip-compressed, once a size, byte or
+time threshold is reached. Each target has its own concurrency limit; batches
+that still fail after retries are appended to a dead-letter file for replay
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from http_client import CircuitOpenError, http_client
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {"ndjson": "application/x-ndjson", "json": "application/json"}
+
+@dataclass
+class WebhookDispatcherConfig:
+    """Batching thresholds, delivery and dead-letter settings"""
+    max_batch_size: int = 100
+    max_batch_bytes: int = 1_000_000
+    max_wait: float = 0.5
+    max_concurrency: int = 4  # in-flight batches per target
+    batch_format: str = "ndjson"
+    compress: bool = True
+    max_retries: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 10.0
+    request_timeout: float = 30.0
+    dead_letter_path: str = "data/webhook_dead_letter.ndjson"
+
+    @classmethod
+    def from_dict(cls, config: Dict[str, Any]) -> "WebhookDispatcherConfig":
+        return cls(**{k: v for k, v in config.items() if k in cls.__dataclass_fields__})
+
+@dataclass
+class _Target:
+    url: str
+    semaphore: asyncio.Semaphore
+    items: List[Tuple[Optional[str], bytes, asyncio.Future]] = field(default_factory=list)
+    keys: Dict[str, asyncio.Future] = field(default_factory=dict)
+    size: int = 0
+    timer: Optional[asyncio.Task] = None
+    stats: Dict[str, int] = field(default_factory=lambda: {
+        "submitted": 0, "coalesced": 0, "batches": 0, "delivered": 0, "failed": 0,
+        "dead_lettered": 0, "bytes_raw": 0, "bytes_sent": 0
+    })
+
+class WebhookDispatcher:
+    """Per-target batching queue in front of the shared HTTP client"""
+
+    def __init__(self, config: Optional[WebhookDispatcherConfig] = None, client=None):
+        self.config = config or WebhookDispatcherConfig()
+        self.client = client or http_client
+        self._targets: Dict[str, _Target] = {}
+        self._in_flight: set = set()
+
+    def _target(self, url: str) -> _Target:
+        target = self._targets.get(url)
+        if target is None:
+            target = self._targets[url] = _Target(url, asyncio.Semaphore(self.config.max_concurrency))
+        return target
+
+    async def submit(self, url: str, payload: Dict[str, Any], key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Queue a payload and wait for its batch to be delivered
+        Payloads submitted with a key that is already buffered share that delivery
+        """
+        target = self._target(url)
+        target.stats["submitted"] += 1
+        if key is not None and key in target.keys:
+            target.stats["coalesced"] += 1
+            return await asyncio.shield(target.keys[key])
+
+        line = json.dumps(payload, default=str).encode()
+        future = asyncio.get_running_loop().create_future()
+        target.items.append((key, line, future))
+        if key is not None:
+            target.keys[key] = future
+        target.size += len(line) + 1
+
+        if len(target.items) >= self.config.max_batch_size or target.size >= self.config.max_batch_bytes:
+            self._flush_target(target)
+        elif target.timer is None:
+            target.timer = asyncio.create_task(self._flush_after(target))
+        return await asyncio.shield(future)
+
+    async def _flush_after(self, target: _Target):
+        await asyncio.sleep(self.config.max_wait)
+        target.timer = None
+        self._flush_target(target)
+
+    def _flush_target(self, target: _Target):
+        if target.timer is not None:
+            target.timer.cancel()
+            target.timer = None
+        if not target.items:
+            return
+        batch, target.items, target.keys, target.size = target.items, [], {}, 0
+        task = asyncio.create_task(self._deliver(target, batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    def _encode(self, lines: List[bytes]) -> Tuple[bytes, Dict[str, str]]:
+        if self.config.batch_format == "json":
+            body = b"[" + b",".join(lines) + b"]"
+        else:
+            body = b"\n".join(lines) + b"\n"
+        headers = {"Content-Type": CONTENT_TYPES.get(self.config.batch_format, CONTENT_TYPES["ndjson"])}
+        if self.config.compress:
+            body = gzip.compress(body, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+        return body, headers
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.config.backoff_max, self.config.backoff_base * (2 ** attempt)))
+
+    async def _deliver(self, target: _Target, batch: List[Tuple[Optional[str], bytes, asyncio.Future]]):
+        lines = [line for _, line, _ in batch]
+        target.stats["batches"] += 1
+        target.stats["bytes_raw"] += sum(len(line) + 1 for line in lines)
+
+        error = None
+        try:
+            body, headers = self._encode(lines)
+            async with target.semaphore:
+                for attempt in range(self.config.max_retries + 1):
+                    try:
+                        target.stats["bytes_sent"] += len(body)
+                        async with self.client.post(target.url, data=body, headers=headers,
+                                                    timeout=self.config.request_timeout) as response:
+                            if response.status < 300:
+                                self._resolve(batch, await self._response_results(response, len(batch)))
+                                target.stats["delivered"] += len(batch)
+                                return
+                            error = f"HTTP {response.status}"
+                            if response.status < 500 and response.status != 429:
+                                break  # the batch itself was rejected; retrying will not help
+                    except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError) as e:
+                        error = str(e) or type(e).__name__
+                    if attempt < self.config.max_retries:
+                        await asyncio.sleep(self._backoff(attempt))
+
+            logger.error(f"Webhook batch of {len(batch)} to {target.url} failed: {error}")
+            target.stats["failed"] += len(batch)
+            dead_lettered = await self._dead_letter(target, lines, error)
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_result({"success": False, "error": error, "dead_lettered": dead_lettered})
+        except Exception as e:
+            logger.error(f"Webhook batch of {len(batch)} to {target.url} failed unexpectedly: {e}")
+            target.stats["failed"] += len(batch)
+            error = str(e) or type(e).__name__
+        finally:
+            # Callers must never wait forever, whatever happened above (including cancellation)
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_result({"success": False, "error": error or "Delivery aborted",
+                                       "dead_lettered": False})
+
+    @staticmethod
+    async def _response_results(response, count: int) -> List[Any]:
+        """Per-item results when the target answers with a same-length array, else the shared body"""
+        try:
+            body = await response.json(content_type=None)
+        except (ValueError, aiohttp.ContentTypeError):
+            body = None
+        if isinstance(body, list) and len(body) == count:
+            return body
+        return [body] * count
+
+    @staticmethod
+    def _resolve(batch, results: List[Any]):
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result({"success": True, "result": result})
+
+    async def _dead_letter(self, target: _Target, lines: List[bytes], error: Optional[str]) -> bool:
+        path = self.config.dead_letter_path
+        if not path:
+            return False
+        failed_at = time.time()
+
+        def write():
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "ab") as f:
+                for line in lines:
+                    record = {"url": target.url, "error": error, "failed_at": failed_at,
+                              "payload": json.loads(line)}
+                    f.write(json.dumps(record).encode() + b"\n")
+
+        try:
+            await asyncio.to_thread(write)
+        except OSError as e:
+            logger.error(f"Could not write webhook dead letters to {path}: {e}")
+            return False
+        target.stats["dead_lettered"] += len(lines)
+        return True
+
+    async def flush(self):
+        """Send everything buffered and wait for in-flight batches"""
+        for target in self._targets.values():
+            self._flush_target(target)
+        if self._in_flight:
+            await asyncio.gather(*list(self._in_flight), return_exceptions=True)
+
+    async def close(self):
+        await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "config": {
+                "max_batch_size": self.config.max_batch_size,
+                "max_wait": self.config.max_wait,
+                "batch_format": self.config.batch_format,
+                "compress": self.config.compress
+            },
+            "in_flight_batches": len(self._in_flight),
+            "targets": {
+                url: {**target.stats, "buffered": len(target.items)}
+                for url, target in self._targets.items()
+            }
+        }
+
+# Global instance
+webhook_dispatcher = None
+
+def initialize_webhook_dispatcher(config: Optional[Dict[str, Any]] = None) -> WebhookDispatcher:
+    """Create the global batched webhook dispatcher"""
+    global webhook_dispatcher
+    webhook_dispatcher = WebhookDispatcher(WebhookDispatcherConfig.from_dict(config or {}))
+    logger.info(
+        f"Webhook dispatcher initialized (batches of {webhook_dispatcher.config.max_batch_size}, "
+        f"{webhook_dispatcher.config.max_wait}s max wait)"
+    )
+    return webhook_dispatcher
@@ -0,0 +1,66 @@
+"""
+Alert Deduplication Tests
+"""
+import pytest
+
+from soar_engine import AlertStatus, SOAREngine
+
+EVENT = {
+    "tenant_id": "acme", "class_uid": 1003, "activity_name": "file_created",
+    "device_name": "host-1", "src_endpoint_ip": "10.0.0.5",
+    "threat_intelligence": {"max_threat_level": "high"}
+}
+
+class CountingEngine(SOAREngine):
+    """Engine that records playbook runs instead of executing actions"""
+
+    def __init__(self, config=None):
+        super().__init__(config or {})
+        self.runs = 0
+
+    async def _execute_playbook(self, playbook, alert, event):
+        self.runs += 1
+        return {}
+
+class TestAlertDeduplication:
+    """Fingerprint folding of repeated alerts"""
+
+    @pytest.mark.asyncio
+    async def test_storm_folds_into_one_alert(self):
+        """Repeats raise one alert, run playbooks once and count occurrences"""
+        engine = CountingEngine()
+        alerts = [await engine.process_security_event(dict(EVENT)) for _ in range(1000)]
+
+        assert len({alert.id for alert in alerts}) == 1
+        assert alerts[0].occurrence_count == 1000
+        assert alerts[0].last_seen is not None
+        assert engine.runs == 1
+        assert len(engine.alerts) == 1
+        assert engine.get_dedup_stats()["alerts_folded"] == 999
+
+    @pytest.mark.asyncio
+    async def test_fingerprint_fields_and_escalation(self):
+        """Different fingerprint fields or a higher severity raise new alerts"""
+        engine = CountingEngine({"dedup_fields": ["tenant_id", "device_name"]})
+        first = await engine.process_security_event(dict(EVENT))
+        same_host = await engine.process_security_event(dict(EVENT, src_endpoint_ip="10.0.0.9"))
+        other_host = await engine.process_security_event(dict(EVENT, device_name="host-2"))
+        escalated = await engine.process_security_event(
+            dict(EVENT, threat_intelligence={"max_threat_level": "critical"})
+        )
+
+        assert same_host.id == first.id
+        assert len({first.id, other_host.id, escalated.id}) == 3
+
+    @pytest.mark.asyncio
+    async def test_closed_alerts_and_disabled_dedup(self):
+        """Closed alerts are not reopened by repeats; a zero window disables folding"""
+        engine = CountingEngine()
+        first = await engine.process_security_event(dict(EVENT))
+        first.status = AlertStatus.CLOSED
+        second = await engine.process_security_event(dict(EVENT))
+        assert second.id != first.id
+
+        disabled = CountingEngine({"dedup_window": 0})
+        ids = {(await disabled.process_security_event(dict(EVENT))).id for _ in range(3)}
+        assert len(ids) == 3 and disabled.runs == 3
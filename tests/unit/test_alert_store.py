@@ -0,0 +1,124 @@
+"""
+Alert Store Tests
+"""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from alert_store import AlertStore
+from soar_engine import Alert, AlertSeverity, AlertStatus
+
+BASE_TIME = datetime(2026, 1, 1)
+
+def make_alerts(count, seed=7):
+    rng = random.Random(seed)
+    return [
+        Alert(
+            title=f"alert {i}",
+            severity=rng.choice(list(AlertSeverity)),
+            status=rng.choice([AlertStatus.OPEN, AlertStatus.INVESTIGATING, AlertStatus.CLOSED]),
+            source_event={"tenant_id": rng.choice(["acme", "globex"])},
+            # Duplicate timestamps exercise the id tie-breaker
+            created_at=BASE_TIME + timedelta(seconds=rng.randint(0, count // 2))
+        )
+        for i in range(count)
+    ]
+
+def expected(alerts, **filters):
+    """Reference listing: filter and sort everything"""
+    matched = [
+        a for a in alerts
+        if all(value is None or {"tenant_id": a.tenant_id, "severity": a.severity.value,
+                                 "status": a.status.value}[name] == value for name, value in filters.items())
+    ]
+    return [a.id for a in sorted(matched, key=lambda a: (a.created_at, a.id), reverse=True)]
+
+async def list_all(store, page_size, **filters):
+    ids, cursor = [], None
+    while True:
+        page, cursor = await store.list_alerts(limit=page_size, cursor=cursor, **filters)
+        ids.extend(a.id for a in page)
+        if cursor is None:
+            return ids
+
+FILTERS = [
+    {},
+    {"tenant_id": "acme"},
+    {"severity": "high", "status": "open"},
+    {"tenant_id": "globex", "severity": "critical", "status": "closed"},
+]
+
+class TestAlertStore:
+    """Indexed hot set, keyset pagination and DuckDB persistence"""
+
+    @pytest.mark.asyncio
+    async def test_memory_pagination_matches_reference(self):
+        """Keyset pages over the in-memory indexes equal a filtered sort"""
+        alerts = make_alerts(300)
+        store = AlertStore()
+        for alert in alerts:
+            store.save(alert)
+
+        for filters in FILTERS:
+            assert await list_all(store, 17, **filters) == expected(alerts, **filters)
+
+    @pytest.mark.asyncio
+    async def test_updates_reindex(self):
+        """Saving a mutated alert moves it between index buckets"""
+        store = AlertStore()
+        alert = make_alerts(1)[0]
+        alert.status = AlertStatus.OPEN
+        store.save(alert)
+        alert.status = AlertStatus.RESOLVED
+        store.save(alert)
+
+        assert (await store.list_alerts(status="open"))[0] == []
+        assert [a.id for a in (await store.list_alerts(status="resolved"))[0]] == [alert.id]
+        with pytest.raises(ValueError):
+            await store.list_alerts(cursor="not-a-cursor")
+
+    @pytest.mark.asyncio
+    async def test_hot_set_is_bounded(self):
+        """Memory holds at most hot_size alerts, evicting the least recently used"""
+        alerts = make_alerts(50)
+        store = AlertStore(hot_size=10)
+        for alert in alerts:
+            store.save(alert)
+            store.get(alerts[0].id)  # keep the first alert warm
+
+        assert len(store) == 10
+        assert store.get(alerts[0].id) is alerts[0]
+        assert store.get(alerts[1].id) is None
+        assert store.get_stats()["evicted"] == 40
+
+    @pytest.mark.asyncio
+    async def test_duckdb_persistence(self, tmp_path):
+        """Evicted alerts are served from DuckDB with the same ordering"""
+        pytest.importorskip("duckdb")
+        from database.duckdb_manager import DuckDBManager
+
+        manager = DuckDBManager(str(tmp_path / "siem.db"))
+        try:
+            alerts = make_alerts(200)
+            store = AlertStore(hot_size=20, flush_batch_size=10000)
+            await store.attach(manager.conn)
+            for alert in alerts:
+                store.save(alert)
+            assert store.get_stats()["pending"] == 200
+
+            for filters in FILTERS:
+                assert await list_all(store, 23, **filters) == expected(alerts, **filters)
+            assert store.get_stats()["pending"] == 0
+
+            restored = await store.fetch(alerts[0].id)
+            assert restored.title == alerts[0].title and restored.tenant_id == alerts[0].tenant_id
+            assert restored.source_event == alerts[0].source_event
+
+            # A fresh store over the same table starts from DuckDB
+            reopened = AlertStore()
+            await reopened.attach(manager.conn)
+            page, _ = await reopened.list_alerts(limit=5)
+            assert [a.id for a in page] == expected(alerts)[:5]
+        finally:
+            manager.close()
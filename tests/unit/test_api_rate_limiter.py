@@ -0,0 +1,164 @@
+"""
+API Rate Limiter Tests
+"""
+import math
+from datetime import datetime, timedelta
+
+import pymongo
+import pytest
+
+import api_rate_limiter
+from api_rate_limiter import APIRateLimiter, UsageCounters
+
+def evaluate(expression, record):
+    """Just enough of the MongoDB expression language for the usage aggregation"""
+    if isinstance(expression, str) and expression.startswith("$"):
+        return record.get(expression[1:])
+    if isinstance(expression, dict):
+        operator = next(iter(expression))
+        if operator == "$toLong":
+            return int((evaluate(expression[operator], record) - datetime(1970, 1, 1)).total_seconds() * 1000)
+        if operator == "$divide":
+            left, right = (evaluate(argument, record) for argument in expression[operator])
+            return left / right
+        if operator == "$floor":
+            return math.floor(evaluate(expression[operator], record))
+        return {key: evaluate(value, record) for key, value in expression.items()}
+    return expression
+
+class FakeCollection:
+    def __init__(self, records=None):
+        self.records = list(records or [])
+        self.insert_many_calls = 0
+
+    def find(self, query, projection=None):
+        raise AssertionError("startup must not scan raw usage records")
+
+    def aggregate(self, pipeline):
+        match, group = pipeline[0]["$match"], pipeline[1]["$group"]
+        groups = {}
+        for record in self.records:
+            if record["timestamp"] >= match["timestamp"]["$gte"]:
+                key = tuple(sorted(evaluate(group["_id"], record).items()))
+                groups[key] = groups.get(key, 0) + 1
+        return [{"_id": dict(key), "count": count} for key, count in groups.items()]
+
+    def insert_many(self, records, ordered=True):
+        self.insert_many_calls += 1
+        self.records.extend(records)
+
+    def count_documents(self, query):
+        raise AssertionError("rate checks must not query MongoDB")
+
+class FakeClient:
+    collection = None
+
+    def __init__(self, url):
+        self.jupiter_siem = self
+
+    @property
+    def api_usage_logs(self):
+        return FakeClient.collection
+
+@pytest.fixture
+def limiter(monkeypatch):
+    monkeypatch.setenv("VT_API_KEY", "test")
+    monkeypatch.setenv("VT_RATE_LIMIT_PER_MIN", "3")
+    monkeypatch.setattr(api_rate_limiter.pymongo, "MongoClient", FakeClient)
+    FakeClient.collection = FakeCollection()
+    limiter = APIRateLimiter("mongodb://unused", flush_interval=60)
+    yield limiter
+    limiter.close()
+
+class TestUsageCounters:
+    """Bucketed sliding windows"""
+
+    def test_windows_expire_old_calls(self):
+        """Calls fall out of each window as it slides"""
+        now = datetime(2026, 3, 31, 23, 59, 30)
+        counters = UsageCounters()
+        counters.add(now - timedelta(hours=2))
+        counters.add(now - timedelta(minutes=5))
+        counters.add(now)
+
+        assert counters.stats(now) == {"last_minute": 1, "last_hour": 2, "last_day": 3, "last_month": 3}
+        assert counters.stats(now + timedelta(minutes=1))["last_minute"] == 0
+        assert counters.stats(now + timedelta(minutes=1))["last_month"] == 0
+
+class TestAPIRateLimiter:
+    """In-memory checks with batched persistence"""
+
+    def test_checks_use_counters_and_writes_are_batched(self, limiter):
+        """Limits are enforced without database reads and usage is written in one batch"""
+        for _ in range(3):
+            assert limiter.check_rate_limit("virustotal", "alice")[0]
+            limiter.record_usage("virustotal", "alice")
+
+        allowed, info = limiter.check_rate_limit("virustotal", "alice")
+        assert not allowed and "Minute limit exceeded" in info["error"]
+        assert limiter.check_rate_limit("virustotal", "bob")[0]
+
+        assert FakeClient.collection.records == []
+        assert limiter.flush() == 3
+        assert FakeClient.collection.insert_many_calls == 1
+
+    def test_counters_are_warmed_from_history(self, monkeypatch):
+        """A restarted limiter still sees recent usage"""
+        monkeypatch.setenv("VT_API_KEY", "test")
+        monkeypatch.setenv("VT_RATE_LIMIT_PER_MIN", "2")
+        monkeypatch.setattr(api_rate_limiter.pymongo, "MongoClient", FakeClient)
+        now = datetime.utcnow()
+        FakeClient.collection = FakeCollection([
+            {"api_name": "virustotal", "user_id": None, "timestamp": now - timedelta(seconds=5)},
+            {"api_name": "virustotal", "user_id": "alice", "timestamp": now - timedelta(seconds=2)},
+            {"api_name": "virustotal", "user_id": "alice", "timestamp": now - timedelta(minutes=30)},
+            {"api_name": "virustotal", "user_id": "alice", "timestamp": now - timedelta(days=40)},
+        ])
+        limiter = APIRateLimiter("mongodb://unused", flush_interval=60)
+        try:
+            assert not limiter.check_rate_limit("virustotal")[0]
+            assert limiter.check_rate_limit("virustotal", "alice")[0]
+            stats = limiter._get_usage_stats("virustotal", "alice", datetime.utcnow())
+            assert stats["last_minute"] == 1 and stats["last_hour"] == 2 and stats["last_day"] == 2
+            assert stats["last_month"] in (1, 2)  # the 30-minute-old call may fall in last month
+        finally:
+            limiter.close()
+
+    def test_failed_writes_are_retried(self, limiter):
+        """Records survive a failed batch and are written on the next flush"""
+        def fail(records, ordered=True):
+            raise pymongo.errors.AutoReconnect("down")
+
+        limiter.record_usage("virustotal")
+        limiter.usage_collection = FakeCollection()
+        limiter.usage_collection.insert_many = fail
+        assert limiter.flush() == 0
+
+        limiter.usage_collection = FakeClient.collection
+        assert limiter.flush() == 1
+
+    def test_partial_failures_retry_only_rejected_records(self, limiter):
+        """After a partial bulk failure only rejected records are retried; already-written ones are not"""
+        collection = FakeClient.collection
+        for _ in range(3):
+            limiter.record_usage("virustotal")
+
+        def partial(records, ordered=True):
+            collection.records.extend([records[0]])
+            raise pymongo.errors.BulkWriteError({
+                "nInserted": 1,
+                "writeErrors": [
+                    {"index": 1, "code": 11000, "errmsg": "duplicate key"},
+                    {"index": 2, "code": 91, "errmsg": "shutdown in progress"},
+                ]
+            })
+
+        limiter.usage_collection = FakeCollection()
+        limiter.usage_collection.insert_many = partial
+        assert limiter.flush() == 1
+        assert len(limiter._failed_records) == 1
+
+        limiter.usage_collection = collection
+        assert limiter.flush() == 1
+        ids = [record["_id"] for record in collection.records]
+        assert len(ids) == len(set(ids)) == 2
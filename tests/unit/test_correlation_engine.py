@@ -0,0 +1,95 @@
+"""
+Streaming Correlation Engine Tests
+"""
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock
+
+import pytest
+
+from analyst_fatigue_prevention import AlertContext, ContextualAlertCorrelator
+from correlation_engine import CorrelationEngine, CorrelationRule, parse_timeframe
+from soar_engine import SOAREngine
+
+def login_failure(ip="203.0.113.9", user="alice"):
+    return {"activity_name": "failed_login", "src_endpoint": {"ip": ip}, "actor": {"user": {"name": user}}}
+
+class TestCorrelationEngine:
+    """Windowed thresholds per group key"""
+
+    def test_sliding_window_fires_once_per_crossing(self):
+        """A group fires when it reaches the threshold and re-arms after its window drains"""
+        engine = CorrelationEngine()
+        engine.add_rule(CorrelationRule("bf", threshold=3, window=60))
+
+        fired = [engine.observe_rule("bf", login_failure(), now=t) for t in (0, 10, 20, 30)]
+        assert [f is not None for f in fired] == [False, False, True, False]
+        assert fired[2].count == 3 and fired[2].group["src_endpoint_ip"] == "203.0.113.9"
+
+        # Other groups are counted separately
+        assert engine.observe_rule("bf", login_failure(user="bob"), now=31) is None
+
+        # Old events slide out, then a new burst fires again
+        assert engine.observe_rule("bf", login_failure(), now=200) is None
+        assert engine.observe_rule("bf", login_failure(), now=201) is None
+        assert engine.observe_rule("bf", login_failure(), now=202) is not None
+
+    def test_tumbling_window_resets(self):
+        """Tumbling windows count from zero at each boundary"""
+        engine = CorrelationEngine()
+        engine.add_rule(CorrelationRule("scan", threshold=2, window=60, window_type="tumbling"))
+        assert engine.observe_rule("scan", login_failure(), now=59) is None
+        assert engine.observe_rule("scan", login_failure(), now=61) is None
+        assert engine.current_count("scan", {"src_endpoint_ip": "203.0.113.9", "actor_user_name": "alice"}, now=62) == 1
+
+    def test_bounded_keys_and_snapshot(self, tmp_path):
+        """Key count is capped, idle keys are evicted, and state survives a restore"""
+        engine = CorrelationEngine(max_keys=100)
+        rule = CorrelationRule("bf", threshold=5, window=parse_timeframe("1m"))
+        engine.add_rule(rule)
+        for i in range(1000):
+            engine.observe_rule("bf", login_failure(ip=f"10.0.{i // 250}.{i % 250}"), now=i * 0.01)
+        assert engine.get_stats()["tracked_keys"]["bf"] == 100
+
+        for _ in range(4):
+            engine.observe_rule("bf", login_failure(), now=20)
+        path = str(tmp_path / "correlation.json")
+        engine.snapshot(path)
+
+        restored = CorrelationEngine()
+        restored.add_rule(rule)
+        assert restored.restore(path) == 100
+        assert restored.observe_rule("bf", login_failure(), now=21) is not None
+
+class TestSOARCorrelation:
+    """Playbook event_count triggers"""
+
+    @pytest.mark.asyncio
+    async def test_brute_force_playbook_fires_on_threshold(self):
+        """Ten failed logins raise one correlation alert that runs the brute-force playbook"""
+        engine = SOAREngine({})
+        engine._execute_playbook = AsyncMock()
+
+        alerts = [await engine.process_security_event(login_failure()) for _ in range(11)]
+        assert [a is not None for a in alerts] == [False] * 9 + [True, False]
+        assert "correlation" in alerts[9].tags
+        executed = engine._execute_playbook.await_args_list
+        assert [call.args[0].id for call in executed] == ["brute_force_response"]
+
+class TestContextualAlertCorrelator:
+    """Time windows in batch alert correlation"""
+
+    def test_time_window_is_honored(self):
+        """Matching alerts spread beyond the window are not grouped"""
+        start = datetime(2026, 1, 1)
+
+        def alert(i, minutes):
+            return AlertContext(f"a{i}", start + timedelta(minutes=minutes), "High", "auth", "", "", "",
+                                "failed_login from host", [], 0.5, 0.1)
+
+        correlator = ContextualAlertCorrelator()
+        spread = [alert(i, i * 10) for i in range(6)]
+        assert correlator.correlate_alerts(spread) == []
+
+        burst = spread + [alert(10 + i, 100 + i) for i in range(5)]
+        groups = correlator.correlate_alerts(burst)
+        assert [a.alert_id for a in groups[0]["alerts"]] == [f"a{10 + i}" for i in range(5)]
@@ -0,0 +1,108 @@
+"""
+Batch Framework Analysis Tests
+"""
+import pytest
+
+from cybersecurity_frameworks import FrameworkAnalyzer, TechniqueRule
+from extended_frameworks import ExtendedFrameworkAnalyzer
+from framework_batch import BatchFrameworkAnalyzer, analyze_chunk
+
+LOGS = [
+    {"_id": "1", "activity_name": "SQL injection attempt", "severity": "High",
+     "src_endpoint": {"ip": "203.0.113.5"}, "dst_endpoint": {"ip": "10.0.0.5"}, "network": {"protocol": "HTTP"}},
+    {"_id": "2", "activity_name": "WMI remote command", "process": {"name": "wmiprvse.exe"}},
+    {"_id": "3", "activity_name": "Failed login brute force", "severity": "Low"},
+    {"_id": "4"},
+]
+
+class TestBatchFrameworkAnalysis:
+    """Shared feature extraction and chunked analysis"""
+
+    def test_chunk_matches_per_log_analyzers(self):
+        """Batch results equal the single-log core and extended analyses"""
+        core, extended = FrameworkAnalyzer(), ExtendedFrameworkAnalyzer()
+        for log, result in zip(LOGS, analyze_chunk(LOGS)[0]):
+            single = core.analyze_log(log)
+            single_extended = extended.analyze_log_extended(log)
+            for name in ("mitre_attack", "kill_chain"):
+                assert result["frameworks"][name] == single["frameworks"][name]
+            for name in ("owasp_top_10", "stride", "nist_csf", "atomic_red_team"):
+                assert result["frameworks"][name] == single_extended["frameworks"][name]
+            assert result["threat_assessment"]["risk_score"] == single["threat_assessment"]["risk_score"]
+            assert result["extended_threat_assessment"] == single_extended["threat_assessment"]
+
+    def test_framework_selection(self):
+        """Only requested frameworks are returned"""
+        result = analyze_chunk(LOGS[:1], ["stride"])[0][0]
+        assert list(result["frameworks"]) == ["stride"]
+        assert "threat_assessment" not in result
+
+    @pytest.mark.asyncio
+    async def test_process_pool_preserves_order(self):
+        """Chunks analyzed in worker processes come back in input order"""
+        analyzer = BatchFrameworkAnalyzer(max_workers=2, chunk_size=3)
+        logs = [dict(log, _id=f"{i}") for i in range(5) for log in LOGS]
+        try:
+            results = await analyzer.analyze(logs, ["mitre_attack"])
+        finally:
+            analyzer.shutdown()
+        assert [r["log_id"] for r in results] == [log["_id"] for log in logs]
+        assert analyzer.get_stats()["chunks"] == 7
+
+    @pytest.mark.asyncio
+    async def test_worker_cache_hits_are_reported(self):
+        """Cache hits inside pool workers show up in the batch stats"""
+        analyzer = BatchFrameworkAnalyzer(max_workers=2, chunk_size=10)
+        logs = [{"_id": str(i), "activity_name": "Failed login", "severity": "Low"} for i in range(40)]
+        try:
+            await analyzer.analyze(logs)
+        finally:
+            analyzer.shutdown()
+        cache = analyzer.get_stats()["analysis_cache"]
+        for name in ("core", "extended"):
+            # Each worker misses the shared signature once at most
+            assert 1 <= cache[name]["misses"] <= 2 and cache[name]["hits"] >= 2
+
+    def test_workers_are_spawned(self):
+        """Worker processes are spawned, not forked from the server process"""
+        analyzer = BatchFrameworkAnalyzer(max_workers=2)
+        try:
+            assert analyzer._get_executor()._mp_context.get_start_method() == "spawn"
+        finally:
+            analyzer.shutdown()
+
+class TestAnalysisCache:
+    """Signature-keyed memoization"""
+
+    def test_repeated_signatures_hit_the_cache(self):
+        """Events differing only in id and timestamp are analyzed once"""
+        analyzer = FrameworkAnalyzer()
+        logs = [{"_id": str(i), "time": i, "activity_name": "Failed login", "severity": "Low"} for i in range(50)]
+
+        results = analyzer.analyze_logs(logs)
+        assert [r["log_id"] for r in results] == [str(i) for i in range(50)]
+        assert results[0]["frameworks"] == results[49]["frameworks"]
+
+        analyzer.analyze_log(dict(logs[0], _id="again"))
+        stats = analyzer.get_cache_stats()
+        assert stats["size"] == 1
+        assert stats["hits"] == 1
+
+    def test_rule_changes_invalidate(self):
+        """Recompiling MITRE rules bypasses results computed under the old rules"""
+        analyzer = FrameworkAnalyzer()
+        log = {"activity_name": "marker activity"}
+        assert analyzer.analyze_log(log)["frameworks"]["mitre_attack"]["techniques"] == []
+
+        analyzer.mitre_mapper.rules.append(TechniqueRule("T1083", {"activity_name": ["marker"]}, 0.9, "marker"))
+        analyzer.mitre_mapper.compile_rules()
+        assert analyzer.analyze_log(log)["frameworks"]["mitre_attack"]["techniques"][0]["id"] == "T1083"
+
+    def test_extended_cache(self):
+        """Extended analysis is memoized per signature as well"""
+        analyzer = ExtendedFrameworkAnalyzer()
+        first = analyzer.analyze_log_extended({"_id": "a", "activity_name": "SQL injection"}, "analyst")
+        second = analyzer.analyze_log_extended({"_id": "b", "activity_name": "SQL injection"})
+        assert first["frameworks"] is second["frameworks"]
+        assert "fatigue_management" in first and "fatigue_management" not in second
+        assert analyzer.get_cache_stats()["hit_rate"] == 0.5
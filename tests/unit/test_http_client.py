@@ -0,0 +1,124 @@
+"""
+Shared HTTP Client Tests
+"""
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from http_client import (
+    CircuitBreaker, CircuitOpenError, CircuitState, HTTPClientConfig, SharedHTTPClient
+)
+
+async def start_server(statuses):
+    """Serve the given status codes in order, then 200"""
+    calls = []
+
+    async def handler(request):
+        calls.append(request.method)
+        status = statuses.pop(0) if statuses else 200
+        return web.json_response({"ok": status == 200}, status=status)
+
+    app = web.Application()
+    app.router.add_route("*", "/", handler)
+    server = TestServer(app)
+    await server.start_server()
+    return server, calls
+
+def make_client(**overrides):
+    config = HTTPClientConfig(backoff_base=0.001, **overrides)
+    return SharedHTTPClient(config)
+
+class TestCircuitBreaker:
+    """Breaker state transitions"""
+
+    def test_opens_and_half_opens(self):
+        """Consecutive failures open the circuit; a probe is allowed after the cool-down"""
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+        breaker.record_failure()
+        assert breaker.state == CircuitState.CLOSED
+        breaker.record_failure()
+        assert breaker.state == CircuitState.OPEN
+        assert breaker.allow()
+        assert breaker.state == CircuitState.HALF_OPEN
+        breaker.record_success()
+        assert breaker.state == CircuitState.CLOSED
+
+    def test_half_open_admits_one_probe(self):
+        """Only one caller probes a half-open circuit; its outcome decides the state"""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        assert not breaker.allow()
+        time.sleep(0.06)
+        assert breaker.allow()
+        assert [breaker.allow() for _ in range(5)] == [False] * 5
+        breaker.record_failure()
+        assert breaker.state == CircuitState.OPEN and not breaker.allow()
+        time.sleep(0.06)
+        assert breaker.allow()
+        breaker.record_success()
+        assert all(breaker.allow() for _ in range(5))
+
+class TestSharedHTTPClient:
+    """Pooled requests, retries and circuit breaking"""
+
+    @pytest.mark.asyncio
+    async def test_retries_transient_failures(self):
+        """Idempotent requests retry 503s and reuse the pooled session"""
+        server, calls = await start_server([503, 503])
+        client = make_client()
+        try:
+            async with client.get(str(server.make_url("/"))) as response:
+                assert response.status == 200
+                assert (await response.json()) == {"ok": True}
+            session = client._session
+            async with client.get(str(server.make_url("/"))) as response:
+                assert response.status == 200
+            assert client._session is session
+            assert len(calls) == 4
+        finally:
+            await client.close()
+            await server.close()
+
+    def test_session_is_replaced_when_its_loop_closes(self):
+        """A session left on a closed loop is closed, not leaked, when another loop takes over"""
+        client = make_client()
+        asyncio.run(client.start())
+        stale = client._session
+        asyncio.run(client.start())
+        assert stale.closed and client._session is not stale and not client._session.closed
+        asyncio.run(client.close())
+
+    @pytest.mark.asyncio
+    async def test_post_is_not_retried_by_default(self):
+        """Non-idempotent requests surface the first response"""
+        server, calls = await start_server([503])
+        client = make_client()
+        try:
+            async with client.post(str(server.make_url("/")), json={}) as response:
+                assert response.status == 503
+            assert calls == ["POST"]
+        finally:
+            await client.close()
+            await server.close()
+
+    @pytest.mark.asyncio
+    async def test_open_circuit_fails_fast(self):
+        """Once a host trips its breaker, requests do not reach it"""
+        server, calls = await start_server([500, 500, 500])
+        client = make_client(failure_threshold=2, reset_timeout=60)
+        url = str(server.make_url("/"))
+        try:
+            for _ in range(2):
+                async with client.get(url, retries=0) as response:
+                    assert response.status == 500
+            with pytest.raises(CircuitOpenError):
+                async with client.get(url):
+                    pass
+            assert len(calls) == 2
+            assert client.get_stats()["breakers"][server.make_url("/").raw_authority]["state"] == "open"
+        finally:
+            await client.close()
+            await server.close()
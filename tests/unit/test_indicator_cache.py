@@ -0,0 +1,38 @@
+"""
+Indicator Cache Tests
+"""
+import time
+
+from indicator_cache import BloomFilter, LRUTTLCache, MISSING
+
+class TestLRUTTLCache:
+    """Eviction, expiry and negative entries"""
+
+    def test_evicts_least_recently_used(self):
+        """Touching an entry protects it from eviction"""
+        cache = LRUTTLCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is MISSING
+        assert cache.get("a") == 1
+
+    def test_none_is_a_cached_value_until_expiry(self):
+        """Negative results are hits distinct from misses and honour their TTL"""
+        cache = LRUTTLCache()
+        cache.set("clean", None, ttl=0.01)
+        assert cache.get("clean") is None
+        time.sleep(0.02)
+        assert cache.get("clean") is MISSING
+        assert cache.get_stats()["hits"] == 1
+
+class TestBloomFilter:
+    """Membership guarantees"""
+
+    def test_no_false_negatives_and_low_false_positives(self):
+        """Every added item is found; unseen items rarely are"""
+        bloom = BloomFilter.from_iterable((f"ip:10.0.{i // 256}.{i % 256}" for i in range(5000)), error_rate=0.01)
+        assert all(f"ip:10.0.{i // 256}.{i % 256}" in bloom for i in range(5000))
+        false_positives = sum(f"ip:172.16.{i // 256}.{i % 256}" in bloom for i in range(5000))
+        assert false_positives < 150
@@ -0,0 +1,162 @@
+"""
+Streaming Ingest Pipeline Tests
+"""
+import asyncio
+import gzip
+import json
+
+import pytest
+
+from ingest_pipeline import BatchTooLarge, IngestPipeline, split_body
+from ocsf_validator import ocsf_validator
+from soar_engine import SOAREngine
+
+MALWARE_EVENT = {
+    "tenant_id": "acme", "class_uid": 1003, "activity_name": "file_created",
+    "threat_intelligence": {"max_threat_level": "critical"}
+}
+
+class RecordingSink:
+    """Sink that keeps every stored batch"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+
+    async def write(self, events):
+        await asyncio.sleep(self.delay)
+        self.batches.append(list(events))
+
+    @property
+    def events(self):
+        return [event for batch in self.batches for event in batch]
+
+class QuietEngine(SOAREngine):
+    """Engine that records playbook runs instead of executing actions"""
+
+    async def _execute_playbook(self, playbook, alert, event):
+        return {}
+
+def lines(events):
+    return [json.dumps(event).encode() for event in events]
+
+class TestIngestPipeline:
+    """Stage batching, alerting, backpressure and listeners"""
+
+    @pytest.mark.asyncio
+    async def test_events_flow_through_every_stage(self):
+        """Parsed events are enriched, alerted and stored; bad lines are counted"""
+        enriched_batches = []
+
+        async def enricher(events):
+            enriched_batches.append(len(events))
+            return [dict(event, enriched=True) for event in events]
+
+        sink = RecordingSink()
+        observed = []
+        pipeline = IngestPipeline(enricher=enricher, soar=QuietEngine({}), sink=sink,
+                                  observers=[observed.append], batch_size=50)
+        await pipeline.start()
+        try:
+            events = [dict(MALWARE_EVENT, device_name=f"host-{i}") for i in range(3)]
+            events += [{"class_uid": 4001, "n": i} for i in range(97)]
+            assert await pipeline.submit(lines(events) + [b"{not json", b"[1, 2]"]) == 102
+            await pipeline.drain()
+        finally:
+            await pipeline.stop()
+
+        stored = sink.events
+        assert len(stored) == 100 and len(observed) == 100
+        assert all(event["enriched"] and event["event_uid"] for event in stored)
+        assert sum(1 for event in stored if "alert_id" in event) == 3
+        assert max(enriched_batches) <= 50
+
+        stats = pipeline.get_stats()
+        assert stats["accepted"] == 102 and stats["alerts"] == 3
+        assert stats["stages"]["parse"]["errors"] == 1
+        assert stats["stages"]["validate"]["errors"] == 1
+        assert stats["stages"]["store"]["events_out"] == 100
+
+    @pytest.mark.asyncio
+    async def test_enforced_validation_drops_invalid_events(self):
+        """The validate stage counts schema failures and, when enforcing, drops events with errors"""
+        sink = RecordingSink()
+        pipeline = IngestPipeline(sink=sink, validator=ocsf_validator, validation_mode="enforce")
+        await pipeline.start()
+        try:
+            valid = {"class_uid": 4001, "category_uid": 4, "activity_id": 1, "activity_name": "traffic"}
+            events = [dict(valid, n=i) for i in range(8)] + [dict(valid, category_uid="4"), {"class_uid": 4001}]
+            events[0]["severity"] = "urgent"
+            await pipeline.submit(events)
+            await pipeline.drain()
+        finally:
+            await pipeline.stop()
+
+        assert sorted(event.get("n") for event in sink.events) == list(range(8))
+        validation = pipeline.get_stats()["validation"]
+        assert validation["invalid"] == 2 and validation["dropped"] == 2 and validation["warnings"] == 1
+        assert validation["top_failures"]["Missing required field: activity_name"] == 1
+
+    @pytest.mark.asyncio
+    async def test_slow_sink_applies_backpressure(self):
+        """A stalled store stage fills the bounded queues and rejects new submissions"""
+        sink = RecordingSink(delay=0.2)
+        pipeline = IngestPipeline(sink=sink, batch_size=10, queue_batches=1)
+        await pipeline.start()
+        try:
+            results = [await pipeline.submit([{"n": i}] * 10, timeout=0.01) for i in range(20)]
+            assert 0 in results
+            assert pipeline.submit_nowait([{"n": 0}] * 5) == 0
+            await pipeline.drain()
+        finally:
+            await pipeline.stop()
+
+        stats = pipeline.get_stats()
+        assert stats["rejected"] > 0 and stats["dropped"] == 5
+        assert len(sink.events) == stats["accepted"]
+
+    @pytest.mark.asyncio
+    async def test_tcp_listener_batches_lines(self):
+        """NDJSON over TCP is batched into the pipeline"""
+        sink = RecordingSink()
+        pipeline = IngestPipeline(sink=sink, batch_size=100)
+        await pipeline.start()
+        try:
+            server = await pipeline.start_tcp("127.0.0.1", 0, flush_interval=0.01)
+            port = server.sockets[0].getsockname()[1]
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"".join(line + b"\n" for line in lines({"n": i} for i in range(250))))
+            await writer.drain()
+            writer.close()
+            for _ in range(100):
+                if len(sink.events) == 250:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await pipeline.stop()
+
+        assert sorted(event["n"] for event in sink.events) == list(range(250))
+        assert pipeline.get_stats()["stages"]["parse"]["max_batch"] <= 100
+
+    def test_split_body_formats(self):
+        """NDJSON, JSON arrays and gzip bodies are all accepted"""
+        ndjson = b'{"a": 1}\n\n{"a": 2}\n'
+        assert split_body(ndjson) == [b'{"a": 1}', b'{"a": 2}']
+        assert split_body(gzip.compress(ndjson)) == [b'{"a": 1}', b'{"a": 2}']
+        assert split_body(b' [{"a": 1}]', "identity") == [{"a": 1}]
+        with pytest.raises(ValueError):
+            split_body(b"[1, 2")
+
+    def test_split_body_limits(self):
+        """Bodies are refused past their inflated size or event count without inflating a bomb"""
+        bomb = gzip.compress(b"\n" * (64 * 1024 * 1024))
+        with pytest.raises(BatchTooLarge):
+            split_body(bomb, "gzip", max_bytes=1024 * 1024)
+        ndjson = b'{"a": 1}\n' * 10
+        assert len(split_body(gzip.compress(ndjson) * 2, max_bytes=200, max_events=20)) == 20
+        with pytest.raises(BatchTooLarge):
+            split_body(ndjson, max_bytes=50)
+        with pytest.raises(BatchTooLarge):
+            split_body(b"[" + b",".join([b"{}"] * 11) + b"]", max_events=10)
+        with pytest.raises(EOFError):
+            split_body(gzip.compress(ndjson)[:-8])
@@ -0,0 +1,150 @@
+"""
+Multi-Process Ingest Worker Tests
+"""
+import asyncio
+import json
+
+import pytest
+
+from ingest_workers import IngestWorkerPool, decode_batch, encode_batch, partition_of
+from soar_engine import SOAREngine
+
+MALWARE_EVENT = {
+    "class_uid": 1003, "activity_name": "file_created", "device_name": "host-1",
+    "threat_intelligence": {"max_threat_level": "critical"}
+}
+
+class RowSink:
+    """Parent-side sink that keeps the rows shipped back by workers"""
+
+    def __init__(self):
+        self.rows = []
+
+    async def write_rows(self, rows):
+        self.rows.extend(rows)
+
+class SlowRowSink(RowSink):
+    """Sink whose writes fall behind the workers"""
+
+    async def write_rows(self, rows):
+        await asyncio.sleep(1.5)
+        self.rows.extend(rows)
+
+async def wait_for(predicate, timeout=30.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.05)
+
+def make_pool(tmp_path, **overrides):
+    # Workers only enqueue playbook runs, as they do next to the parent's SOAR workers
+    config = {"soar": {}, "queue_path": str(tmp_path / "jobs.db"), "heartbeat_interval": 0.2}
+    options = dict(workers=2, config=config,
+                   soar=SOAREngine({}), sink=RowSink(), batch_size=50, supervise_interval=0.1)
+    options.update(overrides)
+    return IngestWorkerPool(**options)
+
+class TestIngestWorkers:
+    """Partitioning, result collection and supervision"""
+
+    def test_partitioning_and_batch_encoding(self):
+        """Partitions depend only on the key fields; batches round-trip"""
+        event = {"tenant_id": "acme", "n": 1}
+        assert partition_of(event, 8) == partition_of({"tenant_id": "acme", "n": 2}, 8)
+        assert {partition_of({"tenant_id": f"t{i}"}, 4) for i in range(50)} == {0, 1, 2, 3}
+        lines = [json.dumps({"n": i}).encode() for i in range(3)]
+        assert decode_batch(encode_batch(lines)) == lines
+
+    def test_raw_lines_are_routed_without_parsing(self, tmp_path):
+        """Lines go to the same partition as their decoded event; only ambiguous ones are parsed"""
+        pool = make_pool(tmp_path, workers=4)
+        parsed = []
+        pool.observers = [parsed.append]
+        pool.observe_sample = 1000
+        events = [{"tenant_id": f"t{i}", "n": i} for i in range(20)] + [{"n": 1}, {"tenant_id": None}]
+        lines = [json.dumps(event).encode() + b"\r\n" for event in events]
+        lines += [b'{"tenant_id": 7}', b'{"tenant_id": "a\\"b"}', b"  ", b"not json"]
+
+        partitions, positions = pool._partition(lines)
+        routed = {index: worker for worker, indices in enumerate(positions) for index in indices}
+        for index, event in enumerate(events):
+            assert routed[index] == partition_of(event, 4)
+        assert routed[20] == routed[21] == partition_of({}, 4)
+        assert routed[22] == partition_of({"tenant_id": 7}, 4)
+        assert routed[23] == partition_of({"tenant_id": 'a"b'}, 4)
+        assert 24 not in routed and 25 in routed
+        assert all(line == line.strip() for lines in partitions for line in lines)
+        # Only the first line (observer sample) and the two ambiguous ones were decoded
+        assert len(parsed) == 3
+
+    @pytest.mark.asyncio
+    async def test_tenants_stay_on_one_worker(self, tmp_path):
+        """Each tenant's repeats fold into one alert because its events share a process"""
+        pool = make_pool(tmp_path)
+        await pool.start()
+        try:
+            events = [dict(MALWARE_EVENT, tenant_id=f"tenant-{i % 4}") for i in range(200)]
+            assert await pool.submit([json.dumps(e).encode() for e in events] + [b"not json"]) == 201
+            await wait_for(lambda: pool.stats["events_processed"] == 200)
+        finally:
+            await pool.stop()
+
+        stats = pool.get_stats()
+        # Malformed lines are routed unparsed and counted by the worker that got them
+        assert sum(w["pipeline"]["stages"]["parse"]["errors"] for w in stats["workers"]) == 1
+        assert stats["parse_errors"] == 0 and stats["events_stored"] == 200
+        assert len(pool.sink.rows) == 200
+        alerts = (await pool.soar.alerts.list_alerts(limit=100))[0]
+        assert sorted(alert.tenant_id for alert in alerts) == [f"tenant-{i}" for i in range(4)]
+        assert all(alert.occurrence_count == 50 for alert in alerts)
+        processed = [w["pipeline"]["stages"]["store"]["events_in"] for w in stats["workers"]]
+        assert sum(processed) == 200
+
+    @pytest.mark.asyncio
+    async def test_dead_worker_is_restarted(self, tmp_path):
+        """The supervisor respawns a killed worker, which keeps serving its partition"""
+        pool = make_pool(tmp_path, sink=None)
+        await pool.start()
+        try:
+            victim = pool._workers[0].process
+            await asyncio.to_thread(victim.kill)
+            await wait_for(lambda: pool.stats["restarts"] == 1 and pool._workers[0].process.is_alive())
+
+            events = [{"tenant_id": f"t{i}", "n": i} for i in range(40)]
+            assert await pool.submit(events) == 40
+            await wait_for(lambda: pool.stats["events_processed"] == 40)
+        finally:
+            await pool.stop()
+
+        assert pool._workers[0].process.pid != victim.pid
+        assert pool.get_stats()["workers"][0]["restarts"] == 1
+
+    @pytest.mark.asyncio
+    async def test_rejected_items_are_reported(self, tmp_path):
+        """A saturated partition reports exactly the items it did not queue"""
+        pool = make_pool(tmp_path, batch_size=5, queue_batches=1)
+        events = [{"tenant_id": ("acme", "a")[i % 2], "n": i} for i in range(20)]
+        rejected = []
+        accepted = await pool.submit([json.dumps(e).encode() for e in events], timeout=0.01, rejected=rejected)
+
+        queued = {n for worker in pool._workers
+                  for n in (json.loads(line)["n"] for line in decode_batch(worker.inbox.get(timeout=1)))}
+        assert accepted == len(queued) == 10 and len(rejected) == 10
+        assert sorted(queued | set(rejected)) == list(range(20))
+        assert pool.stats["rejected"] == len(rejected)
+
+    @pytest.mark.asyncio
+    async def test_slow_storage_does_not_restart_workers(self, tmp_path):
+        """Heartbeats do not queue behind storage rows, so a lagging sink kills no worker"""
+        pool = make_pool(tmp_path, sink=SlowRowSink(), queue_batches=1, heartbeat_timeout=3.0)
+        await pool.start()
+        try:
+            for i in range(6):
+                assert await pool.submit([{"tenant_id": ("acme", "a")[i % 2], "n": i}] * 20) == 20
+                await asyncio.sleep(0.3)
+            await wait_for(lambda: pool.stats["events_processed"] == 120)
+        finally:
+            await pool.stop()
+
+        assert pool.stats["restarts"] == 0
+        assert len(pool.sink.rows) == 120
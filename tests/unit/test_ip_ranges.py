@@ -0,0 +1,57 @@
+"""
+IP Range Matching Tests
+"""
+import pytest
+
+from ip_ranges import IPRangeSet, compile_ranges, match_membership, is_private_ip
+from query_providers import apply_comparison
+from query_ast_schema import ComparisonOperator
+
+class TestIPRangeSet:
+    """CIDR compilation and lookup tests"""
+
+    def test_overlapping_cidrs_are_merged(self):
+        """Nested and adjacent blocks collapse into one interval"""
+        ranges = IPRangeSet(["10.0.0.0/8", "10.1.0.0/16", "11.0.0.0/8", "192.168.1.0/24"])
+        assert len(ranges) == 2
+        assert ranges.contains("11.255.255.255")
+        assert not ranges.contains("12.0.0.0")
+
+    def test_ipv6_and_invalid_values(self):
+        """IPv6 blocks match; garbage input never matches"""
+        ranges = IPRangeSet(["2001:db8::/32", "not-a-cidr"])
+        assert ranges.contains("2001:db8::1")
+        assert not ranges.contains("2001:db9::1")
+        assert not ranges.contains("garbage")
+        assert not ranges.contains(None)
+        assert ranges.invalid == ["not-a-cidr"]
+
+    def test_contains_many_matches_scalar_lookup(self):
+        """Vectorized matching agrees with per-address lookups"""
+        ranges = compile_ranges("192.168.0.0/16, 172.16.0.0/12, fc00::/7")
+        addresses = ["192.168.4.4", "172.32.0.1", "172.31.255.255", None, "fd00::1", "8.8.8.8", "0.0.0.0"]
+        assert ranges.contains_many(addresses) == [ranges.contains(ip) for ip in addresses]
+        assert ranges.contains_many(addresses) == [True, False, True, False, True, False, False]
+
+    def test_membership_mixes_cidrs_and_values(self):
+        """IN-lists match plain values and CIDR blocks"""
+        assert match_membership("10.20.30.40", ["192.168.0.0/16", "10.0.0.0/8"])
+        assert match_membership("Host-A", "host-a, 10.0.0.0/8")
+        assert not match_membership("8.8.8.8", ["192.168.0.0/16", "10.0.0.0/8"])
+
+    def test_private_ranges(self):
+        """Private, loopback and public addresses are classified correctly"""
+        assert is_private_ip("172.16.5.1")
+        assert is_private_ip("127.0.0.1")
+        assert not is_private_ip("172.32.0.1")
+        assert not is_private_ip("185.199.108.153")
+
+    @pytest.mark.parametrize("operator,right,expected", [
+        (ComparisonOperator.IN_SUBNET, "10.0.0.0/8", True),
+        (ComparisonOperator.IN_SUBNET, ["192.168.0.0/16"], False),
+        (ComparisonOperator.NOT_IN, ["192.168.0.0/16", "172.16.0.0/12"], True),
+        (ComparisonOperator.IN, ["10.0.0.0/8"], True),
+    ])
+    def test_query_evaluator_uses_ranges(self, operator, right, expected):
+        """The AST evaluator applies CIDR semantics"""
+        assert apply_comparison("10.0.0.50", operator, right) is expected
@@ -0,0 +1,44 @@
+"""
+MITRE ATT&CK Technique Matcher Tests
+"""
+import pytest
+
+from cybersecurity_frameworks import AttackTechnique, MITREAttackMapper, TechniqueRule
+
+LOGS = [
+    {"activity_name": "WMI process launch", "process": {"name": "WmiPrvSE.exe"}},
+    {"activity_name": "SMB remote file enumeration", "network": {"protocol": "SMB"}},
+    {"activity_name": "DLL injection", "user": {"name": "svc"}},
+    {"activity_name": "logon"},
+]
+
+def summarize(techniques):
+    return [(t.id, round(t.confidence_score, 6), t.matched_indicators) for t in techniques]
+
+class TestMITREAttackMapper:
+    """Compiled keyword index and batch scoring"""
+
+    def test_single_log_mapping(self):
+        """Rules fire once per log and scores are summed per technique"""
+        mapper = MITREAttackMapper()
+        assert summarize(mapper.map_log_to_techniques(LOGS[0])) == [("T1047", 0.9, ["WMI usage detected"])]
+        assert [t.id for t in mapper.map_log_to_techniques(LOGS[1])] == ["T1083", "T1021"]
+        assert mapper.map_log_to_techniques(LOGS[3]) == []
+
+    def test_batch_matches_single(self):
+        """The vectorized batch path agrees with per-log mapping"""
+        mapper = MITREAttackMapper()
+        batch = mapper.map_logs_to_techniques(LOGS)
+        assert [summarize(r) for r in batch] == [summarize(mapper.map_log_to_techniques(log)) for log in LOGS]
+
+    def test_large_catalog(self):
+        """Catalog techniques with keywords are indexed alongside the built-in rules"""
+        mapper = MITREAttackMapper()
+        for i in range(600):
+            tech_id = f"T9{i:03d}"
+            mapper.techniques[tech_id] = AttackTechnique(tech_id, f"Synthetic {i}", "", ["Impact"], [], [], [], [])
+            mapper.rules.append(TechniqueRule(tech_id, {"activity_name": [f"marker{i:03d}x"]}, 0.6, "synthetic"))
+        mapper.compile_rules()
+
+        matched = mapper.map_log_to_techniques({"activity_name": "saw marker042x and wmi"})
+        assert [t.id for t in matched] == ["T1047", "T9042"]
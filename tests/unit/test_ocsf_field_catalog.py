@@ -0,0 +1,52 @@
+"""
+OCSF Field Catalog Tests
+"""
+import os
+import re
+
+from ocsf_field_catalog import FieldCatalog, OCSF_FIELDS, field_catalog
+from query_ast_schema import FieldType
+
+class TestFieldCatalog:
+    """Field resolution and accessor tests"""
+
+    def test_every_name_resolves_to_one_entry(self):
+        """Paths, columns and aliases resolve to the same entry"""
+        entry = field_catalog.resolve("user.name")
+        assert entry is field_catalog.resolve("actor_user_name")
+        assert entry is field_catalog.resolve("user_name")
+        assert entry.field_type == FieldType.STRING
+        assert field_catalog.column("src_endpoint.ip") == "src_endpoint_ip"
+        assert field_catalog.column("custom.field") == "custom_field"
+
+    def test_accessor_handles_nested_and_flat_events(self):
+        """The same accessor reads nested OCSF and flattened rows"""
+        nested = {"src_endpoint": {"ip": "10.0.0.1"}, "actor": {"user": {"name": "alice"}}}
+        flat = {"src_endpoint_ip": "10.0.0.2", "user_name": "bob"}
+        assert field_catalog.get_value(nested, "src_endpoint_ip") == "10.0.0.1"
+        assert field_catalog.get_value(flat, "src_endpoint.ip") == "10.0.0.2"
+        assert field_catalog.get_value(nested, "user.name") == "alice"
+        assert field_catalog.get_value(flat, "actor_user_name") == "bob"
+        assert field_catalog.get_value(flat, "file.name") is None
+
+    def test_unknown_names_do_not_grow_the_catalog(self):
+        """Accessors for names outside the catalog work but are not stored on it"""
+        known = len(field_catalog._accessors)
+        for i in range(50):
+            assert field_catalog.get_value({"custom": {f"k{i}": i}}, f"custom.k{i}") == i
+        assert len(field_catalog._accessors) == known
+
+    def test_version_tracks_definitions(self):
+        """Changing the definitions changes the version hash"""
+        assert FieldCatalog(OCSF_FIELDS).version == field_catalog.version
+        assert FieldCatalog(OCSF_FIELDS[:-1]).version != field_catalog.version
+
+    def test_every_column_exists_in_clickhouse(self):
+        """Catalog columns are real ocsf_events columns, so queries and index advice on them run"""
+        schema = os.path.join(os.path.dirname(__file__), "..", "..", "scripts", "clickhouse_init.sql")
+        with open(schema) as f:
+            ddl = f.read()
+        table = ddl[ddl.index("CREATE TABLE IF NOT EXISTS ocsf_events"):]
+        table = table[:table.index("ENGINE")]
+        columns = set(re.findall(r"^\s+(\w+) [A-Z]", table, re.M))
+        assert set(field_catalog.column_mapping().values()) <= columns
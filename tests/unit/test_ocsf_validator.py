@@ -0,0 +1,80 @@
+"""
+Compiled OCSF Validator Tests
+"""
+import random
+
+import pytest
+
+from nifi_integration import OCSFValidator
+from ocsf_validator import OCSFSchemaValidator, ocsf_validator
+
+FILE_EVENT = {
+    "time": "2024-01-15T10:32:30Z", "class_uid": 1003, "category_uid": 1, "activity_id": 1,
+    "activity_name": "file_created", "severity": "High", "tenant_id": "acme",
+    "file": {"name": "x.exe", "path": "C:\\temp\\x.exe", "size": 1024, "hash": {"sha256": "ab12"}},
+    "device": {"name": "host-1", "ip": "10.0.0.1"},
+    "src_endpoint": {"ip": "10.0.0.5", "port": 443},
+    "metadata": {"version": "1.0.0"}
+}
+
+def messages(event):
+    return ocsf_validator.describe(ocsf_validator.validate(event))
+
+class TestOCSFSchemaValidator:
+    """Error bitmaps for nested and flat OCSF events"""
+
+    def test_valid_nested_and_flat_events(self):
+        """Nested objects, flat columns and epoch-millisecond times all pass"""
+        assert ocsf_validator.validate(FILE_EVENT) == 0
+        flat = {"time": 1705314750000, "class_uid": 1003, "category_uid": 1, "activity_id": 1,
+                "activity_name": "file_created", "file_name": "x.exe", "src_endpoint_ip": "::1"}
+        assert ocsf_validator.validate(flat) == 0
+
+    def test_errors_and_warnings(self):
+        """Required fields are errors; optional fields only warn"""
+        event = dict(FILE_EVENT, time="yesterday", category_uid="1", severity="urgent",
+                     src_endpoint={"ip": "999.1.1.1", "port": "443"}, device="host-1")
+        del event["activity_id"]
+        bitmap = ocsf_validator.validate(event)
+        errors, warnings = ocsf_validator.describe(bitmap)
+
+        assert not ocsf_validator.is_valid(bitmap)
+        assert sorted(errors) == ["Invalid timestamp for time", "Invalid type for category_uid: expected integer",
+                                  "Missing required field: activity_id"]
+        assert "Invalid value for severity" in warnings
+        assert "Invalid ip_address for src_endpoint.ip" in warnings
+        assert "Invalid type for src_endpoint.port: expected integer" in warnings
+        assert "Invalid type for device.name: expected string" in warnings
+
+    def test_class_specific_requirements(self):
+        """Each class_uid has its own generated validator"""
+        event = {key: value for key, value in FILE_EVENT.items() if key != "file"}
+        assert messages(event)[0] == ["Missing required field: file.name"]
+        assert messages(dict(event, class_uid=9999))[0] == []
+        assert "file.name" in ocsf_validator.source(1003)
+        assert ocsf_validator.is_valid(ocsf_validator.validate(dict(event, file_name="x.exe")))
+
+    def test_batch_matches_single_events(self):
+        """validate_batch returns the per-event bitmaps"""
+        rng = random.Random(3)
+        choices = {
+            "time": ["2024-01-01T00:00:00Z", 1700000000000, "bad", None, [1]],
+            "class_uid": [1001, 1003, 1004, "1003", None, {"x": 1}],
+            "severity": ["low", "LOW", "nope", 3],
+            "src_endpoint": [{"ip": "10.0.0.1"}, {"ip": "x"}, "10.0.0.1", {"port": True}],
+            "user": [{"name": "bob"}, {"name": 1}, None],
+        }
+        base = {"category_uid": 1, "activity_id": 1, "activity_name": "test"}
+        events = [dict(base, **{key: rng.choice(values) for key, values in choices.items() if rng.random() < 0.8})
+                  for _ in range(500)]
+        bitmaps = ocsf_validator.validate_batch(events)
+        assert bitmaps == [ocsf_validator.validate(event) for event in events]
+        assert 0 < sum(map(bool, bitmaps)) < 500
+
+    def test_nifi_validator_uses_compiled_schema(self):
+        """The NiFi-facing validator keeps its result shape"""
+        validator = OCSFValidator(OCSFSchemaValidator(class_schemas={}))
+        result = validator.validate({key: value for key, value in FILE_EVENT.items() if key != "file"})
+        assert result == {"valid": True, "errors": [], "warnings": []}
+        result = validator.validate({"time": 5})
+        assert not result["valid"] and "Missing required field: class_uid" in result["errors"]
@@ -0,0 +1,80 @@
+"""
+Playbook Condition Language Tests
+"""
+import pytest
+
+from playbook_conditions import ConditionError, compile_condition
+from soar_engine import Alert, AlertSeverity, Playbook, PlaybookAction, SOAREngine
+
+EVENT = {
+    "risk_score": 0.85,
+    "severity": "high",
+    "process": {"name": "PowerShell.exe", "cmd_line": "powershell -enc AAAA"},
+    "src_endpoint_ip": "10.0.0.5",
+    "tags": ["lateral", "beacon"],
+}
+ALERT = Alert(title="t", severity=AlertSeverity.CRITICAL, tags=["triage"])
+
+def evaluate(condition, event=EVENT, alert=ALERT):
+    return bool(compile_condition(condition)(event, alert))
+
+class TestConditionLanguage:
+    """Parsing and evaluation of action conditions"""
+
+    @pytest.mark.parametrize("condition, expected", [
+        ("risk_score > 0.8", True),
+        ("risk_score >= 0.9", False),
+        ("${risk_score} > 0.5 and ${severity} == 'critical'", True),
+        ("severity in ['high', 'critical']", True),
+        ("severity not in ['low', 'info']", True),
+        ("process.name =~ '(?i)^powershell'", True),
+        ("process.cmd_line !~ '-enc\\s+\\w+'", False),
+        ("src_endpoint.ip == '10.0.0.5'", True),
+        ("tags contains 'beacon' and not alert.tags contains 'benign'", True),
+        ("alert.severity == 'critical' or missing_field > 3", True),
+        ("(risk_score < 0.5 or severity == 'high') and not (process.name == null)", True),
+        ("missing_field < 1", False),
+        ("missing_field == null", True),
+        ("true and not false", True),
+    ])
+    def test_evaluation(self, condition, expected):
+        """Field access, comparisons, membership, regex and boolean logic"""
+        assert evaluate(condition) is expected
+
+    def test_legacy_risk_score_default(self):
+        """${risk_score} still defaults to 0 when the event has none"""
+        assert evaluate("${risk_score} < 0.5", event={}) is True
+
+    @pytest.mark.parametrize("condition", [
+        "__import__('os').system('id')",
+        "risk_score >",
+        "risk_score > 0.5 extra",
+        "name =~ risk_score",
+        "name =~ '('",
+        "risk_score ; 1",
+        "",
+    ])
+    def test_rejects_invalid_or_unsafe_input(self, condition):
+        """Anything outside the grammar fails at compile time instead of executing"""
+        with pytest.raises(ConditionError):
+            compile_condition(condition)
+
+    def test_engine_compiles_once_and_validates_playbooks(self):
+        """Conditions compile at playbook load and are reused on every evaluation"""
+        engine = SOAREngine({})
+        engine.add_playbook(Playbook(
+            id="pb", name="pb", description="", trigger_conditions={},
+            actions=[PlaybookAction(name="a", action_type="containment", parameters={},
+                                    condition="risk_score > 0.8")]
+        ))
+        compiled = engine._conditions["risk_score > 0.8"]
+        assert engine._evaluate_condition("risk_score > 0.8", EVENT, ALERT) is True
+        assert engine._evaluate_condition("risk_score > 0.8", {"risk_score": 0.1}, ALERT) is False
+        assert engine._conditions["risk_score > 0.8"] is compiled
+
+        with pytest.raises(ValueError):
+            engine.add_playbook(Playbook(
+                id="bad", name="bad", description="", trigger_conditions={},
+                actions=[PlaybookAction(name="a", action_type="containment", parameters={},
+                                        condition="os.system('x')")]
+            ))
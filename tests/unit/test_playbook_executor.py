@@ -0,0 +1,140 @@
+"""
+Playbook Action Graph Execution Tests
+"""
+import asyncio
+import time
+
+import pytest
+
+from soar_engine import Alert, Playbook, PlaybookAction, SOAREngine
+
+def make_alert():
+    return Alert(title="test")
+
+def make_playbook(actions):
+    return Playbook(
+        id="pb", name="pb", description="", trigger_conditions={}, actions=actions
+    )
+
+class RecordingEngine(SOAREngine):
+    """Engine whose actions sleep, record timing and fail on demand"""
+
+    def __init__(self, config=None, delays=None, failures=None):
+        super().__init__({"action_retry_backoff": 0.001, **(config or {})})
+        self.delays = delays or {}
+        self.failures = failures or {}
+        self.started = {}
+        self.finished = {}
+        self.calls = {}
+        self.in_flight = 0
+        self.peak = 0
+
+    async def _execute_action(self, action, alert, event):
+        self.calls[action.name] = self.calls.get(action.name, 0) + 1
+        self.started.setdefault(action.name, time.monotonic())
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delays.get(action.name, 0.05))
+        finally:
+            self.in_flight -= 1
+        self.finished[action.name] = time.monotonic()
+        remaining = self.failures.get(action.name, 0)
+        if remaining:
+            self.failures[action.name] = remaining - 1
+            return {"success": False, "critical": action.parameters.get("critical", False)}
+        return {"success": True}
+
+class TestActionGraph:
+    """Dependency-ordered, concurrent playbook actions"""
+
+    @pytest.mark.asyncio
+    async def test_independent_actions_run_concurrently(self):
+        """Wall time follows the critical path, not the sum of actions"""
+        engine = RecordingEngine()
+        playbook = make_playbook([
+            PlaybookAction(name="enrich", action_type="enrichment", parameters={}),
+            PlaybookAction(name="notify", action_type="notification", parameters={}, depends_on=["enrich"]),
+            PlaybookAction(name="ticket", action_type="investigation", parameters={}, depends_on=["enrich"]),
+            PlaybookAction(name="contain", action_type="containment", parameters={}, depends_on=["enrich"]),
+        ])
+        started = time.monotonic()
+        await engine._execute_playbook(playbook, make_alert(), {})
+        elapsed = time.monotonic() - started
+
+        log = engine.execution_history[-1]
+        assert log["actions_completed"] == 4
+        assert elapsed < 0.15
+        for name in ("notify", "ticket", "contain"):
+            assert engine.started[name] >= engine.finished["enrich"]
+
+    @pytest.mark.asyncio
+    async def test_legacy_actions_stay_sequential(self):
+        """Actions without depends_on wait for the previous action"""
+        engine = RecordingEngine()
+        playbook = make_playbook([
+            PlaybookAction(name=f"step{i}", action_type="enrichment", parameters={}) for i in range(3)
+        ])
+        await engine._execute_playbook(playbook, make_alert(), {})
+        assert engine.peak == 1
+        assert engine.started["step2"] >= engine.finished["step1"] >= engine.started["step1"]
+
+    @pytest.mark.asyncio
+    async def test_timeout_and_retry(self):
+        """A hung attempt times out and the retry succeeds"""
+        engine = RecordingEngine(failures={"flaky": 1})
+        playbook = make_playbook([
+            PlaybookAction(name="slow", action_type="enrichment", parameters={}, timeout_seconds=0.02,
+                           retry_count=1, depends_on=[]),
+            PlaybookAction(name="flaky", action_type="enrichment", parameters={}, retry_count=2, depends_on=[]),
+        ])
+        engine.delays["slow"] = 1.0
+        await engine._execute_playbook(playbook, make_alert(), {})
+
+        results = {r["action"]: r for r in engine.execution_history[-1]["results"]}
+        assert results["slow"]["status"] == "failed"
+        assert results["slow"]["result"]["attempts"] == 2
+        assert "Timed out" in results["slow"]["result"]["error"]
+        assert results["flaky"]["status"] == "success"
+        assert results["flaky"]["result"]["attempts"] == 2
+
+    @pytest.mark.asyncio
+    async def test_critical_failure_halts_pending_actions(self):
+        """Dependents of a critical failure are cancelled; running siblings finish"""
+        engine = RecordingEngine(failures={"isolate": 1}, delays={"isolate": 0.01, "scan": 0.05})
+        playbook = make_playbook([
+            PlaybookAction(name="isolate", action_type="containment", parameters={"critical": True},
+                           retry_count=0, depends_on=[]),
+            PlaybookAction(name="scan", action_type="investigation", parameters={}, depends_on=[]),
+            PlaybookAction(name="report", action_type="investigation", parameters={}, depends_on=["isolate"]),
+        ])
+        await engine._execute_playbook(playbook, make_alert(), {})
+
+        results = {r["action"]: r["status"] for r in engine.execution_history[-1]["results"]}
+        assert results == {"isolate": "failed", "scan": "success", "report": "cancelled"}
+        assert "report" not in engine.calls
+
+    @pytest.mark.asyncio
+    async def test_concurrency_cap(self):
+        """No more than max_concurrent_actions run at once"""
+        engine = RecordingEngine(config={"max_concurrent_actions": 2})
+        playbook = make_playbook([
+            PlaybookAction(name=f"a{i}", action_type="enrichment", parameters={}, depends_on=[]) for i in range(6)
+        ])
+        await engine._execute_playbook(playbook, make_alert(), {})
+        assert engine.peak == 2
+        assert engine.execution_history[-1]["actions_completed"] == 6
+
+    def test_invalid_graphs_are_rejected(self):
+        """Unknown dependencies and cycles fail at registration"""
+        engine = SOAREngine({})
+        with pytest.raises(ValueError, match="unknown action"):
+            engine.add_playbook(make_playbook([
+                PlaybookAction(name="a", action_type="enrichment", parameters={}, depends_on=["missing"])
+            ]))
+        with pytest.raises(ValueError, match="cycle"):
+            engine.add_playbook(make_playbook([
+                PlaybookAction(name="a", action_type="enrichment", parameters={}, depends_on=["b"]),
+                PlaybookAction(name="b", action_type="enrichment", parameters={}, depends_on=["a"]),
+            ]))
+        assert "pb" not in engine.playbooks
@@ -0,0 +1,97 @@
+"""
+Playbook Trigger Index Tests
+"""
+import random
+
+import pytest
+
+from playbook_index import PlaybookTriggerIndex
+from soar_engine import Playbook, SOAREngine
+
+def brute_force_match(playbooks, event):
+    """Reference semantics: evaluate every playbook's triggers"""
+    matched = []
+    for playbook in playbooks:
+        ok = True
+        for key, expected in playbook.trigger_conditions.items():
+            if key == "class_uid" and event.get("class_uid") not in expected:
+                ok = False
+            elif key == "activity_name" and event.get("activity_name") not in expected:
+                ok = False
+            elif key == "threat_intelligence.max_threat_level" and \
+                    event.get("threat_intelligence", {}).get("max_threat_level") not in expected:
+                ok = False
+            elif key == "risk_score":
+                score = event.get("risk_score", 0)
+                if ("min" in expected and score < expected["min"]) or ("max" in expected and score > expected["max"]):
+                    ok = False
+        if ok:
+            matched.append(playbook)
+    matched.sort(key=lambda p: p.priority, reverse=True)
+    return [p.id for p in matched]
+
+def random_playbooks(rng, count):
+    playbooks = []
+    for i in range(count):
+        conditions = {}
+        if rng.random() < 0.6:
+            conditions["activity_name"] = rng.sample(["a", "b", "c", "d", "e"], rng.randint(1, 2))
+        if rng.random() < 0.6:
+            conditions["class_uid"] = rng.sample([1001, 1002, 1003, 1004], rng.randint(1, 2))
+        if rng.random() < 0.3:
+            conditions["threat_intelligence.max_threat_level"] = ["high", "critical"]
+        if rng.random() < 0.4:
+            conditions["risk_score"] = {"min": rng.random()}
+        if rng.random() < 0.2:
+            conditions["event_count"] = {"threshold": 10, "timeframe": "5m"}
+        playbooks.append(Playbook(id=f"pb{i}", name=f"pb{i}", description="", trigger_conditions=conditions,
+                                  priority=rng.randint(1, 5)))
+    return playbooks
+
+class TestPlaybookTriggerIndex:
+    """Index matches agree with evaluating every playbook"""
+
+    def test_matches_reference_semantics(self):
+        """Random playbooks and events give the same matches in the same order"""
+        rng = random.Random(7)
+        playbooks = random_playbooks(rng, 200)
+        index = PlaybookTriggerIndex()
+        index.rebuild(playbooks)
+
+        for _ in range(300):
+            event = {
+                "activity_name": rng.choice(["a", "b", "c", "d", "e", None]),
+                "class_uid": rng.choice([1001, 1002, 1003, 1004]),
+                "risk_score": rng.random(),
+                "threat_intelligence": {"max_threat_level": rng.choice(["low", "high", "critical"])},
+            }
+            assert index.match(event) == brute_force_match(playbooks, event)
+        assert index.get_stats()["avg_candidates"] < 200
+
+    def test_incremental_updates(self):
+        """Re-adding and removing playbooks updates the postings"""
+        engine = SOAREngine({})
+        event = {"class_uid": 1002, "process.name": "cmd.exe", "risk_score": 0.9}
+        assert [p.id for p in engine._find_matching_playbooks(event, None)] == ["suspicious_process_response"]
+
+        urgent = Playbook(id="urgent", name="Urgent", description="",
+                          trigger_conditions={"class_uid": [1002]}, priority=10)
+        engine.add_playbook(urgent)
+        assert [p.id for p in engine._find_matching_playbooks(event, None)] == ["urgent", "suspicious_process_response"]
+
+        urgent.trigger_conditions = {"class_uid": [1004]}
+        engine.add_playbook(urgent)
+        engine.playbooks["suspicious_process_response"].enabled = False
+        assert engine._find_matching_playbooks(event, None) == []
+
+        engine.remove_playbook("urgent")
+        assert engine.trigger_index.match({"class_uid": 1004}) == []
+
+    def test_anchor_follows_trigger_order(self):
+        """The anchor is the first EQUALITY_TRIGGERS key a playbook uses, whatever its own key order"""
+        playbook = Playbook(id="pb", name="pb", description="", trigger_conditions={
+            "threat_intelligence.max_threat_level": ["critical"], "class_uid": [1003], "activity_name": ["x"]
+        })
+        compiled = PlaybookTriggerIndex().compile(playbook)
+        assert compiled.anchor == ("activity_name", frozenset({"x"}))
+        assert [key for key, _ in compiled.equals] == ["class_uid", "threat_intelligence.max_threat_level"]
@@ -0,0 +1,197 @@
+"""
+Playbook Job Queue Tests
+"""
+import asyncio
+import time
+
+import pytest
+
+from playbook_queue import JobStatus, PlaybookJobQueue
+from soar_engine import PlaybookStatus, SOAREngine
+
+MALWARE_EVENT = {
+    "class_uid": 1003, "activity_name": "file_created", "risk_score": 0.9,
+    "threat_intelligence": {"max_threat_level": "critical"}
+}
+
+class SlowEngine(SOAREngine):
+    """Engine whose playbooks take a fixed time and can be told to fail"""
+
+    def __init__(self, delay=0.05, fail_times=0):
+        super().__init__({})
+        self.delay = delay
+        self.fail_times = fail_times
+        self.runs = []
+
+    async def _execute_playbook(self, playbook, alert, event):
+        self.runs.append((playbook.id, alert.id))
+        await asyncio.sleep(self.delay)
+        if self.fail_times:
+            self.fail_times -= 1
+            return {"execution_id": "x", "status": PlaybookStatus.FAILED, "error": "webhook down"}
+        return {"execution_id": "x", "status": PlaybookStatus.SUCCESS, "actions_completed": 1, "actions_total": 1}
+
+async def wait_for_status(queue, job_id, status, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job.status == status:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} stuck in {queue.get(job_id).status}")
+
+class TestPlaybookJobQueue:
+    """Durable queue semantics"""
+
+    @pytest.mark.asyncio
+    async def test_idempotent_enqueue(self, tmp_path):
+        """The same alert/playbook pair is queued once"""
+        queue = PlaybookJobQueue(str(tmp_path / "jobs.db"))
+        first = await queue.enqueue("pb", "alert-1", {"n": 1})
+        second = await queue.enqueue("pb", "alert-1", {"n": 2})
+        other = await queue.enqueue("pb", "alert-2", {"n": 3})
+
+        assert first.id == second.id and second.payload == {"n": 1}
+        assert other.id != first.id
+        assert queue.get_stats()["jobs"][JobStatus.QUEUED] == 2
+
+    @pytest.mark.asyncio
+    async def test_visibility_timeout_reclaims_abandoned_jobs(self, tmp_path):
+        """A job claimed by a crashed worker becomes visible again"""
+        queue = PlaybookJobQueue(str(tmp_path / "jobs.db"), visibility_timeout=0.05)
+        job = await queue.enqueue("pb", "alert-1", {})
+
+        claimed = await queue.claim("w1", wait=0)
+        assert claimed.id == job.id and claimed.attempts == 1
+        assert await queue.claim("w2", wait=0) is None
+
+        await asyncio.sleep(0.06)
+        reclaimed = await queue.claim("w2", wait=0)
+        assert reclaimed.id == job.id and reclaimed.attempts == 2 and reclaimed.worker == "w2"
+
+    @pytest.mark.asyncio
+    async def test_heartbeat_and_claim_ownership(self, tmp_path):
+        """Heartbeats keep a job claimed; a worker that lost its claim cannot record an outcome"""
+        queue = PlaybookJobQueue(str(tmp_path / "jobs.db"), visibility_timeout=0.05)
+        job = await queue.enqueue("pb", "alert-1", {})
+        first = await queue.claim("w1", wait=0)
+        for _ in range(3):
+            await asyncio.sleep(0.03)
+            assert await queue.heartbeat(job.id, "w1", first.attempts)
+        assert await queue.claim("w2", wait=0) is None
+
+        await asyncio.sleep(0.06)
+        second = await queue.claim("w2", wait=0)
+        assert not await queue.heartbeat(job.id, "w1", first.attempts)
+        assert not await queue.complete(job.id, {"stale": True}, worker="w1", attempt=first.attempts)
+        assert await queue.fail(job.id, "stale", worker="w1", attempt=first.attempts) == JobStatus.RUNNING
+        assert await queue.complete(job.id, {}, worker="w2", attempt=second.attempts)
+        assert queue.get(job.id).status == JobStatus.SUCCEEDED and queue.get(job.id).error is None
+
+    @pytest.mark.asyncio
+    async def test_abandoned_final_attempt_is_not_reclaimed(self, tmp_path):
+        """A job that keeps killing its worker fails once max_attempts claims have expired"""
+        queue = PlaybookJobQueue(str(tmp_path / "jobs.db"), visibility_timeout=0.01, max_attempts=2)
+        job = await queue.enqueue("pb", "alert-1", {})
+        for _ in range(2):
+            assert (await queue.claim("w", wait=0)).id == job.id
+            await asyncio.sleep(0.02)
+
+        assert await queue.claim("w", wait=0) is None
+        assert queue.get(job.id).status == JobStatus.FAILED and queue.get(job.id).attempts == 2
+
+    @pytest.mark.asyncio
+    async def test_failures_retry_then_give_up(self, tmp_path):
+        """Failed attempts are requeued with backoff until max_attempts"""
+        queue = PlaybookJobQueue(str(tmp_path / "jobs.db"), max_attempts=2, retry_backoff=0)
+        job = await queue.enqueue("pb", "alert-1", {})
+
+        await queue.claim("w", wait=0)
+        assert await queue.fail(job.id, "boom") == JobStatus.QUEUED
+        await queue.claim("w", wait=0)
+        assert await queue.fail(job.id, "boom again") == JobStatus.FAILED
+        assert await queue.claim("w", wait=0) is None
+        assert queue.get(job.id).error == "boom again"
+
+    @pytest.mark.asyncio
+    async def test_jobs_survive_reopen(self, tmp_path):
+        """Queued jobs persist across queue instances"""
+        path = str(tmp_path / "jobs.db")
+        queue = PlaybookJobQueue(path)
+        job = await queue.enqueue("pb", "alert-1", {"event": {"a": 1}})
+        queue.close()
+
+        reopened = PlaybookJobQueue(path)
+        claimed = await reopened.claim("w", wait=0)
+        assert claimed.id == job.id and claimed.payload == {"event": {"a": 1}}
+
+class TestQueuedPlaybookExecution:
+    """SOAR engine running playbooks through workers"""
+
+    @pytest.mark.asyncio
+    async def test_ingest_returns_before_playbooks_run(self, tmp_path):
+        """Events are accepted immediately; workers drain the queue in parallel"""
+        engine = SlowEngine(delay=0.1)
+        queue = PlaybookJobQueue(str(tmp_path / "jobs.db"))
+        await engine.start_workers(queue, count=4)
+        try:
+            started = time.monotonic()
+            alerts = [await engine.process_security_event(dict(MALWARE_EVENT, device_name=f"host-{i}")) for i in range(4)]
+            assert time.monotonic() - started < 0.1
+            assert all(alert.playbook_jobs for alert in alerts)
+            assert queue.get_stats()["jobs"][JobStatus.SUCCEEDED] == 0
+
+            job_ids = [job_id for alert in alerts for job_id in alert.playbook_jobs]
+            for job_id in job_ids:
+                await wait_for_status(queue, job_id, JobStatus.SUCCEEDED)
+            assert time.monotonic() - started < 0.35
+            assert len(engine.runs) == len(job_ids)
+        finally:
+            await engine.stop_workers()
+
+    @pytest.mark.asyncio
+    async def test_long_playbooks_are_not_run_twice(self, tmp_path):
+        """A run longer than the visibility timeout keeps its claim instead of being reclaimed"""
+        engine = SlowEngine(delay=0.3)
+        queue = PlaybookJobQueue(str(tmp_path / "jobs.db"), visibility_timeout=0.06)
+        await engine.start_workers(queue, count=1)
+        try:
+            alert = await engine.process_security_event(dict(MALWARE_EVENT))
+            await asyncio.sleep(0.2)
+            assert await queue.claim("other-worker", wait=0) is None
+            job = await wait_for_status(queue, alert.playbook_jobs[0], JobStatus.SUCCEEDED)
+        finally:
+            await engine.stop_workers()
+        assert job.attempts == 1 and len(engine.runs) == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_runs_are_retried(self, tmp_path):
+        """A failed playbook run is attempted again"""
+        engine = SlowEngine(delay=0, fail_times=1)
+        queue = PlaybookJobQueue(str(tmp_path / "jobs.db"), retry_backoff=0)
+        await engine.start_workers(queue, count=1)
+        try:
+            alert = await engine.process_security_event(dict(MALWARE_EVENT))
+            job = await wait_for_status(queue, alert.playbook_jobs[0], JobStatus.SUCCEEDED)
+            assert job.attempts == 2
+        finally:
+            await engine.stop_workers()
+
+    @pytest.mark.asyncio
+    async def test_restarted_engine_rebuilds_alerts(self, tmp_path):
+        """Jobs queued before a restart carry the alert they belong to"""
+        path = str(tmp_path / "jobs.db")
+        producer = SlowEngine()
+        producer.job_queue = PlaybookJobQueue(path)
+        alert = await producer.process_security_event(dict(MALWARE_EVENT))
+        producer.job_queue.close()
+
+        consumer = SlowEngine(delay=0)
+        queue = PlaybookJobQueue(path)
+        await consumer.start_workers(queue, count=1)
+        try:
+            await wait_for_status(queue, alert.playbook_jobs[0], JobStatus.SUCCEEDED)
+        finally:
+            await consumer.stop_workers()
+        restored = consumer.alerts.get(alert.id)
+        assert restored.title == alert.title and restored.severity == alert.severity
@@ -0,0 +1,136 @@
+"""
+Provider Scheduler Tests
+"""
+import asyncio
+import json
+
+import pytest
+
+from provider_scheduler import (
+    ProviderScheduler, QuotaExhausted, TokenBucket, build_schedulers, event_priority, provider_limits
+)
+from threat_intelligence import IndicatorType
+
+class RecordingProvider:
+    def __init__(self):
+        self.name = "VirusTotal"
+        self.config = {}
+        self.calls = []
+
+    async def lookup_indicator(self, indicator, indicator_type):
+        self.calls.append(indicator)
+        await asyncio.sleep(0.01)
+        return None
+
+class MemoryRedis:
+    def __init__(self):
+        self.store = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.store[key] = value
+
+class TestTokenBucket:
+    """Refill arithmetic"""
+
+    def test_wait_time_after_exhaustion(self):
+        """An empty bucket reports the time to the next token"""
+        bucket = TokenBucket(limit=4, period=60)
+        for _ in range(4):
+            bucket.consume(now=bucket.updated)
+        assert bucket.wait_time(now=bucket.updated) == pytest.approx(15.0)
+        assert bucket.wait_time(now=bucket.updated, count=3) == pytest.approx(45.0)
+        assert bucket.wait_time(now=bucket.updated + 15) == 0.0
+
+    def test_event_priority(self):
+        """Named and OCSF numeric severities map to queue priorities"""
+        assert event_priority({"severity": "Critical"}) == 0
+        assert event_priority({"severity_id": 4}) == 1
+        assert event_priority({}) == 4
+
+class TestProviderScheduler:
+    """Queueing, coalescing and quota handling"""
+
+    @pytest.mark.asyncio
+    async def test_coalesces_and_serves_critical_first(self):
+        """Duplicate pending lookups share one call; higher priority jumps the queue"""
+        provider = RecordingProvider()
+        scheduler = ProviderScheduler(provider, {"rate_limit_per_min": 100}, concurrency=1)
+        try:
+            lookups = [
+                scheduler.submit("low-1", IndicatorType.IP_ADDRESS, 4),
+                scheduler.submit("low-2", IndicatorType.IP_ADDRESS, 4),
+                scheduler.submit("low-2", IndicatorType.IP_ADDRESS, 4),
+                scheduler.submit("crit", IndicatorType.IP_ADDRESS, 0),
+            ]
+            await asyncio.gather(*lookups)
+        finally:
+            await scheduler.close()
+        assert provider.calls[0] == "crit"
+        assert sorted(provider.calls) == ["crit", "low-1", "low-2"]
+        assert scheduler.stats["coalesced"] == 1
+
+    @pytest.mark.asyncio
+    async def test_exhausted_quota_skips_and_persists(self):
+        """Once the quota is spent lookups are skipped, and the state survives a restart"""
+        provider = RecordingProvider()
+        redis = MemoryRedis()
+        scheduler = ProviderScheduler(provider, {"rate_limit_per_day": 2}, redis, concurrency=1, max_wait=1)
+        try:
+            await scheduler.submit("a", IndicatorType.IP_ADDRESS)
+            await scheduler.submit("b", IndicatorType.IP_ADDRESS)
+            with pytest.raises(QuotaExhausted):
+                await scheduler.submit("c", IndicatorType.IP_ADDRESS)
+        finally:
+            await scheduler.close()
+        assert provider.calls == ["a", "b"]
+        assert json.loads(redis.store["threat_intel:quota:virustotal"])["rate_limit_per_day"]["tokens"] < 1
+
+        restarted = ProviderScheduler(provider, {"rate_limit_per_day": 2}, redis, concurrency=1, max_wait=1)
+        try:
+            with pytest.raises(QuotaExhausted):
+                await restarted.submit("d", IndicatorType.IP_ADDRESS)
+        finally:
+            await restarted.close()
+
+    @pytest.mark.asyncio
+    async def test_deep_queue_fails_fast(self):
+        """Lookups the quota cannot serve within max_wait fail at once instead of waiting in series"""
+        provider = RecordingProvider()
+        scheduler = ProviderScheduler(provider, {"rate_limit_per_min": 4}, concurrency=2, max_wait=5)
+        loop = asyncio.get_running_loop()
+        try:
+            await scheduler.submit("warm", IndicatorType.IP_ADDRESS)
+            started = loop.time()
+            results = await asyncio.gather(
+                *(scheduler.submit(f"10.0.0.{i}", IndicatorType.IP_ADDRESS) for i in range(8)),
+                return_exceptions=True
+            )
+        finally:
+            await scheduler.close()
+        assert loop.time() - started < 1
+        assert sum(isinstance(result, QuotaExhausted) for result in results) == 5
+        assert len(provider.calls) == 4
+        assert scheduler.stats["rate_limited"] == 5
+
+    def test_processes_split_the_quota(self):
+        """Each enriching process gets its share of the limits and its own persisted state"""
+        provider = RecordingProvider()
+        provider.config = {"rate_limit_per_min": 4, "rate_limit_per_day": 500}
+        whole = build_schedulers([provider])["VirusTotal"]
+        shares = [build_schedulers([provider], share=(index, 5))["VirusTotal"] for index in range(5)]
+
+        assert whole.buckets["rate_limit_per_min"].capacity == 4
+        assert sum(s.buckets["rate_limit_per_min"].refill_rate for s in shares) == pytest.approx(4 / 60)
+        assert sum(s.buckets["rate_limit_per_day"].capacity for s in shares) == pytest.approx(500)
+        assert len({s.state_key for s in shares}) == 5 and whole.state_key not in {s.state_key for s in shares}
+
+    def test_limits_default_to_the_free_tier(self, monkeypatch):
+        """Environment quotas apply without provider config, which still overrides them"""
+        monkeypatch.setenv("VT_RATE_LIMIT_PER_DAY", "200")
+        provider = RecordingProvider()
+        assert provider_limits(provider) == {"rate_limit_per_min": 4, "rate_limit_per_day": 200}
+        provider.config = {"rate_limit_per_min": 10}
+        assert provider_limits(provider) == {"rate_limit_per_min": 10, "rate_limit_per_day": 200}
@@ -0,0 +1,144 @@
+"""
+Query Workload Advisor Tests
+"""
+import pytest
+
+from query_advisor import QueryWorkloadAdvisor
+from query_ast_schema import (
+    JupiterQueryAST, ASTCondition, ASTField, ASTLiteral, ASTLogicalExpression,
+    ASTGroupBy, ComparisonOperator, LogicalOperator, FieldType
+)
+
+def make_events():
+    """Sample events where only a few rows belong to user alice"""
+    events = []
+    for i in range(64):
+        events.append({
+            "tenant_id": "tenant_1",
+            "time": f"2024-01-01T00:{i:02d}:00Z",
+            "user_name": "alice" if i % 16 == 0 else f"user_{i}",
+            "device_hostname": "dc-01" if i % 16 == 0 else f"ws-{i}",
+            "http_status_code": 200 + (i % 4) * 100,
+            "severity": "high" if i % 2 else "low",
+        })
+    return events
+
+def user_condition(name):
+    return ASTCondition(
+        left=ASTField(name="actor.user.name"),
+        operator=ComparisonOperator.EQUALS,
+        right=ASTLiteral(value=name, literal_type=FieldType.STRING)
+    )
+
+class TestQueryWorkloadAdvisor:
+    """Workload recording and recommendation tests"""
+
+    def test_records_ast_predicates(self):
+        """Top-level AND conjuncts are prunable, OR branches are not"""
+        advisor = QueryWorkloadAdvisor()
+        where = ASTLogicalExpression(
+            operator=LogicalOperator.AND,
+            conditions=[
+                user_condition("alice"),
+                ASTLogicalExpression(operator=LogicalOperator.OR, conditions=[
+                    user_condition("bob"), user_condition("carol")
+                ])
+            ]
+        )
+        advisor.record_query(JupiterQueryAST(where=where), execution_time=0.5)
+
+        predicates = advisor.queries[0].predicates
+        assert [p.column for p in predicates] == ["actor_user_name"] * 3
+        assert [p.prunable for p in predicates] == [True, False, False]
+        assert advisor.get_workload_stats()["avg_execution_time"] == 0.5
+
+    def test_records_legacy_conditions(self):
+        """Conditions from the legacy parser map onto AST operators"""
+        advisor = QueryWorkloadAdvisor()
+        advisor.record_conditions(
+            [{"field": "http_status_code", "operator": "greater_equal", "value": 400}],
+            sort_by="time"
+        )
+        usage = advisor.get_field_usage()
+        assert usage["http_status_code"].dominant_kind == "range"
+        assert usage["time"].sort_count == 1
+
+    def test_malformed_conditions_are_not_raised(self):
+        """A bad condition from the query path is logged, not raised into the caller"""
+        advisor = QueryWorkloadAdvisor()
+        advisor.record_conditions(["status = 200", None])
+        assert len(advisor.queries) == 0
+
+    def test_replay_estimates_granule_skipping(self):
+        """Selective predicates skip most granules when replayed"""
+        advisor = QueryWorkloadAdvisor()
+        advisor.record_conditions([{"field": "user_name", "operator": "equals", "value": "alice"}])
+        replay = advisor.replay(make_events(), granules=16)
+
+        assert replay["actor_user_name"]["selectivity"] == pytest.approx(4 / 64)
+        assert replay["actor_user_name"]["granule_skip_ratio"] == pytest.approx(12 / 16)
+        assert replay["actor_user_name"]["distinct_values"] == 61
+
+    def test_clickhouse_skip_index_recommendation(self):
+        """Frequent selective filters produce skip index DDL"""
+        advisor = QueryWorkloadAdvisor()
+        for _ in range(3):
+            advisor.record_conditions([{"field": "device_hostname", "operator": "equals", "value": "dc-01"}])
+            advisor.record_conditions([{"field": "http_status_code", "operator": "greater_equal", "value": 500}])
+
+        recommendations = {r["columns"][0]: r for r in advisor.recommend("clickhouse", make_events())
+                           if r["type"] == "skip_index"}
+        assert "TYPE bloom_filter(0.01)" in recommendations["device_hostname"]["ddl"][0]
+        assert "TYPE minmax" in recommendations["http_status_code"]["ddl"][0]
+        assert "MATERIALIZE INDEX" in recommendations["device_hostname"]["ddl"][1]
+        assert recommendations["device_hostname"]["estimated_benefit"]["basis"] == "sample_replay"
+
+    def test_existing_indexes_not_recommended(self):
+        """Columns already covered by a declared skip index are skipped"""
+        advisor = QueryWorkloadAdvisor()
+        for _ in range(3):
+            advisor.record_conditions([{"field": "severity", "operator": "equals", "value": "high"}])
+            advisor.record_conditions([{"field": "user_name", "operator": "equals", "value": "alice"}])
+
+        assert not [r for r in advisor.recommend("clickhouse") if r["type"] == "skip_index"]
+
+    def test_group_by_projection(self):
+        """Repeated aggregations produce a pre-aggregated projection"""
+        advisor = QueryWorkloadAdvisor()
+        ast = JupiterQueryAST(group_by=ASTGroupBy(fields=[ASTField(name="severity")]))
+        advisor.record_query(ast)
+        advisor.record_query(ast)
+
+        projections = [r for r in advisor.recommend("clickhouse", make_events()) if r["type"] == "projection"]
+        assert projections[0]["columns"] == ["severity"]
+        assert "GROUP BY `tenant_id`, `severity`" in projections[0]["ddl"][0]
+        assert projections[0]["estimated_benefit"]["row_reduction"] == pytest.approx(1 - 2 / 64, abs=1e-4)
+
+    def test_duckdb_typed_column(self):
+        """DuckDB recommendations extract JSON fields into typed columns"""
+        advisor = QueryWorkloadAdvisor()
+        for _ in range(2):
+            advisor.record_conditions([{"field": "http_status_code", "operator": "greater_equal", "value": 500}])
+
+        recommendation = advisor.recommend("duckdb", make_events())[0]
+        assert recommendation["ddl"][0] == 'ALTER TABLE logs ADD COLUMN IF NOT EXISTS "http_status_code" BIGINT'
+        assert "json_extract_string(parsed_data, '$.http.status_code')" in recommendation["ddl"][1]
+
+    def test_unknown_fields_never_reach_ddl(self):
+        """Field names outside the catalog are not recorded or recommended"""
+        advisor = QueryWorkloadAdvisor()
+        for _ in range(3):
+            advisor.record_conditions([{"field": "x INT); DROP TABLE logs; --", "operator": "equals", "value": 1}],
+                                      sort_by="y) ORDER BY 1; --")
+            advisor.record_query(JupiterQueryAST(group_by=ASTGroupBy(fields=[ASTField(name="a`; DROP")])))
+
+        assert advisor.get_field_usage() == {}
+        assert advisor.recommend("duckdb", make_events()) == []
+        assert advisor.recommend("clickhouse", make_events()) == []
+
+    def test_sorting_key_rebuild_keeps_retention(self):
+        """The rebuilt table quotes its key columns and keeps the TTL of ocsf_events"""
+        advisor = QueryWorkloadAdvisor()
+        create = advisor._clickhouse_rebuild_ddl(("tenant_id", "device_name", "time"))[0]
+        assert "ORDER BY (`tenant_id`, `device_name`, `time`)" in create
+        assert "TTL time + INTERVAL 30 DAY TO DISK 'cold'" in create
@@ -0,0 +1,67 @@
+"""
+Query Suggestion Engine Tests
+"""
+from query_suggestions import QuerySuggestionEngine, TopKValues
+
+def make_engine():
+    engine = QuerySuggestionEngine(top_k=3)
+    events = (
+        [{"tenant_id": "t1", "severity": "high", "process": {"name": "powershell.exe"}}] * 5 +
+        [{"tenant_id": "t1", "severity": "low", "process_name": "python.exe"}] * 3 +
+        [{"tenant_id": "t2", "severity": "critical"}]
+    )
+    engine.observe_many(events)
+    return engine
+
+class TestTopKValues:
+    """Heavy hitter tracking tests"""
+
+    def test_keeps_most_frequent_values(self):
+        """Frequent values displace rare ones once K is reached"""
+        values = TopKValues(k=2)
+        for value, count in [("a", 5), ("b", 1), ("c", 3), ("d", 4)]:
+            for _ in range(count):
+                values.add(value)
+        assert [value for value, _ in values.most_common()] == ["a", "d"]
+
+class TestQuerySuggestionEngine:
+    """Cursor-aware suggestion tests"""
+
+    def test_field_completion(self):
+        """Partial field names complete from the catalog"""
+        suggestions = make_engine().suggest("proc", 4)
+        assert suggestions[0] == {
+            "type": "field", "value": "process_name", "description": "Process name",
+            "replace": {"start": 0, "end": 4}
+        }
+
+    def test_operator_after_field(self):
+        """A completed field name is followed by operators"""
+        suggestions = make_engine().suggest("severity ", 9)
+        assert {s["type"] for s in suggestions} == {"operator"}
+
+    def test_values_are_per_tenant_and_ranked(self):
+        """Value suggestions come from the tenant's own statistics"""
+        engine = make_engine()
+        values = [s["value"] for s in engine.suggest("severity = ", 11, tenant_id="t1")]
+        assert values == ['"high"', '"low"']
+        assert [s["value"] for s in engine.suggest("severity = ", 11, tenant_id="t2")] == ['"critical"']
+
+    def test_value_prefix_inside_list(self):
+        """Values inside IN lists complete on the quoted prefix"""
+        engine = make_engine()
+        query = 'process_name IN ("py'
+        suggestions = engine.suggest(query, len(query), tenant_id="t1")
+        assert [s["value"] for s in suggestions] == ['"python.exe"']
+        assert suggestions[0]["replace"] == {"start": 17, "end": len(query)}
+
+    def test_logical_operator_after_condition(self):
+        """A complete condition is followed by AND/OR"""
+        query = 'severity = "high" '
+        assert [s["value"] for s in make_engine().suggest(query, len(query))] == ["AND", "OR"]
+
+    def test_load_counts_replaces_statistics(self):
+        """Rollup counts replace incrementally collected statistics"""
+        engine = make_engine()
+        engine.load_counts("t1", "severity", [("medium", 10), ("high", 2)])
+        assert [s["value"] for s in engine.suggest("severity = ", 11, tenant_id="t1")] == ['"medium"', '"high"']
@@ -0,0 +1,141 @@
+"""
+Retroactive IOC Sweep Tests
+"""
+from datetime import datetime, timedelta, timezone
+import json
+
+import duckdb
+import pytest
+
+from clickhouse_provider import ClickHouseSQLBuilder
+from retro_hunt import AhoCorasick, ClickHouseEventSource, DuckDBEventSource, IOCMatcher, RetroHunter, indicator_from_record
+from soar_engine import AlertSeverity
+
+def indicators(*records):
+    return [indicator_from_record(r) for r in records]
+
+class PartitionedSource:
+    """In-memory event source that counts partition scans"""
+
+    def __init__(self, events):
+        self.events = events
+        self.calls = 0
+
+    async def stream_partition(self, start, end, tenant_id=None, columns=None, batch_size=10000):
+        self.calls += 1
+        yield [e for e in self.events
+               if start <= datetime.fromisoformat(e["time"]) < end and (not tenant_id or e["tenant_id"] == tenant_id)]
+
+class RecordingClickHouse:
+    """Stand-in for ClickHouseQueryProvider that records SQL instead of connecting"""
+
+    def __init__(self):
+        self.sql_builder = ClickHouseSQLBuilder()
+        self.queries = []
+
+    async def stream_sql(self, sql, batch_size=10000):
+        self.queries.append(sql)
+        return
+        yield
+
+class TestAhoCorasick:
+    """Multi-pattern search"""
+
+    def test_finds_overlapping_patterns(self):
+        """Every occurrence of every pattern is reported in one pass"""
+        automaton = AhoCorasick(["he", "she", "his", "hers"])
+        found = sorted((start, automaton.patterns[i]) for start, i in automaton.search("ushers"))
+        assert found == [(1, "she"), (2, "he"), (2, "hers")]
+
+class TestIOCMatcher:
+    """Compiled batch matching"""
+
+    def test_matches_each_indicator_kind(self):
+        """Exact IPs, CIDRs, hashes and domains all match through one matcher"""
+        matcher = IOCMatcher(indicators(
+            {"type": "ip", "value": "203.0.113.0/24"},
+            {"type": "ip", "value": "198.51.100.7"},
+            {"type": "file_hash", "value": "D41D8CD98F00B204E9800998ECF8427E"},
+            {"type": "domain", "value": "evil.example.com"},
+        ))
+        event = {
+            "src_endpoint": {"ip": "203.0.113.50"}, "dst_endpoint": {"ip": "198.51.100.7"},
+            "file": {"hash": {"md5": "d41d8cd98f00b204e9800998ecf8427e"}},
+            "http": {"url": "https://cdn.evil.example.com/payload.exe"},
+        }
+        fields = sorted(match.field for match in matcher.match(event))
+        assert fields == ["dst_endpoint_ip", "file_hash_md5", "http_url", "src_endpoint_ip"]
+
+    def test_domains_match_whole_labels(self):
+        """A domain IOC does not match look-alike hosts"""
+        matcher = IOCMatcher(indicators({"type": "domain", "value": "evil.com"}))
+        assert matcher.match({"dns_query": "notevil.com"}) == []
+        assert matcher.match({"dns_query": "evil.com.au"}) == []
+        assert len(matcher.match({"dns_query": "a.evil.com"})) == 1
+
+class TestRetroHunter:
+    """Partitioned sweeps and alerting"""
+
+    @pytest.mark.asyncio
+    async def test_single_pass_per_partition(self):
+        """Thousands of IOCs cost one scan per partition and one alert per indicator and tenant"""
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        events = [
+            {"tenant_id": "t1", "time": (now - timedelta(days=d, hours=1)).isoformat(),
+             "src_endpoint_ip": "192.0.2.10", "device_name": f"host-{d}"}
+            for d in range(5)
+        ] + [{"tenant_id": "t2", "time": (now - timedelta(hours=2)).isoformat(), "src_endpoint_ip": "192.0.2.99"}]
+        source = PartitionedSource(events)
+        alerts = []
+
+        async def sink(alert, event):
+            alerts.append((alert, event))
+
+        batch = indicators(*[{"type": "ip", "value": f"10.{i // 256}.{i % 256}.1"} for i in range(5000)])
+        batch += indicators({"type": "ip", "value": "192.0.2.10", "threat_level": "critical"})
+        hunter = RetroHunter(source, alert_sink=sink)
+        job = await hunter.sweep(batch, days=7)
+
+        assert job.status == "completed"
+        assert source.calls == job.partitions_total == 7
+        assert job.events_scanned == 6 and job.matches == 5
+        assert len(alerts) == 1
+        alert, event = alerts[0]
+        assert alert.severity == AlertSeverity.CRITICAL
+        assert "retro-hunt" in alert.tags
+        assert event["threat_intelligence"]["max_threat_level"] == "critical"
+        assert len(alert.affected_assets) == 6
+
+    @pytest.mark.asyncio
+    async def test_clickhouse_source_scopes_tenant_in_utc(self):
+        """Tenant sweeps over ClickHouse escape the tenant and bound partitions in UTC"""
+        provider = RecordingClickHouse()
+        hunter = RetroHunter(ClickHouseEventSource(provider), alert_sink=None)
+        job = await hunter.sweep(indicators({"type": "ip", "value": "192.0.2.10"}), days=2, tenant_id="o'brien")
+
+        assert job.status == "completed" and len(provider.queries) == 2
+        sql = provider.queries[0]
+        assert "AND tenant_id = 'o''brien'" in sql
+        end = datetime.now(timezone.utc) - timedelta(minutes=1)
+        assert f"toDateTime('{end:%Y-%m-%d %H:}" in sql and "'UTC')" in sql
+        assert "src_endpoint_ip" in sql
+
+    @pytest.mark.asyncio
+    async def test_duckdb_partitions_stream_in_batches(self):
+        """A partition is read in bounded batches rather than loaded whole"""
+        conn = duckdb.connect(":memory:")
+        conn.execute("CREATE TABLE logs (id VARCHAR, tenant_id VARCHAR, timestamp TIMESTAMP, parsed_data VARCHAR)")
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        conn.executemany("INSERT INTO logs VALUES (?, ?, ?, ?)", [
+            (f"log-{i}", "t1", now - timedelta(hours=1, seconds=i),
+             json.dumps({"src_endpoint_ip": "192.0.2.10" if i % 10 == 0 else "198.51.100.1"}))
+            for i in range(250)
+        ])
+        source = DuckDBEventSource(conn)
+        batches = [len(events) async for events in source.stream_partition(now - timedelta(days=1), now, "t1",
+                                                                          batch_size=100)]
+        assert batches == [100, 100, 50]
+
+        hunter = RetroHunter(source, alert_sink=None, batch_size=100)
+        job = await hunter.sweep(indicators({"type": "ip", "value": "192.0.2.10"}), days=1)
+        assert job.status == "completed" and job.events_scanned == 250 and job.matches == 25
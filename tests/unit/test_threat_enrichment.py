@@ -0,0 +1,185 @@
+"""
+Threat Intelligence Batch Enrichment Tests
+"""
+import asyncio
+import json
+from dataclasses import replace
+from datetime import datetime
+
+import pytest
+
+from threat_intelligence import (
+    IndicatorType, ThreatIndicator, ThreatIntelligenceManager, ThreatLevel
+)
+
+class FakePipeline:
+    def __init__(self, store):
+        self.store = store
+        self.commands = []
+
+    def setex(self, key, ttl, value):
+        self.commands.append((key, ttl, value))
+
+    async def execute(self):
+        for key, _, value in self.commands:
+            self.store[key] = value
+
+class FakeRedis:
+    def __init__(self):
+        self.store = {}
+        self.mget_calls = 0
+
+    async def mget(self, keys):
+        self.mget_calls += 1
+        return [self.store.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self.store)
+
+class FakeProvider:
+    def __init__(self, name, malicious, delay=0.01):
+        self.name = name
+        self.config = {"max_concurrency": 2}
+        self.malicious = malicious
+        self.delay = delay
+        self.calls = []
+        self.in_flight = 0
+        self.peak = 0
+
+    async def lookup_indicator(self, indicator, indicator_type):
+        self.calls.append(indicator)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        if indicator not in self.malicious:
+            return None
+        return ThreatIndicator(
+            value=indicator, indicator_type=indicator_type, threat_level=ThreatLevel.HIGH,
+            confidence=0.9, source=self.name, first_seen=datetime.now(), last_seen=datetime.now(),
+            tags=[], context={}
+        )
+
+def make_manager(*providers):
+    manager = ThreatIntelligenceManager(FakeRedis(), {})
+    manager.providers = list(providers)
+    manager.provider_semaphores = {p.name: asyncio.Semaphore(p.config["max_concurrency"]) for p in providers}
+    return manager
+
+class TestBatchEnrichment:
+    """Batched, deduplicated indicator lookups"""
+
+    @pytest.mark.asyncio
+    async def test_indicators_are_looked_up_once_per_batch(self):
+        """Repeated indicators across events cost one provider call"""
+        provider = FakeProvider("feed", {"8.8.8.8"})
+        manager = make_manager(provider)
+        events = [{"src_endpoint": {"ip": ip}} for ip in ["8.8.8.8", "1.1.1.1", "8.8.8.8", "9.9.9.9"] * 3]
+
+        enriched = await manager.enrich_events(events)
+
+        assert sorted(provider.calls) == ["1.1.1.1", "8.8.8.8", "9.9.9.9"]
+        assert manager.redis.mget_calls == 1
+        assert provider.peak <= 2
+        assert [("threat_intelligence" in e) for e in enriched[:4]] == [True, False, True, False]
+        assert enriched[0]["threat_intelligence"]["max_threat_level"] == "high"
+
+    @pytest.mark.asyncio
+    async def test_cache_hits_skip_providers(self):
+        """A second batch is served from the cache"""
+        provider = FakeProvider("feed", {"8.8.8.8"})
+        manager = make_manager(provider)
+        await manager.enrich_events([{"src_endpoint": {"ip": "8.8.8.8"}}])
+        cached = json.loads(manager.redis.store["threat_intel:ip:8.8.8.8"])
+        assert cached["source"] == "feed"
+
+        enriched = await manager.enrich_event({"src_endpoint": {"ip": "8.8.8.8"}})
+        assert provider.calls == ["8.8.8.8"]
+        assert enriched["threat_intelligence"]["indicators"][0]["value"] == "8.8.8.8"
+
+    @pytest.mark.asyncio
+    async def test_provider_priority_and_failures(self):
+        """Providers run concurrently but the first in priority order wins; errors are isolated"""
+        class BrokenProvider(FakeProvider):
+            async def lookup_indicator(self, indicator, indicator_type):
+                raise RuntimeError("upstream down")
+
+        slow = FakeProvider("primary", {"8.8.8.8"}, delay=0.05)
+        fast = FakeProvider("secondary", {"8.8.8.8"})
+        manager = make_manager(BrokenProvider("broken", set()), slow, fast)
+
+        result = await manager._lookup_providers("8.8.8.8", IndicatorType.IP_ADDRESS)
+        assert result.source == "primary"
+
+class TestIndicatorCacheTiers:
+    """In-process tier, negative caching and bloom prefilter"""
+
+    @pytest.mark.asyncio
+    async def test_local_tier_absorbs_repeats(self):
+        """Repeated batches are answered without touching Redis"""
+        provider = FakeProvider("feed", {"8.8.8.8"})
+        manager = make_manager(provider)
+        events = [{"src_endpoint": {"ip": "8.8.8.8"}}, {"src_endpoint": {"ip": "1.1.1.1"}}]
+        await manager.enrich_events(events)
+        enriched = await manager.enrich_events(events)
+
+        assert manager.redis.mget_calls == 1
+        assert len(provider.calls) == 2
+        assert "threat_intelligence" in enriched[0] and "threat_intelligence" not in enriched[1]
+
+    @pytest.mark.asyncio
+    async def test_redis_negative_entries_are_hits(self):
+        """A cached clean verdict in Redis suppresses provider lookups"""
+        provider = FakeProvider("feed", {"1.1.1.1"})
+        manager = make_manager(provider)
+        manager.redis.store["threat_intel:ip:1.1.1.1"] = json.dumps({"threat_level": None})
+
+        enriched = await manager.enrich_event({"src_endpoint": {"ip": "1.1.1.1"}})
+        assert provider.calls == []
+        assert "threat_intelligence" not in enriched
+
+    @pytest.mark.asyncio
+    async def test_indicators_missing_from_feeds_are_unknown(self):
+        """Feed hits short-circuit; everything else still reaches Redis and the providers"""
+        from threat_feeds import LocalIndicatorStore
+
+        provider = FakeProvider("api", {"bad.example.net"})
+        manager = make_manager(provider)
+        manager.local_store = LocalIndicatorStore()
+        listed = ThreatIndicator(
+            value="evil.example.com", indicator_type=IndicatorType.DOMAIN, threat_level=ThreatLevel.CRITICAL,
+            confidence=0.9, source="feed", first_seen=datetime.now(), last_seen=datetime.now(), tags=[], context={}
+        )
+        manager.local_store.replace_source("feed", [listed])
+        manager.load_known_bad(manager.local_store.exact_keys())
+        manager.redis.store["threat_intel:domain:cached.example.org"] = json.dumps(
+            manager._threat_indicator_to_dict(replace(listed, value="cached.example.org"))
+        )
+
+        urls = ["https://EVIL.example.com/a", "https://bad.example.net/b", "https://cached.example.org/c"]
+        enriched = await manager.enrich_events([{"http_url": url} for url in urls])
+        assert [event["threat_intelligence"]["indicators"][0]["source"] for event in enriched] == ["feed", "api", "feed"]
+        assert provider.calls == ["bad.example.net"]
+        assert manager.get_cache_stats()["prefiltered_lookups"] == 2
+
+class TestQuotaAwareEnrichment:
+    """Quota-skipped lookups are not cached as clean"""
+
+    @pytest.mark.asyncio
+    async def test_skipped_lookups_are_not_negative_cached(self):
+        """An exhausted quota leaves the indicator uncached so it is retried later"""
+        from provider_scheduler import ProviderScheduler
+
+        provider = FakeProvider("feed", {"8.8.8.8"})
+        manager = make_manager(provider)
+        manager.provider_schedulers = {
+            "feed": ProviderScheduler(provider, {"rate_limit_per_day": 1}, concurrency=1, max_wait=0)
+        }
+        try:
+            await manager.enrich_events([{"src_endpoint": {"ip": "1.1.1.1"}}, {"src_endpoint": {"ip": "9.9.9.9"}}])
+        finally:
+            await manager.provider_schedulers["feed"].close()
+
+        assert len(provider.calls) == 1
+        assert len(manager.redis.store) == 1
+        assert manager.get_cache_stats()["provider_schedulers"]["feed"]["rate_limited"] == 1
@@ -0,0 +1,175 @@
+"""
+Threat Feed Ingestion Tests
+"""
+import ipaddress
+import json
+import random
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from ip_ranges import IPIntervalIndex
+from threat_feeds import (
+    FeedConfig, LocalIndicatorStore, ThreatFeedIngestor, parse_feed
+)
+from threat_intelligence import IndicatorType, ThreatIntelligenceManager, ThreatLevel
+
+STIX_BUNDLE = {
+    "type": "bundle",
+    "objects": [
+        {"type": "indicator", "id": "indicator--1", "confidence": 90, "labels": ["c2"],
+         "pattern": "[ipv4-addr:value = '203.0.113.0/24'] OR [domain-name:value = 'Evil.Example.com']"},
+        {"type": "indicator", "id": "indicator--2",
+         "pattern": "[file:hashes.'SHA-256' = 'AABBCCDDEEFF00112233445566778899AABBCCDDEEFF00112233445566778899']"},
+        {"type": "indicator", "id": "indicator--3", "valid_until": "2000-01-01T00:00:00Z",
+         "pattern": "[ipv4-addr:value = '198.51.100.1']"},
+    ]
+}
+
+MISP_EVENT = {"Event": {
+    "uuid": "evt-1", "threat_level_id": "1", "Tag": [{"name": "tlp:amber"}],
+    "Attribute": [
+        {"type": "ip-dst|port", "value": "192.0.2.10|443", "to_ids": True},
+        {"type": "domain", "value": "bad.example.net", "to_ids": True},
+        {"type": "comment", "value": "ignored", "to_ids": False},
+    ]
+}}
+
+CSV_FEED = """# abuse feed
+indicator,type,threat_level,confidence,tags
+192.0.2.55,ip,critical,95,botnet;scanner
+d41d8cd98f00b204e9800998ecf8427e,,,,
+not a value,,,,
+"""
+
+def feed(name="test", **kwargs):
+    return FeedConfig(name=name, location="unused", **kwargs)
+
+class TestFeedParsers:
+    """STIX, MISP and CSV normalization"""
+
+    def test_stix_patterns_and_expiry(self):
+        """Pattern comparisons become indicators; expired indicators are dropped"""
+        indicators = parse_feed(json.dumps(STIX_BUNDLE), feed())
+        values = {(i.value, i.indicator_type) for i in indicators}
+        assert values == {
+            ("203.0.113.0/24", IndicatorType.IP_ADDRESS),
+            ("evil.example.com", IndicatorType.DOMAIN),
+            ("aabbccddeeff00112233445566778899aabbccddeeff00112233445566778899", IndicatorType.FILE_HASH),
+        }
+        assert indicators[0].confidence == 0.9 and indicators[0].tags == ["c2"]
+
+    def test_misp_composite_attributes(self):
+        """Composite attribute types are split and non-IDS attributes skipped"""
+        indicators = parse_feed(json.dumps(MISP_EVENT), feed())
+        assert [(i.value, i.threat_level) for i in indicators] == [
+            ("192.0.2.10", ThreatLevel.HIGH), ("bad.example.net", ThreatLevel.HIGH)
+        ]
+        assert indicators[0].tags == ["tlp:amber"]
+
+    def test_csv_columns_and_inference(self):
+        """Explicit columns are honoured and missing types inferred"""
+        indicators = parse_feed(CSV_FEED, feed(threat_level=ThreatLevel.MEDIUM))
+        assert [(i.value, i.indicator_type, i.threat_level) for i in indicators] == [
+            ("192.0.2.55", IndicatorType.IP_ADDRESS, ThreatLevel.CRITICAL),
+            ("d41d8cd98f00b204e9800998ecf8427e", IndicatorType.FILE_HASH, ThreatLevel.MEDIUM),
+        ]
+        assert indicators[0].confidence == 0.95 and indicators[0].tags == ["botnet", "scanner"]
+
+class TestLocalIndicatorStore:
+    """Hash and interval lookups with expiry"""
+
+    def test_interval_index_prefers_narrowest_block(self):
+        """Nested blocks resolve to the most specific payload"""
+        index = IPIntervalIndex([("10.0.0.0/8", "wide"), ("10.1.0.0/16", "narrow"), ("2001:db8::/32", "v6")])
+        assert index.lookup("10.1.2.3") == "narrow"
+        assert index.lookup("10.2.0.1") == "wide"
+        assert index.lookup("2001:db8::5") == "v6"
+        assert index.lookup("11.0.0.1") is None
+
+    def test_interval_index_flattens_nested_blocks(self):
+        """A wide block around many narrow ones matches a naive narrowest-block scan"""
+        cidrs = ["10.0.0.0/8", "10.5.0.0/16", "10.5.5.0/24", "10.5.5.7/32", "10.5.5.7/32"]
+        cidrs += [f"10.{i % 256}.{i // 256}.0/24" for i in range(0, 3000, 7)]
+        entries = [(cidr, index) for index, cidr in enumerate(cidrs)]
+        index = IPIntervalIndex(entries)
+        assert len(index) == len(entries)
+
+        networks = [(ipaddress.ip_network(cidr), payload) for cidr, payload in entries]
+        rng = random.Random(7)
+        probes = ["10.5.5.7", "10.5.5.8", "10.5.4.255", "9.255.255.255", "11.0.0.0"]
+        probes += [f"10.{rng.randrange(256)}.{rng.randrange(16)}.{rng.randrange(256)}" for _ in range(500)]
+        for probe in probes:
+            address = ipaddress.ip_address(probe)
+            matches = [(network.num_addresses, -payload, payload)
+                       for network, payload in networks if address in network]
+            assert index.lookup(probe) == (min(matches)[2] if matches else None), probe
+
+    def test_lookup_across_sources(self):
+        """Exact, CIDR and case-insensitive lookups; refreshes replace a feed's entries"""
+        store = LocalIndicatorStore()
+        store.replace_source("stix", parse_feed(json.dumps(STIX_BUNDLE), feed("stix")))
+        store.replace_source("csv", parse_feed(CSV_FEED, feed("csv")))
+
+        assert store.lookup("203.0.113.77", IndicatorType.IP_ADDRESS).source == "stix"
+        assert store.lookup("EVIL.example.com", IndicatorType.DOMAIN) is not None
+        assert store.lookup("192.0.2.55", IndicatorType.IP_ADDRESS).threat_level == ThreatLevel.CRITICAL
+
+        store.replace_source("stix", [])
+        assert store.lookup("203.0.113.77", IndicatorType.IP_ADDRESS) is None
+        assert store.get_stats()["sources"] == {"stix": 0, "csv": 2}
+
+    def test_expired_indicators_are_purged(self):
+        """Indicators past their TTL stop matching and are purged"""
+        indicators = parse_feed(CSV_FEED, feed())
+        indicators[0].ttl = datetime.now() - timedelta(seconds=1)
+        store = LocalIndicatorStore()
+        store.replace_source("csv", indicators)
+        assert store.lookup("192.0.2.55", IndicatorType.IP_ADDRESS) is None
+        assert store.purge_expired() == 1
+        assert len(store) == 1
+
+class TestFeedIngestor:
+    """End-to-end ingestion into the threat manager"""
+
+    @pytest.mark.asyncio
+    async def test_manager_uses_local_store(self, tmp_path):
+        """Feed indicators enrich events without provider or Redis lookups"""
+        path = tmp_path / "feed.json"
+        path.write_text(json.dumps(STIX_BUNDLE))
+        manager = ThreatIntelligenceManager(None, {})
+        ingestor = ThreatFeedIngestor(LocalIndicatorStore(), [FeedConfig(name="stix", location=str(path))], manager)
+
+        assert await ingestor.ingest_all() == {"stix": 3}
+        enriched = await manager.enrich_event({"dst_endpoint": {"ip": "203.0.113.9"}})
+        assert enriched["threat_intelligence"]["indicators"][0]["source"] == "stix"
+
+    @pytest.mark.asyncio
+    async def test_refresh_rebuilds_once_off_the_event_loop(self, tmp_path, monkeypatch):
+        """Every feed loads with one index rebuild, and purges and rebuilds run in worker threads"""
+        builds = []
+        build = LocalIndicatorStore._build
+
+        def recording_build(sources):
+            builds.append(threading.current_thread() is threading.main_thread())
+            return build(sources)
+
+        monkeypatch.setattr(LocalIndicatorStore, "_build", staticmethod(recording_build))
+        (tmp_path / "feed.json").write_text(json.dumps(STIX_BUNDLE))
+        (tmp_path / "feed.csv").write_text(CSV_FEED)
+        manager = ThreatIntelligenceManager(None, {})
+        store = LocalIndicatorStore()
+        ingestor = ThreatFeedIngestor(store, [FeedConfig(name="stix", location=str(tmp_path / "feed.json")),
+                                              FeedConfig(name="csv", location=str(tmp_path / "feed.csv"))], manager)
+
+        assert await ingestor.ingest_all() == {"stix": 3, "csv": 2}
+        assert builds == [False]
+        assert len(manager.known_bad) == len(list(store.exact_keys()))
+
+        indicators = parse_feed(CSV_FEED, feed())
+        indicators[0].ttl = datetime.now() - timedelta(seconds=1)
+        await store.replace_sources({"csv": indicators})
+        assert await store.purge_expired_async() == 1
+        assert builds == [False, False, False]
+        assert await store.purge_expired_async() == 0 and len(builds) == 3
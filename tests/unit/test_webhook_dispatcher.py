@@ -0,0 +1,170 @@
+"""
+Batched Webhook Dispatcher Tests
+"""
+import asyncio
+import gzip
+import json
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from http_client import HTTPClientConfig, SharedHTTPClient
+from soar_engine import Alert, PlaybookAction, SOAREngine
+from webhook_dispatcher import WebhookDispatcher, WebhookDispatcherConfig
+
+class StubN8N:
+    """Local webhook endpoint that records decoded batches"""
+
+    def __init__(self, statuses=None, delay=0.0, echo=True):
+        self.statuses = list(statuses or [])
+        self.delay = delay
+        self.echo = echo
+        self.batches = []
+        self.encodings = []
+        self.in_flight = 0
+        self.peak = 0
+
+    async def handler(self, request):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            raw = await request.read()
+            self.encodings.append(request.headers.get("Content-Encoding"))
+            if raw[:2] == b"\x1f\x8b":  # aiohttp may already have inflated the body
+                raw = gzip.decompress(raw)
+            if request.headers["Content-Type"] == "application/x-ndjson":
+                items = [json.loads(line) for line in raw.decode().splitlines() if line]
+            else:
+                items = json.loads(raw)
+            status = self.statuses.pop(0) if self.statuses else 200
+            if status != 200:
+                return web.json_response({"error": "down"}, status=status)
+            self.batches.append(items)
+            if self.echo:
+                return web.json_response([{"handled": item["n"]} for item in items])
+            return web.json_response({"accepted": len(items)})
+        finally:
+            self.in_flight -= 1
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/soar-action-batch", self.handler)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        return str(self.server.make_url("/soar-action-batch"))
+
+async def make_dispatcher(**overrides):
+    client = SharedHTTPClient(HTTPClientConfig(failure_threshold=1000))
+    config = WebhookDispatcherConfig(backoff_base=0.001, **overrides)
+    return WebhookDispatcher(config, client), client
+
+class TestWebhookDispatcher:
+    """Batching, compression, concurrency and dead-lettering"""
+
+    @pytest.mark.asyncio
+    async def test_size_threshold_batches_and_per_item_results(self):
+        """250 calls go out as three gzip NDJSON batches; each caller gets its own result"""
+        stub = StubN8N()
+        url = await stub.start()
+        dispatcher, client = await make_dispatcher(max_batch_size=100, max_wait=0.05)
+        try:
+            results = await asyncio.gather(*(dispatcher.submit(url, {"n": i}) for i in range(250)))
+        finally:
+            await client.close()
+            await stub.server.close()
+
+        assert sorted(len(batch) for batch in stub.batches) == [50, 100, 100]
+        assert set(stub.encodings) == {"gzip"}
+        assert [r["result"]["handled"] for r in results] == list(range(250))
+        stats = dispatcher.get_stats()["targets"][url]
+        assert stats["delivered"] == 250 and stats["bytes_sent"] < stats["bytes_raw"]
+
+    @pytest.mark.asyncio
+    async def test_time_threshold_json_and_coalescing(self):
+        """A partial batch is sent after max_wait; duplicate keys share one delivery"""
+        stub = StubN8N(echo=False)
+        url = await stub.start()
+        dispatcher, client = await make_dispatcher(max_wait=0.02, batch_format="json", compress=False)
+        try:
+            results = await asyncio.gather(
+                dispatcher.submit(url, {"n": 1}, key="alert-1:notify"),
+                dispatcher.submit(url, {"n": 1}, key="alert-1:notify"),
+                dispatcher.submit(url, {"n": 2}, key="alert-2:notify"),
+            )
+        finally:
+            await client.close()
+            await stub.server.close()
+
+        assert stub.batches == [[{"n": 1}, {"n": 2}]]
+        assert stub.encodings == [None]
+        assert all(r == {"success": True, "result": {"accepted": 2}} for r in results)
+        assert dispatcher.get_stats()["targets"][url]["coalesced"] == 1
+
+    @pytest.mark.asyncio
+    async def test_per_target_concurrency_and_retry(self):
+        """At most max_concurrency batches are in flight; transient errors are retried"""
+        stub = StubN8N(statuses=[503], delay=0.03)
+        url = await stub.start()
+        dispatcher, client = await make_dispatcher(max_batch_size=5, max_concurrency=2)
+        try:
+            results = await asyncio.gather(*(dispatcher.submit(url, {"n": i}) for i in range(40)))
+        finally:
+            await client.close()
+            await stub.server.close()
+
+        assert all(r["success"] for r in results)
+        assert stub.peak <= 2
+        assert sum(len(batch) for batch in stub.batches) == 40
+
+    @pytest.mark.asyncio
+    async def test_failed_batches_are_dead_lettered(self, tmp_path):
+        """Batches that exhaust their retries are spilled to the dead-letter file"""
+        stub = StubN8N(statuses=[500] * 10)
+        url = await stub.start()
+        path = tmp_path / "dead.ndjson"
+        dispatcher, client = await make_dispatcher(max_retries=1, max_wait=0.01, dead_letter_path=str(path))
+        try:
+            results = await asyncio.gather(*(dispatcher.submit(url, {"n": i}) for i in range(3)))
+        finally:
+            await client.close()
+            await stub.server.close()
+
+        assert all(not r["success"] and r["dead_lettered"] for r in results)
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [r["payload"]["n"] for r in records] == [0, 1, 2]
+        assert records[0]["url"] == url and records[0]["error"] == "HTTP 500"
+
+    @pytest.mark.asyncio
+    async def test_unexpected_errors_resolve_every_caller(self):
+        """An exception outside the retried error types still answers each waiting caller"""
+        class BrokenClient:
+            def post(self, url, **kwargs):
+                raise ValueError("bad request options")
+
+        dispatcher = WebhookDispatcher(WebhookDispatcherConfig(max_wait=0.01), BrokenClient())
+        results = await asyncio.wait_for(
+            asyncio.gather(*(dispatcher.submit("http://n8n/batch", {"n": i}) for i in range(3))), timeout=1
+        )
+        assert all(r == {"success": False, "error": "bad request options", "dead_lettered": False}
+                   for r in results)
+        assert dispatcher.get_stats()["targets"]["http://n8n/batch"]["failed"] == 3
+
+    @pytest.mark.asyncio
+    async def test_actions_do_not_retry_dispatched_deliveries(self):
+        """A dead-lettered batch result ends the action instead of multiplying the dispatcher's retries"""
+        class CountingDispatcher:
+            calls = 0
+
+            async def submit(self, url, payload, key=None):
+                self.calls += 1
+                return {"success": False, "error": "HTTP 500", "dead_lettered": True}
+
+        engine = SOAREngine({"action_retry_backoff": 0.001})
+        engine.webhook_dispatcher = CountingDispatcher()
+        action = PlaybookAction(name="custom", action_type="n8n_custom", parameters={}, retry_count=3)
+        result = await engine._execute_action_with_retries(action, Alert(title="test"), {})
+
+        assert engine.webhook_dispatcher.calls == 1
+        assert result["attempts"] == 1 and result["dead_lettered"]